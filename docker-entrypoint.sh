@@ -2,6 +2,8 @@
 set -e
 if [ "$RUN_MODE_ENV" = "API" ]; then
     exec hypercorn api.api:app -b 0.0.0.0:80 --worker-class trio
+elif [ "$RUN_MODE_ENV" = "LAMBDA" ]; then
+    exec python -m awslambdaric lambda_handler.handler
 else
     exec python main.py "$@"
 fi
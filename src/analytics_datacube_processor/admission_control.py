@@ -0,0 +1,217 @@
+"""Memory-budgeted admission of the concurrent datacube builds"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+from analytics_datacube_processor.spatial_tiling import estimate_pixels
+from analytics_datacube_processor.telemetry import ADMISSION_REJECTED, ADMITTED_MEMORY
+from analytics_datacube_processor.utils import convert_to_wkt
+
+logger = LogManager.get_instance()
+
+# revisit periods in days of the fetched collections (Sentinel-2, Landsat 8)
+COLLECTION_REVISIT_DAYS = (5, 16)
+
+# size of a value of the merged datacube (float64)
+BYTES_PER_VALUE = 8
+
+# copies of the datacube in memory at the peak of a build without memory budget: fetched time
+# series, merged datacube and encoding buffers
+MEMORY_OVERHEAD = 3
+
+# memory of a build independent of the datacube size (clients, imports, zarr metadata)
+BASE_JOB_MEMORY_MB = 50.0
+
+DEFAULT_RETRY_AFTER_SECONDS = 30.0
+
+
+def estimate_nb_scenes(start_date: datetime, end_date: datetime) -> int:
+    """
+    Estimate the number of scenes of a time series from the revisit of the collections.
+
+    Args:
+        start_date (datetime): start date of the time series
+        end_date (datetime): end date of the time series
+
+    Returns:
+        int: the number of scenes
+    """
+    days = max(0, (end_date - start_date).days)
+    return 1 + math.ceil(sum(days / revisit_days for revisit_days in COLLECTION_REVISIT_DAYS))
+
+
+def estimate_job_memory_mb(
+    input_data: dict,
+    max_pixels_per_tile: Optional[int] = None,
+    max_concurrent_tiles: int = 4,
+    memory_budget_mb: Optional[float] = None,
+    max_concurrent_fetches: int = 1,
+) -> float:
+    """
+    Estimate the peak memory of a datacube build from the area of its polygon, its date span
+    and its number of indicators. The estimate is conservative: the scenes are assumed to
+    cover the bounding box of the polygon, and a tiled area of interest only holds the tiles
+    processed in parallel in memory. With a memory budget, the build holds at most a date
+    window of each concurrent fetch and a time slice of the zarr write, each within the budget.
+
+    Args:
+        input_data (dict): the processor input data
+        max_pixels_per_tile (int, optional): tiling threshold of the processor
+        max_concurrent_tiles (int): number of tiles processed in parallel
+        memory_budget_mb (float, optional): memory budget of the fetch windows and of the
+            zarr write slices of the processor
+        max_concurrent_fetches (int): number of indicators fetched in parallel
+
+    Returns:
+        float: the estimated memory in MB
+    """
+    nb_pixels = estimate_pixels(convert_to_wkt(input_data["parameters"]["polygon"]))
+    nb_concurrent_tiles = 1
+    if max_pixels_per_tile is not None and nb_pixels > max_pixels_per_tile:
+        nb_concurrent_tiles = max_concurrent_tiles
+        nb_pixels = min(nb_pixels, max_pixels_per_tile * max_concurrent_tiles)
+    nb_scenes = estimate_nb_scenes(
+        datetime.fromisoformat(input_data["parameters"]["startDate"]),
+        datetime.fromisoformat(input_data["parameters"]["endDate"]),
+    )
+    nb_values = nb_pixels * nb_scenes * len(input_data["indicators"])
+    datacube_mb = nb_values * BYTES_PER_VALUE * MEMORY_OVERHEAD / 1024 / 1024
+    if memory_budget_mb is not None:
+        nb_windows = max_concurrent_fetches * nb_concurrent_tiles + 1
+        datacube_mb = min(datacube_mb, memory_budget_mb * nb_windows)
+    return BASE_JOB_MEMORY_MB + datacube_mb
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Raised when a build is not admitted within the waiting timeout.
+
+    Attributes:
+        retry_after_seconds (float): suggested delay before the build is requested again
+    """
+
+    def __init__(self, message: str, retry_after_seconds: float):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class AdmissionController:
+    """
+    Admit the datacube builds while the sum of their memory estimates fits in a budget, the
+    other builds wait in arrival order. A build estimated above the whole budget runs alone.
+
+    Parameters:
+        memory_budget_mb: memory budget of the concurrent builds
+        retry_after_seconds: delay suggested to the rejected requests
+    """
+
+    def __init__(
+        self, memory_budget_mb: float, retry_after_seconds: float = DEFAULT_RETRY_AFTER_SECONDS
+    ):
+        if memory_budget_mb <= 0:
+            raise ValueError("memory_budget_mb must be greater than 0")
+        self.memory_budget_mb = memory_budget_mb
+        self.retry_after_seconds = retry_after_seconds
+        self.__admitted_mb = 0.0
+        self.__waiting: deque = deque()
+        self.__condition = threading.Condition()
+
+    @property
+    def admitted_mb(self) -> float:
+        """sum of the memory estimates of the running builds"""
+        with self.__condition:
+            return self.__admitted_mb
+
+    @contextmanager
+    def admit(self, memory_mb: float, timeout_seconds: Optional[float] = None):
+        """
+        Wait until the build fits in the budget, and hold its memory while in the context.
+
+        Args:
+            memory_mb (float): the memory estimate of the build
+            timeout_seconds (float, optional): maximum waiting time, None to wait indefinitely
+
+        Raises:
+            AdmissionRejectedError: when the build is not admitted within the timeout
+        """
+        if memory_mb > self.memory_budget_mb:
+            logger.info(
+                f"AnalyticsDatacube: build of {memory_mb:.0f} MB above the memory budget "
+                f"({self.memory_budget_mb:.0f} MB), run alone"
+            )
+        memory_mb = min(memory_mb, self.memory_budget_mb)
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        ticket = object()
+        with self.__condition:
+            self.__waiting.append(ticket)
+            try:
+                while (
+                    self.__waiting[0] is not ticket
+                    or self.__admitted_mb + memory_mb > self.memory_budget_mb
+                ):
+                    remaining_seconds = None if deadline is None else deadline - time.monotonic()
+                    if remaining_seconds is not None and remaining_seconds <= 0:
+                        ADMISSION_REJECTED.inc()
+                        raise AdmissionRejectedError(
+                            f"Not enough memory for a build of {memory_mb:.0f} MB "
+                            f"({self.__admitted_mb:.0f}/{self.memory_budget_mb:.0f} MB in use)",
+                            self.retry_after_seconds,
+                        )
+                    self.__condition.wait(remaining_seconds)
+            finally:
+                self.__waiting.remove(ticket)
+                # the next build may fit now that this one is admitted or gave up
+                self.__condition.notify_all()
+            self.__admitted_mb += memory_mb
+            ADMITTED_MEMORY.set(self.__admitted_mb)
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__admitted_mb -= memory_mb
+                ADMITTED_MEMORY.set(self.__admitted_mb)
+                self.__condition.notify_all()
+
+    def run(self, function: Callable, memory_mb: float, timeout_seconds: Optional[float] = None):
+        """
+        Run a build once it is admitted.
+
+        Args:
+            function (Callable): the build, without arguments
+            memory_mb (float): the memory estimate of the build
+            timeout_seconds (float, optional): maximum waiting time, None to wait indefinitely
+
+        Raises:
+            AdmissionRejectedError: when the build is not admitted within the timeout
+
+        Returns:
+            the result of the build
+        """
+        with self.admit(memory_mb, timeout_seconds):
+            return function()
+
+
+def get_admission_controller_from_env() -> Optional[AdmissionController]:
+    """
+    Build the admission controller configured by the ADMISSION_MEMORY_BUDGET_MB and
+    ADMISSION_RETRY_AFTER_SECONDS (default 30) env variables.
+
+    Returns:
+        AdmissionController, or None when no memory budget is configured
+    """
+    memory_budget_mb = os.getenv("ADMISSION_MEMORY_BUDGET_MB")
+    if not memory_budget_mb:
+        return None
+    logger.info(f"AnalyticsDatacube: builds admitted within {memory_budget_mb} MB")
+    return AdmissionController(
+        float(memory_budget_mb),
+        float(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", str(DEFAULT_RETRY_AFTER_SECONDS))),
+    )
@@ -0,0 +1,138 @@
+"""Local derivation of indicators from reflectance bands"""
+
+import re
+from typing import Dict, List, Optional
+
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+logger = LogManager.get_instance()
+
+# Indicator requested to Geosys to retrieve all the reflectance bands at once
+REFLECTANCE_INDICATOR = "Reflectance"
+
+# Reflectance values above this threshold are considered scaled by REFLECTANCE_SCALE_FACTOR
+REFLECTANCE_SCALE_FACTOR = 10000.0
+
+# Accepted band names (normalized: lower case, alphanumeric only) for each spectral band
+BAND_ALIASES = {
+    "blue": ["blue", "b2", "b02"],
+    "green": ["green", "b3", "b03"],
+    "red": ["red", "b4", "b04"],
+    "nir": ["nir", "nearinfrared", "b8", "b08", "b8a"],
+    "swir": ["swir", "swir1", "swir16", "b11"],
+}
+
+
+def _ndvi(bands):
+    return (bands["nir"] - bands["red"]) / (bands["nir"] + bands["red"])
+
+
+def _gndvi(bands):
+    return (bands["nir"] - bands["green"]) / (bands["nir"] + bands["green"])
+
+
+def _ndwi(bands):
+    return (bands["nir"] - bands["swir"]) / (bands["nir"] + bands["swir"])
+
+
+def _evi(bands):
+    nir = _to_unit_reflectance(bands["nir"])
+    red = _to_unit_reflectance(bands["red"])
+    blue = _to_unit_reflectance(bands["blue"])
+    return 2.5 * (nir - red) / (nir + 6.0 * red - 7.5 * blue + 1.0)
+
+
+def _cvi(bands):
+    return bands["nir"] * bands["red"] / bands["green"] ** 2
+
+
+# Indicator formulas and the spectral bands they need
+INDICATOR_FORMULAS = {
+    "NDVI": (["nir", "red"], _ndvi),
+    "GNDVI": (["nir", "green"], _gndvi),
+    "NDWI": (["nir", "swir"], _ndwi),
+    "EVI": (["nir", "red", "blue"], _evi),
+    "CVI": (["nir", "red", "green"], _cvi),
+}
+
+
+def _normalize_band_name(name) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def _to_unit_reflectance(band: xarray.DataArray) -> xarray.DataArray:
+    """Bring scaled reflectance values (e.g. 0-10000) back to the [0, 1] range"""
+    if float(band.max(skipna=True)) > 1.0:
+        return band / REFLECTANCE_SCALE_FACTOR
+    return band
+
+
+def is_derivable(indicator: str) -> bool:
+    """check if an indicator can be computed locally from reflectance bands
+    Args:
+        indicator (str): the indicator name
+
+    Returns:
+        boolean (True/False)
+    """
+    return indicator.upper() in INDICATOR_FORMULAS
+
+
+def get_reflectance_bands(reflectance_dataset: xarray.Dataset) -> Dict[str, xarray.DataArray]:
+    """
+    Extract the spectral bands of a Geosys reflectance dataset.
+
+    Args:
+        reflectance_dataset (xarray.Dataset): dataset returned by the "Reflectance" time series,
+            with a "reflectance" variable and a "band" dimension
+
+    Returns:
+        dict: spectral band name (blue, green, red, nir, swir) -> DataArray without band dimension
+    """
+    if REFLECTANCE_INDICATOR.lower() not in reflectance_dataset.data_vars:
+        return {}
+
+    reflectance = reflectance_dataset[REFLECTANCE_INDICATOR.lower()].astype("float32")
+    available = {_normalize_band_name(band): band for band in reflectance.coords["band"].values}
+
+    bands = {}
+    for band_name, aliases in BAND_ALIASES.items():
+        for alias in aliases:
+            if alias in available:
+                bands[band_name] = reflectance.sel(band=available[alias], drop=True)
+                break
+    return bands
+
+
+def derive_indicators(
+    reflectance_dataset: xarray.Dataset, indicators: List[str]
+) -> Dict[str, Optional[xarray.Dataset]]:
+    """
+    Compute indicators from a reflectance dataset with vectorized band math.
+    The output datasets have the same layout as the ones returned by Geosys for a single
+    indicator (variable named after the lower case indicator, with a one-value "band" dimension).
+
+    Args:
+        reflectance_dataset (xarray.Dataset): the reflectance dataset
+        indicators (List[str]): the indicators to derive
+
+    Returns:
+        dict: indicator -> derived dataset, or None when its bands are not available
+    """
+    bands = get_reflectance_bands(reflectance_dataset)
+    derived = {}
+    for indicator in indicators:
+        required_bands, formula = INDICATOR_FORMULAS[indicator.upper()]
+        missing_bands = [band for band in required_bands if band not in bands]
+        if missing_bands:
+            logger.info(
+                f"AnalyticsDatacube: derive_indicators: Cannot derive {indicator}, "
+                f"missing bands {missing_bands}"
+            )
+            derived[indicator] = None
+            continue
+
+        values = formula(bands).expand_dims(band=[indicator], axis=1)
+        derived[indicator] = xarray.Dataset(data_vars={indicator.lower(): values})
+    return derived
@@ -0,0 +1,262 @@
+"""Batch processor class"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from byoa.telemetry.log_manager.log_manager import LogManager
+from geosyspy import Geosys
+from geosyspy.utils.constants import Env, Region
+
+from analytics_datacube_processor.admission_control import estimate_job_memory_mb
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.fetch_policy import CircuitOpenError
+from analytics_datacube_processor.geosys_client_pool import get_geosys_client_pool
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.progress import ProgressEvent, ProgressTracker
+from analytics_datacube_processor.progress_event_type import ProgressEventType
+from schemas.output_schema import BatchOutputModel, FieldOutputModel, OutputModel
+from utils.file_utils import validate_data
+
+logger = LogManager.get_instance()
+
+
+class AnalyticsDatacubeBatch:
+    """AnalyticsDatacubeBatch builds one datacube per field of a batch request
+
+    All the fields share the same Geosys client and the same upload thread pool,
+    and are processed concurrently.
+
+    Parameters:
+        batch_input_data: dict of batch input data (fields and shared indicators)
+        enum_env: 'Env.PROD' or 'Env.PREPROD'
+        enum_region: 'Region.NA'
+        priority_queue: 'realtime' or 'bulk'
+        bearer_token: optional geosys identity server token to access geosys api
+        entity_id: optional entity id, prefixed to the field id to build each output path
+        max_concurrent_fields: maximum number of fields processed in parallel
+        upload_workers: size of the upload thread pool shared by all the fields
+        progress_callback: optional callable receiving the ProgressEvent of the fields, tagged
+            with their field_id, the progress being the mean progress of the fields
+        job_id: optional identifier of the job, each field is checkpointed as the job
+            "{job_id}_{field_id}" (with the checkpoint_store processor option) so that a batch run
+            again with the same id resumes its fields
+        cancellation_token: optional token cancelling the fields not completed yet
+        processor_options: other AnalyticsDatacube options applied to every field
+    """
+
+    def __init__(
+        self,
+        batch_input_data,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        bearer_token: Optional[str] = None,
+        entity_id: Optional[str] = None,
+        enum_env: Env = Env.PROD,
+        enum_region: Region = Region.NA,
+        priority_queue: str = "realtime",
+        max_concurrent_fields: int = 4,
+        upload_workers: int = 8,
+        progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+        job_id: Optional[str] = None,
+        cancellation_token: Optional[CancellationToken] = None,
+        **processor_options,
+    ):
+        validate_data(batch_input_data, "batch_input")
+        if max_concurrent_fields < 1:
+            raise ValueError("max_concurrent_fields must be greater than or equal to 1")
+        self.batch_input_data = batch_input_data
+        self.entity_id = entity_id
+        self.max_concurrent_fields = max_concurrent_fields
+        self.upload_workers = upload_workers
+        self.processor_options = processor_options
+        self.progress_callback = progress_callback
+        self.job_id = job_id
+        self.cancellation_token = cancellation_token
+        self.__progress = ProgressTracker()
+        self.__fields_progress = {}
+        self.__nb_fields_done = 0
+        self.__fields_progress_lock = threading.Lock()
+        self.__circuit_open_error: Optional[CircuitOpenError] = None
+        self.__client: Geosys = get_geosys_client_pool().get_client(
+            client_id,
+            client_secret,
+            username,
+            password,
+            enum_env,
+            enum_region,
+            priority_queue,
+            bearer_token,
+        )
+
+    def __get_field_input_data(self, field: dict) -> dict:
+        """build the single datacube input data of a field"""
+        input_data = {
+            "parameters": {
+                "polygon": field["polygon"],
+                "startDate": field["startDate"],
+                "endDate": field["endDate"],
+            },
+            "indicators": self.batch_input_data["indicators"],
+        }
+        for option in ("encoding_profile", "zarr_layout", "compositing", "output_format"):
+            if self.batch_input_data.get(option):
+                input_data[option] = self.batch_input_data[option]
+        return input_data
+
+    def estimate_memory_mb(self) -> float:
+        """
+        Estimate the peak memory of the batch: the fields with the largest estimates
+        processed at the same time.
+
+        Returns:
+            float: the estimated memory in MB
+        """
+        estimates = sorted(
+            (
+                estimate_job_memory_mb(
+                    self.__get_field_input_data(field),
+                    self.processor_options.get("max_pixels_per_tile"),
+                    self.processor_options.get("max_concurrent_tiles", 4),
+                    self.processor_options.get("memory_budget_mb"),
+                    self.processor_options.get("max_concurrent_fetches", 1),
+                )
+                for field in self.batch_input_data["fields"]
+            ),
+            reverse=True,
+        )
+        return sum(estimates[: self.max_concurrent_fields])
+
+    def __forward_field_event(self, field_id: str, event: ProgressEvent):
+        """
+        Forward the progress event of a field, with the mean progress of the fields.
+        The end of a field is reported by a FIELD_DONE event instead.
+
+        Args:
+            field_id (str): the field identifier
+            event (ProgressEvent): the progress event of the field
+        """
+        if event.event_type == ProgressEventType.COMPLETED:
+            return
+        with self.__fields_progress_lock:
+            self.__fields_progress[field_id] = event.progress
+            progress = sum(self.__fields_progress.values()) / len(self.batch_input_data["fields"])
+        self.__progress.emit(
+            event.event_type,
+            f"field {field_id}: {event.message}",
+            event.done,
+            event.total,
+            progress=progress,
+            field_id=field_id,
+            **event.details,
+        )
+
+    def __on_field_done(self, field_id: str, succeeded: bool):
+        """
+        Emit the progress event of a processed field.
+
+        Args:
+            field_id (str): the field identifier
+            succeeded (bool): whether the datacube of the field was built
+        """
+        nb_fields = len(self.batch_input_data["fields"])
+        with self.__fields_progress_lock:
+            self.__fields_progress[field_id] = 1.0
+            self.__nb_fields_done += 1
+            done = self.__nb_fields_done
+            progress = sum(self.__fields_progress.values()) / nb_fields
+        self.__progress.emit(
+            ProgressEventType.FIELD_DONE,
+            f"field {field_id} {'succeeded' if succeeded else 'failed'} ({done}/{nb_fields})",
+            done,
+            nb_fields,
+            progress=progress,
+            field_id=field_id,
+            succeeded=succeeded,
+        )
+
+    def __trigger_field(self, field: dict, upload_executor: ThreadPoolExecutor):
+        """
+        Build and upload the datacube of a single field.
+        Errors are isolated so one failing field does not abort the others, except the
+        cancellation of the batch.
+
+        Args:
+            field (dict): the field parameters
+            upload_executor (ThreadPoolExecutor): the shared upload pool
+
+        Raises:
+            JobCancelledError: when the batch is cancelled
+
+        Returns:
+            FieldOutputModel
+        """
+        field_id = field["field_id"]
+        entity_id = f"{self.entity_id}_{field_id}" if self.entity_id else field_id
+        if self.cancellation_token is not None:
+            self.cancellation_token.raise_if_cancelled()
+        try:
+            logger.info(f"AnalyticsDatacubeBatch: Build datacube of field {field_id}")
+            processor = AnalyticsDatacube(
+                self.__get_field_input_data(field),
+                entity_id=entity_id,
+                client=self.__client,
+                upload_workers=self.upload_workers,
+                upload_executor=upload_executor,
+                progress_callback=lambda event: self.__forward_field_event(field_id, event),
+                job_id=f"{self.job_id}_{field_id}" if self.job_id is not None else None,
+                cancellation_token=self.cancellation_token,
+                **self.processor_options,
+            )
+            result = OutputModel(**processor.trigger())
+            self.__on_field_done(field_id, True)
+            return FieldOutputModel(field_id=field_id, succeeded=True, result=result)
+        except JobCancelledError:
+            raise
+        except Exception as exc:
+            logger.error(f"Error while generating datacube of field {field_id}: {str(exc)}")
+            if isinstance(exc, CircuitOpenError):
+                self.__circuit_open_error = exc
+            self.__on_field_done(field_id, False)
+            return FieldOutputModel(field_id=field_id, succeeded=False, error=str(exc))
+
+    def trigger(self):
+        """trigger the processor on every field
+        Raises:
+            JobCancelledError: when the batch is cancelled
+            CircuitOpenError: when no field succeeded while Geosys is degraded
+
+        Returns:
+            batch output_schema object
+        """
+        logger.info("Batch processor triggered")
+        fields = self.batch_input_data["fields"]
+        self.__progress = ProgressTracker(self.progress_callback)
+        self.__fields_progress = {}
+        self.__nb_fields_done = 0
+        self.__circuit_open_error = None
+        max_workers = max(1, min(self.max_concurrent_fields, len(fields)))
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as upload_executor:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                fields_output = list(
+                    executor.map(
+                        lambda field: self.__trigger_field(field, upload_executor), fields
+                    )
+                )
+
+        nb_failed = sum(1 for field_output in fields_output if not field_output.succeeded)
+        if nb_failed == len(fields_output) and self.__circuit_open_error is not None:
+            # the batch is requested again once Geosys recovers
+            raise self.__circuit_open_error
+        self.__progress.emit(
+            ProgressEventType.COMPLETED,
+            f"batch completed: {len(fields_output) - nb_failed} fields succeeded, "
+            f"{nb_failed} failed",
+        )
+        logger.info(
+            f"AnalyticsDatacubeBatch: {len(fields_output) - nb_failed} fields succeeded, "
+            f"{nb_failed} failed"
+        )
+        return BatchOutputModel(fields=fields_output).model_dump()
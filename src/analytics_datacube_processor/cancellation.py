@@ -0,0 +1,69 @@
+"""Cooperative cancellation of the datacube builds"""
+
+import threading
+from typing import Optional
+
+
+class JobCancelledError(RuntimeError):
+    """
+    Raised by a build at its next cancellation check once its token is cancelled.
+
+    Attributes:
+        reason (str): why the build was cancelled
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Datacube build cancelled: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Cancellation flag shared by a build and its canceller (client disconnection, job
+    cancellation, process shutdown). The build checks it between its indicator fetches, its zarr
+    region writes and its object uploads, so that it stops on a consistent checkpoint instead of
+    being interrupted halfway.
+    """
+
+    def __init__(self):
+        self.__event = threading.Event()
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """whether the build was cancelled"""
+        return self.__event.is_set()
+
+    def cancel(self, reason: str = "cancelled by the client"):
+        """
+        Cancel the build, the first reason is kept.
+
+        Args:
+            reason (str, optional): why the build is cancelled
+        """
+        if not self.__event.is_set():
+            self.reason = reason
+            self.__event.set()
+
+    def raise_if_cancelled(self):
+        """
+        Check the token.
+
+        Raises:
+            JobCancelledError: if the build was cancelled
+        """
+        if self.__event.is_set():
+            raise JobCancelledError(self.reason)
+
+    def sleep(self, seconds: float):
+        """
+        Wait for a delay (e.g. a retry backoff), interrupted by the cancellation.
+
+        Args:
+            seconds (float): the delay
+
+        Raises:
+            JobCancelledError: if the build is cancelled before the end of the delay
+        """
+        if self.__event.wait(seconds):
+            raise JobCancelledError(self.reason)
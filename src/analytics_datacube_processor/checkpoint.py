@@ -0,0 +1,319 @@
+"""Checkpoints of the datacube builds, to resume an interrupted job instead of starting over"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+from analytics_datacube_processor.identifiers import JOB_ID_PATTERN
+from analytics_datacube_processor.tile_cache import get_tile_key
+
+logger = LogManager.get_instance()
+
+CHECKPOINT_MANIFEST_NAME = "manifest.jsonl"
+INDICATORS_DIRECTORY_NAME = "indicators"
+
+
+def get_indicator_checkpoint_key(
+    geometry: str, indicator: str, start_date: datetime, end_date: datetime
+) -> str:
+    """
+    Build the checkpoint key of an indicator fetch: the indicator, the tile key of its
+    geometry (a tile of a tiled build) and its dates.
+
+    Args:
+        geometry (str): WKT geometry of the fetch
+        indicator (str): the indicator
+        start_date (datetime): start date of the fetch
+        end_date (datetime): end date of the fetch
+
+    Returns:
+        str: the checkpoint key
+    """
+    return (
+        f"{indicator.lower()}_{get_tile_key(geometry)}_"
+        f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+    )
+
+
+def get_region_key(region: Optional[Dict[str, slice]] = None) -> str:
+    """
+    Build the checkpoint key of a zarr region write.
+
+    Args:
+        region (Dict[str, slice], optional): the window of the region per dimension, None for
+            a write of the whole dataset
+
+    Returns:
+        str: the region key
+    """
+    if region is None:
+        return "all"
+    return ",".join(
+        f"{dim}:{window.start}-{window.stop}" for dim, window in sorted(region.items())
+    )
+
+
+class JobCheckpoint:
+    """
+    Checkpoint of a single job: its manifest records the completed indicator fetches (whose
+    datasets are kept next to it), the written zarr regions, the uploaded objects and, once the
+    job succeeded, its output. The manifest is an append-only file of json records, each
+    record being appended once its step is done, so that an interrupted job loses at most the
+    steps in progress.
+
+    Parameters:
+        directory: folder of the checkpoint
+        job_id: the job identifier
+        request_key: key of the request (see get_request_cache_key), a job id cannot be
+            resumed with another request
+    """
+
+    def __init__(self, directory: str, job_id: str, request_key: str):
+        self.directory = directory
+        self.job_id = job_id
+        self.request_key = request_key
+        self.output_name: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.__indicators = set()
+        self.__regions = set()
+        self.__uploaded_objects = set()
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.join(directory, INDICATORS_DIRECTORY_NAME), exist_ok=True)
+        self.__manifest_path = os.path.join(directory, CHECKPOINT_MANIFEST_NAME)
+        if os.path.exists(self.__manifest_path):
+            self.__replay_manifest()
+        else:
+            self.__append_record({"record": "job", "job_id": job_id, "request_key": request_key})
+
+    def __replay_manifest(self):
+        """load the records of a previous run of the job"""
+        with open(self.__manifest_path, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # the last record of an interrupted run may be truncated
+                continue
+            record_type = record.get("record")
+            if record_type == "job" and record["request_key"] != self.request_key:
+                raise ValueError(f"Job {self.job_id} was started with another request")
+            if record_type == "output":
+                self.output_name = record["name"]
+            elif record_type == "indicator":
+                self.__indicators.add(record["key"])
+            elif record_type == "region":
+                self.__regions.add(record["key"])
+            elif record_type == "reset_regions":
+                self.__regions.clear()
+            elif record_type == "object":
+                self.__uploaded_objects.add(record["key"])
+            elif record_type == "completed":
+                self.result = record["result"]
+        logger.info(
+            f"AnalyticsDatacube: job {self.job_id} resumed with {len(self.__indicators)} "
+            f"indicators fetched, {len(self.__regions)} zarr regions written and "
+            f"{len(self.__uploaded_objects)} objects uploaded"
+        )
+
+    def __append_record(self, record: dict):
+        with open(self.__manifest_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+
+    def get_output_name(self, default_name: str) -> str:
+        """
+        Get the name of the output (zarr or table), chosen by the first run of the job so that
+        a resumed job writes the same objects.
+
+        Args:
+            default_name (str): the output name of a new job
+
+        Returns:
+            str: the output name
+        """
+        with self.__lock:
+            if self.output_name is None:
+                self.output_name = default_name
+                self.__append_record({"record": "output", "name": default_name})
+            return self.output_name
+
+    def get_local_zarr_path(self, default_name: str) -> str:
+        """
+        Get the path of the local zarr of the job, kept in the checkpoint folder.
+
+        Args:
+            default_name (str): the output name of a new job
+
+        Returns:
+            str: the local zarr path
+        """
+        return os.path.join(self.directory, self.get_output_name(default_name))
+
+    def __get_indicator_path(self, key: str) -> str:
+        return os.path.join(self.directory, INDICATORS_DIRECTORY_NAME, f"{key}.nc")
+
+    def load_indicator(self, key: str) -> Optional[xarray.Dataset]:
+        """
+        Load the dataset of a completed indicator fetch.
+
+        Args:
+            key (str): the indicator checkpoint key
+
+        Returns:
+            xarray.Dataset or None if the fetch is not completed
+        """
+        with self.__lock:
+            if key not in self.__indicators:
+                return None
+        with xarray.open_dataset(self.__get_indicator_path(key), engine="scipy") as dataset:
+            return dataset.load()
+
+    def store_indicator(self, key: str, dataset: xarray.Dataset):
+        """
+        Keep the dataset of a completed indicator fetch and record it.
+
+        Args:
+            key (str): the indicator checkpoint key
+            dataset (xarray.Dataset): the fetched dataset
+        """
+        path = self.__get_indicator_path(key)
+        # written then renamed, a recorded fetch always has its complete dataset
+        dataset.to_netcdf(f"{path}.tmp", engine="scipy")
+        os.replace(f"{path}.tmp", path)
+        with self.__lock:
+            self.__indicators.add(key)
+            self.__append_record({"record": "indicator", "key": key})
+
+    def is_region_written(self, key: str) -> bool:
+        """
+        Check whether a zarr region was written.
+
+        Args:
+            key (str): the region key
+
+        Returns:
+            bool
+        """
+        with self.__lock:
+            return key in self.__regions
+
+    @property
+    def has_written_regions(self) -> bool:
+        """whether zarr regions were written, the zarr metadata is then written too"""
+        with self.__lock:
+            return bool(self.__regions)
+
+    def record_region(self, key: str):
+        """
+        Record a written zarr region.
+
+        Args:
+            key (str): the region key
+        """
+        with self.__lock:
+            self.__regions.add(key)
+            self.__append_record({"record": "region", "key": key})
+
+    def reset_regions(self):
+        """forget the written zarr regions, e.g. when the local zarr was lost"""
+        with self.__lock:
+            self.__regions.clear()
+            self.__append_record({"record": "reset_regions"})
+
+    def is_uploaded(self, key: str) -> bool:
+        """
+        Check whether an object was uploaded.
+
+        Args:
+            key (str): the object key
+
+        Returns:
+            bool
+        """
+        with self.__lock:
+            return key in self.__uploaded_objects
+
+    def record_upload(self, key: str):
+        """
+        Record an uploaded object.
+
+        Args:
+            key (str): the object key
+        """
+        with self.__lock:
+            self.__uploaded_objects.add(key)
+            self.__append_record({"record": "object", "key": key})
+
+    def complete(self, result: dict):
+        """
+        Record the output of the succeeded job and delete its fetched datasets, the manifest is
+        kept so that the job is not run again.
+
+        Args:
+            result (dict): the output of the job (output_schema object)
+        """
+        with self.__lock:
+            self.result = result
+            self.__append_record({"record": "completed", "result": result})
+        shutil.rmtree(os.path.join(self.directory, INDICATORS_DIRECTORY_NAME), ignore_errors=True)
+
+
+class CheckpointStore:
+    """
+    Local folder of the job checkpoints, one sub folder per job id. To resume the jobs of a
+    rescheduled pod, the folder must be on a persistent volume.
+
+    Parameters:
+        checkpoint_dir: checkpoints folder, defaults to a folder in the temporary directory
+    """
+
+    def __init__(self, checkpoint_dir: Optional[str] = None):
+        self.checkpoint_dir = checkpoint_dir or os.path.join(
+            tempfile.gettempdir(), "analytics-datacube-checkpoints"
+        )
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    def __get_job_directory(self, job_id: str) -> str:
+        if not JOB_ID_PATTERN.match(job_id):
+            raise ValueError(
+                f"Invalid job id {job_id!r}: expected up to 128 letters, digits, '_', '-' or '.'"
+            )
+        return os.path.join(self.checkpoint_dir, job_id)
+
+    def open(self, job_id: str, request_key: str) -> JobCheckpoint:
+        """
+        Open the checkpoint of a job, created by its first run.
+
+        Args:
+            job_id (str): the job identifier
+            request_key (str): key of the request of the job
+
+        Raises:
+            ValueError: if the job id is invalid or was started with another request
+
+        Returns:
+            JobCheckpoint
+        """
+        return JobCheckpoint(self.__get_job_directory(job_id), job_id, request_key)
+
+
+def get_checkpoint_store_from_env() -> Optional[CheckpointStore]:
+    """
+    Build the checkpoint store configured by the CHECKPOINT_DIR environment variable
+    (disabled if not set).
+
+    Returns:
+        CheckpointStore or None if no checkpoint folder is configured
+    """
+    checkpoint_dir = os.getenv("CHECKPOINT_DIR")
+    if not checkpoint_dir:
+        return None
+    return CheckpointStore(checkpoint_dir)
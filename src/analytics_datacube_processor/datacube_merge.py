@@ -0,0 +1,272 @@
+"""Assembly of the indicator datasets into a single datacube"""
+
+from functools import reduce
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+logger = LogManager.get_instance()
+
+# dimensions along which the rasters are laid out, their order is kept (e.g. decreasing y)
+SPATIAL_DIMS = ("y", "x")
+
+# dimension of the bands of a variable, Geosys labels the band of an indicator with its name
+BAND_DIM = "band"
+
+# kinds of the numpy string dtypes (fixed width unicode, bytes and variable width strings)
+_STRING_KINDS = "UST"
+
+
+def drop_single_bands(dataset: xarray.Dataset) -> xarray.Dataset:
+    """
+    Drop the band dimension of the single band variables (the indicators). Geosys labels the
+    band of an indicator with the indicator name, so the band coordinates of two indicators
+    never match: aligned on their union, each variable would be padded with NaN for the bands
+    of all the other indicators.
+
+    Args:
+        dataset (xarray.Dataset): an indicator dataset
+
+    Returns:
+        xarray.Dataset: the dataset, its multi-band variables (e.g. reflectance) keeping their
+            band dimension
+    """
+    single_band_names = [
+        name for name, variable in dataset.data_vars.items() if variable.sizes.get(BAND_DIM) == 1
+    ]
+    if not single_band_names:
+        return dataset
+    dataset = dataset.assign(
+        {name: dataset[name].isel({BAND_DIM: 0}, drop=True) for name in single_band_names}
+    )
+    if all(BAND_DIM not in variable.dims for variable in dataset.data_vars.values()):
+        # the band coordinates are only kept for the multi-band variables
+        dataset = dataset.drop_dims(BAND_DIM)
+    return dataset
+
+
+def share_coordinates(datasets: List[xarray.Dataset]) -> bool:
+    """
+    Check if the dimension coordinates (time, y, x...) of the datasets are the same wherever
+    several datasets have them, in which case they can be assembled without any alignment.
+
+    Args:
+        datasets (List[xarray.Dataset]): the indicator datasets
+
+    Returns:
+        boolean (True/False)
+    """
+    indexes = {}
+    for dataset in datasets:
+        for dim, index in dataset.indexes.items():
+            if dim not in indexes:
+                indexes[dim] = index
+            elif not index.equals(indexes[dim]):
+                return False
+    return True
+
+
+def get_union_indexes(datasets: List[xarray.Dataset]) -> Dict[str, pd.Index]:
+    """union of the dimension coordinates, spatial ones keep the order of the first dataset"""
+    dims = []
+    for dataset in datasets:
+        dims.extend(dim for dim in dataset.indexes if dim not in dims)
+
+    union_indexes = {}
+    for dim in dims:
+        indexes = [dataset.indexes[dim] for dataset in datasets if dim in dataset.indexes]
+        union_index = reduce(lambda left, right: left.union(right), indexes)
+        if dim in SPATIAL_DIMS:
+            union_index = union_index.sort_values(ascending=not indexes[0].is_monotonic_decreasing)
+        union_indexes[dim] = union_index
+    return union_indexes
+
+
+def get_coord_values(values, dtype: Optional[np.dtype] = None) -> np.ndarray:
+    """
+    Get the values of a coordinate as a plain numpy array. The strings (fixed width unicode,
+    pandas indexes and extension arrays such as the arrow strings of pandas 3) are converted to
+    a numpy array of str objects, so that the coordinate can be chunked and is written to zarr
+    as variable length strings, which later appends can extend with longer values.
+
+    Args:
+        values: the coordinate values (numpy array, pandas index or extension array)
+        dtype (np.dtype, optional): the dtype of the source coordinate, defaults to the dtype
+            of the values
+
+    Returns:
+        np.ndarray
+    """
+    values = values.to_numpy() if hasattr(values, "to_numpy") else np.asarray(values)
+    dtype = values.dtype if dtype is None else np.dtype(dtype)
+    if dtype.kind in _STRING_KINDS or (
+        values.dtype.kind == "O" and all(isinstance(value, str) for value in values.flat)
+    ):
+        return values.astype(object)
+    return values.astype(dtype, copy=False)
+
+
+def _is_contiguous(position: np.ndarray) -> bool:
+    return len(position) > 0 and position[0] >= 0 and np.all(np.diff(position) == 1)
+
+
+def _reindex_variable(
+    variable: xarray.Variable, indexes: Dict[str, pd.Index], union_indexes: Dict[str, pd.Index]
+) -> xarray.Variable:
+    """
+    Place a variable on the union coordinates with a single allocation and a single vectorized
+    assignment, missing values are filled with NaN.
+    """
+    positions = []
+    shape = []
+    for dim in variable.dims:
+        if dim in union_indexes and dim in indexes:
+            positions.append(union_indexes[dim].get_indexer(indexes[dim]))
+            shape.append(len(union_indexes[dim]))
+        else:
+            positions.append(np.arange(variable.sizes[dim]))
+            shape.append(variable.sizes[dim])
+
+    if tuple(shape) == variable.shape and all(
+        np.array_equal(position, np.arange(size)) for position, size in zip(positions, shape)
+    ):
+        return variable
+
+    dtype = variable.dtype if np.issubdtype(variable.dtype, np.floating) else np.float64
+    data = np.full(shape, np.nan, dtype=dtype)
+    if all(_is_contiguous(position) for position in positions):
+        # plain block copy
+        data[tuple(slice(position[0], position[-1] + 1) for position in positions)] = (
+            variable.values
+        )
+    else:
+        data[np.ix_(*positions)] = variable.values
+    return xarray.Variable(variable.dims, data, attrs=variable.attrs, encoding=variable.encoding)
+
+
+def merge_non_index_coords(
+    datasets: List[xarray.Dataset], union_indexes: Dict[str, pd.Index]
+) -> Dict[str, xarray.Variable]:
+    """
+    Combine the non-dimension coordinates (e.g. image.id along time): the first dataset giving
+    a value of a coordinate wins. The coordinates keep the dtype of their source (the strings
+    as str objects, see get_coord_values), missing values being NaN (numbers), NaT (dates) or
+    empty strings.
+    """
+    coords = {}
+    combined = {}
+    for dataset in datasets:
+        for name, coord in dataset.coords.items():
+            if name in dataset.indexes:
+                continue
+            if coord.ndim != 1 or coord.dims[0] not in union_indexes:
+                coords.setdefault(name, coord.variable)
+                continue
+
+            dim = coord.dims[0]
+            if name not in combined:
+                size = len(union_indexes[dim])
+                combined[name] = (np.empty(size, dtype=object), np.zeros(size, dtype=bool), coord)
+            values, filled, _ = combined[name]
+            source_values = np.asarray(coord.values)
+            positions = union_indexes[dim].get_indexer(dataset.indexes[dim])
+            missing = ~filled[positions] & np.asarray(pd.notna(source_values), dtype=bool)
+            values[positions[missing]] = source_values[missing]
+            filled[positions[missing]] = True
+
+    for name, (values, filled, coord) in combined.items():
+        coords[name] = xarray.Variable(
+            coord.dims, _fill_missing_values(values, filled, coord.dtype), attrs=coord.attrs
+        )
+    return coords
+
+
+def _fill_missing_values(values: np.ndarray, filled: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """cast the combined values of a coordinate back to a numpy dtype"""
+    if dtype.kind in _STRING_KINDS or (
+        dtype.kind == "O" and all(isinstance(value, str) for value in values[filled])
+    ):
+        values[~filled] = ""
+        return get_coord_values(values, dtype)
+    if filled.all():
+        return values.astype(dtype)
+    if dtype.kind in "mM":
+        values[~filled] = dtype.type("NaT")
+        return values.astype(dtype)
+    if dtype.kind in "biuf":
+        values[~filled] = np.nan
+        return values.astype(np.float64)
+    return values
+
+
+def merge_indicator_datasets(datasets: List[xarray.Dataset]) -> xarray.Dataset:
+    """
+    Assemble the datasets of the indicators into a single datacube.
+    The single band variables lose their band dimension (see drop_single_bands), then when the
+    datasets share their time axis and grid, the variables are assembled zero-copy.
+    Otherwise, each variable is placed once, with a vectorized assignment, on the union of the
+    time axis and of the grids. The lazy (dask) variables, e.g. of the time series spilled on
+    the local disk, are reindexed lazily and only computed while the datacube is written.
+
+    Args:
+        datasets (List[xarray.Dataset]): the indicator datasets, in the requested order
+
+    Returns:
+        xarray.Dataset: the datacube
+    """
+    datasets = [drop_single_bands(dataset) for dataset in datasets if dataset.data_vars]
+    if not datasets:
+        return xarray.Dataset()
+
+    attrs = {}
+    for dataset in datasets:
+        for name, value in dataset.attrs.items():
+            attrs.setdefault(name, value)
+
+    if share_coordinates(datasets):
+        logger.info("AnalyticsDatacube: merge: shared coordinates, zero-copy assembly")
+        data_vars = {}
+        coords = dict(datasets[0].coords.variables)
+        for dataset in datasets:
+            data_vars.update(
+                {
+                    name: dataset.variables[name]
+                    for name in dataset.data_vars
+                    if name not in data_vars
+                }
+            )
+            for name, coord in dataset.coords.variables.items():
+                coords.setdefault(name, coord)
+        datacube = xarray.Dataset(data_vars=data_vars, coords=coords, attrs=attrs)
+        return datacube.assign_coords(
+            {
+                name: (coord.dims, get_coord_values(coord.variable.data), coord.attrs)
+                for name, coord in datacube.coords.items()
+                if name not in datacube.indexes
+            }
+        )
+
+    logger.info("AnalyticsDatacube: merge: reindexing on the union of the coordinates")
+    union_indexes = get_union_indexes(datasets)
+    data_vars = {}
+    for dataset in datasets:
+        indexes = dict(dataset.indexes)
+        for name in dataset.data_vars:
+            if name in data_vars:
+                continue
+            if dataset[name].chunks is not None:
+                variable = dataset[name].reset_coords(drop=True)
+                data_vars[name] = variable.reindex(
+                    {dim: union_indexes[dim] for dim in variable.dims if dim in union_indexes}
+                ).variable
+            else:
+                data_vars[name] = _reindex_variable(
+                    dataset.variables[name], indexes, union_indexes
+                )
+
+    coords = {dim: get_coord_values(index) for dim, index in union_indexes.items()}
+    coords.update(merge_non_index_coords(datasets, union_indexes))
+    return xarray.Dataset(data_vars=data_vars, coords=coords, attrs=attrs)
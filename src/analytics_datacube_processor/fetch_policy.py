@@ -0,0 +1,370 @@
+"""Timeouts, retries and circuit breaking of the indicator fetches"""
+
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import requests
+from byoa.telemetry.log_manager.log_manager import LogManager
+from requests.adapters import HTTPAdapter
+
+from analytics_datacube_processor.cancellation import CancellationToken
+from analytics_datacube_processor.telemetry import CIRCUIT_BREAKER_OPEN, FETCH_RETRIES
+
+logger = LogManager.get_instance()
+
+# HTTP statuses of a transient upstream failure
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# transport errors of a transient upstream failure
+RETRYABLE_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+DEFAULT_BACKOFF_MAX_SECONDS = 30.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT_SECONDS = 30.0
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without calling the upstream while the circuit breaker is open.
+
+    Attributes:
+        retry_after_seconds (float): time before the upstream is called again
+    """
+
+    def __init__(self, retry_after_seconds: float):
+        super().__init__(
+            f"Geosys is degraded, the fetches are suspended for {retry_after_seconds:.0f}s"
+        )
+        self.retry_after_seconds = retry_after_seconds
+
+
+class FetchError(RuntimeError):
+    """
+    Raised when indicators could not be fetched and the policy does not accept a partial
+    datacube.
+
+    Attributes:
+        failed_indicators (List[str]): the indicators that could not be fetched
+    """
+
+    def __init__(self, failed_indicators: List[str]):
+        super().__init__(f"Indicators {failed_indicators} could not be fetched")
+        self.failed_indicators = failed_indicators
+
+
+# HTTP statuses received by the fetch attempt of the current thread
+_current_statuses: ContextVar[Optional[List[int]]] = ContextVar("fetch_statuses", default=None)
+
+# HTTP timeout (seconds) of the fetch attempt of the current thread
+_current_timeout: ContextVar[Optional[float]] = ContextVar("fetch_timeout", default=None)
+
+
+def _record_status(response: requests.Response, *args, **kwargs):
+    """requests response hook recording the status to the current fetch attempt"""
+    statuses = _current_statuses.get()
+    if statuses is not None:
+        statuses.append(response.status_code)
+    return response
+
+
+def get_fetch_statuses() -> List[int]:
+    """
+    Get the HTTP statuses received so far by the current fetch attempt.
+
+    Returns:
+        List[int]: the statuses, empty outside of a fetch attempt
+    """
+    return list(_current_statuses.get() or [])
+
+
+def record_session_statuses(session: requests.Session):
+    """
+    Record the HTTP statuses of a requests session to the current fetch attempt, so that the
+    errors raised by the Geosys client on a transient HTTP status are retried.
+
+    Args:
+        session (requests.Session): the session
+    """
+    if _record_status not in session.hooks["response"]:
+        session.hooks["response"].append(_record_status)
+
+
+class FetchTimeoutAdapter(HTTPAdapter):
+    """
+    HTTP adapter applying the timeout of the current fetch attempt to the requests sent without
+    an explicit timeout (the Geosys client sets none). The connection and each read of a
+    request time out, raising a requests.Timeout, so no thread is left behind.
+    """
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if timeout is None:
+            timeout = _current_timeout.get()
+        return super().send(
+            request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies
+        )
+
+
+def apply_fetch_timeout(session: requests.Session):
+    """
+    Apply the timeout of the fetch policy to the requests of a session, unless its adapter
+    already does (e.g. the shared adapter of the Geosys client pool).
+
+    Args:
+        session (requests.Session): the session
+    """
+    if not isinstance(session.get_adapter("https://"), FetchTimeoutAdapter):
+        adapter = FetchTimeoutAdapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+
+def is_retryable(exc: Exception, statuses: Optional[List[int]] = None) -> bool:
+    """
+    Check whether a fetch error is transient: a timeout, a transport error, or an error raised
+    after a transient HTTP status (the Geosys client does not raise HTTP errors).
+
+    Args:
+        exc (Exception): the fetch error
+        statuses (List[int], optional): HTTP statuses received by the failed attempt
+
+    Returns:
+        bool: True if the fetch can be retried
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, RETRYABLE_EXCEPTIONS):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return any(status in RETRYABLE_STATUS_CODES for status in statuses or [])
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of an upstream: after consecutive transient failures the circuit opens and
+    the calls fail fast, then a single probe call is let through once the reset timeout elapsed.
+    The circuit closes again on the first success.
+
+    Parameters:
+        failure_threshold: number of consecutive transient failures opening the circuit
+        reset_timeout_seconds: time before a probe call is let through an open circuit
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout_seconds: float = DEFAULT_RESET_TIMEOUT_SECONDS,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be greater than or equal to 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.__failures = 0
+        self.__opened_at: Optional[float] = None
+        self.__probing = False
+        self.__lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """whether the calls are currently failing fast"""
+        with self.__lock:
+            return self.__opened_at is not None
+
+    def before_call(self):
+        """
+        Check that a call can be made.
+
+        Raises:
+            CircuitOpenError: while the circuit is open, or a probe call is in progress
+        """
+        with self.__lock:
+            if self.__opened_at is None:
+                return
+            retry_after_seconds = self.__opened_at + self.reset_timeout_seconds - time.monotonic()
+            if retry_after_seconds > 0 or self.__probing:
+                raise CircuitOpenError(max(retry_after_seconds, 0.0))
+            self.__probing = True
+
+    def record_success(self):
+        """Record a call that reached the upstream, closing the circuit"""
+        with self.__lock:
+            if self.__opened_at is not None:
+                logger.info("AnalyticsDatacube: Geosys recovered, circuit breaker closed")
+                CIRCUIT_BREAKER_OPEN.set(0)
+            self.__failures = 0
+            self.__opened_at = None
+            self.__probing = False
+
+    def record_failure(self):
+        """Record a transient failure, opening the circuit above the threshold"""
+        with self.__lock:
+            self.__failures += 1
+            if self.__probing or (
+                self.__opened_at is None and self.__failures >= self.failure_threshold
+            ):
+                logger.error(
+                    f"AnalyticsDatacube: {self.__failures} consecutive Geosys failures, "
+                    f"circuit breaker open for {self.reset_timeout_seconds}s"
+                )
+                CIRCUIT_BREAKER_OPEN.set(1)
+                self.__opened_at = time.monotonic()
+                self.__probing = False
+
+
+_breaker_lock = threading.Lock()
+_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    Get the process-level circuit breaker of the Geosys fetches, configured by the
+    CIRCUIT_BREAKER_FAILURES (default 5) and CIRCUIT_BREAKER_RESET_SECONDS (default 30) env
+    variables.
+
+    Returns:
+        CircuitBreaker
+    """
+    global _circuit_breaker  # pylint: disable=global-statement
+    with _breaker_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                int(os.getenv("CIRCUIT_BREAKER_FAILURES", str(DEFAULT_FAILURE_THRESHOLD))),
+                float(
+                    os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", str(DEFAULT_RESET_TIMEOUT_SECONDS))
+                ),
+            )
+        return _circuit_breaker
+
+
+def get_backoff_seconds(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """
+    Get the delay before a retry: exponential backoff with full jitter (uniform between 0 and
+    the capped exponential delay), so that the concurrent retries are spread.
+
+    Args:
+        attempt (int): the number of the failed attempt, from 0
+        base_seconds (float): base of the exponential backoff
+        max_seconds (float): maximum backoff
+
+    Returns:
+        float: the delay in seconds
+    """
+    return random.uniform(0, min(max_seconds, base_seconds * 2**attempt))
+
+
+@dataclass
+class FetchPolicy:
+    """
+    Policy of the indicator fetches.
+
+    Attributes:
+        timeout_seconds (float, optional): HTTP timeout of the fetch calls: of the connection and
+            of each read of their requests (see FetchTimeoutAdapter), None to wait indefinitely
+        max_retries (int): number of retries of a transient failure
+        backoff_base_seconds (float): base of the exponential backoff between the retries
+        backoff_max_seconds (float): maximum backoff between the retries
+        partial_ok (bool): build the datacube of the fetched indicators when some of them
+            failed, instead of failing the request (opt-in)
+    """
+
+    timeout_seconds: Optional[float] = None
+    max_retries: int = DEFAULT_MAX_RETRIES
+    backoff_base_seconds: float = DEFAULT_BACKOFF_BASE_SECONDS
+    backoff_max_seconds: float = DEFAULT_BACKOFF_MAX_SECONDS
+    partial_ok: bool = False
+
+    def __post_init__(self):
+        if self.timeout_seconds is not None and self.timeout_seconds <= 0:
+            raise ValueError("timeout_seconds must be greater than 0")
+        if self.max_retries < 0:
+            raise ValueError("max_retries must be greater than or equal to 0")
+
+    def get_backoff_seconds(self, attempt: int) -> float:
+        """
+        Get the delay before a retry, with full jitter so that the retries of the concurrent
+        fetches are spread.
+
+        Args:
+            attempt (int): the number of the failed attempt, from 0
+
+        Returns:
+            float: the delay in seconds
+        """
+        return get_backoff_seconds(attempt, self.backoff_base_seconds, self.backoff_max_seconds)
+
+    def call(
+        self,
+        function: Callable,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        description: str = "fetch",
+        cancellation_token: Optional[CancellationToken] = None,
+    ):
+        """
+        Call a fetch function with the HTTP timeout, retrying its transient failures.
+
+        Args:
+            function (Callable): the fetch function, without arguments
+            circuit_breaker (CircuitBreaker, optional): the circuit breaker of the upstream
+            description (str): description of the fetch in the logs
+            cancellation_token (CancellationToken, optional): checked before each attempt,
+                and interrupting the backoff delays
+
+        Raises:
+            CircuitOpenError: when the circuit breaker is open
+            JobCancelledError: when the build is cancelled
+            Exception: the error of the last attempt
+
+        Returns:
+            the result of the function
+        """
+        attempt = 0
+        while True:
+            if cancellation_token is not None:
+                cancellation_token.raise_if_cancelled()
+            if circuit_breaker is not None:
+                circuit_breaker.before_call()
+            statuses: List[int] = []
+            token = _current_statuses.set(statuses)
+            timeout_token = _current_timeout.set(self.timeout_seconds)
+            try:
+                result = function()
+            except Exception as exc:
+                retryable = is_retryable(exc, statuses)
+                if circuit_breaker is not None:
+                    # the non transient errors (e.g. an invalid polygon) come from a healthy upstream
+                    if retryable:
+                        circuit_breaker.record_failure()
+                    else:
+                        circuit_breaker.record_success()
+                if not retryable or attempt >= self.max_retries:
+                    raise
+            else:
+                if circuit_breaker is not None:
+                    circuit_breaker.record_success()
+                return result
+            finally:
+                _current_statuses.reset(token)
+                _current_timeout.reset(timeout_token)
+
+            delay = self.get_backoff_seconds(attempt)
+            attempt += 1
+            logger.info(
+                f"AnalyticsDatacube: {description} failed, retry {attempt}/{self.max_retries} "
+                f"in {delay:.1f}s"
+            )
+            FETCH_RETRIES.inc()
+            if cancellation_token is not None:
+                cancellation_token.sleep(delay)
+            else:
+                time.sleep(delay)
@@ -0,0 +1,235 @@
+"""Process-level pool of the authenticated Geosys clients"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from byoa.telemetry.log_manager.log_manager import LogManager
+from geosyspy import Geosys
+from geosyspy.utils.constants import Env, Region
+from oauthlib.oauth2 import TokenExpiredError
+
+from analytics_datacube_processor.fetch_policy import FetchTimeoutAdapter
+from analytics_datacube_processor.network_usage import get_geosys_session
+from analytics_datacube_processor.telemetry import GEOSYS_CLIENTS
+
+logger = LogManager.get_instance()
+
+# maximum number of pooled clients (one per env/region/queue and credentials or bearer token)
+DEFAULT_MAX_CLIENTS = 64
+
+# maximum number of kept-alive connections per Geosys host
+DEFAULT_MAX_CONNECTIONS = 32
+
+# maximum age of a pooled client, below the one hour lifetime of the Geosys access tokens:
+# the token refresh of geosyspy is broken, so the clients are rebuilt before their token expires
+DEFAULT_MAX_CLIENT_AGE_SECONDS = 45 * 60
+
+# HTTP status of a missing, expired or revoked access token
+UNAUTHORIZED_STATUS_CODE = 401
+
+
+def is_auth_error(exc: Exception, statuses: Optional[List[int]] = None) -> bool:
+    """
+    Check whether a Geosys call failed on the access token of its client: an expired token,
+    the failed refresh of geosyspy (an AttributeError on its private oauth client) or a
+    401 status.
+
+    Args:
+        exc (Exception): the error of the call
+        statuses (List[int], optional): HTTP statuses received by the failed call
+
+    Returns:
+        bool: True if the client must not be used anymore
+    """
+    if isinstance(exc, TokenExpiredError):
+        return True
+    if isinstance(exc, AttributeError) and "client_oauth" in str(exc):
+        return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == UNAUTHORIZED_STATUS_CODE:
+        return True
+    return UNAUTHORIZED_STATUS_CODE in (statuses or [])
+
+
+def get_client_key(
+    client_id: Optional[str],
+    client_secret: Optional[str],
+    username: Optional[str],
+    password: Optional[str],
+    enum_env: Env,
+    enum_region: Region,
+    priority_queue: str,
+    bearer_token: Optional[str],
+) -> str:
+    """
+    Build the pool key of a client, the secrets are only kept as a fingerprint.
+
+    Returns:
+        str: the sha256 hex digest of the client parameters
+    """
+    values = [
+        enum_env.value,
+        enum_region.value,
+        priority_queue,
+        client_id,
+        client_secret,
+        username,
+        password,
+        bearer_token,
+    ]
+    return hashlib.sha256(
+        "\0".join("" if value is None else str(value) for value in values).encode("utf-8")
+    ).hexdigest()
+
+
+class GeosysClientPool:
+    """
+    Least recently used pool of Geosys clients.
+
+    A client authenticated with credentials is built (and authenticated) once per
+    env/region/queue and credentials, a client of a bearer token once per token. All the clients
+    share the same HTTP connection pool, so the TCP/TLS connections to Geosys are kept alive
+    across the requests whatever their credentials. A client is rebuilt once older than the
+    maximum age, or after a call failed on its access token (evict).
+
+    Parameters:
+        max_clients: maximum number of pooled clients, the least recently used are dropped
+        max_connections: maximum number of kept-alive connections per Geosys host
+        max_age_seconds: maximum age of a pooled client, below the lifetime of its access token
+    """
+
+    def __init__(
+        self,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_age_seconds: float = DEFAULT_MAX_CLIENT_AGE_SECONDS,
+    ):
+        if max_clients < 1:
+            raise ValueError("max_clients must be greater than or equal to 1")
+        if max_age_seconds <= 0:
+            raise ValueError("max_age_seconds must be greater than 0")
+        self.max_clients = max_clients
+        self.max_age_seconds = max_age_seconds
+        # the adapter applies the HTTP timeout of the fetch policy
+        self.__adapter = FetchTimeoutAdapter(pool_connections=8, pool_maxsize=max_connections)
+        # key -> (client, creation time)
+        self.__clients: "OrderedDict[str, Tuple[Geosys, float]]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_client(
+        self,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        enum_env: Env = Env.PROD,
+        enum_region: Region = Region.NA,
+        priority_queue: str = "realtime",
+        bearer_token: Optional[str] = None,
+    ) -> Geosys:
+        """
+        Get the pooled client of the parameters, built on the first use.
+
+        Returns:
+            Geosys: the client, shared with the other requests of the same parameters
+        """
+        key = get_client_key(
+            client_id,
+            client_secret,
+            username,
+            password,
+            enum_env,
+            enum_region,
+            priority_queue,
+            bearer_token,
+        )
+        with self.__lock:
+            entry = self.__clients.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.max_age_seconds:
+                # its access token is about to expire
+                del self.__clients[key]
+                entry = None
+            if entry is not None:
+                self.__clients.move_to_end(key)
+                GEOSYS_CLIENTS.labels(result="hit").inc()
+                return entry[0]
+
+        # built out of the lock, the authentication is a network call
+        GEOSYS_CLIENTS.labels(result="miss").inc()
+        client = Geosys(
+            client_id,
+            client_secret,
+            username,
+            password,
+            enum_env,
+            enum_region,
+            priority_queue,
+            bearer_token,
+        )
+        session = get_geosys_session(client)
+        if session is not None:
+            session.mount("https://", self.__adapter)
+            session.mount("http://", self.__adapter)
+        if client.http_client.get_access_token() is None:
+            # the authentication failed, the client is not pooled so it is retried next time
+            logger.info("AnalyticsDatacube: Geosys client not authenticated, not pooled")
+            return client
+
+        with self.__lock:
+            client, _ = self.__clients.setdefault(key, (client, time.monotonic()))
+            self.__clients.move_to_end(key)
+            while len(self.__clients) > self.max_clients:
+                self.__clients.popitem(last=False)
+        return client
+
+    def evict(self, client: Geosys):
+        """
+        Drop a client whose call failed on its access token, the next requests of its
+        parameters build a new one.
+
+        Args:
+            client (Geosys): the client, ignored if it is not pooled
+        """
+        with self.__lock:
+            keys = [key for key, (pooled, _) in self.__clients.items() if pooled is client]
+            for key in keys:
+                del self.__clients[key]
+        if keys:
+            logger.info("AnalyticsDatacube: Geosys client evicted after an authentication error")
+
+    def clear(self):
+        """Drop all the pooled clients"""
+        with self.__lock:
+            self.__clients.clear()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__clients)
+
+
+_pool_lock = threading.Lock()
+_pool: Optional[GeosysClientPool] = None
+
+
+def get_geosys_client_pool() -> GeosysClientPool:
+    """
+    Get the process-level client pool, sized by the GEOSYS_CLIENT_POOL_SIZE env variable
+    (default 64), its clients being rebuilt after GEOSYS_CLIENT_MAX_AGE_SECONDS (default 2700).
+
+    Returns:
+        GeosysClientPool
+    """
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None:
+            _pool = GeosysClientPool(
+                int(os.getenv("GEOSYS_CLIENT_POOL_SIZE", str(DEFAULT_MAX_CLIENTS))),
+                max_age_seconds=float(
+                    os.getenv("GEOSYS_CLIENT_MAX_AGE_SECONDS", str(DEFAULT_MAX_CLIENT_AGE_SECONDS))
+                ),
+            )
+        return _pool
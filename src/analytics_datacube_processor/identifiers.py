@@ -0,0 +1,10 @@
+"""Patterns of the identifiers given by the callers, without the processing stack"""
+
+import re
+
+# the job ids name the checkpoint folders
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+# the field ids of a batch name the outputs of the fields, and their checkpoints with the job id
+FIELD_ID_MAX_LENGTH = 64
+FIELD_ID_PATTERN = re.compile(rf"^[A-Za-z0-9][A-Za-z0-9_.-]{{0,{FIELD_ID_MAX_LENGTH - 1}}}$")
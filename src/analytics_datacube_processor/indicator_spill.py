@@ -0,0 +1,148 @@
+"""Local spill of the indicator time series fetched window by window, read back lazily"""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+from analytics_datacube_processor.admission_control import (
+    BYTES_PER_VALUE,
+    COLLECTION_REVISIT_DAYS,
+)
+from analytics_datacube_processor.band_math import REFLECTANCE_INDICATOR
+from analytics_datacube_processor.datacube_merge import get_coord_values
+from analytics_datacube_processor.spatial_tiling import estimate_pixels
+from analytics_datacube_processor.telemetry import LOAD_STAGE, time_stage
+from analytics_datacube_processor.utils import append_dataset_to_zarr
+
+logger = LogManager.get_instance()
+
+ONE_DAY = timedelta(days=1)
+
+# bands of a reflectance time series, at most the 13 bands of Sentinel-2
+REFLECTANCE_NB_BANDS = 13
+
+# the times of the windows appended after the first one keep their precision
+TIME_ENCODING = {"units": "microseconds since 1970-01-01", "dtype": "int64"}
+
+
+def get_window_days(geometry: str, indicator: str, memory_budget_mb: float) -> int:
+    """
+    Get the number of days of a fetch window whose time series fits a memory budget, from the
+    pixels of the area of interest and the revisit of the collections.
+
+    Args:
+        geometry (str): WKT geometry of the area of interest
+        indicator (str): the fetched indicator
+        memory_budget_mb (float): the memory budget in MB of a window
+
+    Returns:
+        int: the number of days of a window (at least 1)
+    """
+    if memory_budget_mb <= 0:
+        raise ValueError("memory_budget_mb must be greater than 0")
+    nb_bands = REFLECTANCE_NB_BANDS if indicator == REFLECTANCE_INDICATOR else 1
+    scenes_per_day = sum(1 / revisit_days for revisit_days in COLLECTION_REVISIT_DAYS)
+    day_bytes = estimate_pixels(geometry) * nb_bands * scenes_per_day * BYTES_PER_VALUE
+    return max(1, int(memory_budget_mb * 1024 * 1024 // day_bytes))
+
+
+def get_fetch_windows(
+    start_date: datetime, end_date: datetime, window_days: int
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Split the dates of a request into consecutive windows.
+
+    Args:
+        start_date (datetime): start date of the request
+        end_date (datetime): end date of the request
+        window_days (int): number of days of a window
+
+    Returns:
+        list: (start_date, end_date) windows, both dates included
+    """
+    windows = []
+    window_start_date = start_date
+    while window_start_date <= end_date:
+        window_end_date = min(window_start_date + (window_days - 1) * ONE_DAY, end_date)
+        windows.append((window_start_date, window_end_date))
+        window_start_date = window_end_date + ONE_DAY
+    return windows
+
+
+def _get_time_chunks(dataset: xarray.Dataset, name: str) -> tuple:
+    """zarr chunks of a variable: one time step, whole along the other dimensions"""
+    return tuple(1 if dim == "time" else size for dim, size in dataset[name].sizes.items())
+
+
+class IndicatorSpill:
+    """
+    Local spill of the time series fetched window by window: each window is written (appended
+    along time) to the zarr of its time series on the local disk then released, and the zarr is
+    read back lazily with one dask chunk per time step. The datacube built from the spilled
+    time series is only computed time slice by time slice, while it is written.
+
+    Parameters:
+        spill_dir: spill folder, defaults to a new folder in the temporary directory
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None):
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="analytics-datacube-spill-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+    def store(self, key: str, windows: Iterable[xarray.Dataset]) -> xarray.Dataset:
+        """
+        Write the windows of a time series, each one being fetched while iterated, then open
+        the time series lazily.
+
+        Args:
+            key (str): key of the time series (e.g. its indicator checkpoint key)
+            windows (Iterable[xarray.Dataset]): the datasets of the windows, in time order
+
+        Returns:
+            xarray.Dataset: the lazy time series, empty if no window has an acquisition
+        """
+        path = os.path.join(self.spill_dir, f"{key}.zarr")
+        written = False
+        for dataset in windows:
+            if "time" not in dataset.dims or dataset.sizes["time"] == 0:
+                continue
+            with time_stage(LOAD_STAGE):
+                if written:
+                    # only the times after the last written one are appended
+                    append_dataset_to_zarr(dataset, path)
+                    continue
+                # the string coordinates are written as variable length strings, which the
+                # next windows can extend with longer values
+                dataset = dataset.assign_coords(
+                    {
+                        name: (coord.dims, get_coord_values(coord.variable.data), coord.attrs)
+                        for name, coord in dataset.coords.items()
+                        if name not in dataset.indexes
+                    }
+                )
+                dataset.to_zarr(
+                    path,
+                    mode="w",
+                    encoding={
+                        "time": TIME_ENCODING,
+                        **{
+                            name: {"chunks": _get_time_chunks(dataset, name)}
+                            for name in dataset.data_vars
+                        },
+                    },
+                    consolidated=True,
+                )
+                written = True
+        if not written:
+            return xarray.Dataset()
+        return xarray.open_zarr(path, chunks={})
+
+    def delete(self):
+        """delete the spilled time series"""
+        logger.info(f"AnalyticsDatacube: delete the spilled time series {self.spill_dir}")
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,169 @@
+"""Per-request accounting of the network traffic"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Optional
+
+import requests
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+logger = LogManager.get_instance()
+
+# size of a HTTP status/request line, e.g. "HTTP/1.1 200 OK\r\n"
+HTTP_LINE_SIZE = 16
+
+
+@dataclass
+class NetworkUsage:
+    """
+    Network traffic of a single request.
+
+    Attributes:
+        bytes_sent (int): number of bytes sent (request lines, headers and bodies)
+        bytes_received (int): number of bytes received (status lines, headers and bodies)
+        requests (int): number of HTTP requests
+    """
+
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    requests: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, bytes_sent: int, bytes_received: int):
+        """
+        Account a HTTP exchange.
+
+        Args:
+            bytes_sent (int): bytes sent
+            bytes_received (int): bytes received
+        """
+        with self._lock:
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            self.requests += 1
+
+
+# network usage of the request being processed by the current thread
+_current_usage: ContextVar[Optional[NetworkUsage]] = ContextVar("network_usage", default=None)
+
+
+@contextmanager
+def track_network_usage():
+    """
+    Account the traffic of the instrumented HTTP sessions in a new NetworkUsage,
+    while in the context.
+
+    Yields:
+        NetworkUsage: the network usage of the context
+    """
+    usage = NetworkUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def with_network_usage(function: Callable) -> Callable:
+    """
+    Bind a function to the network usage of the caller, so that the traffic of the function
+    is accounted to the same request when it runs in a worker thread.
+
+    Args:
+        function (Callable): the function
+
+    Returns:
+        Callable: the bound function
+    """
+    usage = _current_usage.get()
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current_usage.set(usage)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_usage.reset(token)
+
+    return wrapper
+
+
+def _headers_size(headers) -> int:
+    return sum(len(str(name)) + len(str(value)) + 4 for name, value in headers.items())
+
+
+def _body_size(body) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    # streamed bodies (files, generators) are not read again
+    return 0
+
+
+def _account_response(response: requests.Response, *args, **kwargs):
+    """requests response hook accounting the exchange to the current network usage"""
+    usage = _current_usage.get()
+    if usage is None:
+        return response
+
+    request = response.request
+    bytes_sent = (
+        HTTP_LINE_SIZE
+        + len(request.url or "")
+        + _headers_size(request.headers)
+        + _body_size(request.body)
+    )
+    if kwargs.get("stream"):
+        body_size = int(response.headers.get("Content-Length", 0))
+    else:
+        body_size = len(response.content)
+    bytes_received = HTTP_LINE_SIZE + _headers_size(response.headers) + body_size
+    usage.add(bytes_sent, bytes_received)
+    return response
+
+
+def instrument_session(session: requests.Session):
+    """
+    Account the traffic of a requests session to the network usage of the current request.
+    A session is instrumented once, even if it is shared by several processors.
+
+    Args:
+        session (requests.Session): the session
+    """
+    if _account_response not in session.hooks["response"]:
+        session.hooks["response"].append(_account_response)
+
+
+def get_geosys_session(client) -> Optional[requests.Session]:
+    """
+    Get the HTTP session of a Geosys client.
+
+    Args:
+        client (Geosys): the Geosys client
+
+    Returns:
+        requests.Session: the session, or None if the client has no accessible session
+    """
+    # the OAuth2 session is private to the geosyspy HttpClient
+    session = getattr(getattr(client, "http_client", None), "_HttpClient__client", None)
+    return session if isinstance(session, requests.Session) else None
+
+
+def instrument_geosys_client(client):
+    """
+    Account the traffic of a Geosys client to the network usage of the current request.
+
+    Args:
+        client (Geosys): the Geosys client
+    """
+    session = get_geosys_session(client)
+    if session is not None:
+        instrument_session(session)
+    else:
+        logger.info("AnalyticsDatacube: the Geosys client traffic cannot be accounted")
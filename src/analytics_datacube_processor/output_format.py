@@ -0,0 +1,20 @@
+"""Available output formats"""
+
+from enum import Enum
+
+
+class OutputFormat(Enum):
+    """
+    Available output formats
+
+    ZARR: the raster datacube, as a zarr store
+    PARQUET: the zonal statistics over the polygon (per date and indicator), as a parquet file
+    CSV: the zonal statistics over the polygon, as a csv file
+    INLINE: the zonal statistics over the polygon, returned in the output when they are small
+        enough, written as a parquet file otherwise
+    """
+
+    ZARR = "ZARR"
+    PARQUET = "PARQUET"
+    CSV = "CSV"
+    INLINE = "INLINE"
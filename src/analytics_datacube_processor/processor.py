@@ -1,25 +1,126 @@
 """ Processor class """
 
+import copy
+import json
 import os
+import tempfile
+import threading
 import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Callable, List, Optional
 
-import numpy as np
-import psutil
+import pandas as pd
 import xarray
 from byoa.telemetry.log_manager.log_manager import LogManager
 from geosyspy import Geosys
 from geosyspy.utils.constants import Env, Region, SatelliteImageryCollection
+from shapely import wkt
 
+from analytics_datacube_processor.admission_control import estimate_job_memory_mb
+from analytics_datacube_processor.band_math import (
+    REFLECTANCE_INDICATOR,
+    derive_indicators,
+    is_derivable,
+)
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.checkpoint import (
+    CheckpointStore,
+    JobCheckpoint,
+    get_indicator_checkpoint_key,
+)
 from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.fetch_policy import (
+    CircuitOpenError,
+    FetchError,
+    FetchPolicy,
+    apply_fetch_timeout,
+    get_circuit_breaker,
+    get_fetch_statuses,
+    record_session_statuses,
+)
+from analytics_datacube_processor.geosys_client_pool import (
+    get_geosys_client_pool,
+    is_auth_error,
+)
+from analytics_datacube_processor.indicator_spill import (
+    IndicatorSpill,
+    get_fetch_windows,
+    get_window_days,
+)
+from analytics_datacube_processor.network_usage import (
+    NetworkUsage,
+    get_geosys_session,
+    instrument_geosys_client,
+    track_network_usage,
+    with_network_usage,
+)
+from analytics_datacube_processor.output_format import OutputFormat
+from analytics_datacube_processor.progress import ProgressEvent, ProgressTracker
+from analytics_datacube_processor.progress_event_type import ProgressEventType
+from analytics_datacube_processor.result_cache import (
+    ResultCache,
+    get_request_cache_key,
+    is_cacheable_request,
+)
+from analytics_datacube_processor.spatial_tiling import (
+    DEFAULT_TILE_SIZE_M,
+    estimate_pixels,
+    get_tile_size_m,
+    split_geometry,
+    write_tiles_to_zarr,
+)
+from analytics_datacube_processor.telemetry import (
+    BYTES_UPLOADED,
+    BYTES_WRITTEN,
+    CLEANUP_STAGE,
+    CLIENT_SETUP_STAGE,
+    COMPOSITE_STAGE,
+    CREDENTIAL_CHECK_STAGE,
+    FETCH_STAGE,
+    INDICATORS_FAILED,
+    INDICATORS_FETCHED,
+    JOBS_IN_FLIGHT,
+    MERGE_STAGE,
+    TILE_ASSEMBLY_STAGE,
+    UPLOAD_STAGE,
+    ZARR_ENCODE_STAGE,
+    ZONAL_STATISTICS_STAGE,
+    time_stage,
+)
+from analytics_datacube_processor.temporal_compositing import (
+    apply_compositing,
+    check_compositing,
+)
+from analytics_datacube_processor.tile_cache import TileCache, get_tile_key
 from analytics_datacube_processor.utils import (
+    UploadReport,
+    append_dataset_to_zarr,
     check_cloud_storage_provider_credentials,
     convert_to_wkt,
+    dataset_to_cloud_storage_zarr,
     dataset_to_zarr_format,
     delete_local_directory,
+    get_cloud_storage_zarr_store,
+    get_output_name,
+    get_zarr_name,
+    get_zarr_store_from_link,
+    get_zarr_store_usage,
+    list_directory_objects,
     upload_to_cloud_storage,
+    write_dataset_to_zarr,
+)
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+from analytics_datacube_processor.zonal_statistics import (
+    DEFAULT_MAX_INLINE_ROWS,
+    TABLE_EXTENSIONS,
+    compute_zonal_statistics,
+    zonal_statistics_to_cloud_storage,
+    zonal_statistics_to_records,
 )
 from schemas.output_schema import Metrics, OutputModel
 from utils.file_utils import validate_data
@@ -43,6 +144,39 @@ class AnalyticsDatacube:
         metrics: bool to provie metrics info in output (bandwitdh, duration)
         cloud_storage_provider: AWS S3/Azure Blob Storage
         clean_local_file: keep or delete temporary local file (zarr file)
+        max_concurrent_fetches: maximum number of indicators fetched in parallel (1 = sequential)
+        derive_indicators_locally: fetch reflectance bands once and compute the indicators locally
+        memory_budget_mb: optional memory budget of the fetched time series and of a zarr write:
+            the indicators are fetched by date windows fitting the budget and spilled on the local
+            disk, then the datacube is computed and written time slice by time slice
+        zarr_storage_mode: write the zarr in a local temporary folder then upload it (LOCAL),
+            or directly on the cloud storage provider (DIRECT)
+        upload_workers: number of objects uploaded in parallel to the cloud storage provider
+        result_cache: optional cache returning the storage link of an identical previous request
+        bypass_cache: ignore the cached results and build the datacube again
+        tile_cache: optional on-disk cache of the fetched indicator time series
+        append_to: optional storage link (or local path) of an existing datacube of the same
+            polygon and indicators, only the dates after its last time are fetched and appended
+        tile_size_m: side in meters of the tiles of a large area of interest
+        max_pixels_per_tile: optional maximum number of pixels of an image of the area of
+            interest, above which the area is split into tiles fetched and processed in parallel
+            then written in their region of a single zarr (not used with append_to)
+        max_concurrent_tiles: maximum number of tiles processed in parallel
+        max_inline_rows: maximum number of rows of the zonal statistics returned inline (INLINE
+            output format), larger statistics are written as parquet
+        fetch_policy: timeout, retries and partial result policy of the indicator fetches, the
+            fetches are also suspended by the process-level circuit breaker when Geosys is degraded
+        client: optional Geosys client shared with other processors, credentials are then ignored,
+            by default the client is taken from the process-level client pool
+        upload_executor: optional upload thread pool shared with other processors
+        progress_callback: optional callable receiving the ProgressEvent of the build stages
+            (indicators fetched, merge done, zarr regions written, bytes uploaded)
+        job_id: optional identifier of the job, a job run again with the same id resumes from
+            the checkpoint of its previous run
+        checkpoint_store: optional store of the job checkpoints (completed indicator fetches,
+            written zarr regions and uploaded objects), used with a job_id
+        cancellation_token: optional token cancelling the build, checked between the indicator
+            fetches, the zarr region writes and the object uploads
     """
 
     def __init__(
@@ -61,71 +195,463 @@ class AnalyticsDatacube:
         metrics: bool = False,
         cloud_storage_provider: CloudStorageProvider = CloudStorageProvider.AWS,
         clean_local_file=True,
+        max_concurrent_fetches: int = 1,
+        derive_indicators_locally: bool = False,
+        memory_budget_mb: Optional[float] = None,
+        zarr_storage_mode: ZarrStorageMode = ZarrStorageMode.LOCAL,
+        upload_workers: int = 8,
+        result_cache: Optional[ResultCache] = None,
+        bypass_cache: bool = False,
+        tile_cache: Optional[TileCache] = None,
+        append_to: Optional[str] = None,
+        tile_size_m: float = DEFAULT_TILE_SIZE_M,
+        max_pixels_per_tile: Optional[int] = None,
+        max_concurrent_tiles: int = 4,
+        max_inline_rows: int = DEFAULT_MAX_INLINE_ROWS,
+        fetch_policy: Optional[FetchPolicy] = None,
+        client: Optional[Geosys] = None,
+        upload_executor: Optional[ThreadPoolExecutor] = None,
+        progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+        job_id: Optional[str] = None,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        cancellation_token: Optional[CancellationToken] = None,
     ):
         validate_data(input_data, "input")
+        if max_concurrent_fetches < 1:
+            raise ValueError("max_concurrent_fetches must be greater than or equal to 1")
+        if max_concurrent_tiles < 1:
+            raise ValueError("max_concurrent_tiles must be greater than or equal to 1")
+        if tile_size_m <= 0:
+            raise ValueError("tile_size_m must be greater than 0")
+        check_compositing(input_data.get("compositing"))
+        if input_data.get("compositing") and append_to is not None:
+            raise ValueError("compositing is not supported with append_to")
+        self.output_format = OutputFormat(
+            input_data.get("output_format") or OutputFormat.ZARR.value
+        )
+        if self.output_format != OutputFormat.ZARR and append_to is not None:
+            raise ValueError(
+                f"append_to is not supported with the {self.output_format.value} output"
+            )
         self.input_data = input_data
-        self.priority_queue: str = priority_queue
-        self.__client: Geosys = Geosys(
-            client_id,
-            client_secret,
-            username,
-            password,
-            enum_env,
-            enum_region,
-            priority_queue,
-            bearer_token,
+        self.encoding_profile = ZarrEncodingProfile(
+            input_data.get("encoding_profile") or ZarrEncodingProfile.DEFAULT.value
         )
+        self.zarr_layout = ZarrLayout(input_data.get("zarr_layout") or ZarrLayout.CHUNKED.value)
+        self.priority_queue: str = priority_queue
+        if client is None:
+            # authenticated clients and their connections are shared by the requests
+            with time_stage(CLIENT_SETUP_STAGE):
+                client = get_geosys_client_pool().get_client(
+                    client_id,
+                    client_secret,
+                    username,
+                    password,
+                    enum_env,
+                    enum_region,
+                    priority_queue,
+                    bearer_token,
+                )
+        instrument_geosys_client(client)
+        session = get_geosys_session(client)
+        if session is not None:
+            record_session_statuses(session)
+            apply_fetch_timeout(session)
+        self.__client: Geosys = client
+        self.fetch_policy = fetch_policy or FetchPolicy()
+        self.__circuit_breaker = get_circuit_breaker()
         self.entity_id = entity_id
         self.metrics = metrics
         self.cloud_storage_provider = cloud_storage_provider
         self.aws_s3_bucket = aws_s3_bucket
         self.clean_local_file = clean_local_file
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self.derive_indicators_locally = derive_indicators_locally
+        self.memory_budget_mb = memory_budget_mb
+        self.zarr_storage_mode = zarr_storage_mode
+        self.upload_workers = upload_workers
+        self.result_cache = result_cache
+        self.bypass_cache = bypass_cache
+        self.tile_cache = tile_cache
+        self.append_to = append_to
+        self.tile_size_m = tile_size_m
+        self.max_pixels_per_tile = max_pixels_per_tile
+        self.max_concurrent_tiles = max_concurrent_tiles
+        self.max_inline_rows = max_inline_rows
+        self.upload_executor = upload_executor
+        self.progress_callback = progress_callback
+        self.__progress = ProgressTracker()
+        # indicator fetches of the build, done and expected (one per indicator and tile)
+        self.__nb_fetches_done = 0
+        self.__nb_fetches = len(input_data["indicators"])
+        self.__nb_tiles_built = 0
+        self.job_id = job_id
+        self.checkpoint_store = checkpoint_store
+        self.cancellation_token = cancellation_token
+        self.__checkpoint: Optional[JobCheckpoint] = None
         self.zarr_path = None
+        # durations of the last predict stages
+        self.fetch_seconds = 0.0
+        self.merge_seconds = 0.0
+        # indicators that could not be fetched (in any tile)
+        self.failed_indicators = set()
+        self.__failed_indicators_lock = threading.Lock()
+        self.__circuit_open_error: Optional[CircuitOpenError] = None
+        # time series spilled on the local disk by the fetches with a memory budget
+        self.__spill: Optional[IndicatorSpill] = None
+
+    def estimate_memory_mb(self) -> float:
+        """
+        Estimate the peak memory of the datacube build, to admit it within a memory budget.
+
+        Returns:
+            float: the estimated memory in MB
+        """
+        return estimate_job_memory_mb(
+            self.input_data,
+            self.max_pixels_per_tile,
+            self.max_concurrent_tiles,
+            self.memory_budget_mb,
+            self.max_concurrent_fetches,
+        )
 
     def prepare_data(self):
         """data preparation"""
 
         # Check if cloud storage provider credentials have been set
-        check_cloud_storage_provider_credentials(self.cloud_storage_provider)
+        with time_stage(CREDENTIAL_CHECK_STAGE):
+            check_cloud_storage_provider_credentials(self.cloud_storage_provider)
         logger.info("data_prepared")
 
-    def predict(self, input_data):
+    def __get_indicator_dataset(self, geometry: str, input_data, indicator: str):
         """
-        predict data
+        Retrieve the time series dataset of a single indicator.
+        Errors are logged and isolated so one failing indicator does not abort the others.
+        With a memory budget, the time series is fetched by date windows fitting the budget,
+        spilled on the local disk and read back lazily, so that it is never whole in memory.
+
         Args:
+            geometry (str): WKT geometry of the area of interest
             input_data (dict): dict of input data
+            indicator (str): indicator to retrieve
+
+        Returns:
+            xarray dataset, or None if the retrieval failed
+        """
+        try:
+            logger.info(
+                f"AnalyticsDatacube: get_analytics_datacube: Get dataset for indicator {indicator}"
+            )
+            start_date = datetime.fromisoformat(input_data["parameters"]["startDate"])
+            end_date = datetime.fromisoformat(input_data["parameters"]["endDate"])
+            if self.memory_budget_mb is None:
+                dataset = self.__get_window_dataset(geometry, indicator, start_date, end_date)
+            else:
+                windows = get_fetch_windows(
+                    start_date,
+                    end_date,
+                    get_window_days(geometry, indicator, self.memory_budget_mb),
+                )
+                logger.info(
+                    f"AnalyticsDatacube: {indicator} fetched in {len(windows)} date windows"
+                )
+                dataset = self.__get_spill().store(
+                    get_indicator_checkpoint_key(geometry, indicator, start_date, end_date),
+                    (
+                        self.__get_window_dataset(geometry, indicator, *window)
+                        for window in windows
+                    ),
+                )
+            INDICATORS_FETCHED.labels(indicator=indicator).inc()
+            self.__count_fetch(indicator, ProgressEventType.INDICATOR_FETCHED)
+            return dataset
+        except JobCancelledError:
+            raise
+        except Exception as exc:
+            logger.error(f"Error while generating dataset for {indicator} indicator: {str(exc)}")
+            INDICATORS_FAILED.labels(indicator=indicator).inc()
+            self.__count_fetch(indicator, ProgressEventType.INDICATOR_FAILED)
+            if isinstance(exc, CircuitOpenError):
+                self.__circuit_open_error = exc
+            return None
+
+    def __get_window_dataset(
+        self, geometry: str, indicator: str, start_date: datetime, end_date: datetime
+    ):
+        """
+        Retrieve the time series of an indicator over a date window: from the checkpoint of a
+        previous run of the job, from the tile cache or from Geosys.
+
+        Args:
+            geometry (str): WKT geometry of the area of interest
+            indicator (str): indicator to retrieve
+            start_date (datetime): start date of the window
+            end_date (datetime): end date of the window
+
+        Returns:
+            xarray dataset
+        """
+        checkpoint_key = None
+        if self.__checkpoint is not None:
+            # fetched by a previous run of the job
+            checkpoint_key = get_indicator_checkpoint_key(
+                geometry, indicator, start_date, end_date
+            )
+            dataset = self.__checkpoint.load_indicator(checkpoint_key)
+            if dataset is not None:
+                logger.info(f"AnalyticsDatacube: {indicator} dataset loaded from checkpoint")
+                return dataset
+
+        if self.tile_cache is None:
+            dataset = self.__get_time_series(geometry, start_date, end_date, indicator)
+        else:
+            # fetch only the dates missing from the tile cache, then assemble from the cache
+            dataset = self.tile_cache.get_time_series(
+                indicator,
+                get_tile_key(geometry),
+                start_date,
+                end_date,
+                lambda fetch_start_date, fetch_end_date: self.__get_time_series(
+                    geometry, fetch_start_date, fetch_end_date, indicator
+                ),
+            )
+        if checkpoint_key is not None:
+            self.__checkpoint.store_indicator(checkpoint_key, dataset)
+        return dataset
+
+    def __get_spill(self) -> IndicatorSpill:
+        """local spill of the time series of the build, created by its first fetch"""
+        with self.__failed_indicators_lock:
+            if self.__spill is None:
+                self.__spill = IndicatorSpill()
+            return self.__spill
+
+    def __count_fetch(self, indicator: str, event_type: ProgressEventType):
+        """
+        Count an indicator fetch and emit its progress event.
+
+        Args:
+            indicator (str): the fetched indicator
+            event_type (ProgressEventType): INDICATOR_FETCHED or INDICATOR_FAILED
+        """
+        with self.__failed_indicators_lock:
+            self.__nb_fetches_done += 1
+            # a failed reflectance fetch is followed by the fetches of the derivable indicators
+            self.__nb_fetches = max(self.__nb_fetches, self.__nb_fetches_done)
+            done, total = self.__nb_fetches_done, self.__nb_fetches
+        status = "fetched" if event_type == ProgressEventType.INDICATOR_FETCHED else "failed"
+        self.__progress.emit(
+            event_type,
+            f"indicator {indicator} {status} ({done}/{total})",
+            done,
+            total,
+            indicator=indicator,
+        )
+
+    def __check_cancelled(self):
+        """
+        Check the cancellation token of the build.
 
         Raises:
-            ValueError: when an invalid geometry is provided as input
+            JobCancelledError: when the build is cancelled
+        """
+        if self.cancellation_token is not None:
+            self.cancellation_token.raise_if_cancelled()
+
+    def __get_output_name(self, extension: str = "zarr") -> str:
+        """name of the output, kept by the checkpoint so that a resumed job writes the same one"""
+        output_name = get_output_name(self.entity_id, extension)
+        if self.__checkpoint is None:
+            return output_name
+        return self.__checkpoint.get_output_name(output_name)
+
+    def __get_local_zarr_path(self) -> Optional[str]:
+        """
+        Path of the local zarr of a checkpointed job, in its checkpoint folder.
+
+        Returns:
+            str: the local zarr path, or None without checkpoint (temporary zarr)
+        """
+        if self.__checkpoint is None:
+            return None
+        zarr_path = self.__checkpoint.get_local_zarr_path(get_zarr_name(self.entity_id))
+        if not os.path.exists(zarr_path) and self.__checkpoint.has_written_regions:
+            # the local zarr of the previous run was lost, it is written again
+            self.__checkpoint.reset_regions()
+        return zarr_path
+
+    def __on_regions_written(self, done: int, total: int):
+        """emit the progress event of the zarr regions written"""
+        self.__progress.emit(
+            ProgressEventType.CHUNKS_WRITTEN, f"zarr regions written ({done}/{total})", done, total
+        )
+
+    def __on_bytes_uploaded(self, done: int, total: int):
+        """emit the progress event of the bytes uploaded"""
+        self.__progress.emit(
+            ProgressEventType.BYTES_UPLOADED,
+            f"{done / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f} MB uploaded",
+            done,
+            total,
+        )
+
+    def __on_tile_built(self, nb_tiles: int):
+        """count a tile built (or failed) and emit its progress event"""
+        with self.__failed_indicators_lock:
+            self.__nb_tiles_built += 1
+            done = self.__nb_tiles_built
+        self.__progress.emit(
+            ProgressEventType.TILE_BUILT, f"tiles built ({done}/{nb_tiles})", done, nb_tiles
+        )
+
+    def __get_time_series(
+        self, geometry: str, start_date: datetime, end_date: datetime, indicator: str
+    ):
+        """
+        Retrieve the time series of an indicator from Geosys, with the timeout and the retries
+        of the fetch policy.
+
+        Args:
+            geometry (str): WKT geometry of the area of interest
+            start_date (datetime): start date of the time series
+            end_date (datetime): end date of the time series
+            indicator (str): indicator to retrieve
 
         Returns:
             xarray dataset
         """
-        # validate and convert the geometry to WKT
-        geometry = convert_to_wkt(input_data["parameters"]["polygon"])
 
-        # Build a list with datasets of each indicator
-        indicators_datasets = []
-        for indicator in input_data["indicators"]:
+        def fetch():
             try:
-                logger.info(
-                    f"AnalyticsDatacube: get_analytics_datacube: Get dataset for indicator {indicator}"
-                )
-                indicator_dataset = self.__client.get_satellite_image_time_series(
+                return self.__client.get_satellite_image_time_series(
                     polygon=geometry,
-                    start_date=datetime.fromisoformat(input_data["parameters"]["startDate"]),
-                    end_date=datetime.fromisoformat(input_data["parameters"]["endDate"]),
+                    start_date=start_date,
+                    end_date=end_date,
                     collections=[
                         SatelliteImageryCollection.SENTINEL_2,
                         SatelliteImageryCollection.LANDSAT_8,
                     ],
                     indicators=[indicator],
                 )
-                indicators_datasets.append(indicator_dataset)
             except Exception as exc:
-                logger.error(
-                    f"Error while generating dataset for {indicator} indicator: {str(exc)}"
+                if is_auth_error(exc, get_fetch_statuses()):
+                    # the next requests do not reuse the client of an expired or revoked token
+                    get_geosys_client_pool().evict(self.__client)
+                raise
+
+        with time_stage(FETCH_STAGE):
+            return self.fetch_policy.call(
+                fetch,
+                self.__circuit_breaker,
+                f"{indicator} fetch",
+                self.cancellation_token,
+            )
+
+    def __derive_indicators(self, geometry: str, input_data, indicators):
+        """
+        Fetch the reflectance bands once and compute every derivable indicator locally.
+
+        Args:
+            geometry (str): WKT geometry of the area of interest
+            input_data (dict): dict of input data
+            indicators (list): requested indicators
+
+        Returns:
+            dict: indicator -> dataset, only for the indicators successfully derived
+        """
+        derivable_indicators = [indicator for indicator in indicators if is_derivable(indicator)]
+        if not derivable_indicators:
+            return {}
+        # the derivable indicators are replaced by a single reflectance fetch
+        with self.__failed_indicators_lock:
+            self.__nb_fetches -= len(derivable_indicators) - 1
+
+        reflectance_dataset = self.__get_indicator_dataset(
+            geometry, input_data, REFLECTANCE_INDICATOR
+        )
+        if reflectance_dataset is None:
+            return {}
+
+        try:
+            derived = derive_indicators(reflectance_dataset, derivable_indicators)
+        except Exception as exc:
+            logger.error(f"Error while deriving indicators from reflectance: {str(exc)}")
+            return {}
+
+        return {
+            indicator: dataset for indicator, dataset in derived.items() if dataset is not None
+        }
+
+    def predict(self, input_data):
+        """
+        predict data
+        Args:
+            input_data (dict): dict of input data
+
+        Raises:
+            ValueError: when an invalid geometry is provided as input
+            FetchError: when indicators could not be fetched and the fetch policy does not
+                accept a partial datacube, or when no indicator could be fetched
+            CircuitOpenError: when no indicator could be fetched while Geosys is degraded
+
+        Returns:
+            xarray dataset
+        """
+        # validate and convert the geometry to WKT
+        geometry = convert_to_wkt(input_data["parameters"]["polygon"])
+
+        indicators = input_data["indicators"]
+        datasets_by_indicator = {}
+        fetch_start_time = time.time()
+
+        # Derive what we can from a single reflectance retrieval
+        if self.derive_indicators_locally:
+            datasets_by_indicator.update(
+                self.__derive_indicators(geometry, input_data, indicators)
+            )
+
+        # Fetch the remaining indicators concurrently
+        remaining_indicators = [
+            indicator for indicator in indicators if indicator not in datasets_by_indicator
+        ]
+        if remaining_indicators:
+            max_workers = max(1, min(self.max_concurrent_fetches, len(remaining_indicators)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # the fetches are accounted to the network usage of the request
+                results = executor.map(
+                    with_network_usage(
+                        lambda indicator: self.__get_indicator_dataset(
+                            geometry, input_data, indicator
+                        )
+                    ),
+                    remaining_indicators,
                 )
+                datasets_by_indicator.update(zip(remaining_indicators, results))
+
+        self.fetch_seconds = time.time() - fetch_start_time
+
+        if self.tile_cache is not None:
+            logger.info(f"AnalyticsDatacube: tile cache stats {self.tile_cache.stats()}")
+
+        failed_indicators = [
+            indicator for indicator in indicators if datasets_by_indicator.get(indicator) is None
+        ]
+        if failed_indicators:
+            with self.__failed_indicators_lock:
+                self.failed_indicators.update(failed_indicators)
+            if len(failed_indicators) == len(indicators) and self.__circuit_open_error is not None:
+                raise self.__circuit_open_error
+            if not self.fetch_policy.partial_ok or len(failed_indicators) == len(indicators):
+                raise FetchError(failed_indicators)
+            logger.info(f"AnalyticsDatacube: partial datacube without {failed_indicators}")
+
+        # Build a list with datasets of each indicator, in the requested order
+        # so the merge stays deterministic
+        indicators_datasets = [
+            datasets_by_indicator[indicator]
+            for indicator in indicators
+            if datasets_by_indicator.get(indicator) is not None
+        ]
 
         # Return merge of all datasets
         logger.info(
@@ -134,7 +660,10 @@ class AnalyticsDatacube:
         )
 
         try:
-            analytics_datacube = xarray.merge(indicators_datasets)
+            merge_start_time = time.time()
+            with time_stage(MERGE_STAGE):
+                analytics_datacube = merge_indicator_datasets(indicators_datasets)
+            self.merge_seconds = time.time() - merge_start_time
             return analytics_datacube
 
         except Exception as exc:
@@ -143,60 +672,574 @@ class AnalyticsDatacube:
                 f"Error while merging results in the analytics datacube: {str(exc)}"
             ) from exc
 
-    def trigger(self):
-        """trigger the processor
+    def __build_datacube(self):
+        """
+        Build the datacube of the input data, tagged with its polygon and indicators
+        so that it can be extended later on.
+
         Returns:
-            output_schema object
+            xarray dataset, lazy (computed while written) when built with a memory budget
         """
-        logger.info("Processor triggered")
-        start_time = time.time()
+        datacube = self.__composite(self.predict(self.input_data))
+        self.__progress.emit(ProgressEventType.MERGE_DONE, "indicators merged")
+        datacube.attrs.update(self.__get_datacube_attrs())
+        return datacube
 
-        bandwidth_init = psutil.net_io_counters().bytes_sent + psutil.net_io_counters().bytes_recv
+    def __composite(self, datacube):
+        """
+        Apply the compositing of the input data (cloudy scenes filtering, temporal reduction)
+        before the datacube is written.
 
-        self.prepare_data()
+        Args:
+            datacube (xarray.Dataset): the datacube
+
+        Returns:
+            xarray dataset
+        """
+        compositing = self.input_data.get("compositing")
+        if not compositing:
+            return datacube
+        with time_stage(COMPOSITE_STAGE):
+            return apply_compositing(
+                datacube,
+                compositing,
+                pd.Timestamp(self.input_data["parameters"]["startDate"]),
+            )
+
+    def __get_datacube_attrs(self) -> dict:
+        """attributes tagging the datacube with its polygon and indicators"""
+        return {
+            "polygon": convert_to_wkt(self.input_data["parameters"]["polygon"]),
+            "indicators": list(self.input_data["indicators"]),
+        }
+
+    def __get_tiles(self) -> Optional[List[str]]:
+        """
+        Split the area of interest into tiles when its images exceed max_pixels_per_tile.
+
+        Returns:
+            list: WKT geometries of the tiles, or None when the area is processed in one go
+        """
+        if self.max_pixels_per_tile is None:
+            return None
+        geometry = convert_to_wkt(self.input_data["parameters"]["polygon"])
+        nb_pixels = estimate_pixels(geometry)
+        if nb_pixels <= self.max_pixels_per_tile:
+            return None
+        tiles = split_geometry(
+            geometry, get_tile_size_m(self.tile_size_m, self.max_pixels_per_tile)
+        )
+        logger.info(
+            f"AnalyticsDatacube: {nb_pixels} pixels per image, area of interest split into "
+            f"{len(tiles)} tiles"
+        )
+        return tiles if len(tiles) > 1 else None
+
+    def __build_tile(self, geometry: str) -> Optional[str]:
+        """
+        Build the datacube of a tile in a temporary local zarr.
+
+        Args:
+            geometry (str): WKT geometry of the tile
 
-        datacube = self.predict(self.input_data)
-        datacube = datacube.load()
-        zarr_path = dataset_to_zarr_format(datacube)
+        Returns:
+            str: the zarr path of the tile, or None if the tile has no data
+        """
+        input_data = copy.deepcopy(self.input_data)
+        input_data["parameters"]["polygon"] = geometry
+        datacube = self.__composite(self.predict(input_data))
+        if not datacube.data_vars:
+            return None
+        tile_path = os.path.join(tempfile.mkdtemp(prefix="analytics-datacube-tile-"), "tile.zarr")
+        write_dataset_to_zarr(datacube, tile_path)
+        return tile_path
+
+    def __write_tiled_zarr(self, tiles: List[str], store, storage_options=None) -> float:
+        """
+        Build the tiles in parallel, then write each of them into its region of a single zarr.
+
+        Args:
+            tiles (List[str]): WKT geometries of the tiles
+            store: zarr store (local path or fsspec url)
+            storage_options (dict, optional): fsspec options of a remote store
+
+        Returns:
+            float: the duration of the tiles build in seconds
+        """
+        generation_start_time = time.time()
+        max_workers = max(1, min(self.max_concurrent_tiles, len(tiles)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # the fetches of the tiles are accounted to the network usage of the request
+            futures = [
+                executor.submit(with_network_usage(self.__build_tile), tile) for tile in tiles
+            ]
+            for future in futures:
+                future.add_done_callback(lambda _: self.__on_tile_built(len(tiles)))
+        tile_paths = [future.result() for future in futures if future.exception() is None]
+        try:
+            for future in futures:
+                if isinstance(future.exception(), JobCancelledError):
+                    raise future.exception()
+                if future.exception() is not None:
+                    raise RuntimeError(
+                        f"Error while building a tile of the datacube: {future.exception()}"
+                    ) from future.exception()
+            generation_seconds = time.time() - generation_start_time
+            self.fetch_seconds = generation_seconds
+
+            assembly_start_time = time.time()
+            with time_stage(TILE_ASSEMBLY_STAGE):
+                write_tiles_to_zarr(
+                    [tile_path for tile_path in tile_paths if tile_path is not None],
+                    store,
+                    storage_options,
+                    self.encoding_profile,
+                    self.zarr_layout,
+                    self.__get_datacube_attrs(),
+                    self.__on_regions_written,
+                    self.cancellation_token,
+                    self.__checkpoint,
+                )
+            self.merge_seconds = time.time() - assembly_start_time
+        finally:
+            for tile_path in tile_paths:
+                if tile_path is not None:
+                    delete_local_directory(os.path.dirname(tile_path))
+        return generation_seconds
+
+    def __build_tiled_datacube(self, tiles: List[str]):
+        """
+        Build the datacube of a large area of interest tile by tile, in a single zarr written
+        directly on the cloud storage (DIRECT) or in a local temporary folder then uploaded (LOCAL).
+
+        Args:
+            tiles (List[str]): WKT geometries of the tiles
 
-        if self.entity_id:
-            # Rename zarr file
+        Returns:
+            tuple: (cloud storage link, generation duration in seconds, UploadReport of the
+                written objects)
+        """
+        if self.zarr_storage_mode == ZarrStorageMode.DIRECT:
+            url, storage_options, cloud_storage_link = get_cloud_storage_zarr_store(
+                self.cloud_storage_provider, self.__get_output_name(), self.aws_s3_bucket
+            )
+            generation_seconds = self.__write_tiled_zarr(tiles, url, storage_options)
+            self.zarr_path = cloud_storage_link
+            # the tiles are uploaded while they are assembled
+            objects, nb_bytes = get_zarr_store_usage(url, storage_options)
+            self.__on_bytes_uploaded(nb_bytes, nb_bytes)
+            return (
+                cloud_storage_link,
+                generation_seconds,
+                UploadReport(objects=objects, bytes=nb_bytes, seconds=self.merge_seconds),
+            )
+
+        zarr_path = self.__get_local_zarr_path() or os.path.join(
+            tempfile.gettempdir(), get_zarr_name()
+        )
+        generation_seconds = self.__write_tiled_zarr(tiles, zarr_path)
+        cloud_storage_link, upload_report = self.__upload_local_zarr(zarr_path)
+        return cloud_storage_link, generation_seconds, upload_report
+
+    def __append_to_existing_datacube(self):
+        """
+        Fetch the dates after the last time of the existing datacube (append_to)
+        and append them to it in place.
+
+        Raises:
+            ValueError: when the existing datacube does not match the input data
+            FetchError: when an indicator could not be fetched, the variables of the datacube
+                would not have the same dates
+
+        Returns:
+            tuple: (storage link of the datacube, generation duration in seconds, UploadReport
+                of the appended objects)
+        """
+        generation_start_time = time.time()
+        store, storage_options = get_zarr_store_from_link(self.append_to)
+        existing = xarray.open_zarr(store, storage_options=storage_options)
+
+        missing_indicators = [
+            indicator
+            for indicator in self.input_data["indicators"]
+            if indicator.lower() not in existing.data_vars
+        ]
+        if missing_indicators:
+            raise ValueError(f"Indicators {missing_indicators} are not in {self.append_to}")
+        requested_variables = [indicator.lower() for indicator in self.input_data["indicators"]]
+        missing_variables = [
+            name for name in existing.data_vars if name not in requested_variables
+        ]
+        if missing_variables:
+            raise ValueError(
+                f"Variables {missing_variables} of {self.append_to} are not requested, every "
+                "variable of the datacube must be appended"
+            )
+        geometry = convert_to_wkt(self.input_data["parameters"]["polygon"])
+        if "polygon" in existing.attrs and not wkt.loads(existing.attrs["polygon"]).equals(
+            wkt.loads(geometry)
+        ):
+            raise ValueError(f"The polygon does not match the polygon of {self.append_to}")
+
+        # the last date is fetched again, only the time steps after the last time are appended
+        last_date = pd.Timestamp(existing["time"].max().values).to_pydatetime()
+        end_date = datetime.fromisoformat(self.input_data["parameters"]["endDate"])
+        if last_date >= end_date:
+            logger.info(f"AnalyticsDatacube: {self.append_to} is already up to date")
+            return self.append_to, time.time() - generation_start_time, UploadReport()
+
+        input_data = copy.deepcopy(self.input_data)
+        input_data["parameters"]["startDate"] = last_date.date().isoformat()
+        datacube = self.predict(input_data)
+        if self.failed_indicators:
+            # a partial append would leave variables with fewer dates than the others
+            raise FetchError(sorted(self.failed_indicators))
+        self.__progress.emit(ProgressEventType.MERGE_DONE, "indicators merged")
+        generation_seconds = time.time() - generation_start_time
+
+        # the appended objects are measured from the size of the store before and after
+        objects_before, bytes_before = get_zarr_store_usage(store, storage_options)
+        self.__check_cancelled()
+        upload_start_time = time.time()
+        with time_stage(ZARR_ENCODE_STAGE):
+            nb_appended_times = append_dataset_to_zarr(datacube, store, storage_options)
+        upload_seconds = time.time() - upload_start_time
+        self.__on_regions_written(1, 1)
+        objects_after, bytes_after = get_zarr_store_usage(store, storage_options)
+        self.__on_bytes_uploaded(
+            max(0, bytes_after - bytes_before), max(0, bytes_after - bytes_before)
+        )
+        logger.info(
+            f"AnalyticsDatacube: {nb_appended_times} time steps appended to {self.append_to}"
+        )
+        self.zarr_path = self.append_to
+        return (
+            self.append_to,
+            generation_seconds,
+            UploadReport(
+                objects=max(0, objects_after - objects_before),
+                bytes=max(0, bytes_after - bytes_before),
+                seconds=upload_seconds,
+            ),
+        )
+
+    def __build_zonal_statistics(self):
+        """
+        Compute the zonal statistics of the datacube over the polygon, then write them as a
+        single table on the cloud storage, or return them inline when they are small enough.
+        The datacube is not written.
+
+        Returns:
+            tuple: (cloud storage link or None, inline zonal statistics or None, generation
+                duration in seconds, UploadReport of the written table)
+        """
+        generation_start_time = time.time()
+        datacube = self.__build_datacube()
+        with time_stage(ZONAL_STATISTICS_STAGE):
+            table = compute_zonal_statistics(datacube, datacube.attrs["polygon"])
+        generation_seconds = time.time() - generation_start_time
+
+        output_format = self.output_format
+        if output_format == OutputFormat.INLINE:
+            if len(table) <= self.max_inline_rows:
+                return None, zonal_statistics_to_records(table), generation_seconds, UploadReport()
+            logger.info(
+                f"AnalyticsDatacube: {len(table)} rows of zonal statistics, more than "
+                f"{self.max_inline_rows}: written as {OutputFormat.PARQUET.value}"
+            )
+            output_format = OutputFormat.PARQUET
+
+        self.__check_cancelled()
+        upload_start_time = time.time()
+        with time_stage(UPLOAD_STAGE):
+            cloud_storage_link, nb_bytes = zonal_statistics_to_cloud_storage(
+                table,
+                output_format,
+                self.cloud_storage_provider,
+                self.__get_output_name(TABLE_EXTENSIONS[output_format]),
+                self.aws_s3_bucket,
+            )
+        self.__on_bytes_uploaded(nb_bytes, nb_bytes)
+        self.zarr_path = cloud_storage_link
+        return (
+            cloud_storage_link,
+            None,
+            generation_seconds,
+            UploadReport(objects=1, bytes=nb_bytes, seconds=time.time() - upload_start_time),
+        )
+
+    def __write_cloud_storage_zarr(self, datacube):
+        """
+        Write the datacube directly on the cloud storage.
+
+        Args:
+            datacube (xarray.Dataset): the datacube to store
+
+        Returns:
+            tuple: (cloud storage link, UploadReport of the written objects)
+        """
+        zarr_name = self.__get_output_name()
+        upload_start_time = time.time()
+        with time_stage(ZARR_ENCODE_STAGE):
+            cloud_storage_link = dataset_to_cloud_storage_zarr(
+                datacube,
+                self.cloud_storage_provider,
+                zarr_name,
+                self.aws_s3_bucket,
+                self.memory_budget_mb,
+                self.encoding_profile,
+                self.zarr_layout,
+                self.__on_regions_written,
+                self.cancellation_token,
+                self.__checkpoint,
+            )
+        # the zarr encoding overlaps with its upload
+        upload_seconds = time.time() - upload_start_time
+        self.zarr_path = cloud_storage_link
+
+        store, storage_options = get_zarr_store_from_link(cloud_storage_link)
+        objects, nb_bytes = get_zarr_store_usage(store, storage_options)
+        self.__on_bytes_uploaded(nb_bytes, nb_bytes)
+        return cloud_storage_link, UploadReport(
+            objects=objects, bytes=nb_bytes, seconds=upload_seconds
+        )
+
+    def __write_and_upload_local_zarr(self, datacube):
+        """
+        Write the datacube in a temporary local zarr, then upload it to the cloud storage.
+
+        Args:
+            datacube (xarray.Dataset): the datacube to store
+
+        Returns:
+            tuple: (cloud storage link, UploadReport of the uploaded objects)
+        """
+        with time_stage(ZARR_ENCODE_STAGE):
+            zarr_path = dataset_to_zarr_format(
+                datacube,
+                self.memory_budget_mb,
+                self.encoding_profile,
+                self.zarr_layout,
+                self.__on_regions_written,
+                self.__get_local_zarr_path(),
+                self.cancellation_token,
+                self.__checkpoint,
+            )
+        return self.__upload_local_zarr(zarr_path)
+
+    def __upload_local_zarr(self, zarr_path: str):
+        """
+        Upload a temporary local zarr to the cloud storage.
+
+        Args:
+            zarr_path (str): the local zarr path
+
+        Returns:
+            tuple: (cloud storage link, UploadReport of the uploaded objects)
+        """
+        BYTES_WRITTEN.inc(
+            sum(os.path.getsize(file_path) for file_path, _ in list_directory_objects(zarr_path))
+        )
+
+        if self.entity_id and self.__checkpoint is None:
+            # Rename zarr file (the zarr of a checkpointed job is already named after the entity)
             new_name = f"{self.entity_id}_{os.path.basename(zarr_path)}"
             new_path = os.path.join(os.path.dirname(zarr_path), new_name)
             os.rename(zarr_path, new_path)
             zarr_path = new_path
 
-        # bandwidth use retrieval
-        bandwidth_generation = (
-            psutil.net_io_counters().bytes_sent + psutil.net_io_counters().bytes_recv
-        )
-
         # upload zarr file on the chosen cloud storage provider
-        cloud_storage_link = upload_to_cloud_storage(
-            self.cloud_storage_provider, zarr_path, self.aws_s3_bucket
-        )
+        with time_stage(UPLOAD_STAGE):
+            cloud_storage_link, upload_report = upload_to_cloud_storage(
+                self.cloud_storage_provider,
+                zarr_path,
+                self.aws_s3_bucket,
+                self.upload_workers,
+                self.upload_executor,
+                self.__on_bytes_uploaded,
+                self.cancellation_token,
+                self.__checkpoint,
+            )
 
         self.zarr_path = zarr_path
         if self.clean_local_file:
             # delete tmp files
-            delete_local_directory(zarr_path)
+            with time_stage(CLEANUP_STAGE):
+                delete_local_directory(zarr_path)
+
+        return cloud_storage_link, upload_report
 
-        # bandwidth_upload retrieval
-        bandwidth_upload = (
-            psutil.net_io_counters().bytes_sent + psutil.net_io_counters().bytes_recv
+    def __get_checkpoint_request_key(self) -> str:
+        """key of the request and of the write settings of the job, a checkpoint is only
+        resumed by the same request written the same way (same zarr regions)"""
+        return json.dumps(
+            {
+                "request": get_request_cache_key(
+                    self.input_data, self.cloud_storage_provider, self.aws_s3_bucket
+                ),
+                "append_to": self.append_to,
+                "zarr_storage_mode": self.zarr_storage_mode.value,
+                "memory_budget_mb": self.memory_budget_mb,
+                "max_pixels_per_tile": self.max_pixels_per_tile,
+                "tile_size_m": self.tile_size_m,
+            },
+            sort_keys=True,
+        )
+
+    def trigger(self):
+        """trigger the processor
+        Returns:
+            output_schema object
+        """
+        # the Geosys traffic of this request is accounted apart from the concurrent requests
+        with JOBS_IN_FLIGHT.track_inprogress(), track_network_usage() as network_usage:
+            try:
+                return self.__trigger(network_usage)
+            finally:
+                # the spilled time series are written into the output by now
+                if self.__spill is not None:
+                    self.__spill.delete()
+                    self.__spill = None
+
+    def __trigger(self, network_usage: NetworkUsage):
+        """build and store the datacube, or get it from the result cache
+        Args:
+            network_usage (NetworkUsage): the network usage of the request
+
+        Returns:
+            output_schema object
+        """
+        logger.info("Processor triggered")
+        start_time = time.time()
+        self.__progress = ProgressTracker(self.progress_callback)
+        self.__nb_fetches_done = 0
+        self.__nb_tiles_built = 0
+        self.__progress.emit(ProgressEventType.STARTED, "build started")
+        self.__check_cancelled()
+
+        self.prepare_data()
+
+        # resume the job from the checkpoint of its previous run
+        self.__checkpoint = None
+        if self.job_id is not None and self.checkpoint_store is not None:
+            self.__checkpoint = self.checkpoint_store.open(
+                self.job_id, self.__get_checkpoint_request_key()
+            )
+            if self.__checkpoint.result is not None:
+                logger.info(f"AnalyticsDatacube: job {self.job_id} already completed")
+                self.__progress.emit(
+                    ProgressEventType.COMPLETED,
+                    f"job {self.job_id} already completed",
+                    storage_links=self.__checkpoint.result.get("storage_links"),
+                )
+                result = OutputModel(**self.__checkpoint.result)
+                if self.metrics:
+                    result.metrics = Metrics(execution_time_seconds=time.time() - start_time)
+                return result.model_dump()
+
+        # return the result of an identical previous request, the requests of dates still to
+        # come are built again
+        cache_key = None
+        if (
+            self.result_cache is not None
+            and self.append_to is None
+            and is_cacheable_request(self.input_data)
+        ):
+            cache_key = get_request_cache_key(
+                self.input_data, self.cloud_storage_provider, self.aws_s3_bucket, self.entity_id
+            )
+            cached_storage_links = None if self.bypass_cache else self.result_cache.get(cache_key)
+            if cached_storage_links is not None:
+                logger.info(f"AnalyticsDatacube: result cache hit for request {cache_key}")
+                self.__progress.emit(
+                    ProgressEventType.CACHE_HIT,
+                    "datacube found in the result cache",
+                    storage_links=cached_storage_links,
+                )
+                result = OutputModel(storage_links=cached_storage_links)
+                if self.metrics:
+                    result.metrics = Metrics(execution_time_seconds=time.time() - start_time)
+                return result.model_dump()
+
+        zonal_statistics = None
+        if self.append_to is not None:
+            # incremental mode: only the dates after the existing datacube are fetched and appended
+            cloud_storage_link, generation_seconds, upload_report = (
+                self.__append_to_existing_datacube()
+            )
+            if self.result_cache is not None:
+                # the requests cached with the previous dates of the datacube are stale
+                self.result_cache.invalidate(cloud_storage_link)
+        elif self.output_format != OutputFormat.ZARR:
+            # zonal statistics fast path: no zarr is written
+            cloud_storage_link, zonal_statistics, generation_seconds, upload_report = (
+                self.__build_zonal_statistics()
+            )
+        else:
+            tiles = self.__get_tiles()
+            if tiles is not None:
+                # large area of interest: the tiles are processed in parallel
+                self.__nb_fetches = len(self.input_data["indicators"]) * len(tiles)
+                cloud_storage_link, generation_seconds, upload_report = (
+                    self.__build_tiled_datacube(tiles)
+                )
+            else:
+                generation_start_time = time.time()
+                datacube = self.__build_datacube()
+                generation_seconds = time.time() - generation_start_time
+
+                if self.zarr_storage_mode == ZarrStorageMode.DIRECT:
+                    # write zarr file directly on the chosen cloud storage provider
+                    cloud_storage_link, upload_report = self.__write_cloud_storage_zarr(datacube)
+                else:
+                    cloud_storage_link, upload_report = self.__write_and_upload_local_zarr(
+                        datacube
+                    )
+        BYTES_UPLOADED.inc(upload_report.bytes)
+
+        # the inline zonal statistics and the partial datacubes are not cached
+        if cache_key is not None and cloud_storage_link is not None and not self.failed_indicators:
+            self.result_cache.put(cache_key, cloud_storage_link)
+        self.__progress.emit(
+            ProgressEventType.COMPLETED,
+            f"build completed: {cloud_storage_link or 'inline zonal statistics'}",
+            storage_links=cloud_storage_link,
         )
 
         # format result
-        result = OutputModel(storage_links=cloud_storage_link)
+        result = OutputModel(
+            storage_links=cloud_storage_link,
+            zonal_statistics=zonal_statistics,
+            indicators_succeeded=[
+                indicator
+                for indicator in self.input_data["indicators"]
+                if indicator not in self.failed_indicators
+            ],
+            indicators_failed=[
+                indicator
+                for indicator in self.input_data["indicators"]
+                if indicator in self.failed_indicators
+            ],
+        )
+
+        if self.__checkpoint is not None:
+            self.__checkpoint.complete(result.model_dump())
 
         # adding metrics
         if self.metrics:
-            metrics = Metrics(
-                execution_time=f"{int(np.round((time.time() - start_time) / 60))} minutes {int(np.round(np.round((time.time() - start_time)) % 60))} seconds",
-                data_generation_network_use=f"{np.round((bandwidth_generation - bandwidth_init) / 1024. / 1024. / 1024. * 8, 3)} Gb",
-                data_upload_network_use=f"{np.round((bandwidth_upload - bandwidth_generation) / 1024. / 1024. / 1024. * 8, 3)} Gb",
+            result.metrics = Metrics(
+                execution_time_seconds=time.time() - start_time,
+                data_generation_seconds=generation_seconds,
+                data_fetch_seconds=self.fetch_seconds,
+                data_merge_seconds=self.merge_seconds,
+                data_generation_bytes_sent=network_usage.bytes_sent,
+                data_generation_bytes_received=network_usage.bytes_received,
+                data_generation_requests=network_usage.requests,
+                data_upload_seconds=upload_report.seconds,
+                data_upload_bytes=upload_report.bytes,
+                data_upload_objects=upload_report.objects,
+                data_upload_throughput=upload_report.bytes_per_second,
             )
-            result.metrics = metrics
 
         # validate output data
         # validate_data(result.model_dump(), "output")
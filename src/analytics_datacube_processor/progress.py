@@ -0,0 +1,147 @@
+"""Progress events of the datacube builds"""
+
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from byoa.telemetry.log_manager.log_manager import LogManager
+
+from analytics_datacube_processor.progress_event_type import ProgressEventType
+
+logger = LogManager.get_instance()
+
+# share of the build progress of each stage: (progress at its start, progress at its end)
+STAGE_PROGRESS = {
+    ProgressEventType.STARTED: (0.0, 0.0),
+    ProgressEventType.INDICATOR_FETCHED: (0.0, 0.6),
+    ProgressEventType.INDICATOR_FAILED: (0.0, 0.6),
+    ProgressEventType.TILE_BUILT: (0.0, 0.6),
+    ProgressEventType.MERGE_DONE: (0.65, 0.65),
+    ProgressEventType.CHUNKS_WRITTEN: (0.65, 0.8),
+    ProgressEventType.BYTES_UPLOADED: (0.8, 1.0),
+    ProgressEventType.FIELD_DONE: (0.0, 1.0),
+    ProgressEventType.CACHE_HIT: (1.0, 1.0),
+    ProgressEventType.COMPLETED: (1.0, 1.0),
+}
+
+# minimum delay between two events of the same type, except the last one of a stage
+DEFAULT_MIN_INTERVAL_SECONDS = 0.5
+
+
+@dataclass
+class ProgressEvent:
+    """
+    Progress event of a datacube build.
+
+    Attributes:
+        event_type (ProgressEventType): the event type
+        progress (float): the progress of the build, between 0 and 1
+        message (str): human readable description of the event
+        done (int, optional): number of items of the stage done (fetches, regions, bytes...)
+        total (int, optional): number of items of the stage
+        details (dict): event specific values (indicator, field_id, storage link...)
+        timestamp (str): the event date (ISO format)
+    """
+
+    event_type: ProgressEventType
+    progress: float
+    message: str
+    done: Optional[int] = None
+    total: Optional[int] = None
+    details: dict = field(default_factory=dict)
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+class ProgressTracker:
+    """
+    Turn the stage updates of a build into progress events sent to a listener.
+    The progress never decreases, and the events of a stage are throttled to one per
+    min_interval_seconds, its last one (done == total) always being sent.
+    A failing listener is logged and never fails the build.
+
+    Parameters:
+        listener: optional callable receiving the ProgressEvent, the tracker does nothing
+            without it
+        min_interval_seconds: minimum delay between two events of the same type
+    """
+
+    def __init__(
+        self,
+        listener: Optional[Callable[[ProgressEvent], None]] = None,
+        min_interval_seconds: float = DEFAULT_MIN_INTERVAL_SECONDS,
+    ):
+        self.listener = listener
+        self.min_interval_seconds = min_interval_seconds
+        self.progress = 0.0
+        self.__last_emit_times = {}
+        self.__lock = threading.Lock()
+
+    def emit(
+        self,
+        event_type: ProgressEventType,
+        message: str,
+        done: Optional[int] = None,
+        total: Optional[int] = None,
+        progress: Optional[float] = None,
+        **details,
+    ):
+        """
+        Send a progress event to the listener.
+
+        Args:
+            event_type (ProgressEventType): the event type
+            message (str): human readable description of the event
+            done (int, optional): number of items of the stage done
+            total (int, optional): number of items of the stage
+            progress (float, optional): progress of the build, derived from the stage and
+                done/total by default
+            details: event specific values
+        """
+        if self.listener is None:
+            return
+        if progress is None:
+            start, end = STAGE_PROGRESS[event_type]
+            fraction = min(1.0, done / total) if done is not None and total else 1.0
+            progress = start + (end - start) * fraction
+        stage_done = done is None or total is None or done >= total
+        with self.__lock:
+            now = time.monotonic()
+            last_emit_time = self.__last_emit_times.get(event_type)
+            if (
+                not stage_done
+                and last_emit_time is not None
+                and now - last_emit_time < self.min_interval_seconds
+            ):
+                self.progress = max(self.progress, progress)
+                return
+            self.__last_emit_times[event_type] = now
+            self.progress = max(self.progress, progress)
+            event = ProgressEvent(
+                event_type=event_type,
+                progress=round(self.progress, 4),
+                message=message,
+                done=done,
+                total=total,
+                details=details,
+            )
+            # under the lock so that the listener receives the events in order
+            try:
+                self.listener(event)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error(f"AnalyticsDatacube: progress listener failed: {exc}")
+
+
+def print_progress_line(event: ProgressEvent):
+    """
+    Show the progress of a build as a single line rewritten on the standard error.
+
+    Args:
+        event (ProgressEvent): the progress event
+    """
+    line = f"\r[{event.progress:4.0%}] {event.message}"
+    end = "\n" if event.event_type == ProgressEventType.COMPLETED else ""
+    sys.stderr.write(f"{line:<100}{end}")
+    sys.stderr.flush()
@@ -0,0 +1,31 @@
+"""Available progress event types"""
+
+from enum import Enum
+
+
+class ProgressEventType(Enum):
+    """
+    Available progress event types of a datacube build
+
+    STARTED: the build started
+    CACHE_HIT: the result of an identical request is returned from the result cache
+    INDICATOR_FETCHED: the time series of an indicator was fetched (done/total fetches)
+    INDICATOR_FAILED: the time series of an indicator could not be fetched (done/total fetches)
+    TILE_BUILT: the datacube of a tile was built (done/total tiles)
+    MERGE_DONE: the indicator datasets were merged into the datacube
+    CHUNKS_WRITTEN: zarr regions were written (done/total regions)
+    BYTES_UPLOADED: objects were uploaded to the cloud storage (done/total bytes)
+    FIELD_DONE: a field of a batch was processed (done/total fields)
+    COMPLETED: the build is over
+    """
+
+    STARTED = "STARTED"
+    CACHE_HIT = "CACHE_HIT"
+    INDICATOR_FETCHED = "INDICATOR_FETCHED"
+    INDICATOR_FAILED = "INDICATOR_FAILED"
+    TILE_BUILT = "TILE_BUILT"
+    MERGE_DONE = "MERGE_DONE"
+    CHUNKS_WRITTEN = "CHUNKS_WRITTEN"
+    BYTES_UPLOADED = "BYTES_UPLOADED"
+    FIELD_DONE = "FIELD_DONE"
+    COMPLETED = "COMPLETED"
@@ -0,0 +1,415 @@
+"""Result cache of already generated datacubes"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from byoa.telemetry.log_manager.log_manager import LogManager
+from shapely import wkt
+
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.fetch_policy import get_backoff_seconds
+from analytics_datacube_processor.utils import (
+    convert_to_wkt,
+    get_azure_container_client,
+    get_s3_client,
+    storage_link_exists,
+)
+
+logger = LogManager.get_instance()
+
+RESULT_CACHE_MANIFEST_NAME = "analytics-datacube-result-cache.json"
+
+# attempts of a conditional write of the cloud index, updated concurrently by other processes
+MAX_INDEX_UPDATE_ATTEMPTS = 5
+INDEX_UPDATE_BACKOFF_SECONDS = 0.05
+INDEX_UPDATE_BACKOFF_MAX_SECONDS = 1.0
+
+# error codes of a conditional write refused because the index changed
+S3_CONFLICT_ERROR_CODES = ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+def get_request_cache_key(
+    input_data: dict,
+    cloud_storage_provider: CloudStorageProvider,
+    aws_s3_bucket: Optional[str] = None,
+    entity_id: Optional[str] = None,
+) -> str:
+    """
+    Build a canonical hash of a datacube request: the normalized WKT geometry, the dates,
+    the sorted indicators, the storage destination, the entity id and any other input option.
+
+    Args:
+        input_data (dict): dict of input data
+        cloud_storage_provider (CloudStorageProvider): The cloud storage provider (AWS or Azure).
+        aws_s3_bucket (str, optional): The AWS S3 bucket name.
+        entity_id (str, optional): the entity id prefixing the output name
+
+    Returns:
+        str: the sha256 hex digest of the request
+    """
+    parameters = input_data["parameters"]
+    geometry = wkt.loads(convert_to_wkt(parameters["polygon"])).normalize()
+    if cloud_storage_provider == CloudStorageProvider.AWS and aws_s3_bucket is None:
+        aws_s3_bucket = os.getenv("AWS_BUCKET_NAME")
+
+    canonical_request = {
+        "polygon": wkt.dumps(geometry, rounding_precision=8),
+        "startDate": datetime.fromisoformat(parameters["startDate"]).isoformat(),
+        "endDate": datetime.fromisoformat(parameters["endDate"]).isoformat(),
+        "indicators": sorted(set(input_data["indicators"])),
+        "cloud_storage_provider": cloud_storage_provider.value,
+        "aws_s3_bucket": (
+            aws_s3_bucket if cloud_storage_provider == CloudStorageProvider.AWS else None
+        ),
+        "entity_id": entity_id,
+        "options": {
+            key: value
+            for key, value in input_data.items()
+            if key not in ("parameters", "indicators") and value is not None
+        },
+    }
+    return hashlib.sha256(
+        json.dumps(canonical_request, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def is_cacheable_request(input_data: dict) -> bool:
+    """
+    Check that a request only covers past days: the scenes of a request ending today or later
+    can still be acquired, so the datacube of the same request would change.
+
+    Args:
+        input_data (dict): dict of input data
+
+    Returns:
+        bool: True if the datacube of the request can be cached
+    """
+    end_date = datetime.fromisoformat(input_data["parameters"]["endDate"]).date()
+    return end_date < datetime.now(timezone.utc).date()
+
+
+class ResultCacheBackend(ABC):
+    """Storage of the result cache index: {key: {"storage_links", "created_at", "last_access"}}"""
+
+    @abstractmethod
+    def load_index(self) -> dict:
+        """Load the cache index"""
+
+    @abstractmethod
+    def save_index(self, index: dict):
+        """Save the cache index"""
+
+    def update_index(self, update: Callable[[dict], Optional[dict]]):
+        """
+        Update the cache index, read then written by the calling process (the ResultCache
+        serializes its updates).
+
+        Args:
+            update (Callable): receives the index and returns the updated index, or None to
+                leave it unchanged
+        """
+        index = update(self.load_index())
+        if index is not None:
+            self.save_index(index)
+
+
+class LocalResultCacheBackend(ResultCacheBackend):
+    """
+    Result cache index stored as a json file on the local disk
+
+    Parameters:
+        path: path of the json index file
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(tempfile.gettempdir(), RESULT_CACHE_MANIFEST_NAME)
+
+    def load_index(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def save_index(self, index: dict):
+        # write then rename, so a concurrent reader never sees a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(tmp_path, self.path)
+
+
+class CloudStorageResultCacheBackend(ResultCacheBackend):
+    """
+    Result cache index stored as a manifest object in the cloud storage
+
+    Parameters:
+        cloud_storage_provider: AWS S3/Azure Blob Storage
+        aws_s3_bucket: AWS S3 bucket name, required only for AWS
+        manifest_name: name of the manifest object
+    """
+
+    def __init__(
+        self,
+        cloud_storage_provider: CloudStorageProvider,
+        aws_s3_bucket: Optional[str] = None,
+        manifest_name: str = RESULT_CACHE_MANIFEST_NAME,
+    ):
+        if cloud_storage_provider == CloudStorageProvider.AWS and aws_s3_bucket is None:
+            aws_s3_bucket = os.getenv("AWS_BUCKET_NAME")
+        self.cloud_storage_provider = cloud_storage_provider
+        self.aws_s3_bucket = aws_s3_bucket
+        self.manifest_name = manifest_name
+
+    def load_index(self) -> dict:
+        return self._load_versioned_index()[0]
+
+    def save_index(self, index: dict):
+        body = json.dumps(index).encode("utf-8")
+        if self.cloud_storage_provider == CloudStorageProvider.AWS:
+            get_s3_client().put_object(
+                Bucket=self.aws_s3_bucket, Key=self.manifest_name, Body=body
+            )
+        else:
+            get_azure_container_client().upload_blob(self.manifest_name, body, overwrite=True)
+
+    def update_index(self, update: Callable[[dict], Optional[dict]]):
+        """
+        Update the manifest with a conditional write: the manifest is only replaced if it has
+        not changed (ETag) since it was read, otherwise it is read and updated again, so that
+        the updates of the concurrent processes are not lost.
+
+        Args:
+            update (Callable): receives the index and returns the updated index, or None to
+                leave it unchanged
+
+        Raises:
+            RuntimeError: when the manifest keeps changing between its read and its write
+        """
+        for attempt in range(MAX_INDEX_UPDATE_ATTEMPTS):
+            index, etag = self._load_versioned_index()
+            index = update(index)
+            if index is None or self._save_versioned_index(index, etag):
+                return
+            time.sleep(
+                get_backoff_seconds(
+                    attempt, INDEX_UPDATE_BACKOFF_SECONDS, INDEX_UPDATE_BACKOFF_MAX_SECONDS
+                )
+            )
+        raise RuntimeError(
+            f"The result cache manifest {self.manifest_name} was updated concurrently "
+            f"{MAX_INDEX_UPDATE_ATTEMPTS} times"
+        )
+
+    def _load_versioned_index(self) -> Tuple[dict, Optional[str]]:
+        """load the manifest and its ETag, None if there is no manifest yet"""
+        if self.cloud_storage_provider == CloudStorageProvider.AWS:
+            s3_client = get_s3_client()
+            try:
+                response = s3_client.get_object(Bucket=self.aws_s3_bucket, Key=self.manifest_name)
+            except s3_client.exceptions.NoSuchKey:
+                return {}, None
+            return json.loads(response["Body"].read()), response["ETag"]
+
+        # the Azure SDK is only imported by the Azure storage paths
+        from azure.core.exceptions import (  # pylint: disable=import-outside-toplevel
+            ResourceNotFoundError,
+        )
+
+        try:
+            blob = get_azure_container_client().download_blob(self.manifest_name)
+        except ResourceNotFoundError:
+            return {}, None
+        return json.loads(blob.readall()), blob.properties.etag
+
+    def _save_versioned_index(self, index: dict, etag: Optional[str]) -> bool:
+        """write the manifest if it is still at the ETag (absent if None), False otherwise"""
+        body = json.dumps(index).encode("utf-8")
+        if self.cloud_storage_provider == CloudStorageProvider.AWS:
+            s3_client = get_s3_client()
+            condition = {"IfMatch": etag} if etag is not None else {"IfNoneMatch": "*"}
+            try:
+                s3_client.put_object(
+                    Bucket=self.aws_s3_bucket, Key=self.manifest_name, Body=body, **condition
+                )
+            except s3_client.exceptions.ClientError as exc:
+                if exc.response["Error"]["Code"] in S3_CONFLICT_ERROR_CODES:
+                    return False
+                raise
+            return True
+
+        # pylint: disable=import-outside-toplevel
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+        try:
+            if etag is None:
+                get_azure_container_client().upload_blob(self.manifest_name, body)
+            else:
+                get_azure_container_client().upload_blob(
+                    self.manifest_name,
+                    body,
+                    overwrite=True,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified,
+                )
+        except (ResourceExistsError, ResourceModifiedError):
+            return False
+        return True
+
+
+class ResultCache:
+    """
+    Content-addressed cache of the storage links of already generated datacubes,
+    with TTL and LRU eviction. The index is only written by put and invalidate: the accesses
+    of the cache hits are kept in memory and merged into the index on the next put. The
+    processor only caches the requests of past days (see is_cacheable_request).
+
+    Parameters:
+        backend: storage of the cache index
+        ttl_seconds: optional time to live of an entry
+        max_entries: optional maximum number of entries, the least recently used are evicted
+    """
+
+    def __init__(
+        self,
+        backend: ResultCacheBackend,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # last access time of the keys hit since the last put
+        self._last_access = {}
+
+    def _is_expired(self, entry: dict, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get the storage link of a cached result. The entries whose output no longer exists
+        (e.g. deleted by a lifecycle rule) are misses.
+
+        Args:
+            key (str): the request cache key
+
+        Returns:
+            str: the storage link, or None on a cache miss
+        """
+        with self._lock:
+            entry = self.backend.load_index().get(key)
+        now = time.time()
+        if entry is None or self._is_expired(entry, now):
+            return None
+        if not storage_link_exists(entry["storage_links"]):
+            logger.info(
+                f"AnalyticsDatacube: cached datacube {entry['storage_links']} no longer exists"
+            )
+            return None
+        with self._lock:
+            self._last_access[key] = now
+        return entry["storage_links"]
+
+    def put(self, key: str, storage_links: str):
+        """
+        Store the storage link of a generated datacube, evicting expired and least recently
+        used entries.
+
+        Args:
+            key (str): the request cache key
+            storage_links (str): the storage link of the datacube
+        """
+        with self._lock:
+            last_access = dict(self._last_access)
+            now = time.time()
+
+            def add_entry(index: dict) -> dict:
+                for accessed_key, accessed_at in last_access.items():
+                    if accessed_key in index:
+                        index[accessed_key]["last_access"] = max(
+                            index[accessed_key]["last_access"], accessed_at
+                        )
+                index[key] = {
+                    "storage_links": storage_links,
+                    "created_at": now,
+                    "last_access": now,
+                }
+                index = {
+                    entry_key: entry
+                    for entry_key, entry in index.items()
+                    if not self._is_expired(entry, now)
+                }
+                if self.max_entries is not None and len(index) > self.max_entries:
+                    most_recent = sorted(
+                        index.items(), key=lambda item: item[1]["last_access"], reverse=True
+                    )
+                    index = dict(most_recent[: self.max_entries])
+                return index
+
+            self.backend.update_index(add_entry)
+            for accessed_key in last_access:
+                self._last_access.pop(accessed_key, None)
+
+    def invalidate(self, storage_links: str):
+        """
+        Remove the entries of a datacube which changed, e.g. after an append of new dates.
+
+        Args:
+            storage_links (str): the storage link of the datacube
+        """
+        stale_keys = []
+
+        def remove_entries(index: dict) -> Optional[dict]:
+            stale_keys[:] = [
+                key for key, entry in index.items() if entry["storage_links"] == storage_links
+            ]
+            if not stale_keys:
+                return None
+            return {key: entry for key, entry in index.items() if key not in stale_keys}
+
+        with self._lock:
+            self.backend.update_index(remove_entries)
+            if not stale_keys:
+                return
+            for key in stale_keys:
+                self._last_access.pop(key, None)
+            logger.info(
+                f"AnalyticsDatacube: {len(stale_keys)} result cache entries of {storage_links} "
+                "invalidated"
+            )
+
+
+def get_result_cache_from_env() -> Optional[ResultCache]:
+    """
+    Build the result cache configured by the environment variables:
+    RESULT_CACHE_BACKEND (LOCAL, AWS_S3 or AZURE_BLOB_STORAGE, disabled if not set),
+    RESULT_CACHE_PATH (LOCAL index path), RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES.
+
+    Returns:
+        ResultCache or None if no backend is configured
+    """
+    backend_name = os.getenv("RESULT_CACHE_BACKEND")
+    if not backend_name:
+        return None
+
+    if backend_name == "LOCAL":
+        backend = LocalResultCacheBackend(os.getenv("RESULT_CACHE_PATH"))
+    else:
+        backend = CloudStorageResultCacheBackend(CloudStorageProvider(backend_name))
+
+    ttl_seconds = os.getenv("RESULT_CACHE_TTL_SECONDS")
+    max_entries = os.getenv("RESULT_CACHE_MAX_ENTRIES")
+    logger.info(f"AnalyticsDatacube: result cache enabled ({backend_name})")
+    return ResultCache(
+        backend,
+        ttl_seconds=float(ttl_seconds) if ttl_seconds else None,
+        max_entries=int(max_entries) if max_entries else None,
+    )
@@ -0,0 +1,267 @@
+"""Spatial tiling of large areas of interest"""
+
+import math
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+from pyproj import Geod
+from shapely import wkt
+from shapely.geometry import box
+
+from analytics_datacube_processor.cancellation import CancellationToken
+from analytics_datacube_processor.checkpoint import JobCheckpoint, get_region_key
+from analytics_datacube_processor.datacube_merge import (
+    get_coord_values,
+    get_union_indexes,
+    merge_non_index_coords,
+)
+from analytics_datacube_processor.zarr_encoding import ENCODING_PROFILES, get_zarr_encoding
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+
+logger = LogManager.get_instance()
+
+# ground resolution of the finest collection (Sentinel-2)
+DEFAULT_RESOLUTION_M = 10.0
+
+# tile side of 512 pixels at the Sentinel-2 resolution
+DEFAULT_TILE_SIZE_M = 5120.0
+
+# length of a degree of latitude
+METERS_PER_DEGREE = 111_320.0
+
+_GEOD = Geod(ellps="WGS84")
+
+
+def estimate_pixels(geometry: str, resolution_m: float = DEFAULT_RESOLUTION_M) -> int:
+    """
+    Estimate the number of pixels of an image of the area of interest,
+    the rasters covering the bounding box of the geometry.
+
+    Args:
+        geometry (str): WKT geometry (WGS84)
+        resolution_m (float): ground resolution in meters
+
+    Returns:
+        int: the number of pixels
+    """
+    bbox = box(*wkt.loads(geometry).bounds)
+    area, _ = _GEOD.geometry_area_perimeter(bbox)
+    return math.ceil(abs(area) / resolution_m**2)
+
+
+def get_tile_size_m(
+    tile_size_m: float, max_pixels_per_tile: int, resolution_m: float = DEFAULT_RESOLUTION_M
+) -> float:
+    """
+    Get the tile side in meters, reduced so that a tile does not exceed the pixels threshold.
+
+    Args:
+        tile_size_m (float): requested tile side in meters
+        max_pixels_per_tile (int): maximum number of pixels of a tile
+        resolution_m (float): ground resolution in meters
+
+    Returns:
+        float: the tile side in meters
+    """
+    return min(tile_size_m, math.sqrt(max_pixels_per_tile) * resolution_m)
+
+
+def split_geometry(geometry: str, tile_size_m: float) -> List[str]:
+    """
+    Split the bounding box of a geometry into a grid of square tiles, clipped to the geometry.
+    The tiles not intersecting the geometry are dropped, and a tile clipped into several parts
+    gives one tile per part.
+
+    Args:
+        geometry (str): WKT geometry (WGS84)
+        tile_size_m (float): tile side in meters
+
+    Returns:
+        List[str]: WKT geometries of the tiles, row by row from the south west corner
+    """
+    if tile_size_m <= 0:
+        raise ValueError("tile_size_m must be greater than 0")
+    shape = wkt.loads(geometry)
+    min_x, min_y, max_x, max_y = shape.bounds
+
+    # tile side in degrees at the center of the geometry
+    latitude = math.radians((min_y + max_y) / 2)
+    tile_height = tile_size_m / METERS_PER_DEGREE
+    tile_width = tile_size_m / (METERS_PER_DEGREE * max(math.cos(latitude), 1e-6))
+
+    tiles = []
+    for row in range(max(1, math.ceil((max_y - min_y) / tile_height))):
+        for column in range(max(1, math.ceil((max_x - min_x) / tile_width))):
+            tile_box = box(
+                min_x + column * tile_width,
+                min_y + row * tile_height,
+                min(max_x, min_x + (column + 1) * tile_width),
+                min(max_y, min_y + (row + 1) * tile_height),
+            )
+            tile = shape.intersection(tile_box)
+            parts = getattr(tile, "geoms", [tile])
+            tiles.extend(part.wkt for part in parts if part.geom_type == "Polygon" and part.area)
+    return tiles
+
+
+def _get_region(tile: xarray.Dataset, union_indexes) -> Dict[str, slice]:
+    """window of the tile in the union of the coordinates"""
+    region = {}
+    for dim, index in tile.indexes.items():
+        positions = union_indexes[dim].get_indexer(index)
+        region[dim] = slice(int(positions.min()), int(positions.max()) + 1)
+    return region
+
+
+def _overlaps(region: Dict[str, slice], other: Dict[str, slice]) -> bool:
+    return all(
+        region[dim].start < other[dim].stop and other[dim].start < region[dim].stop
+        for dim in region
+        if dim in other
+    )
+
+
+def _get_max_abs_values(tiles: List[xarray.Dataset]) -> Dict[str, float]:
+    """maximum absolute value of the variables over all the tiles"""
+    max_abs_values = {}
+    for tile in tiles:
+        for name, variable in tile.data_vars.items():
+            max_abs_values[name] = float(
+                np.fmax(max_abs_values.get(name, np.nan), abs(variable).max(skipna=True))
+            )
+    return max_abs_values
+
+
+def write_tiles_to_zarr(
+    tile_stores: List[str],
+    store,
+    storage_options: Optional[dict] = None,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    attrs: Optional[dict] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+):
+    """
+    Assemble the zarr of the tiles into a single zarr store.
+    The store is initialized on the union of the time axis and of the grids of the tiles,
+    then each tile is written, one at a time, into its region of the store. Where tiles overlap
+    (e.g. the pixels on their border) the values already written are kept in place of NaN.
+    With a checkpoint, a resumed job keeps the store of its previous run and only writes the
+    tiles that were not written.
+
+    Args:
+        tile_stores (List[str]): local zarr paths of the tiles
+        store: zarr store (local path or fsspec url)
+        storage_options (dict, optional): fsspec options of a remote store
+        encoding_profile (ZarrEncodingProfile, optional): chunks, compression and dtype profile
+        zarr_layout (ZarrLayout, optional): one object per chunk, or chunks packed in shards
+        attrs (dict, optional): attributes of the datacube
+        progress_callback (Callable, optional): called with the number of tiles written and
+            their total
+        cancellation_token (CancellationToken, optional): checked before each tile write
+        checkpoint (JobCheckpoint, optional): records the written tiles
+
+    Raises:
+        JobCancelledError: when the build is cancelled
+    """
+    # the partial store of an interrupted run without written tiles is overwritten
+    mode = "w" if checkpoint is not None else None
+    tiles = [xarray.open_zarr(tile_store) for tile_store in tile_stores]
+    tiles = [tile for tile in tiles if tile.data_vars]
+    if not tiles:
+        xarray.Dataset(attrs=attrs).to_zarr(
+            store, mode=mode, storage_options=storage_options, consolidated=True
+        )
+        return
+
+    union_indexes = get_union_indexes(tiles)
+    coords = {dim: get_coord_values(index) for dim, index in union_indexes.items()}
+    coords.update(merge_non_index_coords(tiles, union_indexes))
+    template_attrs = {}
+    for tile in tiles:
+        for name, value in tile.attrs.items():
+            template_attrs.setdefault(name, value)
+    template_attrs.update(attrs or {})
+
+    # lazy template of the datacube, only its metadata and coordinates are written
+    import dask.array  # pylint: disable=import-outside-toplevel
+
+    data_vars = {}
+    for tile in tiles:
+        for name, variable in tile.data_vars.items():
+            if name not in data_vars:
+                shape = tuple(
+                    len(union_indexes[dim]) if dim in union_indexes else variable.sizes[dim]
+                    for dim in variable.dims
+                )
+                data_vars[name] = xarray.Variable(
+                    variable.dims,
+                    dask.array.full(shape, np.nan, dtype=variable.dtype, chunks=-1),
+                    attrs=variable.attrs,
+                )
+    template = xarray.Dataset(data_vars=data_vars, coords=coords, attrs=template_attrs)
+
+    settings = ENCODING_PROFILES.get(encoding_profile)
+    max_abs_values = (
+        _get_max_abs_values(tiles) if settings is not None and settings.dtype == "int16" else None
+    )
+    encoding = get_zarr_encoding(
+        template, encoding_profile, zarr_layout=zarr_layout, max_abs_values=max_abs_values
+    )
+    if not encoding:
+        # the template would be written as a single chunk: use the chunks of the sharded
+        # layout, which are aligned with the tile windows
+        encoding = {
+            name: {"chunks": variable_encoding["chunks"]}
+            for name, variable_encoding in get_zarr_encoding(
+                template, encoding_profile, zarr_layout=ZarrLayout.SHARDED
+            ).items()
+        }
+    for name, variable_encoding in encoding.items():
+        chunks = variable_encoding.get("shards") or variable_encoding["chunks"]
+        template[name] = template[name].chunk(dict(zip(template[name].dims, chunks)))
+    if checkpoint is None or not checkpoint.has_written_regions:
+        template.to_zarr(
+            store,
+            mode=mode,
+            storage_options=storage_options,
+            encoding=encoding,
+            compute=False,
+            consolidated=True,
+        )
+
+    written_regions = []
+    for index, tile in enumerate(tiles):
+        region = _get_region(tile, union_indexes)
+        region_key = get_region_key(region)
+        if checkpoint is not None and checkpoint.is_region_written(region_key):
+            written_regions.append(region)
+            if progress_callback is not None:
+                progress_callback(index + 1, len(tiles))
+            continue
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+        data = (
+            tile.reset_coords(drop=True)
+            .reindex({dim: union_indexes[dim][window] for dim, window in region.items()})
+            .load()
+        )
+        if any(_overlaps(region, written_region) for written_region in written_regions):
+            existing = xarray.open_zarr(store, storage_options=storage_options)[
+                list(data.data_vars)
+            ].isel(region)
+            data = data.fillna(existing.reset_coords(drop=True).load())
+        data.drop_vars(list(data.coords)).to_zarr(
+            store, storage_options=storage_options, region=region, mode="r+"
+        )
+        written_regions.append(region)
+        if checkpoint is not None:
+            checkpoint.record_region(region_key)
+        logger.info(f"AnalyticsDatacube: tile {index + 1}/{len(tiles)} written")
+        if progress_callback is not None:
+            progress_callback(index + 1, len(tiles))
@@ -0,0 +1,127 @@
+"""Prometheus instrumentation of the datacube processor"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import psutil
+from byoa.telemetry.log_manager.log_manager import LogManager
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logger = LogManager.get_instance()
+
+# port scraped by prometheus (see prometheus.yml)
+DEFAULT_METRICS_PORT = 9000
+
+# processing stages of a datacube build
+CLIENT_SETUP_STAGE = "client_setup"
+CREDENTIAL_CHECK_STAGE = "credential_check"
+FETCH_STAGE = "fetch"
+MERGE_STAGE = "merge"
+COMPOSITE_STAGE = "composite"
+TILE_ASSEMBLY_STAGE = "tile_assembly"
+LOAD_STAGE = "load"
+ZARR_ENCODE_STAGE = "zarr_encode"
+ZONAL_STATISTICS_STAGE = "zonal_statistics"
+UPLOAD_STAGE = "upload"
+CLEANUP_STAGE = "cleanup"
+
+STAGE_DURATION = Histogram(
+    "analytics_datacube_stage_duration_seconds",
+    "Duration of the datacube build stages",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+INDICATORS_FETCHED = Counter(
+    "analytics_datacube_indicators_fetched_total",
+    "Number of indicator time series fetched from Geosys",
+    ["indicator"],
+)
+INDICATORS_FAILED = Counter(
+    "analytics_datacube_indicators_failed_total",
+    "Number of indicator time series that could not be fetched",
+    ["indicator"],
+)
+FETCH_RETRIES = Counter(
+    "analytics_datacube_fetch_retries_total",
+    "Number of indicator fetches retried after a transient Geosys failure",
+)
+BYTES_WRITTEN = Counter(
+    "analytics_datacube_bytes_written_total", "Number of zarr bytes written on the local disk"
+)
+BYTES_UPLOADED = Counter(
+    "analytics_datacube_bytes_uploaded_total",
+    "Number of zarr bytes uploaded to the cloud storage",
+)
+GEOSYS_CLIENTS = Counter(
+    "analytics_datacube_geosys_clients_total",
+    "Number of Geosys clients requested from the client pool, by pool hit or miss",
+    ["result"],
+)
+JOBS_IN_FLIGHT = Gauge(
+    "analytics_datacube_jobs_in_flight", "Number of datacube builds currently running"
+)
+CIRCUIT_BREAKER_OPEN = Gauge(
+    "analytics_datacube_circuit_breaker_open",
+    "Whether the Geosys fetches are suspended by the circuit breaker (1) or not (0)",
+)
+ADMITTED_MEMORY = Gauge(
+    "analytics_datacube_admitted_memory_mb",
+    "Sum of the memory estimates of the datacube builds admitted by the admission controller",
+)
+ADMISSION_REJECTED = Counter(
+    "analytics_datacube_admission_rejected_total",
+    "Number of datacube builds rejected for lack of memory",
+)
+RESIDENT_MEMORY = Gauge(
+    "analytics_datacube_resident_memory_bytes", "Resident memory size of the process"
+)
+RESIDENT_MEMORY.set_function(lambda: psutil.Process().memory_info().rss)
+
+_server_lock = threading.Lock()
+_server_started = False
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Observe the duration of a stage in the stage histogram, even if the stage fails.
+
+    Args:
+        stage (str): the stage name
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - start_time)
+
+
+def start_metrics_server(port: Optional[int] = None) -> bool:
+    """
+    Serve the metrics on the port scraped by prometheus (METRICS_PORT env variable,
+    default 9000). The server is started once per process.
+
+    Args:
+        port (int, optional): the port, overrides the METRICS_PORT env variable
+
+    Returns:
+        bool: True if the metrics server is running
+    """
+    global _server_started  # pylint: disable=global-statement
+    with _server_lock:
+        if _server_started:
+            return True
+        if port is None:
+            port = int(os.getenv("METRICS_PORT", str(DEFAULT_METRICS_PORT)))
+        try:
+            start_http_server(port)
+        except OSError as exc:
+            # e.g. another worker process of the API already serves the metrics
+            logger.error(f"AnalyticsDatacube: cannot serve the metrics on port {port}: {exc}")
+            return False
+        _server_started = True
+        logger.info(f"AnalyticsDatacube: metrics served on port {port}")
+        return True
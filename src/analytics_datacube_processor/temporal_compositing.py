@@ -0,0 +1,230 @@
+"""Temporal compositing of the datacube: cloudy scenes filtering and temporal reduction"""
+
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+from pandas.tseries.frequencies import to_offset
+
+from analytics_datacube_processor.datacube_merge import get_coord_values
+from analytics_datacube_processor.temporal_reducer import TemporalReducer
+
+logger = LogManager.get_instance()
+
+# calendar periods given with their deprecated pandas aliases (e.g. 1M), labelled by their start
+_CALENDAR_PERIOD = re.compile(r"^(\d*)(M|Q|Y)$")
+
+# coordinate of the compositing period of each scene while grouping
+_PERIOD_COORD = "period"
+
+
+def get_composite_frequency(period: str) -> str:
+    """
+    Get the pandas frequency of a compositing period, the months, quarters and years
+    starting on their first day (e.g. 1M -> 1MS).
+
+    Args:
+        period (str): the compositing period (e.g. 7D, 1W, 1M)
+
+    Raises:
+        ValueError: when the period is not a valid pandas frequency
+
+    Returns:
+        str: the pandas frequency
+    """
+    frequency = _CALENDAR_PERIOD.sub(r"\1\2S", period.strip())
+    try:
+        to_offset(frequency)
+    except ValueError as exc:
+        raise ValueError(f"Invalid compositing period: {period}") from exc
+    return frequency
+
+
+def check_compositing(compositing: Optional[dict]):
+    """
+    Check the compositing options before the datacube is built.
+
+    Args:
+        compositing (dict, optional): the compositing input data
+
+    Raises:
+        ValueError: when the period or the reducer are not valid
+    """
+    if not compositing:
+        return
+    if compositing.get("period"):
+        get_composite_frequency(compositing["period"])
+    reducer = TemporalReducer(compositing.get("reducer") or TemporalReducer.MEAN.value)
+    if reducer == TemporalReducer.PERCENTILE and compositing.get("percentile") is None:
+        raise ValueError("The PERCENTILE reducer requires a percentile")
+
+
+def get_valid_fraction(dataset: xarray.Dataset) -> xarray.DataArray:
+    """
+    Get the fraction of valid pixels of each scene. The fraction is relative to the pixels
+    valid in at least one scene, i.e. the pixels of the area of interest in its bounding box.
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+
+    Returns:
+        xarray.DataArray: the fraction of valid pixels along time
+    """
+    valid = None
+    # the coordinates of the acquisitions are not needed to count the valid pixels
+    for variable in dataset.reset_coords(drop=True).data_vars.values():
+        # a pixel is valid if any band of any indicator has a value
+        variable_valid = variable.notnull().any(
+            dim=[dim for dim in variable.dims if dim not in ("time", "y", "x")]
+        )
+        valid = variable_valid if valid is None else valid | variable_valid
+    nb_pixels = int(valid.any(dim="time").sum())
+    return valid.sum(dim=["y", "x"]) / max(nb_pixels, 1)
+
+
+def filter_scenes(dataset: xarray.Dataset, min_valid_fraction: float) -> xarray.Dataset:
+    """
+    Drop the scenes (e.g. cloudy ones) with a fraction of valid pixels below a threshold.
+    The scenes are selected with a plain numpy mask, the coordinates along time being numpy
+    arrays too (not pandas extension arrays).
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+        min_valid_fraction (float): the minimum fraction (0 to 1) of valid pixels of a scene
+
+    Returns:
+        xarray.Dataset: the datacube of the scenes kept
+    """
+    kept = np.asarray(get_valid_fraction(dataset).values >= min_valid_fraction, dtype=bool)
+    logger.info(
+        f"AnalyticsDatacube: {int(kept.sum())}/{kept.size} scenes with at least "
+        f"{min_valid_fraction:.0%} of valid pixels"
+    )
+    dataset = dataset.assign_coords(
+        {
+            name: (coord.dims, get_coord_values(coord.variable.data), coord.attrs)
+            for name, coord in dataset.coords.items()
+            if name not in dataset.indexes and coord.dims == ("time",)
+        }
+    )
+    return dataset.isel(time=np.flatnonzero(kept))
+
+
+def get_period_starts(times: pd.DatetimeIndex, frequency: str, origin: pd.Timestamp):
+    """
+    Get the start of the compositing period of each time. The periods are anchored on the
+    origin (fixed periods) or on the calendar (weeks, months...), so that they do not depend
+    on the first scene (e.g. of a tile).
+
+    Args:
+        times (pd.DatetimeIndex): the times of the scenes
+        frequency (str): the pandas frequency of the periods
+        origin (pd.Timestamp): the start of the first period
+
+    Returns:
+        pd.DatetimeIndex: the period start of each time
+    """
+    offset = to_offset(frequency)
+    start = offset.rollback(min(origin, times.min()).normalize())
+    period_starts = pd.date_range(start, times.max(), freq=offset)
+    return period_starts[np.searchsorted(period_starts, times, side="right") - 1]
+
+
+def composite(
+    dataset: xarray.Dataset,
+    period: str,
+    reducer: TemporalReducer = TemporalReducer.MEAN,
+    percentile: Optional[float] = None,
+    origin: Optional[pd.Timestamp] = None,
+) -> xarray.Dataset:
+    """
+    Reduce the scenes of each compositing period pixel by pixel, ignoring the missing values.
+    The composites are labelled by the start of their period, the periods without any scene
+    are not in the composite datacube.
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+        period (str): the compositing period (e.g. 7D, 1W, 1M)
+        reducer (TemporalReducer): the temporal reducer
+        percentile (float, optional): the percentile (0 to 100) of the PERCENTILE reducer
+        origin (pd.Timestamp, optional): the start of the first period (e.g. the start date of
+            the request), defaults to the first scene
+
+    Returns:
+        xarray.Dataset: the composite datacube
+    """
+    times = dataset.indexes["time"]
+    period_starts = get_period_starts(
+        times, get_composite_frequency(period), times.min() if origin is None else origin
+    )
+
+    # the coordinates of the acquisitions (image.id, image.sensor...) do not apply to a composite
+    groups = (
+        dataset.drop_vars(
+            [
+                name
+                for name, coord in dataset.coords.items()
+                if name != "time" and "time" in coord.dims
+            ]
+        )
+        .assign_coords({_PERIOD_COORD: ("time", period_starts)})
+        .groupby(_PERIOD_COORD)
+    )
+    if reducer == TemporalReducer.PERCENTILE:
+        composites = groups.quantile(percentile / 100, dim="time", skipna=True).drop_vars(
+            "quantile"
+        )
+    else:
+        composites = getattr(groups, reducer.value.lower())(dim="time", skipna=True)
+    composites = composites.rename({_PERIOD_COORD: "time"}).transpose(*dataset.dims)
+    composites.attrs = {
+        **dataset.attrs,
+        "composite_period": period,
+        "composite_reducer": reducer.value,
+    }
+    if reducer == TemporalReducer.PERCENTILE:
+        composites.attrs["composite_percentile"] = percentile
+    if "crs" in dataset.coords and "time" in dataset.coords["crs"].dims:
+        # the scenes are interpolated on the grid of the first one
+        composites = composites.assign_coords(crs=dataset.coords["crs"].values[0])
+    for name, variable in dataset.data_vars.items():
+        composites[name].attrs = variable.attrs
+    return composites
+
+
+def apply_compositing(
+    dataset: xarray.Dataset, compositing: Optional[dict], origin: Optional[pd.Timestamp] = None
+) -> xarray.Dataset:
+    """
+    Apply the compositing options of the input data to the datacube: the scenes below the
+    valid pixels fraction are dropped, then the remaining ones are reduced by period.
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+        compositing (dict, optional): the compositing input data
+        origin (pd.Timestamp, optional): the start of the first compositing period
+
+    Returns:
+        xarray.Dataset: the datacube to write
+    """
+    if not compositing or not dataset.data_vars or "time" not in dataset.dims:
+        return dataset
+    if compositing.get("min_valid_fraction") is not None:
+        dataset = filter_scenes(dataset, compositing["min_valid_fraction"])
+    if compositing.get("period") and dataset.sizes["time"] > 0:
+        nb_scenes = dataset.sizes["time"]
+        dataset = composite(
+            dataset,
+            compositing["period"],
+            TemporalReducer(compositing.get("reducer") or TemporalReducer.MEAN.value),
+            compositing.get("percentile"),
+            origin,
+        )
+        logger.info(
+            f"AnalyticsDatacube: {nb_scenes} scenes reduced to {dataset.sizes['time']} "
+            f"{compositing['period']} composites"
+        )
+    return dataset
@@ -0,0 +1,21 @@
+"""Available temporal reducers of the composites"""
+
+from enum import Enum
+
+
+class TemporalReducer(Enum):
+    """
+    Available temporal reducers, applied pixel by pixel to the scenes of a compositing period
+
+    MEAN: mean of the valid values
+    MEDIAN: median of the valid values
+    MAX: maximum of the valid values (e.g. max-NDVI composites)
+    MIN: minimum of the valid values
+    PERCENTILE: percentile of the valid values (see the compositing percentile)
+    """
+
+    MEAN = "MEAN"
+    MEDIAN = "MEDIAN"
+    MAX = "MAX"
+    MIN = "MIN"
+    PERCENTILE = "PERCENTILE"
@@ -0,0 +1,330 @@
+"""On-disk cache of the indicator time series fetched from Geosys"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+from shapely import wkt
+
+logger = LogManager.get_instance()
+
+COVERAGE_FILE_NAME = "coverage.json"
+ONE_DAY = timedelta(days=1)
+
+# the acquisitions of the last days may still be ingested by Geosys, so they are refetched
+DEFAULT_RECENT_DAYS = 7
+
+
+def get_uncovered_intervals(
+    intervals: List[List[str]], start_date: datetime, end_date: datetime
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Get the date intervals of a request that are not in covered intervals.
+
+    Args:
+        intervals (list): covered [start_date, end_date] intervals, as isoformat strings
+        start_date (datetime): start date of the request
+        end_date (datetime): end date of the request
+
+    Returns:
+        list: (start_date, end_date) intervals not covered
+    """
+    missing_intervals = []
+    current_date = start_date
+    for interval_start, interval_end in sorted(intervals):
+        interval_start = datetime.fromisoformat(interval_start)
+        interval_end = datetime.fromisoformat(interval_end)
+        if interval_end < current_date:
+            continue
+        if interval_start > end_date:
+            break
+        if interval_start > current_date:
+            missing_intervals.append((current_date, interval_start - ONE_DAY))
+        current_date = max(current_date, interval_end + ONE_DAY)
+    if current_date <= end_date:
+        missing_intervals.append((current_date, end_date))
+    return missing_intervals
+
+
+def get_nb_days(intervals: List[Tuple[datetime, datetime]]) -> int:
+    """number of days of (start_date, end_date) intervals, both included"""
+    return sum((end_date - start_date).days + 1 for start_date, end_date in intervals)
+
+
+def get_tile_key(geometry: str) -> str:
+    """
+    Build the cache key of a geometry: hash of its normalized WKT.
+    Geosys time series are clipped to the requested polygon, so only an identical geometry
+    (e.g. the same field, or the same tile of a tiled request) can reuse the cached arrays.
+
+    Args:
+        geometry (str): WKT geometry
+
+    Returns:
+        str: the tile key
+    """
+    normalized_wkt = wkt.dumps(wkt.loads(geometry).normalize(), rounding_precision=8)
+    return hashlib.sha256(normalized_wkt.encode("utf-8")).hexdigest()[:32]
+
+
+class TileCache:
+    """
+    Local on-disk cache of per-indicator, per-acquisition-date datasets, keyed by geometry tile.
+    Each (indicator, tile) entry records the date intervals already fetched, so a request only
+    fetches the dates it misses. The dates of the last recent_days days are never marked as
+    covered, their acquisitions being possibly not ingested by Geosys yet.
+    Least recently used entries are evicted above the size limit.
+
+    Parameters:
+        cache_dir: cache folder, defaults to a folder in the temporary directory
+        max_size_mb: maximum size of the cache on disk
+        recent_days: number of days before today which are always refetched
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_size_mb: float = 1024,
+        recent_days: int = DEFAULT_RECENT_DAYS,
+    ):
+        self.cache_dir = cache_dir or os.path.join(
+            tempfile.gettempdir(), "analytics-datacube-tile-cache"
+        )
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.recent_days = recent_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, indicator: str, tile_key: str) -> str:
+        return os.path.join(self.cache_dir, indicator.lower(), tile_key)
+
+    def _load_coverage(self, entry_dir: str) -> dict:
+        coverage_path = os.path.join(entry_dir, COVERAGE_FILE_NAME)
+        if not os.path.exists(coverage_path):
+            return {"intervals": [], "last_access": 0}
+        with open(coverage_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _save_coverage(self, entry_dir: str, coverage: dict):
+        os.makedirs(entry_dir, exist_ok=True)
+        with open(os.path.join(entry_dir, COVERAGE_FILE_NAME), "w", encoding="utf-8") as file:
+            json.dump(coverage, file)
+
+    def _get_last_covered_date(self) -> datetime:
+        """last date which can be marked as covered, the more recent ones are refetched"""
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        return today - self.recent_days * ONE_DAY
+
+    def get_missing_intervals(
+        self, indicator: str, tile_key: str, start_date: datetime, end_date: datetime
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Get the date intervals of a request that are not in the cache yet.
+
+        Args:
+            indicator (str): the indicator
+            tile_key (str): the tile key
+            start_date (datetime): start date of the request
+            end_date (datetime): end date of the request
+
+        Returns:
+            list: (start_date, end_date) intervals to fetch from Geosys
+        """
+        with self._lock:
+            coverage = self._load_coverage(self._entry_dir(indicator, tile_key))
+        return get_uncovered_intervals(coverage["intervals"], start_date, end_date)
+
+    def store(
+        self,
+        indicator: str,
+        tile_key: str,
+        dataset: xarray.Dataset,
+        start_date: datetime,
+        end_date: datetime,
+    ):
+        """
+        Store a fetched dataset, one file per acquisition date, and mark its interval as covered,
+        except its recent days.
+
+        Args:
+            indicator (str): the indicator
+            tile_key (str): the tile key
+            dataset (xarray.Dataset): the dataset fetched for the interval (possibly empty)
+            start_date (datetime): start date of the fetched interval
+            end_date (datetime): end date of the fetched interval
+        """
+        entry_dir = self._entry_dir(indicator, tile_key)
+        with self._lock:
+            os.makedirs(entry_dir, exist_ok=True)
+            if "time" in dataset.dims:
+                for index in range(dataset.sizes["time"]):
+                    date_dataset = dataset.isel(time=[index])
+                    date = pd.Timestamp(date_dataset["time"].values[0])
+                    date_dataset.to_netcdf(
+                        os.path.join(entry_dir, f"{date.strftime('%Y%m%dT%H%M%S')}.nc"),
+                        engine="scipy",
+                    )
+
+            coverage = self._load_coverage(entry_dir)
+            covered_end_date = min(end_date, self._get_last_covered_date())
+            if covered_end_date >= start_date:
+                coverage["intervals"].append(
+                    [start_date.isoformat(), covered_end_date.isoformat()]
+                )
+            coverage["last_access"] = time.time()
+            self._save_coverage(entry_dir, coverage)
+            self._evict(keep_entry_dir=entry_dir)
+
+    def load(
+        self, indicator: str, tile_key: str, start_date: datetime, end_date: datetime
+    ) -> Optional[xarray.Dataset]:
+        """
+        Assemble the cached acquisitions of a request.
+
+        Args:
+            indicator (str): the indicator
+            tile_key (str): the tile key
+            start_date (datetime): start date of the request
+            end_date (datetime): end date of the request
+
+        Returns:
+            xarray.Dataset sorted by time (empty if there is no acquisition in the request),
+            or None if the dates of the request are not all in the cache, e.g. the entry was
+            evicted by a concurrent store
+        """
+        entry_dir = self._entry_dir(indicator, tile_key)
+        with self._lock:
+            if not os.path.isdir(entry_dir):
+                return None
+            coverage = self._load_coverage(entry_dir)
+            if get_uncovered_intervals(
+                coverage["intervals"], start_date, min(end_date, self._get_last_covered_date())
+            ):
+                return None
+            datasets = []
+            for file_name in sorted(os.listdir(entry_dir)):
+                if not file_name.endswith(".nc"):
+                    continue
+                date = datetime.strptime(file_name[:-3], "%Y%m%dT%H%M%S")
+                if start_date <= date < end_date + ONE_DAY:
+                    with xarray.open_dataset(
+                        os.path.join(entry_dir, file_name), engine="scipy"
+                    ) as date_dataset:
+                        datasets.append(date_dataset.load())
+
+            coverage["last_access"] = time.time()
+            self._save_coverage(entry_dir, coverage)
+
+        if not datasets:
+            return xarray.Dataset()
+        return xarray.concat(datasets, dim="time", join="outer").sortby("time")
+
+    def get_time_series(
+        self,
+        indicator: str,
+        tile_key: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetch: Callable[[datetime, datetime], xarray.Dataset],
+    ) -> xarray.Dataset:
+        """
+        Get the time series of a request: the missing intervals are fetched and stored, then the
+        request is assembled from the cache. If the entry was evicted in the meantime by a
+        concurrent store, the whole request is a miss and is fetched again.
+
+        Args:
+            indicator (str): the indicator
+            tile_key (str): the tile key
+            start_date (datetime): start date of the request
+            end_date (datetime): end date of the request
+            fetch (Callable): fetches the dataset of a (start_date, end_date) interval
+
+        Returns:
+            xarray.Dataset: the time series of the request
+        """
+        missing_intervals = self.get_missing_intervals(indicator, tile_key, start_date, end_date)
+        for missing_start_date, missing_end_date in missing_intervals:
+            self.store(
+                indicator,
+                tile_key,
+                fetch(missing_start_date, missing_end_date),
+                missing_start_date,
+                missing_end_date,
+            )
+        dataset = self.load(indicator, tile_key, start_date, end_date)
+        if dataset is None:
+            logger.info(f"AnalyticsDatacube: tile cache entry of {indicator} evicted, refetched")
+            missing_intervals = [(start_date, end_date)]
+            dataset = fetch(start_date, end_date)
+
+        nb_missing_days = get_nb_days(missing_intervals)
+        with self._lock:
+            self.misses += nb_missing_days
+            self.hits += get_nb_days([(start_date, end_date)]) - nb_missing_days
+        return dataset
+
+    def _evict(self, keep_entry_dir: str):
+        """remove the least recently used entries (except keep_entry_dir) until the cache
+        fits its size limit"""
+        entries = []
+        total_size = 0
+        for indicator in os.listdir(self.cache_dir):
+            indicator_dir = os.path.join(self.cache_dir, indicator)
+            if not os.path.isdir(indicator_dir):
+                continue
+            for tile_key in os.listdir(indicator_dir):
+                entry_dir = os.path.join(indicator_dir, tile_key)
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, file_name))
+                    for file_name in os.listdir(entry_dir)
+                )
+                total_size += size
+                entries.append((self._load_coverage(entry_dir)["last_access"], size, entry_dir))
+
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            if entry_dir == keep_entry_dir:
+                continue
+            logger.info(f"AnalyticsDatacube: tile cache eviction of {entry_dir}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits (days of the requests served from the cache) and misses (days fetched)
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def get_tile_cache_from_env() -> Optional[TileCache]:
+    """
+    Build the tile cache configured by the environment variables:
+    TILE_CACHE_DIR (disabled if not set), TILE_CACHE_MAX_SIZE_MB (default 1024) and
+    TILE_CACHE_RECENT_DAYS (default 7).
+
+    Returns:
+        TileCache or None if no cache folder is configured
+    """
+    cache_dir = os.getenv("TILE_CACHE_DIR")
+    if not cache_dir:
+        return None
+    return TileCache(
+        cache_dir,
+        float(os.getenv("TILE_CACHE_MAX_SIZE_MB", "1024")),
+        int(os.getenv("TILE_CACHE_RECENT_DAYS", str(DEFAULT_RECENT_DAYS))),
+    )
@@ -1,30 +1,189 @@
 """utils class"""
 
 import json
+import math
 import os
+import re
 import shutil
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
 
+import boto3
+import fsspec
+import numpy as np
 import xarray
-from byoa.cloud_storage import aws_s3, azure_blob_storage
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from byoa.cloud_storage import aws_s3
 from byoa.telemetry.log_manager import log_manager
 from byoa.telemetry.log_manager.log_manager import LogManager
 from shapely import wkt
+from shapely.errors import GEOSException
 from shapely.geometry import shape
 
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.checkpoint import JobCheckpoint, get_region_key
 from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.fetch_policy import (
+    DEFAULT_BACKOFF_MAX_SECONDS,
+    get_backoff_seconds,
+)
+from analytics_datacube_processor.zarr_encoding import get_time_chunk, get_zarr_encoding
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+
+# the Azure SDK is only imported by the Azure storage paths
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient
 
 logger_manager = LogManager.get_instance()
 
 
-def dataset_to_zarr_format(dataset: xarray.Dataset):
+def get_output_name(entity_id: Optional[str] = None, extension: str = "zarr") -> str:
+    """
+    Build the output name: "[entity_id_]Year-Month-Day_Hour-Minute-Second_analytics-datacube.extension"
+
+    Args:
+        entity_id (str, optional): entity id used as prefix
+        extension (str, optional): extension of the output (zarr, parquet, csv)
+
+    Returns:
+        The output name
+    """
+    output_name = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + f"_analytics-datacube.{extension}"
+    if entity_id:
+        output_name = f"{entity_id}_{output_name}"
+    return output_name
+
+
+def get_zarr_name(entity_id: Optional[str] = None) -> str:
+    """
+    Build the zarr output name: "[entity_id_]Year-Month-Day_Hour-Minute-Second_analytics-datacube.zarr"
+
+    Args:
+        entity_id (str, optional): entity id used as prefix
+
+    Returns:
+        The zarr name
+    """
+    return get_output_name(entity_id)
+
+
+def write_dataset_to_zarr(
+    dataset: xarray.Dataset,
+    store,
+    memory_budget_mb: Optional[float] = None,
+    storage_options: Optional[dict] = None,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+):
+    """
+    Write a xarray.Dataset to a zarr store, streamed by time slices if a memory budget is set.
+    The metadata is always consolidated, so that the store is opened with a single read.
+    With a checkpoint, the regions written by a previous run of the job are skipped.
+
+    Args:
+        dataset (xarray.Dataset): the dataset to write
+        store: zarr store (local path or fsspec url)
+        memory_budget_mb (float, optional): memory budget (in MB) of a single write
+        storage_options (dict, optional): fsspec options of a remote store
+        encoding_profile (ZarrEncodingProfile, optional): chunks, compression and dtype profile
+        zarr_layout (ZarrLayout, optional): one object per chunk, or chunks packed in shards
+        progress_callback (Callable, optional): called with the number of zarr regions written
+            and their total
+        cancellation_token (CancellationToken, optional): checked before each region write
+        checkpoint (JobCheckpoint, optional): records the written regions
+
+    Raises:
+        JobCancelledError: when the build is cancelled
+    """
+    if memory_budget_mb is None:
+        _write_whole_dataset(
+            dataset,
+            store,
+            storage_options,
+            encoding_profile,
+            zarr_layout,
+            progress_callback,
+            cancellation_token,
+            checkpoint,
+        )
+    else:
+        write_dataset_by_time_slices(
+            dataset,
+            store,
+            memory_budget_mb,
+            storage_options,
+            encoding_profile,
+            zarr_layout,
+            progress_callback,
+            cancellation_token,
+            checkpoint,
+        )
+
+
+def _write_whole_dataset(
+    dataset: xarray.Dataset,
+    store,
+    storage_options: Optional[dict] = None,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+):
+    """write a dataset to a zarr store at once, as a single checkpointed region"""
+    region_key = get_region_key()
+    if checkpoint is None or not checkpoint.is_region_written(region_key):
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+        dataset.to_zarr(
+            store,
+            # the partial store of an interrupted run is overwritten
+            mode="w" if checkpoint is not None else None,
+            storage_options=storage_options,
+            encoding=get_zarr_encoding(dataset, encoding_profile, zarr_layout=zarr_layout),
+            consolidated=True,
+        )
+        if checkpoint is not None:
+            checkpoint.record_region(region_key)
+    if progress_callback is not None:
+        progress_callback(1, 1)
+
+
+def dataset_to_zarr_format(
+    dataset: xarray.Dataset,
+    memory_budget_mb: Optional[float] = None,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    zarr_path: Optional[str] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+):
     """
     Save a xarray.Dataset as zarr format in a temporary folder.
     Output zarr path : "Year-Month-Day_Hour-Minute-Second_analytics-datacube.zarr"
 
     Args:
         - dataset: the Dataset to save
+        - memory_budget_mb: optional memory budget (in MB) of a single write. When provided,
+          the dataset is written time slice by time slice (see write_dataset_by_time_slices).
+        - encoding_profile: chunks, compression and dtype profile of the zarr
+        - zarr_layout: one object per chunk, or chunks packed in shards
+        - progress_callback: optional callable receiving the number of zarr regions written
+          and their total
+        - zarr_path: optional zarr path replacing the temporary one (e.g. in a job checkpoint)
+        - cancellation_token: optional token checked before each region write
+        - checkpoint: optional job checkpoint recording the written regions
 
     Returns:
         The complete zarr path
@@ -32,17 +191,472 @@ def dataset_to_zarr_format(dataset: xarray.Dataset):
     logger = log_manager.LogManager.get_instance()
 
     # Make a valid path whatever the OS
-    zarr_path = os.path.join(
-        tempfile.gettempdir(),
-        datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + "_analytics-datacube.zarr",
-    )
+    if zarr_path is None:
+        zarr_path = os.path.join(tempfile.gettempdir(), get_zarr_name())
     logger.info("AnalyticsDatacube:save_dataset_to_temporary_zarr: path is " + zarr_path)
 
     # save dataset and return complete zarr path
-    dataset.to_zarr(zarr_path)
+    write_dataset_to_zarr(
+        dataset,
+        zarr_path,
+        memory_budget_mb,
+        encoding_profile=encoding_profile,
+        zarr_layout=zarr_layout,
+        progress_callback=progress_callback,
+        cancellation_token=cancellation_token,
+        checkpoint=checkpoint,
+    )
     return zarr_path
 
 
+def get_cloud_storage_zarr_store(
+    cloud_storage_provider: CloudStorageProvider,
+    zarr_name: str,
+    aws_s3_bucket: Optional[str] = None,
+):
+    """
+    Build the fsspec url and storage options to write a zarr directly on a cloud storage.
+    Local stand-ins (moto, Azurite...) can be targeted with the AWS_ENDPOINT_URL and
+    AZURE_STORAGE_CONNECTION_STRING environment variables.
+
+    Args:
+        cloud_storage_provider (CloudStorageProvider): The cloud storage provider (AWS or Azure).
+        zarr_name (str): The name of the zarr in the bucket/container.
+        aws_s3_bucket (str, optional): The AWS S3 bucket name. Required only if cloud_storage_provider is AWS.
+
+    Returns:
+        tuple: (fsspec url, storage options, storage link)
+    """
+    if cloud_storage_provider == CloudStorageProvider.AWS:
+        if aws_s3_bucket is None:
+            aws_s3_bucket = os.getenv("AWS_BUCKET_NAME")
+        if aws_s3_bucket is None:
+            raise ValueError("No AWS S3 bucket provided")
+        url = f"s3://{aws_s3_bucket}/{zarr_name}"
+        return url, _get_s3_storage_options(), url
+
+    if cloud_storage_provider == CloudStorageProvider.AZURE:
+        from byoa.cloud_storage import (  # pylint: disable=import-outside-toplevel
+            azure_blob_storage,
+        )
+
+        url = f"abfs://{os.getenv('AZURE_BLOB_CONTAINER_NAME')}/{zarr_name}"
+        return (
+            url,
+            _get_azure_storage_options(),
+            azure_blob_storage.get_azure_blob_url_path(zarr_name),
+        )
+
+    raise ValueError(f"Unsupported cloud storage provider: {cloud_storage_provider}")
+
+
+def _get_s3_storage_options() -> dict:
+    """fsspec options of the AWS S3 storage"""
+    if os.getenv("AWS_ENDPOINT_URL"):
+        return {"client_kwargs": {"endpoint_url": os.getenv("AWS_ENDPOINT_URL")}}
+    return {}
+
+
+def _get_azure_storage_options() -> dict:
+    """fsspec options of the Azure Blob Storage"""
+    if os.getenv("AZURE_STORAGE_CONNECTION_STRING"):
+        return {"connection_string": os.getenv("AZURE_STORAGE_CONNECTION_STRING")}
+    return {
+        "account_name": os.getenv("AZURE_ACCOUNT_NAME"),
+        "sas_token": os.getenv("AZURE_SAS_CREDENTIAL"),
+    }
+
+
+def get_zarr_store_from_link(storage_link: str):
+    """
+    Build the fsspec url and storage options of an existing zarr from its storage link
+    (as returned in the output storage_links), or from a local path.
+
+    Args:
+        storage_link (str): s3://bucket/name, https://account.blob.core.windows.net/container/name,
+            abfs://container/name or a local path
+
+    Returns:
+        tuple: (zarr store url or path, storage options)
+    """
+    if storage_link.startswith("s3://"):
+        return storage_link, _get_s3_storage_options()
+    if storage_link.startswith("abfs://"):
+        return storage_link, _get_azure_storage_options()
+    azure_blob_url = re.match(r"https://[^/]+\.blob\.core\.windows\.net/(.+)", storage_link)
+    if azure_blob_url:
+        return f"abfs://{azure_blob_url.group(1)}", _get_azure_storage_options()
+    return storage_link, None
+
+
+def storage_link_exists(storage_link: str) -> bool:
+    """
+    Check that the output of a storage link (zarr, parquet or csv) still exists,
+    e.g. it has not been deleted by a lifecycle rule of the bucket.
+
+    Args:
+        storage_link (str): the storage link, as accepted by get_zarr_store_from_link
+
+    Returns:
+        bool: True if the output exists
+    """
+    store, storage_options = get_zarr_store_from_link(storage_link)
+    filesystem, path = fsspec.core.url_to_fs(store, **(storage_options or {}))
+    return filesystem.exists(path)
+
+
+def is_configured_storage_link(storage_link: str) -> bool:
+    """
+    Check that a storage link points into the configured AWS_BUCKET_NAME bucket or
+    AZURE_BLOB_CONTAINER_NAME container, and not to a local path or another bucket.
+
+    Args:
+        storage_link (str): the storage link, as accepted by get_zarr_store_from_link
+
+    Returns:
+        bool: True if the link is in the configured bucket or container
+    """
+    store, _ = get_zarr_store_from_link(storage_link)
+    roots = []
+    if os.getenv("AWS_BUCKET_NAME"):
+        roots.append(f"s3://{os.getenv('AWS_BUCKET_NAME')}/")
+    if os.getenv("AZURE_BLOB_CONTAINER_NAME"):
+        roots.append(f"abfs://{os.getenv('AZURE_BLOB_CONTAINER_NAME')}/")
+    for root in roots:
+        if store.startswith(root):
+            segments = store[len(root) :].split("/")
+            return bool(segments[0]) and ".." not in segments
+    return False
+
+
+def dataset_to_cloud_storage_zarr(
+    dataset: xarray.Dataset,
+    cloud_storage_provider: CloudStorageProvider,
+    zarr_name: str,
+    aws_s3_bucket: Optional[str] = None,
+    memory_budget_mb: Optional[float] = None,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+):
+    """
+    Write a xarray.Dataset as zarr format directly on the cloud storage provider,
+    without going through a local temporary folder.
+
+    Args:
+        dataset (xarray.Dataset): the Dataset to save
+        cloud_storage_provider (CloudStorageProvider): The cloud storage provider (AWS or Azure).
+        zarr_name (str): The name of the zarr in the bucket/container.
+        aws_s3_bucket (str, optional): The AWS S3 bucket name. Required only if cloud_storage_provider is AWS.
+        memory_budget_mb (float, optional): memory budget (in MB) of a single write
+        encoding_profile (ZarrEncodingProfile, optional): chunks, compression and dtype profile
+        zarr_layout (ZarrLayout, optional): one object per chunk, or chunks packed in shards
+        progress_callback (Callable, optional): called with the number of zarr regions written
+            and their total
+        cancellation_token (CancellationToken, optional): checked before each region write
+        checkpoint (JobCheckpoint, optional): records the written regions
+
+    Raises:
+        JobCancelledError: when the build is cancelled
+
+    Returns:
+        str: the storage link of the zarr
+    """
+    url, storage_options, storage_link = get_cloud_storage_zarr_store(
+        cloud_storage_provider, zarr_name, aws_s3_bucket
+    )
+    logger_manager.info(f"AnalyticsDatacube:dataset_to_cloud_storage_zarr: url is {url}")
+    try:
+        write_dataset_to_zarr(
+            dataset,
+            url,
+            memory_budget_mb,
+            storage_options,
+            encoding_profile,
+            zarr_layout,
+            progress_callback,
+            cancellation_token,
+            checkpoint,
+        )
+    except JobCancelledError:
+        raise
+    except Exception as exc:
+        logger_manager.error(f"Error while writing zarr to {cloud_storage_provider.value}: {exc}")
+        raise RuntimeError(
+            f"Error while writing zarr to {cloud_storage_provider.value}: {exc}"
+        ) from exc
+    logger_manager.info(f"Analytics DataCube written to {cloud_storage_provider.value}")
+    return storage_link
+
+
+def _align_on_existing_variable(
+    variable: xarray.DataArray, existing: xarray.DataArray
+) -> xarray.DataArray:
+    """
+    Lay out a new variable like the variable of an existing zarr: datacubes written before
+    the single band variables lost their band dimension keep the band of every indicator.
+    """
+    if "band" in existing.dims and "band" not in variable.dims:
+        bands = {str(band).lower(): band for band in existing["band"].values}
+        if variable.name.lower() not in bands:
+            raise ValueError(f"The band of {variable.name} is not in the existing datacube")
+        variable = variable.expand_dims(band=[bands[variable.name.lower()]])
+    if "band" in existing.dims:
+        variable = variable.reindex(band=existing["band"].values)
+    return variable.transpose(*existing.dims)
+
+
+def _cast_to_existing_dtype(coord: xarray.DataArray, existing: xarray.DataArray) -> np.ndarray:
+    """
+    Cast the values of a new coordinate to the dtype of the coordinate of an existing zarr
+    (e.g. variable length strings read as numpy StringDType).
+    """
+    values = np.asarray(coord.values)
+    if existing.dtype.kind == "U" and values.astype(str).dtype.itemsize > existing.dtype.itemsize:
+        # fixed width strings would be truncated
+        raise ValueError(
+            f"The values of {coord.name} are longer than the strings of the existing datacube"
+        )
+    return values.astype(existing.dtype)
+
+
+def append_dataset_to_zarr(
+    dataset: xarray.Dataset, store, storage_options: Optional[dict] = None
+) -> int:
+    """
+    Append the time steps of a dataset that are after the last time of an existing zarr,
+    using zarr append semantics along the time dimension. Every variable and coordinate along
+    time of the existing zarr is appended, so that they all keep the same time length.
+
+    Args:
+        dataset (xarray.Dataset): the dataset with the new time steps
+        store: existing zarr store (local path or fsspec url)
+        storage_options (dict, optional): fsspec options of a remote store
+
+    Raises:
+        ValueError: when variables or coordinates of the existing zarr are not in the dataset
+            (e.g. an indicator could not be fetched), or when the band of a variable is not
+            in the existing zarr
+
+    Returns:
+        int: the number of appended time steps
+    """
+    existing = xarray.open_zarr(store, storage_options=storage_options)
+    last_time = np.datetime64(existing["time"].max().values)
+    new_times = np.flatnonzero(dataset.indexes["time"].to_numpy() > last_time)
+    if len(new_times) == 0:
+        return 0
+    dataset = dataset.isel(time=new_times)
+
+    existing_coords = [
+        name
+        for name, coord in existing.coords.items()
+        if name not in existing.indexes and "time" in coord.dims
+    ]
+    missing = [name for name in existing.data_vars if name not in dataset.data_vars] + [
+        name for name in existing_coords if name not in dataset.coords
+    ]
+    if missing:
+        raise ValueError(
+            f"{missing} of the existing datacube are missing from the appended time steps"
+        )
+
+    # align the new slices on the existing grid, layout and dtypes
+    for dim in ("x", "y"):
+        if dim in existing.dims and dim in dataset.dims:
+            tolerance = None
+            if existing.sizes[dim] > 1:
+                tolerance = float(abs(existing[dim].diff(dim)).min()) / 2
+            dataset = dataset.reindex(
+                {dim: existing[dim].values}, method="nearest", tolerance=tolerance
+            )
+    data_vars = {
+        name: _align_on_existing_variable(dataset[name].reset_coords(drop=True), existing[name])
+        for name in existing.data_vars
+    }
+    coords = {
+        name: (existing[name].dims, _cast_to_existing_dtype(dataset[name], existing[name]))
+        for name in existing_coords
+    }
+    coords["time"] = dataset["time"].values
+
+    # appending rewrites the group attributes, keep the existing ones
+    appended = xarray.Dataset(data_vars=data_vars, coords=coords, attrs=dict(existing.attrs))
+    appended.drop_vars([dim for dim in ("x", "y", "band") if dim in appended.coords]).to_zarr(
+        store, append_dim="time", storage_options=storage_options, consolidated=True
+    )
+    return appended.sizes["time"]
+
+
+def get_zarr_store_usage(store, storage_options: Optional[dict] = None) -> Tuple[int, int]:
+    """
+    Measure a zarr store: its number of objects and their total size.
+
+    Args:
+        store: zarr store (local path or fsspec url)
+        storage_options (dict, optional): fsspec options of a remote store
+
+    Returns:
+        tuple: (number of objects, number of bytes)
+    """
+    filesystem, path = fsspec.core.url_to_fs(store, **(storage_options or {}))
+    sizes = filesystem.find(path, detail=True)
+    return len(sizes), sum(int(info.get("size") or 0) for info in sizes.values())
+
+
+def get_time_slice_size(dataset: xarray.Dataset, memory_budget_mb: float) -> int:
+    """
+    Compute the number of time steps that can be written at once within a memory budget.
+
+    Args:
+        dataset (xarray.Dataset): the dataset to write
+        memory_budget_mb (float): the memory budget in MB
+
+    Returns:
+        int: number of time steps per slice (at least 1)
+    """
+    if memory_budget_mb <= 0:
+        raise ValueError("memory_budget_mb must be greater than 0")
+
+    nb_times = dataset.sizes.get("time", 0)
+    if nb_times == 0:
+        return 1
+
+    time_step_bytes = sum(
+        variable.nbytes / nb_times
+        for variable in dataset.variables.values()
+        if "time" in variable.dims
+    )
+    if time_step_bytes == 0:
+        return nb_times
+    return max(1, min(nb_times, int(memory_budget_mb * 1024 * 1024 // time_step_bytes)))
+
+
+def write_dataset_by_time_slices(
+    dataset: xarray.Dataset,
+    store,
+    memory_budget_mb: float,
+    storage_options: Optional[dict] = None,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+):
+    """
+    Stream a dataset into a zarr store, one time slice at a time.
+    The dataset is dask-chunked along time so that each chunk fits the memory budget,
+    the store layout is initialized without computing the data, then each time slice is
+    computed, encoded and written into its region. A lazy dataset (e.g. the time series spilled
+    by the processor) is only computed slice by slice, keeping peak memory bounded by the slice
+    size.
+    The slices are aligned on the zarr chunks along time: the slice size is rounded down to a
+    multiple of the profile time chunk, or the time chunk is reduced to the slice size.
+    In the sharded layout, each time slice is a shard.
+    With a checkpoint, a resumed job keeps the store of its previous run and only writes the
+    time slices that were not written.
+
+    Args:
+        dataset (xarray.Dataset): the dataset to write
+        store: zarr store (local path or mapping)
+        memory_budget_mb (float): the memory budget in MB of a single slice
+        storage_options (dict, optional): fsspec options of a remote store
+        encoding_profile (ZarrEncodingProfile, optional): chunks, compression and dtype profile
+        zarr_layout (ZarrLayout, optional): one object per chunk, or chunks packed in shards
+        progress_callback (Callable, optional): called with the number of zarr regions written
+            and their total
+        cancellation_token (CancellationToken, optional): checked before each time slice
+        checkpoint (JobCheckpoint, optional): records the written time slices
+
+    Raises:
+        JobCancelledError: when the build is cancelled
+    """
+    if "time" not in dataset.dims:
+        _write_whole_dataset(
+            dataset,
+            store,
+            storage_options,
+            encoding_profile,
+            zarr_layout,
+            progress_callback,
+            cancellation_token,
+            checkpoint,
+        )
+        return
+
+    slice_size = get_time_slice_size(dataset, memory_budget_mb)
+    time_chunk = get_time_chunk(dataset, encoding_profile, zarr_layout)
+    if time_chunk is not None:
+        if time_chunk >= slice_size:
+            time_chunk = slice_size
+        else:
+            slice_size = slice_size // time_chunk * time_chunk
+    # only the data variables along time are computed slice by slice, the coordinates (e.g.
+    # image.id along time) and the other variables are small: computed and written whole with
+    # the metadata
+    dataset = dataset.assign(
+        {
+            name: (
+                variable.chunk({"time": slice_size})
+                if "time" in variable.dims
+                else variable.compute()
+            )
+            for name, variable in dataset.data_vars.items()
+        }
+    )
+    dataset = dataset.assign_coords(
+        {
+            name: coord.compute()
+            for name, coord in dataset.coords.items()
+            if name not in dataset.indexes and coord.chunks is not None
+        }
+    )
+
+    # Write metadata (consolidated, the regions below do not change it) and coordinates only,
+    # already written by the previous run of a resumed job
+    if checkpoint is None or not checkpoint.has_written_regions:
+        dataset.to_zarr(
+            store,
+            compute=False,
+            mode="w" if checkpoint is not None else None,
+            storage_options=storage_options,
+            encoding=get_zarr_encoding(
+                dataset, encoding_profile, time_chunk, zarr_layout, time_shard=slice_size
+            ),
+            consolidated=True,
+        )
+
+    # The coordinates and the variables without the time dimension are already written
+    region_dataset = dataset.drop_vars(
+        [
+            name
+            for name, variable in dataset.variables.items()
+            if name not in dataset.data_vars or "time" not in variable.dims
+        ]
+    )
+    nb_times = dataset.sizes["time"]
+    nb_slices = math.ceil(nb_times / slice_size)
+    for start in range(0, nb_times, slice_size):
+        time_region = slice(start, min(start + slice_size, nb_times))
+        region_key = get_region_key({"time": time_region})
+        if checkpoint is None or not checkpoint.is_region_written(region_key):
+            if cancellation_token is not None:
+                cancellation_token.raise_if_cancelled()
+            region_dataset.isel(time=time_region).to_zarr(
+                store, region={"time": time_region}, mode="r+", storage_options=storage_options
+            )
+            if checkpoint is not None:
+                checkpoint.record_region(region_key)
+            logger_manager.info(
+                f"AnalyticsDatacube:write_dataset_by_time_slices: wrote time steps "
+                f"{time_region.start}-{time_region.stop} / {nb_times}"
+            )
+        if progress_callback is not None:
+            progress_callback(start // slice_size + 1, nb_slices)
+
+
 def is_valid_wkt(geometry):
     """check if the geometry is a valid WKT
     Args:
@@ -55,7 +669,7 @@ def is_valid_wkt(geometry):
     try:
         wkt.loads(geometry)
         return True
-    except ValueError:
+    except (ValueError, GEOSException):
         return False
 
 
@@ -83,10 +697,292 @@ def convert_to_wkt(geometry):
         raise ValueError(f"Geometry is not a valid WKT or GeoJSON: {e}") from e
 
 
+@dataclass
+class UploadReport:
+    """
+    Statistics of a folder upload.
+
+    Attributes:
+        objects (int): number of uploaded objects
+        bytes (int): number of uploaded bytes
+        seconds (float): upload duration
+        retries (int): number of retried object uploads
+    """
+
+    objects: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    retries: int = 0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """upload throughput in bytes per second"""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def objects_per_second(self) -> float:
+        """upload throughput in objects per second"""
+        return self.objects / self.seconds if self.seconds > 0 else 0.0
+
+
+_clients_lock = threading.Lock()
+_s3_clients: dict = {}
+_azure_container_clients: dict = {}
+
+
+def get_s3_client(max_pool_connections: int = 10):
+    """
+    Get a process-wide AWS S3 client, so HTTP connections are kept alive and reused.
+
+    Args:
+        max_pool_connections (int): size of the client connection pool
+
+    Returns:
+        boto3 S3 client
+    """
+    endpoint_url = os.getenv("AWS_ENDPOINT_URL")
+    key = (endpoint_url, max_pool_connections)
+    with _clients_lock:
+        if key not in _s3_clients:
+            _s3_clients[key] = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    retries={"max_attempts": 0},
+                ),
+            )
+        return _s3_clients[key]
+
+
+def get_azure_container_client(max_single_put_size: int = 8 * 1024 * 1024) -> "ContainerClient":
+    """
+    Get a process-wide Azure Blob Storage container client, so HTTP connections are reused.
+
+    Args:
+        max_single_put_size (int): blobs larger than this size are uploaded in blocks
+
+    Returns:
+        ContainerClient
+    """
+    from azure.storage.blob import BlobServiceClient  # pylint: disable=import-outside-toplevel
+
+    container_name = os.getenv("AZURE_BLOB_CONTAINER_NAME")
+    connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    account_name = os.getenv("AZURE_ACCOUNT_NAME")
+    key = (connection_string, account_name, container_name, max_single_put_size)
+    with _clients_lock:
+        if key not in _azure_container_clients:
+            if connection_string:
+                service_client = BlobServiceClient.from_connection_string(
+                    connection_string, max_single_put_size=max_single_put_size
+                )
+            else:
+                service_client = BlobServiceClient(
+                    account_url=f"https://{account_name}.blob.core.windows.net",
+                    credential=os.getenv("AZURE_SAS_CREDENTIAL"),
+                    max_single_put_size=max_single_put_size,
+                )
+            _azure_container_clients[key] = service_client.get_container_client(container_name)
+        return _azure_container_clients[key]
+
+
+class CloudStorageUploader:
+    """
+    Upload a local folder (e.g. a zarr with thousands of chunk files) to a cloud storage provider
+    with a pool of workers sharing the same client, a per-object retry with jittered exponential backoff
+    and multipart uploads for large objects.
+
+    Parameters:
+        cloud_storage_provider: AWS S3/Azure Blob Storage
+        aws_s3_bucket: AWS S3 bucket name, required only for AWS
+        max_workers: number of objects uploaded in parallel
+        max_retries: number of retries of a failed object upload
+        backoff_seconds: base of the exponential backoff between two retries, with full jitter
+        backoff_max_seconds: maximum backoff between two retries
+        multipart_threshold_mb: objects larger than this size are uploaded in parts
+        executor: optional thread pool shared with other uploads, max_workers is then only
+            used to size the client connection pool
+        progress_callback: optional callable receiving the number of bytes uploaded and the
+            total number of bytes of the directory, after each object
+        cancellation_token: optional token checked before each object upload
+        checkpoint: optional job checkpoint recording the uploaded objects, the objects uploaded
+            by a previous run of the job are skipped
+    """
+
+    def __init__(
+        self,
+        cloud_storage_provider: CloudStorageProvider,
+        aws_s3_bucket: Optional[str] = None,
+        max_workers: int = 8,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        backoff_max_seconds: float = DEFAULT_BACKOFF_MAX_SECONDS,
+        multipart_threshold_mb: int = 8,
+        executor: Optional[ThreadPoolExecutor] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        cancellation_token: Optional[CancellationToken] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+    ):
+        if max_workers < 1:
+            raise ValueError("max_workers must be greater than or equal to 1")
+        if cloud_storage_provider == CloudStorageProvider.AWS and aws_s3_bucket is None:
+            aws_s3_bucket = os.getenv("AWS_BUCKET_NAME")
+        self.cloud_storage_provider = cloud_storage_provider
+        self.aws_s3_bucket = aws_s3_bucket
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.multipart_threshold = multipart_threshold_mb * 1024 * 1024
+        self.executor = executor
+        self.progress_callback = progress_callback
+        self.cancellation_token = cancellation_token
+        self.checkpoint = checkpoint
+        self._total_bytes = 0
+        self._skipped_bytes = 0
+        self._lock = threading.Lock()
+
+    def _upload_object(self, local_file_path: str, key: str):
+        """upload a single object"""
+        if self.cloud_storage_provider == CloudStorageProvider.AWS:
+            get_s3_client(self.max_workers).upload_file(
+                local_file_path,
+                self.aws_s3_bucket,
+                key,
+                Config=TransferConfig(
+                    multipart_threshold=self.multipart_threshold,
+                    multipart_chunksize=self.multipart_threshold,
+                    use_threads=False,
+                ),
+            )
+        elif self.cloud_storage_provider == CloudStorageProvider.AZURE:
+            container_client = get_azure_container_client(self.multipart_threshold)
+            with open(local_file_path, "rb") as local_file:
+                container_client.upload_blob(key, local_file, overwrite=True)
+        else:
+            raise ValueError(f"Unsupported cloud storage provider: {self.cloud_storage_provider}")
+
+    def _upload_object_with_retry(self, local_file_path: str, key: str, report: UploadReport):
+        """upload a single object, retried with a full jitter exponential backoff interrupted by
+        the cancellation"""
+        for attempt in range(self.max_retries + 1):
+            if self.cancellation_token is not None:
+                self.cancellation_token.raise_if_cancelled()
+            try:
+                self._upload_object(local_file_path, key)
+                break
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Error while uploading {key}: {exc}") from exc
+                with self._lock:
+                    report.retries += 1
+                backoff_seconds = get_backoff_seconds(
+                    attempt, self.backoff_seconds, self.backoff_max_seconds
+                )
+                if self.cancellation_token is not None:
+                    self.cancellation_token.sleep(backoff_seconds)
+                else:
+                    time.sleep(backoff_seconds)
+        if self.checkpoint is not None:
+            self.checkpoint.record_upload(key)
+
+        with self._lock:
+            report.objects += 1
+            report.bytes += os.path.getsize(local_file_path)
+            if self.progress_callback is not None:
+                self.progress_callback(self._skipped_bytes + report.bytes, self._total_bytes)
+
+    def _upload_objects(
+        self, executor: ThreadPoolExecutor, files: List[Tuple[str, str]], report: UploadReport
+    ):
+        """upload (local file path, key) objects with the executor and wait for them"""
+        futures = [
+            executor.submit(self._upload_object_with_retry, local_file_path, key, report)
+            for local_file_path, key in files
+        ]
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            # a failed or cancelled upload does not leave objects uploading in the background
+            for future in futures:
+                future.cancel()
+
+    def upload_directory(self, local_directory_path: str) -> UploadReport:
+        """
+        Upload a directory and its contents. Objects are stored under the directory name,
+        like the byoa cloud storage helpers.
+
+        Args:
+            local_directory_path (str): The local directory path to upload.
+
+        Raises:
+            JobCancelledError: when the build is cancelled
+
+        Returns:
+            UploadReport: the upload statistics
+        """
+        files = list_directory_objects(local_directory_path)
+        self._total_bytes = sum(os.path.getsize(local_file_path) for local_file_path, _ in files)
+        if self.checkpoint is not None:
+            uploaded_files = [file for file in files if self.checkpoint.is_uploaded(file[1])]
+            self._skipped_bytes = sum(
+                os.path.getsize(local_file_path) for local_file_path, _ in uploaded_files
+            )
+            files = [file for file in files if not self.checkpoint.is_uploaded(file[1])]
+            if uploaded_files:
+                logger_manager.info(
+                    f"AnalyticsDatacube:upload_directory: {len(uploaded_files)} objects already "
+                    f"uploaded by a previous run of job {self.checkpoint.job_id}"
+                )
+        report = UploadReport()
+        start_time = time.time()
+        if self.executor is not None:
+            self._upload_objects(self.executor, files, report)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                self._upload_objects(executor, files, report)
+        report.seconds = time.time() - start_time
+
+        logger_manager.info(
+            f"AnalyticsDatacube:upload_directory: {report.objects} objects, {report.bytes} bytes "
+            f"uploaded in {report.seconds:.1f}s ({report.bytes_per_second / 1024 / 1024:.2f} MB/s, "
+            f"{report.objects_per_second:.1f} objects/s, {report.retries} retries)"
+        )
+        return report
+
+
+def list_directory_objects(local_directory_path: str) -> List[Tuple[str, str]]:
+    """
+    List the files of a directory with their object key (prefixed by the directory name).
+
+    Args:
+        local_directory_path (str): The local directory path.
+
+    Returns:
+        list: (local file path, object key) tuples
+    """
+    directory_name = os.path.basename(local_directory_path)
+    files = []
+    for root, _, filenames in os.walk(local_directory_path):
+        for filename in filenames:
+            local_file_path = os.path.join(root, filename)
+            relative_path = os.path.relpath(local_file_path, local_directory_path)
+            key = os.path.join(directory_name, relative_path).replace(os.sep, "/")
+            files.append((local_file_path, key))
+    return files
+
+
 def upload_to_cloud_storage(
     cloud_storage_provider: CloudStorageProvider,
     zarr_path: str,
     aws_s3_bucket: str,
+    upload_workers: int = 8,
+    upload_executor: Optional[ThreadPoolExecutor] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
 ):
     """
     Uploads data to the specified cloud storage provider.
@@ -95,27 +991,48 @@ def upload_to_cloud_storage(
         cloud_storage_provider (CloudStorageProvider): The cloud storage provider (AWS or Azure).
         zarr_path (str): The path to the data to be uploaded.
         aws_s3_bucket (str, optional): The AWS S3 bucket name. Required only if cloud_storage_provider is AWS.
+        upload_workers (int, optional): Number of objects uploaded in parallel.
+        upload_executor (ThreadPoolExecutor, optional): Upload pool shared with other uploads.
+        progress_callback (Callable, optional): Called with the number of bytes uploaded and
+            their total.
+        cancellation_token (CancellationToken, optional): Checked before each object upload.
+        checkpoint (JobCheckpoint, optional): Records the uploaded objects, the objects uploaded
+            by a previous run of the job are skipped.
+
+    Raises:
+        JobCancelledError: when the build is cancelled
 
     Returns:
-        dict or None: A dictionary containing the storage link if the upload is successful,
-                      otherwise None.
+        tuple: the storage link and the UploadReport of the upload
 
     Notes:
         This function uploads data to the specified cloud storage provider based on the provider type.
-        If the upload fails, it returns None.
+        If the upload fails, it raises a RuntimeError.
     """
     try:
+        uploader = CloudStorageUploader(
+            cloud_storage_provider,
+            aws_s3_bucket,
+            max_workers=upload_workers,
+            executor=upload_executor,
+            progress_callback=progress_callback,
+            cancellation_token=cancellation_token,
+            checkpoint=checkpoint,
+        )
+        report = uploader.upload_directory(zarr_path)
         if cloud_storage_provider == CloudStorageProvider.AWS:
-            if aws_s3_bucket is None:
-                aws_s3_bucket = os.getenv("AWS_BUCKET_NAME")
-            if aws_s3.write_folder_to_aws_s3(zarr_path, aws_s3_bucket):
-                logger_manager.info("Analytics DataCube uploaded to AWS S3")
-                return aws_s3.get_s3_uri_path(zarr_path, aws_s3_bucket)
-        elif cloud_storage_provider == CloudStorageProvider.AZURE:
-            if azure_blob_storage.upload_directory_to_azure_blob_storage(zarr_path):
-                logger_manager.info("Analytics DataCube uploaded to Azure Blob Storage")
-                return azure_blob_storage.get_azure_blob_url_path(zarr_path)
+            logger_manager.info("Analytics DataCube uploaded to AWS S3")
+            return aws_s3.get_s3_uri_path(zarr_path, uploader.aws_s3_bucket), report
+        if cloud_storage_provider == CloudStorageProvider.AZURE:
+            from byoa.cloud_storage import (  # pylint: disable=import-outside-toplevel
+                azure_blob_storage,
+            )
+
+            logger_manager.info("Analytics DataCube uploaded to Azure Blob Storage")
+            return azure_blob_storage.get_azure_blob_url_path(zarr_path), report
 
+    except JobCancelledError:
+        raise
     except Exception as exc:
         logger_manager.error(
             f"Error while uploading folder to {cloud_storage_provider.value}: {exc}"
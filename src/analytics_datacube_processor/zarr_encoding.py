@@ -0,0 +1,188 @@
+"""Zarr encoding (chunks, compression, dtype) of the datacube variables"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import xarray
+
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+
+# int16 range used by the scaled values, the lowest value is the fill value of missing pixels
+INT16_FILL_VALUE = np.iinfo(np.int16).min
+INT16_MAX_VALUE = np.iinfo(np.int16).max
+
+# scale factor of the int16 values when the variable range cannot be computed (e.g. all NaN)
+DEFAULT_INT16_SCALE_FACTOR = 1e-4
+
+
+@dataclass(frozen=True)
+class EncodingSettings:
+    """
+    Encoding settings of a profile.
+
+    Attributes:
+        time_chunk (int, optional): chunk size along time, None for the whole time series
+        spatial_chunk (int): maximum chunk size along y and x
+        cname (str, optional): blosc compressor (zstd, lz4...), None for the zarr default
+        clevel (int): compression level
+        shuffle (str): blosc shuffle (shuffle, bitshuffle or noshuffle)
+        dtype (str, optional): storage dtype of the indicators (float32 or scaled int16),
+            None to keep the computed dtype
+    """
+
+    time_chunk: Optional[int]
+    spatial_chunk: int
+    cname: Optional[str]
+    clevel: int
+    shuffle: str
+    dtype: Optional[str]
+
+
+ENCODING_PROFILES = {
+    ZarrEncodingProfile.TIME_SERIES: EncodingSettings(
+        time_chunk=None,
+        spatial_chunk=32,
+        cname="lz4",
+        clevel=5,
+        shuffle="shuffle",
+        dtype="float32",
+    ),
+    ZarrEncodingProfile.SPATIAL: EncodingSettings(
+        time_chunk=1, spatial_chunk=512, cname="lz4", clevel=5, shuffle="shuffle", dtype="float32"
+    ),
+    ZarrEncodingProfile.ARCHIVE: EncodingSettings(
+        time_chunk=8,
+        spatial_chunk=256,
+        cname="zstd",
+        clevel=9,
+        shuffle="bitshuffle",
+        dtype="int16",
+    ),
+}
+
+
+# chunks of the DEFAULT profile in the sharded layout, which needs explicit chunks
+SHARDED_DEFAULT_SETTINGS = EncodingSettings(
+    time_chunk=1, spatial_chunk=256, cname=None, clevel=0, shuffle="shuffle", dtype=None
+)
+
+
+def _get_settings(
+    profile: ZarrEncodingProfile, zarr_layout: ZarrLayout
+) -> Optional[EncodingSettings]:
+    settings = ENCODING_PROFILES.get(profile)
+    if settings is None and zarr_layout == ZarrLayout.SHARDED:
+        return SHARDED_DEFAULT_SETTINGS
+    return settings
+
+
+def get_time_chunk(
+    dataset: xarray.Dataset,
+    profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+) -> Optional[int]:
+    """
+    Get the chunk size along time of a profile.
+
+    Args:
+        dataset (xarray.Dataset): the dataset to write
+        profile (ZarrEncodingProfile): the encoding profile
+        zarr_layout (ZarrLayout): the zarr layout
+
+    Returns:
+        int: the chunk size along time, or None if the profile does not set the chunks
+    """
+    settings = _get_settings(profile, zarr_layout)
+    if settings is None or "time" not in dataset.dims:
+        return None
+    return min(settings.time_chunk or dataset.sizes["time"], dataset.sizes["time"])
+
+
+def _get_int16_scale_factor(
+    variable: xarray.DataArray, max_abs_value: Optional[float] = None
+) -> float:
+    """smallest power of ten scale factor storing the variable range in int16"""
+    if max_abs_value is None:
+        max_abs_value = float(abs(variable).max(skipna=True))
+    if not math.isfinite(max_abs_value) or max_abs_value == 0:
+        return DEFAULT_INT16_SCALE_FACTOR
+    return 10.0 ** math.ceil(math.log10(max_abs_value / INT16_MAX_VALUE))
+
+
+def get_zarr_encoding(
+    dataset: xarray.Dataset,
+    profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    time_chunk: Optional[int] = None,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    time_shard: Optional[int] = None,
+    max_abs_values: Optional[Dict[str, float]] = None,
+) -> dict:
+    """
+    Build the xarray to_zarr encoding of the data variables for an encoding profile and layout.
+
+    Args:
+        dataset (xarray.Dataset): the dataset to write
+        profile (ZarrEncodingProfile): the encoding profile
+        time_chunk (int, optional): chunk size along time, overrides the profile one
+            (e.g. to align the chunks with time sliced writes)
+        zarr_layout (ZarrLayout): the zarr layout
+        time_shard (int, optional): shard size along time of the sharded layout (a multiple of
+            the time chunk), defaults to the whole time series
+        max_abs_values (Dict[str, float], optional): maximum absolute value of the variables,
+            computed from the dataset by default (e.g. when the dataset is an empty template)
+
+    Returns:
+        dict: variable name -> encoding, empty for the DEFAULT profile in the CHUNKED layout
+    """
+    settings = _get_settings(profile, zarr_layout)
+    if settings is None:
+        return {}
+    if time_chunk is None:
+        time_chunk = get_time_chunk(dataset, profile, zarr_layout)
+    # zarr is only imported when a datacube is written
+    from zarr.codecs import BloscCodec  # pylint: disable=import-outside-toplevel
+
+    encoding = {}
+    for name, variable in dataset.data_vars.items():
+        chunks = []
+        shards = []
+        for dim in variable.dims:
+            if dim == "time":
+                chunk = time_chunk
+                shard = time_shard or math.ceil(variable.sizes[dim] / chunk) * chunk
+            elif dim in ("x", "y"):
+                chunk = min(settings.spatial_chunk, variable.sizes[dim])
+                shard = math.ceil(variable.sizes[dim] / chunk) * chunk
+            else:
+                chunk = shard = variable.sizes[dim]
+            chunks.append(chunk)
+            shards.append(shard)
+        variable_encoding = {"chunks": tuple(chunks)}
+        if zarr_layout == ZarrLayout.SHARDED:
+            variable_encoding["shards"] = tuple(shards)
+        if settings.cname is not None:
+            variable_encoding["compressors"] = (
+                BloscCodec(cname=settings.cname, clevel=settings.clevel, shuffle=settings.shuffle),
+            )
+
+        if settings.dtype is not None and np.issubdtype(variable.dtype, np.floating):
+            if settings.dtype == "int16":
+                variable_encoding.update(
+                    {
+                        "dtype": "int16",
+                        "scale_factor": _get_int16_scale_factor(
+                            variable, (max_abs_values or {}).get(name)
+                        ),
+                        "add_offset": 0.0,
+                        "_FillValue": INT16_FILL_VALUE,
+                        # chunks never written (e.g. outside of the tiles) are read as missing
+                        "fill_value": INT16_FILL_VALUE,
+                    }
+                )
+            else:
+                variable_encoding["dtype"] = settings.dtype
+        encoding[name] = variable_encoding
+    return encoding
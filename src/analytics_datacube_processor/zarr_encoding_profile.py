@@ -0,0 +1,19 @@
+"""Available zarr encoding profiles"""
+
+from enum import Enum
+
+
+class ZarrEncodingProfile(Enum):
+    """
+    Available zarr encoding profiles (chunk shapes, compression and dtype of the indicators)
+
+    DEFAULT: chunks and compressor chosen by zarr, values kept as computed
+    TIME_SERIES: whole time series of small spatial tiles in each chunk, fast pixel time series reads
+    SPATIAL: one acquisition date of large spatial tiles in each chunk, fast image reads
+    ARCHIVE: medium chunks, strong compression and values stored as scaled int16
+    """
+
+    DEFAULT = "DEFAULT"
+    TIME_SERIES = "TIME_SERIES"
+    SPATIAL = "SPATIAL"
+    ARCHIVE = "ARCHIVE"
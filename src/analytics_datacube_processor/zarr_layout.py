@@ -0,0 +1,16 @@
+"""Available zarr layouts"""
+
+from enum import Enum
+
+
+class ZarrLayout(Enum):
+    """
+    Available zarr layouts
+
+    CHUNKED: one object per chunk
+    SHARDED: chunks packed in zarr v3 shards, one object per shard (whole variable, or time slice
+        of a variable when the datacube is streamed within a memory budget)
+    """
+
+    CHUNKED = "CHUNKED"
+    SHARDED = "SHARDED"
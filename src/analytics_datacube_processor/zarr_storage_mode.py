@@ -0,0 +1,15 @@
+"""Available zarr storage modes"""
+
+from enum import Enum
+
+
+class ZarrStorageMode(Enum):
+    """
+    Available zarr storage modes
+
+    LOCAL: the zarr is written to a temporary local folder, then uploaded
+    DIRECT: the zarr is written directly to the cloud storage, chunks are uploaded as they are encoded
+    """
+
+    LOCAL = "LOCAL"
+    DIRECT = "DIRECT"
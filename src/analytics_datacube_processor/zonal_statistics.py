@@ -0,0 +1,201 @@
+"""Zonal statistics of the datacube over the polygon"""
+
+import warnings
+from typing import List, Optional, Tuple
+
+import fsspec
+import numpy as np
+import pandas as pd
+import shapely
+import xarray
+from byoa.telemetry.log_manager.log_manager import LogManager
+from pyproj import CRS, Transformer
+from shapely import ops, wkt
+
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.output_format import OutputFormat
+from analytics_datacube_processor.utils import get_cloud_storage_zarr_store
+
+logger = LogManager.get_instance()
+
+# maximum number of rows of the zonal statistics returned inline in the output
+DEFAULT_MAX_INLINE_ROWS = 10_000
+
+# CRS of the input geometries
+GEOMETRY_CRS = CRS.from_epsg(4326)
+
+ZONAL_STATISTICS_COLUMNS = [
+    "time",
+    "indicator",
+    "band",
+    "count",
+    "mean",
+    "median",
+    "std",
+    "min",
+    "max",
+]
+
+# file extension of the tables
+TABLE_EXTENSIONS = {OutputFormat.PARQUET: "parquet", OutputFormat.CSV: "csv"}
+
+
+def get_dataset_crs(dataset: xarray.Dataset) -> Optional[CRS]:
+    """
+    Get the CRS of the rasters of the datacube (crs coordinate of the Geosys time series).
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+
+    Returns:
+        CRS: the CRS of the rasters, or None if unknown
+    """
+    if "crs" not in dataset.coords:
+        return None
+    values = [
+        value
+        for value in np.atleast_1d(dataset.coords["crs"].values)
+        if isinstance(value, str) and value
+    ]
+    return CRS.from_user_input(str(values[0])) if values else None
+
+
+def get_geometry_mask(dataset: xarray.Dataset, geometry: str) -> np.ndarray:
+    """
+    Get the mask of the pixels of the datacube grid whose center is in the geometry.
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+        geometry (str): WKT geometry (WGS84)
+
+    Returns:
+        np.ndarray: boolean mask along (y, x)
+    """
+    shape = wkt.loads(geometry)
+    crs = get_dataset_crs(dataset)
+    if crs is not None and not crs.equals(GEOMETRY_CRS):
+        transformer = Transformer.from_crs(GEOMETRY_CRS, crs, always_xy=True)
+        shape = ops.transform(transformer.transform, shape)
+
+    x, y = np.meshgrid(dataset["x"].values, dataset["y"].values)
+    mask = shapely.intersects_xy(shape, x, y)
+    if not mask.any():
+        # polygon smaller than a pixel: the rasters are already clipped to the polygon
+        logger.info("AnalyticsDatacube: no pixel center in the polygon, all pixels are used")
+        mask[:] = True
+    return mask
+
+
+def compute_zonal_statistics(dataset: xarray.Dataset, geometry: str) -> pd.DataFrame:
+    """
+    Compute the statistics of the valid pixels in the geometry, for every time step and band of
+    every indicator. The statistics are computed at once for all the time steps and bands.
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+        geometry (str): WKT geometry (WGS84)
+
+    Returns:
+        pd.DataFrame: one row per time, indicator and band with the number of valid pixels
+            and their mean, median, standard deviation, minimum and maximum
+    """
+    if not dataset.data_vars or "time" not in dataset.dims:
+        return pd.DataFrame(columns=ZONAL_STATISTICS_COLUMNS)
+
+    mask = get_geometry_mask(dataset, geometry)
+    times = dataset.indexes["time"]
+    tables = []
+    for name, variable in dataset.data_vars.items():
+        if "band" not in variable.dims:
+            variable = variable.expand_dims(band=[name.upper()])
+        # (time, band, pixel) values of the pixels in the geometry
+        values = variable.transpose("time", "band", "y", "x").values[..., mask].astype(np.float64)
+        count = np.count_nonzero(~np.isnan(values), axis=-1)
+        with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+            # statistics of the pixels without any valid value are NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            statistics = {
+                "count": count,
+                "mean": np.nanmean(values, axis=-1),
+                "median": np.nanmedian(values, axis=-1),
+                "std": np.nanstd(values, axis=-1),
+                "min": np.nanmin(values, axis=-1),
+                "max": np.nanmax(values, axis=-1),
+            }
+
+        # the bands without any valid pixel in the geometry are skipped
+        bands = np.flatnonzero(count.sum(axis=0) > 0)
+        nb_times = len(times)
+        tables.append(
+            pd.DataFrame(
+                {
+                    "time": np.tile(times.values, len(bands)),
+                    "indicator": name,
+                    "band": np.repeat(variable["band"].values[bands].astype(str), nb_times),
+                    **{
+                        statistic: values_by_band[:, bands].T.ravel()
+                        for statistic, values_by_band in statistics.items()
+                    },
+                }
+            )
+        )
+    return pd.concat(tables, ignore_index=True)[ZONAL_STATISTICS_COLUMNS]
+
+
+def zonal_statistics_to_records(table: pd.DataFrame) -> List[dict]:
+    """
+    Convert the zonal statistics to JSON compatible records (ISO dates, missing values as None).
+
+    Args:
+        table (pd.DataFrame): the zonal statistics
+
+    Returns:
+        List[dict]: one record per row
+    """
+    table = table.assign(time=pd.to_datetime(table["time"]).dt.strftime("%Y-%m-%dT%H:%M:%S"))
+    return table.astype(object).where(table.notna(), None).to_dict(orient="records")
+
+
+def zonal_statistics_to_cloud_storage(
+    table: pd.DataFrame,
+    output_format: OutputFormat,
+    cloud_storage_provider: CloudStorageProvider,
+    name: str,
+    aws_s3_bucket: Optional[str] = None,
+) -> Tuple[str, int]:
+    """
+    Write the zonal statistics as a single parquet or csv object on the cloud storage provider.
+
+    Args:
+        table (pd.DataFrame): the zonal statistics
+        output_format (OutputFormat): PARQUET or CSV
+        cloud_storage_provider (CloudStorageProvider): The cloud storage provider (AWS or Azure).
+        name (str): The name of the object in the bucket/container.
+        aws_s3_bucket (str, optional): The AWS S3 bucket name.
+
+    Returns:
+        tuple: (the storage link, the number of bytes written)
+    """
+    if output_format == OutputFormat.PARQUET:
+        data = table.to_parquet(index=False)
+    elif output_format == OutputFormat.CSV:
+        data = table.to_csv(index=False).encode("utf-8")
+    else:
+        raise ValueError(f"Unsupported zonal statistics format: {output_format}")
+
+    url, storage_options, storage_link = get_cloud_storage_zarr_store(
+        cloud_storage_provider, name, aws_s3_bucket
+    )
+    try:
+        with fsspec.open(url, "wb", **storage_options) as file:
+            file.write(data)
+    except Exception as exc:
+        logger.error(f"Error while writing table to {cloud_storage_provider.value}: {exc}")
+        raise RuntimeError(
+            f"Error while writing table to {cloud_storage_provider.value}: {exc}"
+        ) from exc
+    logger.info(
+        f"AnalyticsDatacube: zonal statistics ({len(table)} rows, {len(data)} bytes) written "
+        f"to {cloud_storage_provider.value}"
+    )
+    return storage_link, len(data)
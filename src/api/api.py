@@ -1,30 +1,81 @@
 """Fast api to trigger the analytics datacube processor.
-Result can be stored on AWS S3 or Azure Blob storage 
+Result can be stored on AWS S3 or Azure Blob storage
 
 Returns:
     storage_link: path of the output zarr file
 """
 
+import json
 import os
-from typing import Annotated, List, Optional
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Annotated, AsyncIterator, Callable, List, Optional, Union
 
+import anyio
 from byoa.telemetry.log_manager.log_manager import LogManager
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.openapi.docs import get_swagger_ui_html
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.staticfiles import StaticFiles
-from geosyspy.utils.jwt_validator import check_token_validity
+from pydantic import ValidationError
 
+from analytics_datacube_processor.admission_control import (
+    AdmissionRejectedError,
+    get_admission_controller_from_env,
+)
+from analytics_datacube_processor.batch_processor import AnalyticsDatacubeBatch
+from analytics_datacube_processor.cancellation import CancellationToken
+from analytics_datacube_processor.checkpoint import get_checkpoint_store_from_env
 from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.fetch_policy import (
+    DEFAULT_MAX_RETRIES,
+    CircuitOpenError,
+    FetchPolicy,
+)
+from analytics_datacube_processor.identifiers import JOB_ID_PATTERN
+from analytics_datacube_processor.output_format import OutputFormat
 from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.progress import ProgressEvent
+from analytics_datacube_processor.result_cache import get_result_cache_from_env
+from analytics_datacube_processor.spatial_tiling import DEFAULT_TILE_SIZE_M
+from analytics_datacube_processor.telemetry import start_metrics_server
+from analytics_datacube_processor.temporal_reducer import TemporalReducer
+from analytics_datacube_processor.tile_cache import get_tile_cache_from_env
+from analytics_datacube_processor.utils import is_configured_storage_link
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
 from api.constants import Indicator, Question
-from schemas.input_schema import InputModel, Parameters
+from api.jobs import FINISHED_JOB_STATUSES, JobConflictError, JobManager, QueueFullError
+from schemas.input_schema import (
+    BatchInputModel,
+    Compositing,
+    FieldParameters,
+    InputModel,
+    Parameters,
+)
+from schemas.job_schema import JobModel, ProgressEventModel
+from utils.token_utils import check_token_validity, get_token_subject
 
 logger_manager = LogManager.get_instance()
 load_dotenv()
 
-app = FastAPI(docs_url=None, title="analytics_datacube_processor" + " API", description="")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """cancel the jobs still running on shutdown (e.g. a rescheduled pod): they stop at their
+    next cancellation check, and are resumed from their checkpoint when submitted again with
+    the same job id"""
+    yield
+    job_manager.cancel_all("server shutdown")
+
+
+app = FastAPI(
+    lifespan=lifespan, docs_url=None, title="analytics_datacube_processor" + " API", description=""
+)
 
 # identity server configuration
 tokenUrl = os.getenv("IDENTITY_SERVER_URL")
@@ -37,10 +88,203 @@ public_certificate_key = os.getenv("CIPHER_CERTIFICATE_PUBLIC_KEY")
 if public_certificate_key is not None:
     public_certificate_key = public_certificate_key.replace("\\n", "\n")
 
+# optional memory budget (MB) of the fetch windows and of a zarr write, streams datacubes to
+# zarr by time slices
+memory_budget_mb = os.getenv("MEMORY_BUDGET_MB")
+if memory_budget_mb is not None:
+    memory_budget_mb = float(memory_budget_mb)
+
+# optional result cache shared by all the requests
+result_cache = get_result_cache_from_env()
+
+# optional on-disk cache of the fetched indicator time series shared by all the requests
+tile_cache = get_tile_cache_from_env()
+
+# optional checkpoints of the jobs, resumed when a job is submitted again with the same job id
+checkpoint_store = get_checkpoint_store_from_env()
+
+# bounded pool running the asynchronous datacube jobs off the event loop
+job_manager = JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", "1")),
+    max_queue_depth=int(os.getenv("JOB_MAX_QUEUE_DEPTH", "10")),
+)
+
+# maximum number of fields of a batch request processed in parallel
+max_concurrent_fields = int(os.getenv("MAX_CONCURRENT_FIELDS", "4"))
+
+# optional spatial tiling of the large areas of interest: number of pixels per image above which
+# the area is split into tiles processed in parallel
+max_pixels_per_tile = os.getenv("MAX_PIXELS_PER_TILE")
+if max_pixels_per_tile is not None:
+    max_pixels_per_tile = int(max_pixels_per_tile)
+tile_size_m = float(os.getenv("TILE_SIZE_M", str(DEFAULT_TILE_SIZE_M)))
+max_concurrent_tiles = int(os.getenv("MAX_CONCURRENT_TILES", "4"))
+
+# optional timeout (seconds) of a single indicator fetch, and retries of the transient failures
+fetch_timeout_seconds = os.getenv("FETCH_TIMEOUT_SECONDS")
+if fetch_timeout_seconds is not None:
+    fetch_timeout_seconds = float(fetch_timeout_seconds)
+fetch_max_retries = int(os.getenv("FETCH_MAX_RETRIES", str(DEFAULT_MAX_RETRIES)))
+
+# optional memory budget of the concurrent builds, the synchronous requests wait for their
+# admission at most ADMISSION_MAX_WAIT_SECONDS then are refused, the jobs wait in their queue
+admission_controller = get_admission_controller_from_env()
+admission_max_wait_seconds = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "60"))
+
+# polling interval (seconds) of the job progress events streamed as server-sent events
+event_stream_interval_seconds = float(os.getenv("EVENT_STREAM_INTERVAL_SECONDS", "0.5"))
+
+# interval (seconds) of the checks of the client disconnection of a synchronous request
+DISCONNECT_CHECK_INTERVAL_SECONDS = 1.0
+
+# prometheus metrics (stage latencies, counters, in-flight jobs, memory) on the scraped port
+start_metrics_server()
+
 
 # pylint: disable=missing-docstring
 
 
+def trigger_admitted(
+    client: Union[AnalyticsDatacube, AnalyticsDatacubeBatch],
+    timeout_seconds: Optional[float] = None,
+    job_id: Optional[str] = None,
+    progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+    cancellation_token: Optional[CancellationToken] = None,
+) -> dict:
+    """trigger the processor once its memory estimate fits in the admission budget"""
+    if job_id is not None:
+        client.job_id = job_id
+    if progress_callback is not None:
+        client.progress_callback = progress_callback
+    if cancellation_token is not None:
+        client.cancellation_token = cancellation_token
+    if admission_controller is None:
+        return client.trigger()
+    return admission_controller.run(client.trigger, client.estimate_memory_mb(), timeout_seconds)
+
+
+async def trigger_until_disconnected(
+    request: Request, client: Union[AnalyticsDatacube, AnalyticsDatacubeBatch]
+) -> dict:
+    """trigger the processor in a worker thread, off the event loop, cancelled when the client
+    disconnects so that the build does not go on fetching and uploading for nobody"""
+    cancellation_token = CancellationToken()
+
+    async def cancel_on_disconnect():
+        while not await request.is_disconnected():
+            await anyio.sleep(DISCONNECT_CHECK_INTERVAL_SECONDS)
+        logger_manager.info("Client disconnected, datacube build cancelled")
+        cancellation_token.cancel("client disconnected")
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(cancel_on_disconnect)
+        try:
+            return await run_in_threadpool(
+                trigger_admitted,
+                client,
+                admission_max_wait_seconds,
+                cancellation_token=cancellation_token,
+            )
+        finally:
+            task_group.cancel_scope.cancel()
+
+
+def check_token(token: Annotated[str, Depends(oauth2_scheme)]) -> str:
+    """dependency returning the bearer token of a request, raise a 401 HTTPException if it is
+    not valid"""
+    if not token or (
+        public_certificate_key is not None
+        and not check_token_validity(token, public_certificate_key)
+    ):
+        raise HTTPException(status_code=401, detail="Not Authorized")
+    return token
+
+
+def get_job_owner(token: Annotated[str, Depends(check_token)]) -> str:
+    """dependency returning the owner of the jobs of a request (the subject of its verified
+    token), raise a 503 HTTPException if no certificate is configured to verify the tokens, a
+    401 if the token is not valid or has no subject"""
+    if public_certificate_key is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The jobs require the CIPHER_CERTIFICATE_PUBLIC_KEY env variable.",
+        )
+    owner = get_token_subject(token, public_certificate_key)
+    if owner is None:
+        raise HTTPException(status_code=401, detail="Not Authorized")
+    return owner
+
+
+async def stream_job_events(job_id: str, after: int, owner: str) -> AsyncIterator[str]:
+    """server-sent events of the progress events of a job, until it is finished"""
+    while True:
+        job = job_manager.get(job_id, owner)
+        events = job_manager.get_events(job_id, after, owner)
+        if job is None or events is None:
+            return
+        for event in events:
+            after = event.sequence
+            yield (
+                f"id: {event.sequence}\nevent: {event.event_type}\n"
+                f"data: {json.dumps(event.model_dump())}\n\n"
+            )
+        if job.status in FINISHED_JOB_STATUSES:
+            # the events are added before the job is finished, none can follow
+            yield (
+                f"event: {job.status.value}\n"
+                f"data: {job.model_dump_json(exclude={'result'})}\n\n"
+            )
+            return
+        await anyio.sleep(event_stream_interval_seconds)
+
+
+def get_retry_after_header(retry_after_seconds: float) -> dict:
+    """Retry-After header of a 503 response"""
+    return {"Retry-After": str(max(1, round(retry_after_seconds)))}
+
+
+def get_encoding_profile_option(encoding_profile: ZarrEncodingProfile) -> Optional[str]:
+    """input data encoding_profile option, not set for the default profile so that
+    the cache keys of the default requests do not change"""
+    if encoding_profile == ZarrEncodingProfile.DEFAULT:
+        return None
+    return encoding_profile.value
+
+
+def get_zarr_layout_option(zarr_layout: ZarrLayout) -> Optional[str]:
+    """input data zarr_layout option, not set for the default layout so that
+    the cache keys of the default requests do not change"""
+    if zarr_layout == ZarrLayout.CHUNKED:
+        return None
+    return zarr_layout.value
+
+
+def get_output_format_option(output_format: OutputFormat) -> Optional[str]:
+    """input data output_format option, not set for the datacube output so that
+    the cache keys of the datacube requests do not change"""
+    if output_format == OutputFormat.ZARR:
+        return None
+    return output_format.value
+
+
+def get_compositing_option(
+    composite_period: Optional[str],
+    composite_reducer: TemporalReducer,
+    composite_percentile: Optional[float],
+    min_valid_fraction: Optional[float],
+) -> Optional[Compositing]:
+    """input data compositing option, not set when the scenes are neither filtered nor
+    reduced so that the cache keys of the other requests do not change"""
+    if composite_period is None and min_valid_fraction is None:
+        return None
+    return Compositing(
+        period=composite_period,
+        reducer=composite_reducer.value,
+        percentile=composite_percentile,
+        min_valid_fraction=min_valid_fraction,
+    )
+
+
 @app.get("/docs", include_in_schema=False)
 async def swagger_ui_html() -> str:
     """
@@ -64,9 +308,8 @@ async def swagger_ui_html() -> str:
     )
 
 
-@app.post("/analytics-datacube", tags=["Analytic Computation"])
-async def create_analytics_datacube(
-    token: Annotated[str, Depends(oauth2_scheme)],
+def analytics_datacube_processor(
+    token: Annotated[str, Depends(check_token)],
     parameters: Parameters,
     cloud_storage_provider: CloudStorageProvider,
     aws_s3_bucket: Optional[str] = None,
@@ -75,19 +318,43 @@ async def create_analytics_datacube(
     metrics: Question = Query(
         alias="Display metrics information (bandwidth consumption, duration)"
     ),
-):
+    zarr_storage_mode: ZarrStorageMode = ZarrStorageMode.LOCAL,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    composite_period: Optional[str] = None,
+    composite_reducer: TemporalReducer = TemporalReducer.MEAN,
+    composite_percentile: Optional[float] = Query(default=None, ge=0, le=100),
+    min_valid_fraction: Optional[float] = Query(default=None, ge=0, le=1),
+    output_format: OutputFormat = OutputFormat.ZARR,
+    partial_ok: bool = False,
+    bypass_cache: bool = False,
+    append_to: Optional[str] = None,
+) -> AnalyticsDatacube:
+    """
+    Check the token and build the processor of a datacube request.
 
-    # Check token validity
-    if not token or (
-        public_certificate_key is not None
-        and not check_token_validity(token, public_certificate_key)
-    ):
-        raise HTTPException(status_code=401, detail="Not Authorized")
+    Returns:
+        AnalyticsDatacube: the processor, ready to be triggered
 
+    Raises:
+        HTTPException: 401 if the token is not valid, 422 if append_to is not a storage link
+            of the configured bucket or container, 500 if the processor cannot be built
+    """
+    if append_to is not None and not is_configured_storage_link(append_to):
+        raise HTTPException(
+            status_code=422,
+            detail=f"append_to {append_to!r} is not in the configured bucket or container",
+        )
     try:
         input_data = InputModel(
             parameters=parameters,
             indicators=[indicator.value for indicator in indicators],
+            encoding_profile=get_encoding_profile_option(encoding_profile),
+            zarr_layout=get_zarr_layout_option(zarr_layout),
+            compositing=get_compositing_option(
+                composite_period, composite_reducer, composite_percentile, min_valid_fraction
+            ),
+            output_format=get_output_format_option(output_format),
         )
 
         display_metrics = False
@@ -95,21 +362,290 @@ async def create_analytics_datacube(
             display_metrics = True
 
         # Init the processor
-        client = AnalyticsDatacube(
+        return AnalyticsDatacube(
             input_data.model_dump(),
             bearer_token=token,
             cloud_storage_provider=cloud_storage_provider,
             aws_s3_bucket=aws_s3_bucket,
             metrics=display_metrics,
             entity_id=entity_id,
+            memory_budget_mb=memory_budget_mb,
+            zarr_storage_mode=zarr_storage_mode,
+            result_cache=result_cache,
+            bypass_cache=bypass_cache,
+            tile_cache=tile_cache,
+            max_pixels_per_tile=max_pixels_per_tile,
+            tile_size_m=tile_size_m,
+            max_concurrent_tiles=max_concurrent_tiles,
+            fetch_policy=FetchPolicy(
+                timeout_seconds=fetch_timeout_seconds,
+                max_retries=fetch_max_retries,
+                partial_ok=partial_ok,
+            ),
+            append_to=append_to,
+            checkpoint_store=checkpoint_store,
+        )
+
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500, detail=f"Error while generating datacube: {exc}"
+        ) from exc
+
+
+def analytics_datacube_batch_processor(
+    token: Annotated[str, Depends(check_token)],
+    fields: List[FieldParameters],
+    cloud_storage_provider: CloudStorageProvider,
+    aws_s3_bucket: Optional[str] = None,
+    indicators: List[Indicator] = Query(...),
+    entity_id: str = "entity_1",
+    metrics: Question = Query(
+        alias="Display metrics information (bandwidth consumption, duration)"
+    ),
+    zarr_storage_mode: ZarrStorageMode = ZarrStorageMode.LOCAL,
+    encoding_profile: ZarrEncodingProfile = ZarrEncodingProfile.DEFAULT,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+    composite_period: Optional[str] = None,
+    composite_reducer: TemporalReducer = TemporalReducer.MEAN,
+    composite_percentile: Optional[float] = Query(default=None, ge=0, le=100),
+    min_valid_fraction: Optional[float] = Query(default=None, ge=0, le=1),
+    output_format: OutputFormat = OutputFormat.ZARR,
+    partial_ok: bool = False,
+    bypass_cache: bool = False,
+) -> AnalyticsDatacubeBatch:
+    """
+    Check the token and build the processor of a batch datacube request (one datacube per field).
+
+    Returns:
+        AnalyticsDatacubeBatch: the batch processor, ready to be triggered
+
+    Raises:
+        HTTPException: 401 if the token is not valid, 422 if the fields are not valid (e.g.
+            duplicated field ids), 500 if the processor cannot be built
+    """
+    try:
+        input_data = BatchInputModel(
+            fields=fields,
+            indicators=[indicator.value for indicator in indicators],
+            encoding_profile=get_encoding_profile_option(encoding_profile),
+            zarr_layout=get_zarr_layout_option(zarr_layout),
+            compositing=get_compositing_option(
+                composite_period, composite_reducer, composite_percentile, min_valid_fraction
+            ),
+            output_format=get_output_format_option(output_format),
+        )
+
+        # Init the batch processor
+        return AnalyticsDatacubeBatch(
+            input_data.model_dump(),
+            bearer_token=token,
+            entity_id=entity_id,
+            max_concurrent_fields=max_concurrent_fields,
+            cloud_storage_provider=cloud_storage_provider,
+            aws_s3_bucket=aws_s3_bucket,
+            metrics=metrics == Question.YES,
+            memory_budget_mb=memory_budget_mb,
+            zarr_storage_mode=zarr_storage_mode,
+            result_cache=result_cache,
+            bypass_cache=bypass_cache,
+            tile_cache=tile_cache,
+            max_pixels_per_tile=max_pixels_per_tile,
+            tile_size_m=tile_size_m,
+            max_concurrent_tiles=max_concurrent_tiles,
+            fetch_policy=FetchPolicy(
+                timeout_seconds=fetch_timeout_seconds,
+                max_retries=fetch_max_retries,
+                partial_ok=partial_ok,
+            ),
+            checkpoint_store=checkpoint_store,
         )
 
-        # Generate analytics datacube
-        result = client.trigger()
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid batch request: {exc}") from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500, detail=f"Error while generating datacubes: {exc}"
+        ) from exc
+
+
+@app.post("/analytics-datacube", tags=["Analytic Computation"])
+async def create_analytics_datacube(
+    request: Request,
+    client: Annotated[AnalyticsDatacube, Depends(analytics_datacube_processor)],
+):
+    try:
+        # Generate analytics datacube in a worker thread, off the event loop
+        result = await trigger_until_disconnected(request, client)
 
         return result
 
+    except (AdmissionRejectedError, CircuitOpenError) as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error while generating datacube: {exc}",
+            headers=get_retry_after_header(exc.retry_after_seconds),
+        ) from exc
     except Exception as exc:
         raise HTTPException(
             status_code=500, detail=f"Error while generating datacube: {exc}"
         ) from exc
+
+
+@app.post("/analytics-datacube/jobs", tags=["Analytic Computation"], status_code=202)
+async def create_analytics_datacube_job(
+    client: Annotated[AnalyticsDatacube, Depends(analytics_datacube_processor)],
+    owner: Annotated[str, Depends(get_job_owner)],
+    job_id: Annotated[Optional[str], Query(pattern=JOB_ID_PATTERN.pattern)] = None,
+) -> JobModel:
+    """
+    Enqueue a datacube build and return its job, to poll with GET /jobs/{job_id}
+    and follow with GET /jobs/{job_id}/events or /jobs/{job_id}/events/stream.
+    A cancelled or failed job submitted again with its job_id resumes from its checkpoint
+    (CHECKPOINT_DIR env variable). The job is owned by the subject of the token.
+
+    Raises:
+        HTTPException: 429 if the maximum number of pending jobs is reached, 409 if a job with
+            the same job_id is queued or running, or belongs to another subject
+    """
+    try:
+        # the job waits in its worker until it is admitted
+        return job_manager.submit(partial(trigger_admitted, client), job_id, owner)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    except JobConflictError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@app.post("/analytics-datacube/batch", tags=["Analytic Computation"])
+async def create_analytics_datacube_batch(
+    request: Request,
+    client: Annotated[AnalyticsDatacubeBatch, Depends(analytics_datacube_batch_processor)],
+):
+    """
+    Generate one datacube per field. A failing field does not fail the request,
+    its error is reported in its output.
+    """
+    try:
+        # Generate the datacubes in a worker thread, off the event loop
+        result = await trigger_until_disconnected(request, client)
+
+        return result
+
+    except (AdmissionRejectedError, CircuitOpenError) as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error while generating datacubes: {exc}",
+            headers=get_retry_after_header(exc.retry_after_seconds),
+        ) from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500, detail=f"Error while generating datacubes: {exc}"
+        ) from exc
+
+
+@app.post("/analytics-datacube/batch/jobs", tags=["Analytic Computation"], status_code=202)
+async def create_analytics_datacube_batch_job(
+    client: Annotated[AnalyticsDatacubeBatch, Depends(analytics_datacube_batch_processor)],
+    owner: Annotated[str, Depends(get_job_owner)],
+    job_id: Annotated[Optional[str], Query(pattern=JOB_ID_PATTERN.pattern)] = None,
+) -> JobModel:
+    """
+    Enqueue a batch of datacube builds and return its job, to poll with GET /jobs/{job_id}
+    and follow with GET /jobs/{job_id}/events or /jobs/{job_id}/events/stream.
+    A cancelled or failed job submitted again with its job_id resumes from its checkpoint
+    (CHECKPOINT_DIR env variable). The job is owned by the subject of the token.
+
+    Raises:
+        HTTPException: 429 if the maximum number of pending jobs is reached, 409 if a job with
+            the same job_id is queued or running, or belongs to another subject
+    """
+    try:
+        # the job waits in its worker until it is admitted
+        return job_manager.submit(partial(trigger_admitted, client), job_id, owner)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    except JobConflictError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@app.get("/jobs/{job_id}", tags=["Analytic Computation"])
+async def get_analytics_datacube_job(
+    owner: Annotated[str, Depends(get_job_owner)],
+    job_id: str,
+) -> JobModel:
+    """
+    Get the status, progress and result of a datacube job.
+
+    Raises:
+        HTTPException: 401 if the token is not valid, 404 if the job is unknown or belongs to
+            another subject
+    """
+    job = job_manager.get(job_id, owner)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", tags=["Analytic Computation"])
+async def cancel_analytics_datacube_job(
+    owner: Annotated[str, Depends(get_job_owner)],
+    job_id: str,
+) -> JobModel:
+    """
+    Cancel a datacube job: a queued job is not run, a running job stops at its next fetch,
+    zarr region write or upload, and can be resumed later by submitting it again with its
+    job_id.
+
+    Raises:
+        HTTPException: 401 if the token is not valid, 404 if the job is unknown or belongs to
+            another subject
+    """
+    job = job_manager.cancel(job_id, owner=owner)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/events", tags=["Analytic Computation"])
+async def get_analytics_datacube_job_events(
+    owner: Annotated[str, Depends(get_job_owner)],
+    job_id: str,
+    after: Annotated[int, Query(ge=0)] = 0,
+) -> List[ProgressEventModel]:
+    """
+    Get the progress events of a datacube job (indicator fetched, merge done, chunks written,
+    bytes uploaded...) following the event sequence `after`, to poll with the sequence of the
+    last event received.
+
+    Raises:
+        HTTPException: 401 if the token is not valid, 404 if the job is unknown or belongs to
+            another subject
+    """
+    events = job_manager.get_events(job_id, after, owner)
+    if events is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return events
+
+
+@app.get("/jobs/{job_id}/events/stream", tags=["Analytic Computation"])
+async def stream_analytics_datacube_job_events(
+    owner: Annotated[str, Depends(get_job_owner)],
+    job_id: str,
+    last_event_id: Annotated[Optional[int], Header(ge=0)] = None,
+) -> StreamingResponse:
+    """
+    Stream the progress events of a datacube job as server-sent events, closed with a
+    SUCCEEDED or FAILED event once the job is finished. A reconnecting client resumes after
+    its Last-Event-ID header.
+
+    Raises:
+        HTTPException: 401 if the token is not valid, 404 if the job is unknown or belongs to
+            another subject
+    """
+    if job_manager.get(job_id, owner) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return StreamingResponse(
+        stream_job_events(job_id, last_event_id or 0, owner),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,278 @@
+"""Asynchronous execution of the datacube builds in a bounded worker pool"""
+
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Callable, List, Optional, Union
+
+from byoa.telemetry.log_manager.log_manager import LogManager
+from pydantic import TypeAdapter
+
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.progress import ProgressEvent
+from schemas.job_schema import JobModel, JobStatus, ProgressEventModel
+from schemas.output_schema import BatchOutputModel, OutputModel
+
+logger_manager = LogManager.get_instance()
+
+# a job returns either a single datacube output or a batch output
+job_result_adapter = TypeAdapter(Union[OutputModel, BatchOutputModel])
+
+
+# statuses of the finished jobs
+FINISHED_JOB_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when the maximum number of pending jobs is reached"""
+
+
+class JobConflictError(Exception):
+    """Raised when a job is submitted with the id of a queued or running job"""
+
+
+class JobManager:
+    """
+    Run datacube builds off the API event loop, in a bounded pool of worker threads,
+    and keep track of their status. Each job has a cancellation token, checked by its build
+    between its fetches, zarr region writes and uploads. A job submitted with an owner is only
+    visible to, and cancellable by, the same owner.
+
+    Parameters:
+        max_workers: number of jobs running at the same time
+        max_queue_depth: maximum number of queued or running jobs, new jobs are refused above
+        max_finished_jobs: number of finished jobs kept for status polling
+        max_events_per_job: number of last progress events kept per job
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 1,
+        max_queue_depth: int = 10,
+        max_finished_jobs: int = 1000,
+        max_events_per_job: int = 1000,
+    ):
+        self.max_queue_depth = max_queue_depth
+        self.max_finished_jobs = max_finished_jobs
+        self.max_events_per_job = max_events_per_job
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="datacube-job"
+        )
+        self._jobs: dict = {}
+        self._events: dict = {}
+        self._cancellation_tokens: dict = {}
+        self._owners: dict = {}
+        self._lock = threading.Lock()
+
+    def _pending_jobs_count(self) -> int:
+        return sum(
+            1 for job in self._jobs.values() if job.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+        )
+
+    def _is_visible(self, job_id: str, owner: Optional[str]) -> bool:
+        """a job is visible to its owner, and to the internal calls (owner None)"""
+        return job_id in self._jobs and (owner is None or self._owners.get(job_id) == owner)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.now().isoformat()
+
+    def _prune_finished_jobs(self):
+        finished_jobs = [job for job in self._jobs.values() if job.status in FINISHED_JOB_STATUSES]
+        finished_jobs.sort(key=lambda job: job.updated_at)
+        for job in finished_jobs[: max(0, len(finished_jobs) - self.max_finished_jobs)]:
+            del self._jobs[job.job_id]
+            del self._events[job.job_id]
+            del self._cancellation_tokens[job.job_id]
+            self._owners.pop(job.job_id, None)
+
+    def _add_event(self, job_id: str, event: ProgressEvent):
+        with self._lock:
+            job = self._jobs[job_id]
+            events = self._events[job_id]
+            sequence = events[-1].sequence + 1 if events else 1
+            events.append(
+                ProgressEventModel(
+                    sequence=sequence,
+                    event_type=event.event_type.value,
+                    progress=event.progress,
+                    message=event.message,
+                    done=event.done,
+                    total=event.total,
+                    details=event.details,
+                    timestamp=event.timestamp,
+                )
+            )
+            job.progress = event.progress
+            job.message = event.message
+            job.updated_at = datetime.now().isoformat()
+
+    def _run(self, job_id: str, task: Callable[..., dict], cancellation_token: CancellationToken):
+        # the token of this submission: a job cancelled while queued then submitted again
+        # has a new token, which must not make the cancelled run start
+        with self._lock:
+            if cancellation_token.cancelled:
+                # cancelled while queued
+                return
+        self._update(job_id, status=JobStatus.RUNNING)
+        try:
+            result = task(
+                job_id=job_id,
+                progress_callback=partial(self._add_event, job_id),
+                cancellation_token=cancellation_token,
+            )
+            self._update(
+                job_id,
+                status=JobStatus.SUCCEEDED,
+                progress=1.0,
+                result=job_result_adapter.validate_python(result),
+            )
+        except JobCancelledError as exc:
+            logger_manager.info(f"Job {job_id} cancelled: {exc.reason}")
+            self._update(job_id, status=JobStatus.CANCELLED, error=str(exc))
+        except Exception as exc:
+            logger_manager.error(f"Job {job_id} failed: {exc}")
+            self._update(job_id, status=JobStatus.FAILED, error=str(exc))
+
+    def submit(
+        self,
+        task: Callable[..., dict],
+        job_id: Optional[str] = None,
+        owner: Optional[str] = None,
+    ) -> JobModel:
+        """
+        Enqueue a datacube build.
+
+        Args:
+            task: callable building the datacube(s) and returning the output model as a dict,
+                called with the job_id, progress_callback (receiving the ProgressEvent of the
+                build) and cancellation_token keyword arguments
+            job_id (str, optional): identifier of the job, to resume a cancelled or failed job
+                from its checkpoint. Defaults to a new uuid.
+            owner (str, optional): the caller submitting the job (e.g. the subject of its
+                token), the only one allowed to get, cancel or resume the job
+
+        Raises:
+            QueueFullError: when the maximum number of pending jobs is reached
+            JobConflictError: when a job with the same id is queued or running, or belongs to
+                another owner
+
+        Returns:
+            JobModel: the queued job
+        """
+        with self._lock:
+            previous_job = self._jobs.get(job_id) if job_id is not None else None
+            if previous_job is not None and self._owners.get(job_id) != owner:
+                raise JobConflictError(f"Job {job_id} already exists")
+            if previous_job is not None and previous_job.status not in FINISHED_JOB_STATUSES:
+                raise JobConflictError(f"Job {job_id} is already {previous_job.status.value}")
+            if self._pending_jobs_count() >= self.max_queue_depth:
+                raise QueueFullError(
+                    f"Too many pending jobs (maximum queue depth: {self.max_queue_depth})"
+                )
+            self._prune_finished_jobs()
+            now = datetime.now().isoformat()
+            job = JobModel(
+                job_id=job_id or str(uuid.uuid4()),
+                status=JobStatus.QUEUED,
+                created_at=now,
+                updated_at=now,
+            )
+            self._jobs[job.job_id] = job
+            self._events[job.job_id] = deque(maxlen=self.max_events_per_job)
+            cancellation_token = CancellationToken()
+            self._cancellation_tokens[job.job_id] = cancellation_token
+            self._owners[job.job_id] = owner
+            queued_job = job.model_copy()
+
+        self._executor.submit(self._run, job.job_id, task, cancellation_token)
+        logger_manager.info(f"Job {job.job_id} queued")
+        return queued_job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[JobModel]:
+        """
+        Get the status of a job.
+
+        Args:
+            job_id (str): the job identifier
+            owner (str, optional): the caller, checked against the owner of the job
+
+        Returns:
+            JobModel or None if the job is unknown or belongs to another owner
+        """
+        with self._lock:
+            if not self._is_visible(job_id, owner):
+                return None
+            return self._jobs[job_id].model_copy()
+
+    def get_events(
+        self, job_id: str, after: int = 0, owner: Optional[str] = None
+    ) -> Optional[List[ProgressEventModel]]:
+        """
+        Get the progress events of a job.
+
+        Args:
+            job_id (str): the job identifier
+            after (int, optional): sequence of the last event already received. Defaults to 0.
+            owner (str, optional): the caller, checked against the owner of the job
+
+        Returns:
+            List[ProgressEventModel] or None if the job is unknown or belongs to another owner:
+                the kept events with a sequence above after, in order
+        """
+        with self._lock:
+            if not self._is_visible(job_id, owner):
+                return None
+            events = self._events[job_id]
+            return [event.model_copy() for event in events if event.sequence > after]
+
+    def cancel(
+        self, job_id: str, reason: str = "cancelled by the client", owner: Optional[str] = None
+    ) -> Optional[JobModel]:
+        """
+        Cancel a job: a queued job is not run, a running job stops at its next cancellation
+        check, keeping its checkpoint to be resumed later.
+
+        Args:
+            job_id (str): the job identifier
+            reason (str, optional): why the job is cancelled
+            owner (str, optional): the caller, checked against the owner of the job
+
+        Returns:
+            JobModel or None if the job is unknown or belongs to another owner
+        """
+        with self._lock:
+            if not self._is_visible(job_id, owner):
+                return None
+            job = self._jobs[job_id]
+            if job.status not in FINISHED_JOB_STATUSES:
+                self._cancellation_tokens[job_id].cancel(reason)
+                if job.status == JobStatus.QUEUED:
+                    job.status = JobStatus.CANCELLED
+                    job.error = f"Datacube build cancelled: {reason}"
+                    job.updated_at = datetime.now().isoformat()
+            return job.model_copy()
+
+    def cancel_all(self, reason: str):
+        """
+        Cancel all the queued and running jobs, e.g. on the shutdown of the server.
+
+        Args:
+            reason (str): why the jobs are cancelled
+        """
+        with self._lock:
+            job_ids = [
+                job.job_id
+                for job in self._jobs.values()
+                if job.status not in FINISHED_JOB_STATUSES
+            ]
+        for job_id in job_ids:
+            self.cancel(job_id, reason)
+        if job_ids:
+            logger_manager.info(f"{len(job_ids)} jobs cancelled: {reason}")
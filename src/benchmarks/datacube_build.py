@@ -0,0 +1,398 @@
+"""Benchmark of the datacube builds with a fake Geosys backend and a local cloud storage:
+wall time of each stage, peak memory, bytes and objects written, across datacube sizes and
+numbers of indicators. The results are written as JSON and compared to a baseline.
+
+Run from the src folder:
+    python -m benchmarks.datacube_build --sizes 64 256 --indicator_counts 1 3 \
+        --output benchmark.json
+    python -m benchmarks.datacube_build --sizes 64 256 --indicator_counts 1 3 \
+        --baseline benchmark.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import psutil
+from prometheus_client import REGISTRY
+
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.telemetry import (
+    CLEANUP_STAGE,
+    COMPOSITE_STAGE,
+    CREDENTIAL_CHECK_STAGE,
+    FETCH_STAGE,
+    LOAD_STAGE,
+    MERGE_STAGE,
+    UPLOAD_STAGE,
+    ZARR_ENCODE_STAGE,
+)
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+from benchmarks.fake_geosys import FakeGeosys
+from benchmarks.local_storage import local_cloud_storage
+from utils.file_utils import load_input_data
+
+DEFAULT_INPUT_PATH = os.path.join("data", "processor_input_example.json")
+
+STAGES = (
+    CREDENTIAL_CHECK_STAGE,
+    FETCH_STAGE,
+    MERGE_STAGE,
+    COMPOSITE_STAGE,
+    LOAD_STAGE,
+    ZARR_ENCODE_STAGE,
+    UPLOAD_STAGE,
+    CLEANUP_STAGE,
+)
+
+# compared metrics (lower is better) and the absolute increase below which they are noise
+REGRESSION_NOISE_FLOORS = {"total_s": 0.05, "peak_rss_mb": 20.0, "bytes": 0, "objects": 0}
+
+
+class PeakMemorySampler:
+    """Sample the resident memory of the process in a background thread while in the context
+
+    Parameters:
+        interval_seconds: sampling interval
+    """
+
+    def __init__(self, interval_seconds: float = 0.01):
+        self.interval_seconds = interval_seconds
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self.__process = psutil.Process()
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def __sample(self):
+        while not self.__stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.__process.memory_info().rss)
+            self.__stop.wait(self.interval_seconds)
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = self.__process.memory_info().rss
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__sample, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__stop.set()
+        self.__thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.__process.memory_info().rss)
+
+
+def get_stage_seconds() -> Dict[str, float]:
+    """
+    Get the cumulated duration of each stage from the prometheus stage histogram.
+
+    Returns:
+        dict: stage -> seconds
+    """
+    return {
+        stage: REGISTRY.get_sample_value(
+            "analytics_datacube_stage_duration_seconds_sum", {"stage": stage}
+        )
+        or 0.0
+        for stage in STAGES
+    }
+
+
+def run_scenario(
+    input_data: dict,
+    size: int,
+    nb_indicators: int,
+    cloud_storage_provider: CloudStorageProvider = CloudStorageProvider.AWS,
+    zarr_storage_mode: ZarrStorageMode = ZarrStorageMode.LOCAL,
+    max_concurrent_fetches: int = 1,
+    latency_seconds: float = 0.0,
+) -> dict:
+    """
+    Build and upload the datacube of the input data once, with a fake Geosys client.
+
+    Args:
+        input_data (dict): the processor input data
+        size (int): number of pixels along y and x of the datacube
+        nb_indicators (int): number of indicators, the first ones of the input data
+        cloud_storage_provider (CloudStorageProvider): the (local) cloud storage provider
+        zarr_storage_mode (ZarrStorageMode): the zarr storage mode
+        max_concurrent_fetches (int): maximum number of indicators fetched in parallel
+        latency_seconds (float): duration of a fake Geosys call
+
+    Returns:
+        dict: the measures of the build
+    """
+    scenario_input_data = copy.deepcopy(input_data)
+    scenario_input_data["indicators"] = input_data["indicators"][:nb_indicators]
+    client = FakeGeosys(size=size, latency_seconds=latency_seconds)
+
+    stage_seconds_before = get_stage_seconds()
+    with PeakMemorySampler() as memory:
+        start_time = time.perf_counter()
+        output = AnalyticsDatacube(
+            scenario_input_data,
+            cloud_storage_provider=cloud_storage_provider,
+            metrics=True,
+            max_concurrent_fetches=max_concurrent_fetches,
+            zarr_storage_mode=zarr_storage_mode,
+            client=client,
+        ).trigger()
+        total_seconds = time.perf_counter() - start_time
+    stage_seconds_after = get_stage_seconds()
+
+    metrics = output["metrics"]
+    return {
+        "total_s": total_seconds,
+        "stage_s": {
+            stage: stage_seconds_after[stage] - stage_seconds_before[stage] for stage in STAGES
+        },
+        "peak_rss_mb": memory.peak_bytes / 1024 / 1024,
+        "rss_increase_mb": (memory.peak_bytes - memory.start_bytes) / 1024 / 1024,
+        "bytes": metrics["data_upload_bytes"],
+        "objects": metrics["data_upload_objects"],
+        "geosys_calls": client.calls,
+    }
+
+
+def summarize_runs(runs: List[dict]) -> dict:
+    """
+    Summarize the repeated runs of a scenario: median durations, maximum memory.
+
+    Args:
+        runs (List[dict]): the measures of each run
+
+    Returns:
+        dict: the measures of the scenario
+    """
+    return {
+        "total_s": round(statistics.median(run["total_s"] for run in runs), 4),
+        "stage_s": {
+            stage: round(statistics.median(run["stage_s"][stage] for run in runs), 4)
+            for stage in STAGES
+        },
+        "peak_rss_mb": round(max(run["peak_rss_mb"] for run in runs), 1),
+        "rss_increase_mb": round(max(run["rss_increase_mb"] for run in runs), 1),
+        "bytes": runs[-1]["bytes"],
+        "objects": runs[-1]["objects"],
+        "geosys_calls": runs[-1]["geosys_calls"],
+    }
+
+
+def find_regressions(
+    results: List[dict],
+    baseline: List[dict],
+    tolerance: float,
+    noise_floors: Optional[Dict[str, float]] = None,
+) -> List[dict]:
+    """
+    Compare the results to a baseline: a metric regresses when it increased by more than the
+    tolerance and than its noise floor.
+
+    Args:
+        results (List[dict]): the scenario results
+        baseline (List[dict]): the scenario results of the baseline
+        tolerance (float): the relative increase tolerated (e.g. 0.2 for 20%)
+        noise_floors (Dict[str, float], optional): compared metrics and their absolute noise
+            floor, defaults to REGRESSION_NOISE_FLOORS
+
+    Returns:
+        List[dict]: the regressions (scenario, metric, baseline and current values)
+    """
+    baseline_by_scenario = {result["scenario"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_by_scenario.get(result["scenario"])
+        if baseline_result is None:
+            continue
+        for metric, noise_floor in (noise_floors or REGRESSION_NOISE_FLOORS).items():
+            baseline_value = baseline_result.get(metric)
+            if baseline_value is None:
+                continue
+            increase = result[metric] - baseline_value
+            if increase > max(tolerance * baseline_value, noise_floor):
+                regressions.append(
+                    {
+                        "scenario": result["scenario"],
+                        "metric": metric,
+                        "baseline": baseline_value,
+                        "value": result[metric],
+                        "change": round(increase / baseline_value, 3) if baseline_value else None,
+                    }
+                )
+    return regressions
+
+
+def main(
+    input_path: str = DEFAULT_INPUT_PATH,
+    sizes: List[int] = (64, 256),
+    indicator_counts: List[int] = (1, 3),
+    repeat: int = 1,
+    cloud_storage_provider: CloudStorageProvider = CloudStorageProvider.AWS,
+    zarr_storage_mode: ZarrStorageMode = ZarrStorageMode.LOCAL,
+    max_concurrent_fetches: int = 1,
+    latency_seconds: float = 0.0,
+    output_path: Optional[str] = None,
+    baseline_path: Optional[str] = None,
+    tolerance: float = 0.2,
+    azurite_connection_string: Optional[str] = None,
+) -> int:
+    """
+    Run every scenario (size x number of indicators), print and write the results, and compare
+    them to the baseline.
+
+    Args:
+        input_path (str, optional): processor input file (polygon, dates and indicators).
+        sizes (List[int], optional): numbers of pixels along y and x of the datacubes.
+        indicator_counts (List[int], optional): numbers of indicators of the datacubes.
+        repeat (int, optional): number of runs of each scenario. Defaults to 1.
+        cloud_storage_provider (CloudStorageProvider, optional): AWS (local moto server) or
+            AZURE (local Azurite emulator). Defaults to AWS.
+        zarr_storage_mode (ZarrStorageMode, optional): LOCAL or DIRECT. Defaults to LOCAL.
+        max_concurrent_fetches (int, optional): indicators fetched in parallel. Defaults to 1.
+        latency_seconds (float, optional): duration of a fake Geosys call. Defaults to 0.
+        output_path (str, optional): JSON file of the results. Defaults to None.
+        baseline_path (str, optional): JSON results of a previous run to compare to.
+        tolerance (float, optional): relative increase tolerated before a metric is flagged
+            as a regression. Defaults to 0.2.
+        azurite_connection_string (str, optional): connection string of the Azurite emulator.
+
+    Returns:
+        int: exit status, 1 when a regression is found
+    """
+    input_data = load_input_data(input_path)
+    if input_data is None:
+        raise ValueError(f"Cannot load the input data {input_path}")
+    if max(indicator_counts) > len(input_data["indicators"]):
+        raise ValueError(
+            f"The input data has {len(input_data['indicators'])} indicators, "
+            f"{max(indicator_counts)} requested"
+        )
+
+    results = []
+    with local_cloud_storage(cloud_storage_provider, azurite_connection_string):
+        for size in sizes:
+            for nb_indicators in indicator_counts:
+                runs = [
+                    run_scenario(
+                        input_data,
+                        size,
+                        nb_indicators,
+                        cloud_storage_provider,
+                        zarr_storage_mode,
+                        max_concurrent_fetches,
+                        latency_seconds,
+                    )
+                    for _ in range(repeat)
+                ]
+                result = {
+                    "scenario": f"size_{size}_indicators_{nb_indicators}",
+                    "size": size,
+                    "indicators": nb_indicators,
+                    **summarize_runs(runs),
+                }
+                print(
+                    f"{result['scenario']}: {result['total_s']}s, "
+                    f"peak {result['peak_rss_mb']} MB, {result['bytes']} bytes in "
+                    f"{result['objects']} objects, stages {result['stage_s']}"
+                )
+                results.append(result)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "options": {
+            "input_path": input_path,
+            "cloud_storage_provider": cloud_storage_provider.value,
+            "zarr_storage_mode": zarr_storage_mode.value,
+            "max_concurrent_fetches": max_concurrent_fetches,
+            "latency_seconds": latency_seconds,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = find_regressions(results, baseline, tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regression against {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input_path", type=str, help="Processor input file", default=DEFAULT_INPUT_PATH
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", help="Pixels along y and x", default=[64, 256]
+    )
+    parser.add_argument(
+        "--indicator_counts", type=int, nargs="+", help="Numbers of indicators", default=[1, 3]
+    )
+    parser.add_argument("--repeat", type=int, help="Number of runs of a scenario", default=1)
+    parser.add_argument(
+        "--cloud_storage_provider",
+        type=CloudStorageProvider,
+        help="AWS (local moto server) or AZURE (local Azurite emulator)",
+        default=CloudStorageProvider.AWS,
+    )
+    parser.add_argument(
+        "--zarr_storage_mode",
+        type=ZarrStorageMode,
+        help="Local zarr then upload (LOCAL) or direct write (DIRECT)",
+        default=ZarrStorageMode.LOCAL,
+    )
+    parser.add_argument(
+        "--max_concurrent_fetches", type=int, help="Indicators fetched in parallel", default=1
+    )
+    parser.add_argument(
+        "--latency", type=float, help="Duration in seconds of a fake Geosys call", default=0.0
+    )
+    parser.add_argument("--output", type=str, help="JSON file of the results", default=None)
+    parser.add_argument("--baseline", type=str, help="JSON results to compare to", default=None)
+    parser.add_argument(
+        "--tolerance", type=float, help="Relative increase flagged as a regression", default=0.2
+    )
+    parser.add_argument(
+        "--azurite_connection_string",
+        type=str,
+        help="Connection string of the Azurite emulator",
+        default=None,
+    )
+    args = parser.parse_args()
+
+    sys.exit(
+        main(
+            args.input_path,
+            args.sizes,
+            args.indicator_counts,
+            args.repeat,
+            args.cloud_storage_provider,
+            args.zarr_storage_mode,
+            args.max_concurrent_fetches,
+            args.latency,
+            args.output,
+            args.baseline,
+            args.tolerance,
+            args.azurite_connection_string,
+        )
+    )
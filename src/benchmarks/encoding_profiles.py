@@ -0,0 +1,139 @@
+"""Benchmark of the zarr encoding profiles and layouts: size, number of objects, write time,
+open time and read times of a datacube.
+
+Run from the src folder:
+    python -m benchmarks.encoding_profiles --times 60 --size 512
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xarray
+
+from analytics_datacube_processor.utils import list_directory_objects, write_dataset_to_zarr
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+
+
+def build_synthetic_datacube(
+    nb_times: int, size: int, indicators=("NDVI", "EVI"), seed: int = 0
+) -> xarray.Dataset:
+    """
+    Build a datacube with the Geosys layout (time, band, y, x), smooth indicator values
+    and cloud gaps, in float64 like the merged time series.
+
+    Args:
+        nb_times (int): number of acquisition dates
+        size (int): number of pixels along y and x
+        indicators (tuple): indicator names
+        seed (int): random seed
+
+    Returns:
+        xarray.Dataset
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2023-01-01", periods=nb_times, freq="5D")
+    y = np.arange(size)
+    x = np.arange(size)
+    season = np.sin(np.linspace(0, np.pi, nb_times))[:, None, None]
+    field = np.add.outer(np.sin(y / 25.0), np.cos(x / 25.0))[None, :, :] / 4
+    data_vars = {}
+    for indicator in indicators:
+        values = 0.2 + 0.6 * season + 0.1 * field + rng.normal(0, 0.02, (nb_times, size, size))
+        values[rng.random((nb_times, size, size)) < 0.1] = np.nan
+        data_vars[indicator.lower()] = xarray.DataArray(
+            values[:, None, :, :],
+            dims=("time", "band", "y", "x"),
+            coords={"time": times, "band": [indicator], "y": y, "x": x},
+        )
+    return xarray.Dataset(data_vars)
+
+
+def benchmark_profile(
+    dataset: xarray.Dataset,
+    profile: ZarrEncodingProfile,
+    zarr_layout: ZarrLayout = ZarrLayout.CHUNKED,
+) -> dict:
+    """
+    Write a datacube with a profile and layout, then open it and read back a pixel time series
+    and an image.
+
+    Args:
+        dataset (xarray.Dataset): the datacube
+        profile (ZarrEncodingProfile): the encoding profile
+        zarr_layout (ZarrLayout, optional): the zarr layout
+
+    Returns:
+        dict: the benchmark results
+    """
+    zarr_path = os.path.join(tempfile.mkdtemp(), f"{profile.value}_{zarr_layout.value}.zarr")
+    try:
+        start_time = time.perf_counter()
+        write_dataset_to_zarr(
+            dataset, zarr_path, encoding_profile=profile, zarr_layout=zarr_layout
+        )
+        write_seconds = time.perf_counter() - start_time
+
+        objects = list_directory_objects(zarr_path)
+        size_bytes = sum(os.path.getsize(file_path) for file_path, _ in objects)
+
+        start_time = time.perf_counter()
+        with xarray.open_zarr(zarr_path) as stored:
+            open_seconds = time.perf_counter() - start_time
+            variable = list(stored.data_vars)[0]
+            start_time = time.perf_counter()
+            stored[variable].isel(y=dataset.sizes["y"] // 2, x=dataset.sizes["x"] // 2).load()
+            time_series_read_seconds = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            stored[variable].isel(time=dataset.sizes["time"] // 2).load()
+            image_read_seconds = time.perf_counter() - start_time
+
+        return {
+            "profile": profile.value,
+            "layout": zarr_layout.value,
+            "size_mb": round(size_bytes / 1024 / 1024, 2),
+            "objects": len(objects),
+            "write_s": round(write_seconds, 3),
+            "open_s": round(open_seconds, 4),
+            "time_series_read_s": round(time_series_read_seconds, 4),
+            "image_read_s": round(image_read_seconds, 4),
+        }
+    finally:
+        shutil.rmtree(os.path.dirname(zarr_path), ignore_errors=True)
+
+
+def main(nb_times: int = 60, size: int = 512):
+    """
+    Print the benchmark of every encoding profile and layout.
+
+    Args:
+        nb_times (int, optional): number of acquisition dates. Defaults to 60.
+        size (int, optional): number of pixels along y and x. Defaults to 512.
+    """
+    dataset = build_synthetic_datacube(nb_times, size)
+    print(
+        f"datacube: {dict(dataset.sizes)}, {round(dataset.nbytes / 1024 / 1024, 1)} MB in memory"
+    )
+    results = pd.DataFrame(
+        [
+            benchmark_profile(dataset, profile, zarr_layout)
+            for profile in ZarrEncodingProfile
+            for zarr_layout in ZarrLayout
+        ]
+    )
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--times", type=int, help="Number of acquisition dates", default=60)
+    parser.add_argument("--size", type=int, help="Number of pixels along y and x", default=512)
+    args = parser.parse_args()
+
+    main(args.times, args.size)
@@ -0,0 +1,152 @@
+"""Offline stand-in of the Geosys client, synthesizing indicator time series"""
+
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import xarray
+from pyproj import Transformer
+from shapely import wkt
+
+from analytics_datacube_processor.band_math import REFLECTANCE_INDICATOR
+
+# sensors of the synthesized scenes, alternating along time
+SENSORS = ("SENTINEL_2", "LANDSAT_8")
+
+# bands of the synthesized reflectance (scaled 0-10000 like Geosys)
+REFLECTANCE_BANDS = ("Blue", "Green", "Red", "NIR", "SWIR1")
+
+
+def get_utm_epsg(longitude: float, latitude: float) -> int:
+    """
+    Get the EPSG code of the UTM zone of a point.
+
+    Args:
+        longitude (float): longitude in degrees
+        latitude (float): latitude in degrees
+
+    Returns:
+        int: the EPSG code (WGS84 / UTM)
+    """
+    zone = min(int((longitude + 180) // 6) + 1, 60)
+    return (32600 if latitude >= 0 else 32700) + zone
+
+
+class FakeGeosys:
+    """Fake Geosys client returning synthetic time series in the layout of
+    `Geosys.get_satellite_image_time_series`: one variable per indicator with (time, band, y, x)
+    dims on the UTM grid of the polygon, and the image coordinates of each scene.
+
+    Parameters:
+        resolution_m: pixel size in meters
+        size: optional number of pixels along y and x, overriding the extent of the polygon
+        revisit_days: number of days between two scenes
+        cloud_fraction: mean fraction of cloudy (missing) pixels of a scene
+        latency_seconds: duration of a call, to emulate the Geosys processing and transfer
+        seed: random seed, the same call returns the same values
+    """
+
+    def __init__(
+        self,
+        resolution_m: float = 10.0,
+        size: Optional[int] = None,
+        revisit_days: int = 5,
+        cloud_fraction: float = 0.2,
+        latency_seconds: float = 0.0,
+        seed: int = 0,
+    ):
+        self.resolution_m = resolution_m
+        self.size = size
+        self.revisit_days = revisit_days
+        self.cloud_fraction = cloud_fraction
+        self.latency_seconds = latency_seconds
+        self.seed = seed
+        self.calls = 0
+        self.__lock = threading.Lock()
+
+    def __get_grid(self, polygon: str):
+        """UTM CRS and pixel centers (x ascending, y descending) of the polygon"""
+        shape = wkt.loads(polygon)
+        epsg = get_utm_epsg(shape.centroid.x, shape.centroid.y)
+        transformer = Transformer.from_crs(4326, epsg, always_xy=True)
+        if self.size is not None:
+            center_x, center_y = transformer.transform(shape.centroid.x, shape.centroid.y)
+            half_extent = self.size * self.resolution_m / 2
+            min_x, min_y = center_x - half_extent, center_y - half_extent
+            max_x, max_y = center_x + half_extent, center_y + half_extent
+        else:
+            min_x, min_y, max_x, max_y = transformer.transform_bounds(*shape.bounds)
+        min_x = np.floor(min_x / self.resolution_m) * self.resolution_m
+        max_y = np.ceil(max_y / self.resolution_m) * self.resolution_m
+        nb_x = self.size or max(1, int(np.ceil((max_x - min_x) / self.resolution_m)))
+        nb_y = self.size or max(1, int(np.ceil((max_y - min_y) / self.resolution_m)))
+        x = min_x + (np.arange(nb_x) + 0.5) * self.resolution_m
+        y = max_y - (np.arange(nb_y) + 0.5) * self.resolution_m
+        return f"EPSG:{epsg}", x, y
+
+    def get_satellite_image_time_series(
+        self,
+        polygon: str,
+        start_date: datetime,
+        end_date: datetime,
+        collections: Optional[list] = None,
+        indicators: Optional[List[str]] = None,
+    ) -> xarray.Dataset:
+        """
+        Synthesize the time series of an indicator: a seasonal signal, a spatial pattern,
+        noise and cloud gaps.
+
+        Args:
+            polygon (str): WKT polygon
+            start_date (datetime): start date
+            end_date (datetime): end date
+            collections (list, optional): satellite collections, ignored
+            indicators (List[str]): the indicator, a single one like the Geosys calls of the
+                processor
+
+        Returns:
+            xarray.Dataset
+        """
+        with self.__lock:
+            self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        indicator = indicators[0]
+        crs, x, y = self.__get_grid(polygon)
+        times = pd.date_range(start_date, end_date, freq=f"{self.revisit_days}D")
+        rng = np.random.default_rng([self.seed, sum(map(ord, indicator))])
+
+        day_of_year = times.dayofyear.to_numpy()
+        season = np.sin(np.pi * day_of_year / 365.0)[:, None, None]
+        pattern = np.add.outer(np.sin(np.arange(len(y)) / 25.0), np.cos(np.arange(len(x)) / 25.0))
+        bands = REFLECTANCE_BANDS if indicator == REFLECTANCE_INDICATOR else (indicator,)
+        shape = (len(times), len(y), len(x))
+        clouds = rng.random(shape) < rng.uniform(0, 2 * self.cloud_fraction, (len(times), 1, 1))
+
+        values = np.empty((len(times), len(bands), len(y), len(x)), dtype=np.float32)
+        for band_index in range(len(bands)):
+            band_values = 0.2 + 0.6 * season + 0.1 * pattern[None] + rng.normal(0, 0.02, shape)
+            if indicator == REFLECTANCE_INDICATOR:
+                band_values = band_values * (band_index + 1) / len(bands) * 10000
+            band_values[clouds] = np.nan
+            values[:, band_index] = band_values
+
+        return xarray.Dataset(
+            {
+                indicator.lower(): xarray.DataArray(
+                    values,
+                    dims=("time", "band", "y", "x"),
+                    coords={"time": times, "band": list(bands), "y": y, "x": x},
+                )
+            },
+            coords={
+                "image.id": ("time", [f"{indicator}_{index}" for index in range(len(times))]),
+                "image.sensor": ("time", [SENSORS[index % 2] for index in range(len(times))]),
+                "image.spatialResolution": ("time", np.full(len(times), self.resolution_m)),
+                "crs": ("time", [crs] * len(times)),
+            },
+        )
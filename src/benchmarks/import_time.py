@@ -0,0 +1,201 @@
+"""Benchmark of the cold start of the entry points: wall time of their import, and of a refused
+Lambda invocation, in fresh interpreters, with the heaviest direct imports reported by
+`python -X importtime`. The results are written as JSON and compared to a baseline.
+
+Run from the src folder:
+    python -m benchmarks.import_time --output import_time.json
+    python -m benchmarks.import_time --baseline import_time.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from benchmarks.datacube_build import find_regressions
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# scenario name -> statements run in a fresh interpreter
+SCENARIOS = {
+    "main": "import main",
+    "lambda_handler": "import lambda_handler",
+    "refused_invocation": (
+        "import lambda_handler\n"
+        "try:\n"
+        "    lambda_handler.handler({'input_data': {}})\n"
+        "except Exception:\n"
+        "    pass"
+    ),
+    "processing_stack": (
+        "import analytics_datacube_processor.processor\n"
+        "import analytics_datacube_processor.batch_processor"
+    ),
+}
+
+REGRESSION_NOISE_FLOORS = {"total_s": 0.05}
+
+
+def _get_import_times(stderr: str) -> List[Tuple[str, int, float]]:
+    """(module, depth, cumulative seconds) of the `-X importtime` report, children first"""
+    import_times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            # the nested imports are indented by two spaces below their importer
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            import_times.append((name.strip(), depth, int(cumulative) / 1e6))
+    return import_times
+
+
+def get_startup_modules() -> List[str]:
+    """
+    Get the modules imported by the startup of an interpreter.
+
+    Returns:
+        List[str]: the top level modules imported before the statements run
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        cwd=SRC_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [name for name, depth, _ in _get_import_times(completed.stderr) if depth == 0]
+
+
+def run_scenario(statements: str, startup_modules: List[str]) -> Tuple[float, Dict[str, float]]:
+    """
+    Run statements in a fresh interpreter.
+
+    Args:
+        statements (str): the python statements
+        startup_modules (List[str]): the modules imported by the interpreter startup
+
+    Returns:
+        Tuple[float, Dict[str, float]]: the wall time in seconds of the statements, and the
+            cumulative import time in seconds of the modules directly imported by the
+            statements and by the modules they import
+    """
+    code = (
+        "import time\n"
+        "_start = time.perf_counter()\n"
+        f"{statements}\n"
+        "print(time.perf_counter() - _start)"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_seconds = {}
+    children = {}
+    for name, depth, seconds in _get_import_times(completed.stderr):
+        if depth == 1:
+            children[name] = seconds
+        elif depth == 0:
+            if name not in startup_modules:
+                import_seconds.update(children)
+            children = {}
+    return float(completed.stdout.strip().splitlines()[-1]), import_seconds
+
+
+def main(
+    scenarios: List[str] = tuple(SCENARIOS),
+    repeat: int = 5,
+    top: int = 5,
+    output_path: str = None,
+    baseline_path: str = None,
+    tolerance: float = 0.2,
+) -> int:
+    """
+    Run the import time benchmark.
+
+    Args:
+        scenarios (List[str], optional): names of the scenarios. Defaults to all.
+        repeat (int, optional): number of runs of a scenario. Defaults to 5.
+        top (int, optional): number of heaviest imports reported. Defaults to 5.
+        output_path (str, optional): JSON file of the results.
+        baseline_path (str, optional): JSON results of a previous run to compare to.
+        tolerance (float, optional): relative increase of the wall time flagged as a
+            regression. Defaults to 0.2.
+
+    Returns:
+        int: exit status, 1 when a regression is found
+    """
+    startup_modules = get_startup_modules()
+    results = []
+    for scenario in scenarios:
+        runs = [run_scenario(SCENARIOS[scenario], startup_modules) for _ in range(repeat)]
+        totals = [total_seconds for total_seconds, _ in runs]
+        heaviest_imports = sorted(runs[0][1].items(), key=lambda item: item[1], reverse=True)
+        result = {
+            "scenario": scenario,
+            "total_s": round(statistics.median(totals), 3),
+            "max_total_s": round(max(totals), 3),
+            "heaviest_imports_s": {
+                name: round(seconds, 3) for name, seconds in heaviest_imports[:top]
+            },
+        }
+        print(
+            f"{scenario}: {result['total_s']}s (max {result['max_total_s']}s), "
+            f"heaviest imports {result['heaviest_imports_s']}"
+        )
+        results.append(result)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "options": {"repeat": repeat},
+        "results": results,
+    }
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = find_regressions(results, baseline, tolerance, REGRESSION_NOISE_FLOORS)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regression against {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenarios",
+        type=str,
+        nargs="+",
+        choices=list(SCENARIOS),
+        help="Scenarios to run",
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--repeat", type=int, help="Number of runs of a scenario", default=5)
+    parser.add_argument("--top", type=int, help="Number of heaviest imports reported", default=5)
+    parser.add_argument("--output", type=str, help="JSON file of the results", default=None)
+    parser.add_argument("--baseline", type=str, help="JSON results to compare to", default=None)
+    parser.add_argument(
+        "--tolerance", type=float, help="Relative increase flagged as a regression", default=0.2
+    )
+    args = parser.parse_args()
+
+    sys.exit(
+        main(args.scenarios, args.repeat, args.top, args.output, args.baseline, args.tolerance)
+    )
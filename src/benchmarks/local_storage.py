@@ -0,0 +1,140 @@
+"""Local stand-ins of the cloud storage providers for the benchmarks: an in-process moto S3
+server for AWS, an Azurite emulator for Azure"""
+
+import logging
+import os
+import socket
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import boto3
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobServiceClient
+
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+
+# default connection string of a local Azurite emulator (well-known development account)
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+
+@contextmanager
+def _environment(variables: Dict[str, str]):
+    """set environment variables while in the context, then restore them"""
+    previous = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_s3_storage(bucket: str = "benchmark"):
+    """
+    Serve S3 from an in-process moto server while in the context, with the AWS environment
+    variables of the processor pointing to it.
+
+    Args:
+        bucket (str): the bucket created on the server
+
+    Yields:
+        str: the endpoint url of the server
+    """
+    try:
+        from moto.server import ThreadedMotoServer  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise RuntimeError(
+            "The local S3 storage requires moto, install it with: pip install 'moto[server]'"
+        ) from exc
+
+    # the request logs of the server would flood the benchmark output
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = _get_free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    endpoint_url = f"http://127.0.0.1:{port}"
+    try:
+        with _environment(
+            {
+                "AWS_ACCESS_KEY_ID": "benchmark",
+                "AWS_SECRET_ACCESS_KEY": "benchmark",
+                "AWS_DEFAULT_REGION": "us-east-1",
+                "AWS_ENDPOINT_URL": endpoint_url,
+                "AWS_BUCKET_NAME": bucket,
+            }
+        ):
+            boto3.client("s3", endpoint_url=endpoint_url).create_bucket(Bucket=bucket)
+            yield endpoint_url
+    finally:
+        server.stop()
+
+
+@contextmanager
+def local_azure_storage(
+    container: str = "benchmark", connection_string: str = AZURITE_CONNECTION_STRING
+):
+    """
+    Point the Azure environment variables of the processor to a running Azurite emulator
+    (e.g. `docker run -p 10000:10000 mcr.microsoft.com/azure-storage/azurite azurite-blob`)
+    while in the context.
+
+    Args:
+        container (str): the container created on the emulator
+        connection_string (str): the connection string of the emulator
+
+    Yields:
+        str: the connection string
+    """
+    with _environment(
+        {
+            "AZURE_STORAGE_CONNECTION_STRING": connection_string,
+            "AZURE_BLOB_CONTAINER_NAME": container,
+            # the connection string takes precedence, these only pass the credentials check
+            "AZURE_ACCOUNT_NAME": "devstoreaccount1",
+            "AZURE_SAS_CREDENTIAL": "benchmark",
+        }
+    ):
+        try:
+            BlobServiceClient.from_connection_string(connection_string).create_container(container)
+        except ResourceExistsError:
+            pass
+        yield connection_string
+
+
+@contextmanager
+def local_cloud_storage(
+    cloud_storage_provider: CloudStorageProvider,
+    azurite_connection_string: Optional[str] = None,
+):
+    """
+    Local stand-in of a cloud storage provider while in the context.
+
+    Args:
+        cloud_storage_provider (CloudStorageProvider): AWS (moto) or AZURE (Azurite)
+        azurite_connection_string (str, optional): connection string of the Azurite emulator
+
+    Yields:
+        str: the endpoint url (AWS) or connection string (AZURE) of the stand-in
+    """
+    if cloud_storage_provider == CloudStorageProvider.AZURE:
+        with local_azure_storage(
+            connection_string=azurite_connection_string or AZURITE_CONNECTION_STRING
+        ) as connection_string:
+            yield connection_string
+    else:
+        with local_s3_storage() as endpoint_url:
+            yield endpoint_url
@@ -0,0 +1,210 @@
+"""AWS Lambda handler of the analytics datacube processor (event fields in the README)"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from analytics_datacube_processor.cancellation import CancellationToken
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.identifiers import JOB_ID_PATTERN
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+from utils.file_utils import is_batch_input, validate_data
+from utils.token_utils import check_token_validity
+
+load_dotenv()
+
+
+class WarmHandler:
+    """processing stack imported once per execution environment, with its caches, upload pool
+    and processor options (same env variables as the API)"""
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        from geosyspy.utils.constants import Env, Region
+
+        from analytics_datacube_processor.batch_processor import AnalyticsDatacubeBatch
+        from analytics_datacube_processor.checkpoint import get_checkpoint_store_from_env
+        from analytics_datacube_processor.fetch_policy import DEFAULT_MAX_RETRIES, FetchPolicy
+        from analytics_datacube_processor.processor import AnalyticsDatacube
+        from analytics_datacube_processor.result_cache import get_result_cache_from_env
+        from analytics_datacube_processor.spatial_tiling import DEFAULT_TILE_SIZE_M
+        from analytics_datacube_processor.tile_cache import get_tile_cache_from_env
+        from analytics_datacube_processor.utils import is_configured_storage_link
+
+        self.processor_class = AnalyticsDatacube
+        self.is_configured_storage_link = is_configured_storage_link
+        self.batch_processor_class = AnalyticsDatacubeBatch
+        self.fetch_policy_class = FetchPolicy
+        self.enum_env = Env.PROD
+        self.enum_region = Region.NA
+
+        memory_budget_mb = os.getenv("MEMORY_BUDGET_MB")
+        max_pixels_per_tile = os.getenv("MAX_PIXELS_PER_TILE")
+        fetch_timeout_seconds = os.getenv("FETCH_TIMEOUT_SECONDS")
+        self.fetch_timeout_seconds = (
+            float(fetch_timeout_seconds) if fetch_timeout_seconds is not None else None
+        )
+        self.fetch_max_retries = int(os.getenv("FETCH_MAX_RETRIES", str(DEFAULT_MAX_RETRIES)))
+        self.max_concurrent_fields = int(os.getenv("MAX_CONCURRENT_FIELDS", "4"))
+        self.upload_workers = int(os.getenv("UPLOAD_WORKERS", "8"))
+        self.upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers)
+        self.processor_options = {
+            "client_id": os.getenv("API_CLIENT_ID"),
+            "client_secret": os.getenv("API_CLIENT_SECRET"),
+            "username": os.getenv("API_USERNAME"),
+            "password": os.getenv("API_PASSWORD"),
+            "memory_budget_mb": float(memory_budget_mb) if memory_budget_mb is not None else None,
+            "result_cache": get_result_cache_from_env(),
+            "tile_cache": get_tile_cache_from_env(),
+            "max_pixels_per_tile": (
+                int(max_pixels_per_tile) if max_pixels_per_tile is not None else None
+            ),
+            "tile_size_m": float(os.getenv("TILE_SIZE_M", str(DEFAULT_TILE_SIZE_M))),
+            "max_concurrent_tiles": int(os.getenv("MAX_CONCURRENT_TILES", "4")),
+            "checkpoint_store": get_checkpoint_store_from_env(),
+        }
+
+    def __call__(
+        self,
+        event: dict,
+        batch_input: bool,
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> dict:
+        """
+        Build and store the datacube of a validated event.
+
+        Args:
+            event (dict): the invocation event
+            batch_input (bool): whether the input data is a batch of fields
+            cancellation_token (CancellationToken, optional): token cancelling the build
+
+        Raises:
+            ValueError: if append_to is not a storage link of the configured bucket or container
+
+        Returns:
+            dict: the processor output
+        """
+        append_to = event.get("append_to")
+        if append_to is not None and not self.is_configured_storage_link(append_to):
+            raise ValueError(
+                f"append_to {append_to!r} is not in the configured bucket or container."
+            )
+        options = {
+            **self.processor_options,
+            "bearer_token": event.get("bearer_token"),
+            "entity_id": event.get("entity_id"),
+            "enum_env": self.enum_env,
+            "enum_region": self.enum_region,
+            "metrics": bool(event.get("metrics", False)),
+            "cloud_storage_provider": CloudStorageProvider(
+                event.get("cloud_storage_provider", CloudStorageProvider.AWS.value)
+            ),
+            "aws_s3_bucket": event.get("aws_s3_bucket"),
+            "zarr_storage_mode": ZarrStorageMode(
+                event.get("zarr_storage_mode", ZarrStorageMode.LOCAL.value)
+            ),
+            "bypass_cache": bool(event.get("bypass_cache", False)),
+            "job_id": event.get("job_id"),
+            "cancellation_token": cancellation_token,
+            "upload_workers": self.upload_workers,
+            "fetch_policy": self.fetch_policy_class(
+                timeout_seconds=self.fetch_timeout_seconds,
+                max_retries=self.fetch_max_retries,
+                partial_ok=bool(event.get("partial_ok", False)),
+            ),
+        }
+        if batch_input:
+            processor = self.batch_processor_class(
+                event["input_data"], max_concurrent_fields=self.max_concurrent_fields, **options
+            )
+        else:
+            processor = self.processor_class(
+                event["input_data"],
+                append_to=append_to,
+                upload_executor=self.upload_executor,
+                **options,
+            )
+        return processor.trigger()
+
+
+_warm_handler: Optional[WarmHandler] = None
+_warm_handler_lock = threading.Lock()
+
+
+def get_warm_handler() -> WarmHandler:
+    """get the processing stack of the execution environment, initialized by the first call"""
+    global _warm_handler  # pylint: disable=global-statement
+    with _warm_handler_lock:
+        if _warm_handler is None:
+            _warm_handler = WarmHandler()
+        return _warm_handler
+
+
+def check_event(event: dict) -> bool:
+    """
+    Validate the input data and the token of an event, without the processing stack.
+
+    Args:
+        event (dict): the invocation event
+
+    Raises:
+        ValueError: if the event has no input data, an invalid option or an invalid token
+        ValidationError: if the input data does not conform to the input schema
+
+    Returns:
+        bool: whether the input data is a batch of fields
+    """
+    input_data = event.get("input_data")
+    if not isinstance(input_data, dict):
+        raise ValueError("The event has no input_data object.")
+    batch_input = is_batch_input(input_data)
+    if batch_input and event.get("append_to") is not None:
+        raise ValueError("append_to is not supported with a batch input.")
+    validate_data(input_data, "batch_input" if batch_input else "input")
+    CloudStorageProvider(event.get("cloud_storage_provider", CloudStorageProvider.AWS.value))
+    ZarrStorageMode(event.get("zarr_storage_mode", ZarrStorageMode.LOCAL.value))
+    job_id = event.get("job_id")
+    if job_id is not None and not JOB_ID_PATTERN.match(str(job_id)):
+        raise ValueError(f"Invalid job_id {job_id!r}.")
+
+    public_certificate_key = os.getenv("CIPHER_CERTIFICATE_PUBLIC_KEY")
+    bearer_token = event.get("bearer_token")
+    if bearer_token and public_certificate_key is not None:
+        if not check_token_validity(bearer_token, public_certificate_key.replace("\\n", "\n")):
+            raise ValueError("Not Authorized")
+    return batch_input
+
+
+def handler(event: dict, context=None) -> dict:
+    """
+    Lambda entry point: validate the event, then build its datacube with the warm stack.
+
+    Args:
+        event (dict): the invocation event
+        context (LambdaContext, optional): the invocation context, cancels the build before
+            its timeout
+
+    Returns:
+        dict: the processor output
+    """
+    batch_input = check_event(event)
+    cancellation_token = CancellationToken()
+    timer = None
+    if context is not None:
+        # stop the build on a consistent checkpoint before the invocation times out
+        remaining_seconds = context.get_remaining_time_in_millis() / 1000
+        timer = threading.Timer(
+            max(0.0, remaining_seconds - float(os.getenv("LAMBDA_CANCEL_MARGIN_SECONDS", "10"))),
+            cancellation_token.cancel,
+            args=("Lambda invocation timeout",),
+        )
+        timer.daemon = True
+        timer.start()
+    try:
+        return get_warm_handler()(event, batch_input, cancellation_token)
+    finally:
+        if timer is not None:
+            timer.cancel()
@@ -2,14 +2,19 @@
 
 import argparse
 import os
+import signal
+import threading
 
 from dotenv import load_dotenv
-from geosyspy.geosys import Env, Region
-from geosyspy.utils.jwt_validator import check_token_validity
 
 from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
-from analytics_datacube_processor.processor import AnalyticsDatacube
-from utils.file_utils import load_input_data
+from analytics_datacube_processor.output_format import OutputFormat
+from analytics_datacube_processor.temporal_reducer import TemporalReducer
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+from utils.file_utils import is_batch_input, load_input_data, validate_data
+from utils.token_utils import check_token_validity
 
 
 def main(
@@ -19,6 +24,29 @@ def main(
     metrics: bool = False,
     entity_id=None,
     cloud_storage_provider=CloudStorageProvider.AWS,
+    max_concurrent_fetches: int = 1,
+    derive_indicators_locally: bool = False,
+    memory_budget_mb=None,
+    zarr_storage_mode=ZarrStorageMode.LOCAL,
+    upload_workers: int = 8,
+    bypass_cache: bool = False,
+    append_to=None,
+    max_concurrent_fields: int = 4,
+    encoding_profile=None,
+    zarr_layout=None,
+    max_pixels_per_tile=None,
+    tile_size_m=None,
+    max_concurrent_tiles: int = 4,
+    composite_period=None,
+    composite_reducer=None,
+    composite_percentile=None,
+    min_valid_fraction=None,
+    output_format=None,
+    fetch_timeout=None,
+    fetch_retries=None,
+    partial_ok: bool = False,
+    progress: bool = False,
+    job_id=None,
 ):
     """_summary_
 
@@ -31,7 +59,59 @@ def main(
         cloud_storage_provider (CloudStorageProvider, optional): The cloud storage provider to use
             for storing the output file. It should be one of the values from the CloudStorageProvider enum
             (AWS or AZURE). Defaults to CloudStorageProvider.AWS.
-
+        max_concurrent_fetches (int, optional): Maximum number of indicators fetched in parallel.
+            Defaults to 1 (sequential).
+        derive_indicators_locally (bool, optional): Whether to fetch the reflectance bands once
+            and compute the indicators locally. Defaults to False.
+        memory_budget_mb (float, optional): Memory budget (MB) of a fetch window and of a zarr
+            write. When set, the indicators are fetched by date windows spilled on the local disk
+            and the datacube is streamed to zarr time slice by time slice. Defaults to None.
+        zarr_storage_mode (ZarrStorageMode, optional): Write the zarr in a local temporary folder
+            then upload it (LOCAL), or directly on the cloud storage (DIRECT).
+            Defaults to ZarrStorageMode.LOCAL.
+        upload_workers (int, optional): Number of objects uploaded in parallel. Defaults to 8.
+        bypass_cache (bool, optional): Ignore the result cache (configured with the
+            RESULT_CACHE_* environment variables) and build the datacube again. Defaults to False.
+        append_to (str, optional): Storage link of an existing datacube of the same polygon and
+            indicators. Only the dates after its last time are fetched and appended to it.
+            Defaults to None.
+        max_concurrent_fields (int, optional): Maximum number of fields of a batch input
+            processed in parallel. Defaults to 4.
+        encoding_profile (ZarrEncodingProfile, optional): Chunks, compression and dtype profile
+            of the zarr, overrides the encoding_profile of the input file. Defaults to None.
+        zarr_layout (ZarrLayout, optional): One object per chunk (CHUNKED) or chunks packed in
+            shards (SHARDED), overrides the zarr_layout of the input file. Defaults to None.
+        max_pixels_per_tile (int, optional): Number of pixels of an image of the area of
+            interest above which the area is split into tiles processed in parallel.
+            Defaults to None (no tiling).
+        tile_size_m (float, optional): Side of the tiles in meters. Defaults to None (5120).
+        max_concurrent_tiles (int, optional): Maximum number of tiles processed in parallel.
+            Defaults to 4.
+        composite_period (str, optional): Compositing period (e.g. 7D, 1M), the scenes of each
+            period are reduced to a single composite. Defaults to None.
+        composite_reducer (TemporalReducer, optional): Temporal reducer of the composites
+            (MEAN, MEDIAN, MAX, MIN, PERCENTILE). Defaults to None (MEAN).
+        composite_percentile (float, optional): Percentile (0 to 100) of the PERCENTILE
+            reducer. Defaults to None.
+        min_valid_fraction (float, optional): Minimum fraction (0 to 1) of valid pixels of a
+            scene, the cloudy scenes below are dropped. Defaults to None.
+        The compositing options override the compositing of the input file.
+        output_format (OutputFormat, optional): The datacube (ZARR), or its zonal statistics
+            over the polygon (PARQUET, CSV or INLINE), overrides the output_format of the input
+            file. Defaults to None.
+        fetch_timeout (float, optional): HTTP timeout in seconds of the indicator fetches (of
+            the connection and of each read). Defaults to None (no timeout).
+        fetch_retries (int, optional): Number of retries of a fetch after a transient Geosys
+            failure (timeout, 5xx, 429), with a jittered exponential backoff.
+            Defaults to None (2).
+        partial_ok (bool, optional): Build the datacube of the other indicators when an
+            indicator cannot be fetched, instead of failing. Defaults to False.
+        progress (bool, optional): Show the progress of the build stages (indicators fetched,
+            merge, chunks written, bytes uploaded) as a line on the standard error.
+            Defaults to False.
+        job_id (str, optional): Identifier of the job, checkpointed in the CHECKPOINT_DIR folder:
+            a job stopped by a SIGTERM (e.g. a rescheduled pod) or a failure resumes when it is
+            run again with the same job_id. Defaults to None.
 
     Returns:
         zarr_path: path of the output zarr file
@@ -49,6 +129,24 @@ def main(
     else:
         raise ValueError(f"Unrecognized environment: {environment}")
 
+    if encoding_profile is not None:
+        input_data["encoding_profile"] = encoding_profile.value
+    if zarr_layout is not None:
+        input_data["zarr_layout"] = zarr_layout.value
+    if output_format is not None:
+        input_data["output_format"] = output_format.value
+    compositing_options = {
+        "period": composite_period,
+        "reducer": composite_reducer.value if composite_reducer is not None else None,
+        "percentile": composite_percentile,
+        "min_valid_fraction": min_valid_fraction,
+    }
+    if any(value is not None for value in compositing_options.values()):
+        input_data["compositing"] = {
+            **(input_data.get("compositing") or {}),
+            **{key: value for key, value in compositing_options.items() if value is not None},
+        }
+
     api_client_id = os.getenv("API_CLIENT_ID")
     api_client_secret = os.getenv("API_CLIENT_SECRET")
     api_username = os.getenv("API_USERNAME")
@@ -57,6 +155,12 @@ def main(
     if public_certificate_key is not None:
         public_certificate_key = public_certificate_key.replace("\\n", "\n")
 
+    # the invalid inputs and tokens are refused before the import of the processing stack
+    batch_input = is_batch_input(input_data)
+    if batch_input and append_to is not None:
+        raise ValueError("append_to is not supported with a batch input.")
+    validate_data(input_data, "batch_input" if batch_input else "input")
+
     # Check token validity
     if bearer_token and (
         public_certificate_key is not None
@@ -64,20 +168,81 @@ def main(
     ):
         raise ValueError("Not Authorized")
 
-    processor = AnalyticsDatacube(
-        input_data=input_data,
-        client_id=api_client_id,
-        client_secret=api_client_secret,
-        username=api_username,
-        password=api_password,
-        enum_env=Env.PROD,
-        enum_region=Region.NA,
-        bearer_token=bearer_token,
-        entity_id=entity_id,
-        metrics=metrics,
-        cloud_storage_provider=cloud_storage_provider,
-        aws_s3_bucket=aws_s3_bucket,
-    )
+    # pylint: disable=import-outside-toplevel
+    from geosyspy.utils.constants import Env, Region
+
+    from analytics_datacube_processor.batch_processor import AnalyticsDatacubeBatch
+    from analytics_datacube_processor.cancellation import CancellationToken
+    from analytics_datacube_processor.checkpoint import get_checkpoint_store_from_env
+    from analytics_datacube_processor.fetch_policy import DEFAULT_MAX_RETRIES, FetchPolicy
+    from analytics_datacube_processor.processor import AnalyticsDatacube
+    from analytics_datacube_processor.progress import print_progress_line
+    from analytics_datacube_processor.result_cache import get_result_cache_from_env
+    from analytics_datacube_processor.spatial_tiling import DEFAULT_TILE_SIZE_M
+    from analytics_datacube_processor.tile_cache import get_tile_cache_from_env
+
+    processor_options = {
+        "metrics": metrics,
+        "cloud_storage_provider": cloud_storage_provider,
+        "aws_s3_bucket": aws_s3_bucket,
+        "max_concurrent_fetches": max_concurrent_fetches,
+        "derive_indicators_locally": derive_indicators_locally,
+        "memory_budget_mb": memory_budget_mb,
+        "zarr_storage_mode": zarr_storage_mode,
+        "result_cache": get_result_cache_from_env(),
+        "bypass_cache": bypass_cache,
+        "tile_cache": get_tile_cache_from_env(),
+        "max_pixels_per_tile": max_pixels_per_tile,
+        "tile_size_m": tile_size_m if tile_size_m is not None else DEFAULT_TILE_SIZE_M,
+        "max_concurrent_tiles": max_concurrent_tiles,
+        "fetch_policy": FetchPolicy(
+            timeout_seconds=fetch_timeout,
+            max_retries=fetch_retries if fetch_retries is not None else DEFAULT_MAX_RETRIES,
+            partial_ok=partial_ok,
+        ),
+        "progress_callback": print_progress_line if progress else None,
+        "checkpoint_store": get_checkpoint_store_from_env(),
+        "job_id": job_id,
+        "cancellation_token": CancellationToken(),
+    }
+    if threading.current_thread() is threading.main_thread():
+        # a terminated process (e.g. a rescheduled pod) stops its build at the next fetch,
+        # zarr region write or upload, on a checkpoint consistent with its manifest
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: processor_options["cancellation_token"].cancel("process terminated"),
+        )
+
+    if batch_input:
+        processor = AnalyticsDatacubeBatch(
+            input_data,
+            client_id=api_client_id,
+            client_secret=api_client_secret,
+            username=api_username,
+            password=api_password,
+            bearer_token=bearer_token,
+            entity_id=entity_id,
+            enum_env=Env.PROD,
+            enum_region=Region.NA,
+            max_concurrent_fields=max_concurrent_fields,
+            upload_workers=upload_workers,
+            **processor_options,
+        )
+    else:
+        processor = AnalyticsDatacube(
+            input_data=input_data,
+            client_id=api_client_id,
+            client_secret=api_client_secret,
+            username=api_username,
+            password=api_password,
+            enum_env=Env.PROD,
+            enum_region=Region.NA,
+            bearer_token=bearer_token,
+            entity_id=entity_id,
+            upload_workers=upload_workers,
+            append_to=append_to,
+            **processor_options,
+        )
 
     result = processor.trigger()
     print(f"result: {result}")
@@ -104,6 +269,140 @@ if __name__ == "__main__":
         help="Provide an entity_id value added to the zarr output file",
         default=None,
     )
+    parser.add_argument(
+        "--max_concurrent_fetches",
+        type=int,
+        help="Maximum number of indicators fetched in parallel",
+        default=1,
+    )
+    parser.add_argument(
+        "--derive_indicators_locally",
+        action="store_true",
+        help="Fetch reflectance bands once and compute the indicators locally",
+    )
+    parser.add_argument(
+        "--memory_budget_mb",
+        type=float,
+        help="Memory budget (MB) of a fetch window and of a zarr write, the datacube is streamed",
+        default=None,
+    )
+    parser.add_argument(
+        "--zarr_storage_mode",
+        type=ZarrStorageMode,
+        help="Write the zarr locally then upload it (LOCAL) or directly on the cloud storage (DIRECT)",
+        default=ZarrStorageMode.LOCAL,
+    )
+    parser.add_argument(
+        "--upload_workers",
+        type=int,
+        help="Number of objects uploaded in parallel to the cloud storage",
+        default=8,
+    )
+    parser.add_argument(
+        "--bypass_cache",
+        action="store_true",
+        help="Ignore the result cache and build the datacube again",
+    )
+    parser.add_argument(
+        "--append_to",
+        type=str,
+        help="Storage link of an existing datacube to extend with the dates after its last time",
+        default=None,
+    )
+    parser.add_argument(
+        "--max_concurrent_fields",
+        type=int,
+        help="Maximum number of fields of a batch input processed in parallel",
+        default=4,
+    )
+    parser.add_argument(
+        "--encoding_profile",
+        type=ZarrEncodingProfile,
+        help="Zarr chunks, compression and dtype profile (DEFAULT, TIME_SERIES, SPATIAL, ARCHIVE)",
+        default=None,
+    )
+    parser.add_argument(
+        "--zarr_layout",
+        type=ZarrLayout,
+        help="One object per zarr chunk (CHUNKED) or chunks packed in shards (SHARDED)",
+        default=None,
+    )
+    parser.add_argument(
+        "--max_pixels_per_tile",
+        type=int,
+        help="Pixels per image above which the area is split into tiles processed in parallel",
+        default=None,
+    )
+    parser.add_argument(
+        "--tile_size_m",
+        type=float,
+        help="Side of the tiles in meters (default 5120)",
+        default=None,
+    )
+    parser.add_argument(
+        "--max_concurrent_tiles",
+        type=int,
+        help="Maximum number of tiles processed in parallel",
+        default=4,
+    )
+    parser.add_argument(
+        "--composite_period",
+        type=str,
+        help="Compositing period (e.g. 7D, 1M), the scenes of each period are reduced to one",
+        default=None,
+    )
+    parser.add_argument(
+        "--composite_reducer",
+        type=TemporalReducer,
+        help="Temporal reducer of the composites (MEAN, MEDIAN, MAX, MIN, PERCENTILE)",
+        default=None,
+    )
+    parser.add_argument(
+        "--composite_percentile",
+        type=float,
+        help="Percentile (0 to 100) of the PERCENTILE reducer",
+        default=None,
+    )
+    parser.add_argument(
+        "--min_valid_fraction",
+        type=float,
+        help="Minimum fraction (0 to 1) of valid pixels of a scene, cloudier scenes are dropped",
+        default=None,
+    )
+    parser.add_argument(
+        "--output_format",
+        type=OutputFormat,
+        help="Datacube (ZARR) or zonal statistics over the polygon (PARQUET, CSV, INLINE)",
+        default=None,
+    )
+    parser.add_argument(
+        "--fetch_timeout",
+        type=float,
+        help="HTTP timeout in seconds of the indicator fetches (connection and each read)",
+        default=None,
+    )
+    parser.add_argument(
+        "--fetch_retries",
+        type=int,
+        help="Number of retries of a fetch after a transient Geosys failure (default 2)",
+        default=None,
+    )
+    parser.add_argument(
+        "--partial_ok",
+        action="store_true",
+        help="Return a partial datacube when an indicator cannot be fetched instead of failing",
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Show the progress of the build stages on the standard error",
+    )
+    parser.add_argument(
+        "--job_id",
+        type=str,
+        help="Job identifier, to resume an interrupted job from its checkpoint (CHECKPOINT_DIR)",
+        default=None,
+    )
     args = parser.parse_args()
 
     main(
@@ -113,4 +412,27 @@ if __name__ == "__main__":
         args.metrics,
         args.entity_id,
         args.cloud_storage_provider,
+        args.max_concurrent_fetches,
+        args.derive_indicators_locally,
+        args.memory_budget_mb,
+        args.zarr_storage_mode,
+        args.upload_workers,
+        args.bypass_cache,
+        args.append_to,
+        args.max_concurrent_fields,
+        args.encoding_profile,
+        args.zarr_layout,
+        args.max_pixels_per_tile,
+        args.tile_size_m,
+        args.max_concurrent_tiles,
+        args.composite_period,
+        args.composite_reducer,
+        args.composite_percentile,
+        args.min_valid_fraction,
+        args.output_format,
+        args.fetch_timeout,
+        args.fetch_retries,
+        args.partial_ok,
+        args.progress,
+        args.job_id,
     )
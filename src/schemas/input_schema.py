@@ -1,7 +1,10 @@
 """Input schema class"""
-from typing import List
+from collections import Counter
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+
+from analytics_datacube_processor.identifiers import FIELD_ID_MAX_LENGTH, FIELD_ID_PATTERN
 
 
 class Parameters(BaseModel):
@@ -18,6 +21,25 @@ class Parameters(BaseModel):
     endDate: str
 
 
+class Compositing(BaseModel):
+    """
+    Temporal compositing applied to the datacube before it is written
+
+    Attributes:
+        period (Optional[str]): The compositing period, as a pandas frequency (e.g. 7D, 1W, 1M).
+            The periods start on the start date (fixed periods) or on the calendar
+            (weeks, months...). The scenes are not resampled when not set.
+        reducer (str): The temporal reducer (MEAN, MEDIAN, MAX, MIN or PERCENTILE).
+        percentile (Optional[float]): The percentile (0 to 100) of the PERCENTILE reducer.
+        min_valid_fraction (Optional[float]): The minimum fraction (0 to 1) of valid pixels of a
+            scene, the cloudy scenes below are dropped before the compositing.
+    """
+    period: Optional[str] = None
+    reducer: str = "MEAN"
+    percentile: Optional[float] = Field(default=None, ge=0, le=100)
+    min_valid_fraction: Optional[float] = Field(default=None, ge=0, le=1)
+
+
 class InputModel(BaseModel):
     """
     Input model class
@@ -25,6 +47,59 @@ class InputModel(BaseModel):
     Attributes:
         parameters (Parameters): An instance of the Parameters class containing task parameters.
         indicators (List[str]): A list of strings representing indicators for data analysis.
+        encoding_profile (Optional[str]): The zarr encoding profile (DEFAULT, TIME_SERIES,
+            SPATIAL or ARCHIVE).
+        zarr_layout (Optional[str]): The zarr layout (CHUNKED or SHARDED).
+        compositing (Optional[Compositing]): The temporal compositing of the datacube.
+        output_format (Optional[str]): The output format: the datacube (ZARR), or the zonal
+            statistics over the polygon (PARQUET, CSV or INLINE).
     """
     parameters: Parameters
     indicators: List[str]
+    encoding_profile: Optional[str] = None
+    zarr_layout: Optional[str] = None
+    compositing: Optional[Compositing] = None
+    output_format: Optional[str] = None
+
+
+class FieldParameters(Parameters):
+    """
+    Parameters of a field in a batch request
+
+    Attributes:
+        field_id (str): A string identifying the field, used to name its output: up to 64
+            letters, digits, '_', '-' or '.', starting with a letter or a digit.
+    """
+    field_id: str = Field(max_length=FIELD_ID_MAX_LENGTH, pattern=FIELD_ID_PATTERN.pattern)
+
+
+class BatchInputModel(BaseModel):
+    """
+    Batch input model class
+
+    Attributes:
+        fields (List[FieldParameters]): The parameters of each field, with unique field ids.
+        indicators (List[str]): A list of strings representing indicators shared by all the fields.
+        encoding_profile (Optional[str]): The zarr encoding profile shared by all the fields.
+        zarr_layout (Optional[str]): The zarr layout shared by all the fields.
+        compositing (Optional[Compositing]): The temporal compositing shared by all the fields.
+        output_format (Optional[str]): The output format shared by all the fields.
+    """
+    fields: List[FieldParameters]
+    indicators: List[str]
+    encoding_profile: Optional[str] = None
+    zarr_layout: Optional[str] = None
+    compositing: Optional[Compositing] = None
+    output_format: Optional[str] = None
+
+    @field_validator("fields")
+    @classmethod
+    def check_unique_field_ids(cls, fields: List[FieldParameters]) -> List[FieldParameters]:
+        """the field id names the output and the checkpoint of a field, so it must be unique"""
+        field_ids = Counter(field.field_id for field in fields)
+        duplicated_field_ids = sorted(
+            field_id for field_id, count in field_ids.items() if count > 1
+        )
+        if duplicated_field_ids:
+            raise ValueError(f"Duplicated field_id: {', '.join(duplicated_field_ids)}")
+        return fields
@@ -0,0 +1,72 @@
+"""Job schema class"""
+
+from enum import Enum
+from typing import Optional, Union
+
+from pydantic import BaseModel
+
+from schemas.output_schema import BatchOutputModel, OutputModel
+
+
+class JobStatus(Enum):
+    """
+    Status of an asynchronous datacube job
+    """
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+class JobModel(BaseModel):
+    """
+    Asynchronous datacube job
+
+    Attributes:
+        job_id (str): The job identifier.
+        status (JobStatus): The job status.
+        progress (float): The job progress, between 0 and 1.
+        created_at (str): The job creation date (ISO format).
+        updated_at (str): The last job update date (ISO format).
+        result (Optional[Union[OutputModel, BatchOutputModel]]): The output of the job once
+            succeeded.
+        message (Optional[str]): The message of the last progress event of the job.
+        error (Optional[str]): The error message if the job failed or was cancelled.
+    """
+
+    job_id: str
+    status: JobStatus
+    progress: float = 0.0
+    created_at: str
+    updated_at: str
+    result: Optional[Union[OutputModel, BatchOutputModel]] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ProgressEventModel(BaseModel):
+    """
+    Progress event of an asynchronous datacube job
+
+    Attributes:
+        sequence (int): The event number in the job, starting at 1.
+        event_type (str): The event type (STARTED, INDICATOR_FETCHED, MERGE_DONE,
+            CHUNKS_WRITTEN, BYTES_UPLOADED, COMPLETED...).
+        progress (float): The job progress, between 0 and 1.
+        message (str): The human readable description of the event.
+        done (Optional[int]): The number of items of the stage done.
+        total (Optional[int]): The number of items of the stage.
+        details (dict): The event specific values (indicator, field_id...).
+        timestamp (str): The event date (ISO format).
+    """
+
+    sequence: int
+    event_type: str
+    progress: float
+    message: str
+    done: Optional[int] = None
+    total: Optional[int] = None
+    details: dict = {}
+    timestamp: str
@@ -1,23 +1,66 @@
 """outpout schema class"""
 
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
 
 class Metrics(BaseModel):
     """
-    Metrics for the output.
+    Metrics for the output, accounted to the request only.
 
     Attributes:
-        execution_time (Optional[str]): The execution time.
-        data_generation_network_use (Optional[str]): Network use for datacube generation.
-        data_upload_network_use (Optional[str]): Network use for datacube upload.
+        execution_time_seconds (Optional[float]): The execution time.
+        data_generation_seconds (Optional[float]): Duration of the datacube generation.
+        data_fetch_seconds (Optional[float]): Duration of the indicators retrieval.
+        data_merge_seconds (Optional[float]): Duration of the indicators merge.
+        data_generation_bytes_sent (Optional[int]): Bytes sent to Geosys.
+        data_generation_bytes_received (Optional[int]): Bytes received from Geosys.
+        data_generation_requests (Optional[int]): Number of HTTP requests to Geosys.
+        data_upload_seconds (Optional[float]): Duration of the datacube upload.
+        data_upload_bytes (Optional[int]): Bytes uploaded to the cloud storage.
+        data_upload_objects (Optional[int]): Objects uploaded to the cloud storage.
+        data_upload_throughput (Optional[float]): Upload throughput in bytes per second.
     """
 
-    execution_time: Optional[str] = None
-    data_generation_network_use: Optional[str] = None
-    data_upload_network_use: Optional[str] = None
+    execution_time_seconds: Optional[float] = None
+    data_generation_seconds: Optional[float] = None
+    data_fetch_seconds: Optional[float] = None
+    data_merge_seconds: Optional[float] = None
+    data_generation_bytes_sent: Optional[int] = None
+    data_generation_bytes_received: Optional[int] = None
+    data_generation_requests: Optional[int] = None
+    data_upload_seconds: Optional[float] = None
+    data_upload_bytes: Optional[int] = None
+    data_upload_objects: Optional[int] = None
+    data_upload_throughput: Optional[float] = None
+
+
+class ZonalStatistics(BaseModel):
+    """
+    Statistics of the valid pixels of an indicator band over the polygon at a date.
+
+    Attributes:
+        time (str): The date of the scene (or start of the compositing period), ISO format.
+        indicator (str): The indicator variable of the datacube.
+        band (str): The band of the indicator.
+        count (int): The number of valid pixels in the polygon.
+        mean (Optional[float]): The mean of the valid pixels.
+        median (Optional[float]): The median of the valid pixels.
+        std (Optional[float]): The standard deviation of the valid pixels.
+        min (Optional[float]): The minimum of the valid pixels.
+        max (Optional[float]): The maximum of the valid pixels.
+    """
+
+    time: str
+    indicator: str
+    band: str
+    count: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
 
 
 class OutputModel(BaseModel):
@@ -25,9 +68,45 @@ class OutputModel(BaseModel):
     Output model containing storage links, and metrics.
 
     Attributes:
-        StorageLinks (str): The link of the output path.
+        StorageLinks (Optional[str]): The link of the output path, not set when the zonal
+            statistics are returned inline.
+        ZonalStatistics (Optional[List[ZonalStatistics]]): The zonal statistics returned inline.
+        IndicatorsSucceeded (Optional[List[str]]): The indicators in the output.
+        IndicatorsFailed (Optional[List[str]]): The indicators that could not be fetched, not in
+            the (partial) output.
         Metrics (Optional[Metrics]): Metrics for the output.
     """
 
-    storage_links: str
+    storage_links: Optional[str] = None
+    zonal_statistics: Optional[List[ZonalStatistics]] = None
+    indicators_succeeded: Optional[List[str]] = None
+    indicators_failed: Optional[List[str]] = None
     metrics: Optional[Metrics] = None  # type: ignore
+
+
+class FieldOutputModel(BaseModel):
+    """
+    Output of a field in a batch request.
+
+    Attributes:
+        field_id (str): The field identifier.
+        succeeded (bool): Whether the datacube of the field has been generated.
+        result (Optional[OutputModel]): The output of the field if succeeded.
+        error (Optional[str]): The error message if failed.
+    """
+
+    field_id: str
+    succeeded: bool
+    result: Optional[OutputModel] = None
+    error: Optional[str] = None
+
+
+class BatchOutputModel(BaseModel):
+    """
+    Output of a batch request, one datacube per field.
+
+    Attributes:
+        fields (List[FieldOutputModel]): The output of each field, in the input order.
+    """
+
+    fields: List[FieldOutputModel]
@@ -5,8 +5,8 @@ import json
 
 from pydantic import ValidationError
 
-from schemas.input_schema import InputModel
-from schemas.output_schema import OutputModel
+from schemas.input_schema import BatchInputModel, InputModel
+from schemas.output_schema import BatchOutputModel, OutputModel
 
 
 def validate_data(data, data_type):
@@ -15,10 +15,10 @@ def validate_data(data, data_type):
 
     Args:
         data (dict): The data to validate.
-        data_type (str): The type of data ('input' or 'output').
+        data_type (str): The type of data ('input', 'output', 'batch_input' or 'batch_output').
 
     Raises:
-        ValueError: If the data_type is not 'input' or 'output'.
+        ValueError: If the data_type is not 'input', 'output', 'batch_input' or 'batch_output'.
         ValidationError: If the data does not conform to the specified schema.
     """
     try:
@@ -26,8 +26,14 @@ def validate_data(data, data_type):
             InputModel(**data)
         elif data_type == 'output':
             OutputModel(**data)
+        elif data_type == 'batch_input':
+            BatchInputModel(**data)
+        elif data_type == 'batch_output':
+            BatchOutputModel(**data)
         else:
-            raise ValueError("Invalid data_type. Must be 'input' or 'output'.")
+            raise ValueError(
+                "Invalid data_type. Must be 'input', 'output', 'batch_input' or 'batch_output'."
+            )
     except ValidationError as e:
         print(f"Pydantic validation error: {e}")
         raise
@@ -52,3 +58,16 @@ def load_input_data(input_data_path):
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON: {e}")
         raise
+
+
+def is_batch_input(input_data):
+    """
+    Check if the input data is a batch request (several fields).
+
+    Args:
+        input_data (dict): The input data.
+
+    Returns:
+        bool: True if the input data contains a list of fields.
+    """
+    return 'fields' in input_data
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Bearer token checks, without the import of the geosyspy package."""
+
+import logging
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+
+logger = logging.getLogger(__name__)
+
+# claims identifying the caller of a token: the user, or the client of a client credentials token
+SUBJECT_CLAIMS = ("sub", "client_id")
+
+
+def decode_token(token, certificate_key, algorithms=("RS256",)):
+    """
+    Check the signature, audience and expiration of a JWT token and get its claims, like
+    geosyspy.utils.jwt_validator.check_token_validity but without importing geosyspy
+    (and its scientific stack) before the request is authorized.
+
+    Args:
+        token (str): The JWT token to check.
+        certificate_key (str): The certificate in PEM format.
+        algorithms (tuple, optional): The signature algorithms. Defaults to ('RS256',).
+
+    Returns:
+        dict: the claims of the token, or None if the token is not valid
+    """
+    try:
+        certificate = x509.load_pem_x509_certificate(certificate_key.encode())
+        public_key = certificate.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        audience = jwt.decode(token, options={"verify_signature": False}).get("aud")
+        # the expiration is required and checked by the decoding
+        return jwt.decode(
+            token,
+            public_key,
+            algorithms=list(algorithms),
+            audience=audience,
+            options={"require": ["exp"]},
+        )
+    except jwt.ExpiredSignatureError:
+        logger.error("Expired Token")
+        return None
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error(f"Invalid Token. {e}")
+        return None
+
+
+def check_token_validity(token, certificate_key, algorithms=("RS256",)):
+    """
+    Check the signature, audience and expiration of a JWT token (see decode_token).
+
+    Args:
+        token (str): The JWT token to check.
+        certificate_key (str): The certificate in PEM format.
+        algorithms (tuple, optional): The signature algorithms. Defaults to ('RS256',).
+
+    Returns:
+        bool: True if the token is valid, False otherwise.
+    """
+    return decode_token(token, certificate_key, algorithms) is not None
+
+
+def get_token_subject(token, certificate_key, algorithms=("RS256",)):
+    """
+    Get the caller identified by a JWT token, from the sub (or client_id) claim of the token
+    once its signature is checked.
+
+    Args:
+        token (str): The JWT token.
+        certificate_key (str): The certificate in PEM format.
+        algorithms (tuple, optional): The signature algorithms. Defaults to ('RS256',).
+
+    Returns:
+        str: the subject of the token, or None if it has none or the token is not valid
+    """
+    claims = decode_token(token, certificate_key, algorithms)
+    if claims is None:
+        return None
+    for claim in SUBJECT_CLAIMS:
+        if claims.get(claim):
+            return str(claims[claim])
+    return None
@@ -0,0 +1,79 @@
+"""Shared fixtures of the tests: synthetic indicator datasets of the fake Geosys client and
+a local S3 stand-in"""
+
+import os
+import socket
+import uuid
+from datetime import datetime
+
+import boto3
+import pytest
+
+from benchmarks.fake_geosys import FakeGeosys
+
+POLYGON = (
+    "POLYGON((-90.41169914 41.66631642, -90.41178502 41.6545818, -90.37753855 41.65413284, "
+    "-90.37788188 41.666059940000004, -90.41169914 41.66631642))"
+)
+
+START_DATE = datetime(2023, 6, 1)
+END_DATE = datetime(2023, 7, 1)
+
+
+@pytest.fixture
+def polygon():
+    """WKT polygon of a field"""
+    return POLYGON
+
+
+@pytest.fixture
+def fake_geosys():
+    """fake Geosys client with small 8x8 rasters"""
+    return FakeGeosys(size=8)
+
+
+@pytest.fixture
+def get_indicator_dataset(fake_geosys):
+    """build the dataset of an indicator, in the layout of the Geosys time series"""
+
+    def get_dataset(indicator, start_date=START_DATE, end_date=END_DATE):
+        return fake_geosys.get_satellite_image_time_series(
+            POLYGON, start_date, end_date, indicators=[indicator]
+        )
+
+    return get_dataset
+
+
+@pytest.fixture(scope="session")
+def s3_endpoint_url():
+    """local moto S3 server, targeted by the S3 clients through AWS_ENDPOINT_URL"""
+    server_module = pytest.importorskip("moto.server")
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    endpoint_url = f"http://127.0.0.1:{port}"
+    environment = {
+        "AWS_ENDPOINT_URL": endpoint_url,
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }
+    previous_environment = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    yield endpoint_url
+    for name, value in previous_environment.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    server.stop()
+
+
+@pytest.fixture
+def s3_bucket(s3_endpoint_url):
+    """new empty bucket of the local S3 server"""
+    bucket = f"bucket-{uuid.uuid4().hex[:12]}"
+    boto3.client("s3", endpoint_url=s3_endpoint_url).create_bucket(Bucket=bucket)
+    return bucket
@@ -0,0 +1,138 @@
+"""Tests of the memory-budgeted admission of the concurrent builds"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from analytics_datacube_processor.admission_control import (
+    BASE_JOB_MEMORY_MB,
+    AdmissionController,
+    AdmissionRejectedError,
+    estimate_job_memory_mb,
+    estimate_nb_scenes,
+    get_admission_controller_from_env,
+)
+
+
+def get_input_data(polygon, end_date="2023-07-01", indicators=("NDVI", "EVI")):
+    return {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": end_date},
+        "indicators": list(indicators),
+    }
+
+
+def start_build(controller, name, memory_mb, admitted, release):
+    """build holding its memory until released, its name is recorded once admitted"""
+
+    def build():
+        with controller.admit(memory_mb):
+            admitted.append(name)
+            release.wait(5)
+
+    thread = threading.Thread(target=build)
+    thread.start()
+    # the builds queue in the order they are started
+    time.sleep(0.05)
+    return thread
+
+
+def test_memory_estimate_grows_with_the_request(polygon):
+    june = estimate_job_memory_mb(get_input_data(polygon))
+
+    assert june > BASE_JOB_MEMORY_MB
+    assert estimate_job_memory_mb(get_input_data(polygon, "2023-12-01")) > june
+    assert estimate_job_memory_mb(get_input_data(polygon, indicators=["NDVI"])) < june
+    assert estimate_nb_scenes(datetime(2023, 6, 1), datetime(2023, 6, 1)) == 1
+    assert estimate_nb_scenes(datetime(2023, 6, 1), datetime(2023, 7, 1)) == 1 + 6 + 2
+
+
+def test_memory_estimate_is_capped_by_the_tiles_and_the_budget(polygon):
+    input_data = get_input_data(polygon, "2025-06-01")
+    whole = estimate_job_memory_mb(input_data)
+
+    tiled = estimate_job_memory_mb(input_data, max_pixels_per_tile=1000, max_concurrent_tiles=2)
+    budgeted = estimate_job_memory_mb(input_data, memory_budget_mb=1, max_concurrent_fetches=2)
+
+    assert tiled < whole
+    # two fetch windows and a write slice
+    assert budgeted == BASE_JOB_MEMORY_MB + 3
+    assert estimate_job_memory_mb(input_data, memory_budget_mb=1024) == whole
+
+
+def test_builds_are_admitted_in_arrival_order():
+    controller = AdmissionController(100)
+    admitted = []
+    releases = {name: threading.Event() for name in ("first", "large", "small")}
+
+    threads = [
+        start_build(controller, "first", 80, admitted, releases["first"]),
+        start_build(controller, "large", 50, admitted, releases["large"]),
+        # fits next to the first build, but waits behind the large one
+        start_build(controller, "small", 10, admitted, releases["small"]),
+    ]
+    assert admitted == ["first"]
+    assert controller.admitted_mb == 80
+
+    for release in releases.values():
+        release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert admitted == ["first", "large", "small"]
+    assert controller.admitted_mb == 0
+
+
+def test_waiting_build_is_rejected_after_the_timeout():
+    controller = AdmissionController(100, retry_after_seconds=12)
+    admitted = []
+    release = threading.Event()
+    thread = start_build(controller, "running", 60, admitted, release)
+
+    start_time = time.monotonic()
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.run(lambda: None, 60, timeout_seconds=0.2)
+
+    assert time.monotonic() - start_time >= 0.2
+    assert error.value.retry_after_seconds == 12
+    # a build fitting next to the running one is admitted once the rejected one gave up
+    assert controller.run(lambda: "done", 40, timeout_seconds=0.2) == "done"
+    release.set()
+    thread.join(5)
+    assert controller.admitted_mb == 0
+
+
+def test_build_above_the_budget_runs_alone():
+    controller = AdmissionController(100)
+    admitted = []
+    release = threading.Event()
+    thread = start_build(controller, "running", 10, admitted, release)
+
+    with pytest.raises(AdmissionRejectedError):
+        controller.run(lambda: None, 500, timeout_seconds=0.1)
+    release.set()
+    thread.join(5)
+
+    def oversize_build():
+        assert controller.admitted_mb == 100
+        with pytest.raises(AdmissionRejectedError):
+            controller.run(lambda: None, 1, timeout_seconds=0)
+        return "done"
+
+    assert controller.run(oversize_build, 500, timeout_seconds=1) == "done"
+    assert controller.admitted_mb == 0
+
+
+def test_controller_from_env(monkeypatch):
+    monkeypatch.delenv("ADMISSION_MEMORY_BUDGET_MB", raising=False)
+    assert get_admission_controller_from_env() is None
+
+    monkeypatch.setenv("ADMISSION_MEMORY_BUDGET_MB", "2048")
+    monkeypatch.setenv("ADMISSION_RETRY_AFTER_SECONDS", "5")
+    controller = get_admission_controller_from_env()
+
+    assert controller.memory_budget_mb == 2048
+    assert controller.retry_after_seconds == 5
+    with pytest.raises(ValueError):
+        AdmissionController(0)
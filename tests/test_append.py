@@ -0,0 +1,133 @@
+"""Tests of the incremental append of new dates to an existing datacube"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+import xarray
+
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.utils import (
+    append_dataset_to_zarr,
+    is_configured_storage_link,
+    write_dataset_to_zarr,
+)
+
+JULY_END = datetime(2023, 7, 31)
+
+
+@pytest.fixture
+def existing_store(tmp_path, get_indicator_dataset):
+    """zarr of a NDVI and EVI datacube of June, read back like an appended datacube"""
+    datacube = merge_indicator_datasets(
+        [get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")]
+    )
+    store = str(tmp_path / "datacube.zarr")
+    write_dataset_to_zarr(datacube, store)
+    return store
+
+
+def get_july_datacube(get_indicator_dataset, indicators=("NDVI", "EVI")):
+    """datacube of the dates until the end of July, the dates of June included"""
+    return merge_indicator_datasets(
+        [get_indicator_dataset(indicator, end_date=JULY_END) for indicator in indicators]
+    )
+
+
+def test_append_multi_indicator_datacube(existing_store, get_indicator_dataset):
+    nb_times_before = xarray.open_zarr(existing_store).sizes["time"]
+    datacube = get_july_datacube(get_indicator_dataset)
+
+    nb_appended = append_dataset_to_zarr(datacube, existing_store)
+
+    appended = xarray.open_zarr(existing_store).load()
+    new_times = slice(nb_times_before, None)
+    assert nb_appended == datacube.sizes["time"] - nb_times_before
+    assert appended.sizes["time"] == datacube.sizes["time"]
+    assert appended["crs"].sizes["time"] == appended.sizes["time"]
+    np.testing.assert_array_equal(
+        appended["ndvi"].isel(time=new_times).values, datacube["ndvi"].isel(time=new_times).values
+    )
+    np.testing.assert_array_equal(appended["image.id"].values, datacube["image.id"].values)
+
+
+def test_append_up_to_date_datacube(existing_store, get_indicator_dataset):
+    datacube = merge_indicator_datasets(
+        [get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")]
+    )
+
+    assert append_dataset_to_zarr(datacube, existing_store) == 0
+
+
+def test_append_rejects_missing_variable(existing_store, get_indicator_dataset):
+    # EVI could not be fetched (partial datacube)
+    datacube = get_july_datacube(get_indicator_dataset, indicators=("NDVI",))
+
+    with pytest.raises(ValueError, match="evi"):
+        append_dataset_to_zarr(datacube, existing_store)
+
+    existing = xarray.open_zarr(existing_store)
+    assert existing["ndvi"].sizes["time"] == existing["evi"].sizes["time"]
+
+
+def test_append_to_datacube_with_band_dimension(tmp_path, get_indicator_dataset):
+    # datacubes written before the single band variables lost their band dimension
+    datacube = xarray.merge(
+        [get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")],
+        join="outer",
+        compat="override",
+    )
+    # variable length strings, like the Geosys coordinates
+    datacube = datacube.assign_coords(
+        {
+            name: ("time", datacube[name].values.astype(object))
+            for name in ("image.id", "image.sensor", "crs")
+        }
+    )
+    nb_times_before = datacube.sizes["time"]
+    store = str(tmp_path / "datacube.zarr")
+    datacube.to_zarr(store)
+    july = get_july_datacube(get_indicator_dataset)
+
+    append_dataset_to_zarr(july, store)
+
+    appended = xarray.open_zarr(store).load()
+    new_times = slice(nb_times_before, None)
+    assert appended["ndvi"].dims == ("time", "band", "y", "x")
+    np.testing.assert_array_equal(
+        appended["ndvi"].sel(band="NDVI").isel(time=new_times).values,
+        july["ndvi"].isel(time=new_times).values,
+    )
+    assert np.isnan(appended["ndvi"].sel(band="EVI").values).all()
+
+
+def test_append_rejects_truncated_strings(tmp_path, get_indicator_dataset):
+    # fixed width strings, the image ids of July are longer
+    datacube = get_indicator_dataset("NDVI")
+    store = str(tmp_path / "datacube.zarr")
+    datacube.to_zarr(store)
+
+    with pytest.raises(ValueError, match="image.id"):
+        append_dataset_to_zarr(
+            merge_indicator_datasets([get_indicator_dataset("NDVI", end_date=JULY_END)]), store
+        )
+
+
+def test_only_the_configured_storage_links_can_be_extended(monkeypatch):
+    monkeypatch.setenv("AWS_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("AZURE_BLOB_CONTAINER_NAME", "container")
+
+    assert is_configured_storage_link("s3://bucket/datacube.zarr")
+    assert is_configured_storage_link("abfs://container/datacube.zarr")
+    assert is_configured_storage_link(
+        "https://account.blob.core.windows.net/container/datacube.zarr"
+    )
+    assert not is_configured_storage_link("s3://other-bucket/datacube.zarr")
+    assert not is_configured_storage_link("s3://bucket-other/datacube.zarr")
+    assert not is_configured_storage_link("s3://bucket/../other-bucket/datacube.zarr")
+    assert not is_configured_storage_link("s3://bucket/")
+    assert not is_configured_storage_link("/tmp/datacube.zarr")
+    assert not is_configured_storage_link("file:///tmp/datacube.zarr")
+
+    monkeypatch.delenv("AZURE_BLOB_CONTAINER_NAME")
+    assert not is_configured_storage_link("abfs://container/datacube.zarr")
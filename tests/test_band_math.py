@@ -0,0 +1,94 @@
+"""Tests of the local derivation of the indicators from the reflectance bands"""
+
+import numpy as np
+import pytest
+import xarray
+
+from analytics_datacube_processor.band_math import (
+    derive_indicators,
+    get_reflectance_bands,
+    is_derivable,
+)
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from benchmarks.fake_geosys import FakeGeosys
+
+
+def get_reflectance_dataset(bands, scale=1.0):
+    """reflectance dataset of 2 dates and 2x2 pixels, each band being constant"""
+    values = np.stack(
+        [np.full((2, 2, 2), value * scale, dtype=np.float32) for value in bands.values()],
+        axis=1,
+    )
+    return xarray.Dataset(
+        {
+            "reflectance": xarray.DataArray(
+                values,
+                dims=("time", "band", "y", "x"),
+                coords={"band": list(bands), "y": [1.0, 0.0], "x": [0.0, 1.0]},
+            )
+        }
+    )
+
+
+def test_derivable_indicators():
+    assert is_derivable("NDVI")
+    assert is_derivable("evi")
+    assert not is_derivable("LAI")
+
+
+def test_band_aliases_are_recognized():
+    dataset = get_reflectance_dataset({"B02": 0.1, "B04": 0.2, "B8A": 0.5, "Swir-1": 0.3})
+
+    bands = get_reflectance_bands(dataset)
+
+    assert set(bands) == {"blue", "red", "nir", "swir"}
+    assert float(bands["nir"][0, 0, 0]) == pytest.approx(0.5)
+    assert "band" not in bands["nir"].dims
+    assert get_reflectance_bands(xarray.Dataset()) == {}
+
+
+def test_indicators_are_derived_in_the_layout_of_geosys():
+    bands = {"Blue": 0.1, "Green": 0.2, "Red": 0.3, "NIR": 0.6, "SWIR1": 0.4}
+
+    derived = derive_indicators(get_reflectance_dataset(bands), ["NDVI", "NDWI", "CVI"])
+
+    assert list(derived["NDVI"].data_vars) == ["ndvi"]
+    assert derived["NDVI"]["ndvi"].dims == ("time", "band", "y", "x")
+    assert list(derived["NDVI"]["band"].values) == ["NDVI"]
+    np.testing.assert_allclose(derived["NDVI"]["ndvi"], (0.6 - 0.3) / (0.6 + 0.3), rtol=1e-6)
+    np.testing.assert_allclose(derived["NDWI"]["ndwi"], (0.6 - 0.4) / (0.6 + 0.4), rtol=1e-6)
+    np.testing.assert_allclose(derived["CVI"]["cvi"], 0.6 * 0.3 / 0.2**2, rtol=1e-5)
+
+
+def test_evi_of_scaled_reflectance():
+    bands = {"Blue": 0.1, "Red": 0.3, "NIR": 0.6}
+    expected = 2.5 * (0.6 - 0.3) / (0.6 + 6.0 * 0.3 - 7.5 * 0.1 + 1.0)
+
+    unit = derive_indicators(get_reflectance_dataset(bands), ["EVI"])["EVI"]
+    scaled = derive_indicators(get_reflectance_dataset(bands, scale=10000), ["EVI"])["EVI"]
+
+    np.testing.assert_allclose(unit["evi"], expected, rtol=1e-5)
+    np.testing.assert_allclose(scaled["evi"], expected, rtol=1e-5)
+
+
+def test_indicator_without_its_bands_is_not_derived():
+    derived = derive_indicators(get_reflectance_dataset({"Red": 0.3, "NIR": 0.6}), ["NDVI", "EVI"])
+
+    assert derived["NDVI"] is not None
+    assert derived["EVI"] is None
+
+
+def test_processor_derives_the_indicators_from_a_single_retrieval(polygon):
+    client = FakeGeosys(size=8)
+    input_data = {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": ["NDVI", "EVI", "GNDVI"],
+    }
+
+    datacube = AnalyticsDatacube(
+        input_data, client=client, derive_indicators_locally=True
+    ).predict(input_data)
+
+    assert client.calls == 1
+    assert list(datacube.data_vars) == ["ndvi", "evi", "gndvi"]
+    assert int(datacube["ndvi"].notnull().sum()) > 0
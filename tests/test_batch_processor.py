@@ -0,0 +1,66 @@
+"""Tests of the batch processor"""
+
+import pytest
+
+from analytics_datacube_processor import batch_processor
+from analytics_datacube_processor.batch_processor import AnalyticsDatacubeBatch
+from analytics_datacube_processor.fetch_policy import CircuitOpenError
+from benchmarks.fake_geosys import FakeGeosys
+
+
+class FakeClientPool:
+    def get_client(self, *args):
+        return FakeGeosys(size=8)
+
+
+def get_batch(polygon, field_ids):
+    input_data = {
+        "fields": [
+            {
+                "field_id": field_id,
+                "polygon": polygon,
+                "startDate": "2023-06-01",
+                "endDate": "2023-07-01",
+            }
+            for field_id in field_ids
+        ],
+        "indicators": ["NDVI"],
+    }
+    return AnalyticsDatacubeBatch(input_data)
+
+
+@pytest.fixture
+def failing_fields(monkeypatch):
+    """field ids whose build fails: with an open circuit breaker, or with another error"""
+    failing_fields = {}
+
+    class FakeProcessor:
+        def __init__(self, input_data, entity_id, **kwargs):
+            self.entity_id = entity_id
+
+        def trigger(self):
+            if self.entity_id in failing_fields:
+                raise failing_fields[self.entity_id]
+            return {"storage_links": f"s3://bucket/{self.entity_id}.zarr"}
+
+    monkeypatch.setattr(batch_processor, "get_geosys_client_pool", FakeClientPool)
+    monkeypatch.setattr(batch_processor, "AnalyticsDatacube", FakeProcessor)
+    return failing_fields
+
+
+def test_batch_fails_when_the_circuit_is_open_for_all_the_fields(failing_fields, polygon):
+    failing_fields.update({"a": CircuitOpenError(12), "b": ValueError("invalid polygon")})
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        get_batch(polygon, ["a", "b"]).trigger()
+
+    assert exc_info.value.retry_after_seconds == 12
+
+
+def test_batch_reports_the_open_circuit_of_a_field(failing_fields, polygon):
+    failing_fields["a"] = CircuitOpenError(12)
+
+    output = get_batch(polygon, ["a", "b"]).trigger()
+
+    assert [field["succeeded"] for field in output["fields"]] == [False, True]
+    assert "Geosys is degraded" in output["fields"][0]["error"]
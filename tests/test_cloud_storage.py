@@ -0,0 +1,240 @@
+"""Tests of the zarr writes and uploads to a cloud storage, against a local S3 stand-in"""
+
+import threading
+import time
+
+import boto3
+import pytest
+import xarray
+
+from analytics_datacube_processor import fetch_policy
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.checkpoint import JobCheckpoint
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.utils import (
+    CloudStorageUploader,
+    dataset_to_cloud_storage_zarr,
+    get_zarr_store_from_link,
+    list_directory_objects,
+    storage_link_exists,
+    write_dataset_to_zarr,
+)
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+
+
+class FlakyUploader(CloudStorageUploader):
+    """uploader whose first upload of each object fails"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failed_keys = set()
+
+    def _upload_object(self, local_file_path: str, key: str):
+        if key not in self.failed_keys:
+            self.failed_keys.add(key)
+            raise ConnectionError(f"connection reset while uploading {key}")
+        super()._upload_object(local_file_path, key)
+
+
+class UnreachableUploader(CloudStorageUploader):
+    """uploader whose uploads always fail"""
+
+    def _upload_object(self, local_file_path: str, key: str):
+        raise ConnectionError(f"connection reset while uploading {key}")
+
+
+def list_keys(bucket: str, prefix: str) -> set:
+    """keys of the objects of a bucket under a prefix"""
+    paginator = boto3.client("s3").get_paginator("list_objects_v2")
+    return {
+        item["Key"]
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+        for item in page.get("Contents", [])
+    }
+
+
+@pytest.fixture(name="datacube")
+def fixture_datacube(get_indicator_dataset):
+    """multi-indicator datacube"""
+    return merge_indicator_datasets(
+        [get_indicator_dataset("NDVI"), get_indicator_dataset("EVI").isel(time=slice(1, None))]
+    )
+
+
+@pytest.fixture(name="local_zarr")
+def fixture_local_zarr(tmp_path, datacube):
+    """datacube written to a local zarr folder"""
+    path = str(tmp_path / "datacube.zarr")
+    write_dataset_to_zarr(datacube, path)
+    return path
+
+
+@pytest.mark.parametrize("memory_budget_mb", [None, 0.001])
+def test_zarr_written_directly_to_s3(s3_bucket, datacube, memory_budget_mb):
+    storage_link = dataset_to_cloud_storage_zarr(
+        datacube,
+        CloudStorageProvider.AWS,
+        "datacube.zarr",
+        s3_bucket,
+        memory_budget_mb=memory_budget_mb,
+    )
+
+    assert storage_link == f"s3://{s3_bucket}/datacube.zarr"
+    assert storage_link_exists(storage_link)
+    store, storage_options = get_zarr_store_from_link(storage_link)
+    written = xarray.open_zarr(store, storage_options=storage_options).load()
+    xarray.testing.assert_equal(written["ndvi"], datacube["ndvi"])
+    xarray.testing.assert_equal(written["evi"], datacube["evi"])
+
+
+def test_processor_writes_directly_to_s3(s3_bucket, fake_geosys, polygon):
+    input_data = {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": ["NDVI", "EVI"],
+    }
+
+    output = AnalyticsDatacube(
+        input_data,
+        client=fake_geosys,
+        aws_s3_bucket=s3_bucket,
+        zarr_storage_mode=ZarrStorageMode.DIRECT,
+    ).trigger()
+
+    store, storage_options = get_zarr_store_from_link(output["storage_links"])
+    written = xarray.open_zarr(store, storage_options=storage_options)
+    assert set(written.data_vars) == {"ndvi", "evi"}
+    assert written.sizes["time"] > 0
+
+
+def test_failed_uploads_are_retried(s3_bucket, local_zarr):
+    uploader = FlakyUploader(CloudStorageProvider.AWS, s3_bucket, backoff_seconds=0)
+
+    report = uploader.upload_directory(local_zarr)
+
+    keys = {key for _, key in list_directory_objects(local_zarr)}
+    assert report.objects == len(keys)
+    assert report.retries == len(keys)
+    assert list_keys(s3_bucket, "datacube.zarr/") == keys
+
+
+def test_upload_retries_wait_a_full_jitter_backoff(monkeypatch, s3_bucket, local_zarr):
+    backoff_ranges = []
+
+    def record_backoff_range(low, high):
+        backoff_ranges.append((low, high))
+        return 0.0
+
+    monkeypatch.setattr(fetch_policy.random, "uniform", record_backoff_range)
+    uploader = UnreachableUploader(
+        CloudStorageProvider.AWS, s3_bucket, max_workers=1, backoff_seconds=1, max_retries=3
+    )
+
+    with pytest.raises(RuntimeError, match="Error while uploading"):
+        uploader.upload_directory(local_zarr)
+
+    # delays drawn between 0 and the exponential backoff of each retry of an object
+    assert backoff_ranges[:3] == [(0, 1), (0, 2), (0, 4)]
+
+
+def test_cancellation_interrupts_the_upload_backoff(monkeypatch, s3_bucket, local_zarr):
+    monkeypatch.setattr(fetch_policy.random, "uniform", lambda low, high: high)
+    cancellation_token = CancellationToken()
+    uploader = FlakyUploader(
+        CloudStorageProvider.AWS,
+        s3_bucket,
+        max_workers=1,
+        backoff_seconds=60,
+        cancellation_token=cancellation_token,
+    )
+    threading.Timer(0.2, cancellation_token.cancel, args=("pod rescheduled",)).start()
+    start_time = time.monotonic()
+
+    with pytest.raises(JobCancelledError):
+        uploader.upload_directory(local_zarr)
+
+    assert time.monotonic() - start_time < 10
+
+
+def test_upload_fails_after_its_retries(s3_bucket, local_zarr):
+    uploader = FlakyUploader(CloudStorageProvider.AWS, s3_bucket, max_retries=0)
+
+    with pytest.raises(RuntimeError, match="Error while uploading"):
+        uploader.upload_directory(local_zarr)
+
+
+def test_cancelled_upload_resumes_from_its_checkpoint(tmp_path, s3_bucket, local_zarr):
+    keys = {key for _, key in list_directory_objects(local_zarr)}
+    checkpoint = JobCheckpoint(str(tmp_path / "checkpoint"), "job-1", "request")
+    cancellation_token = CancellationToken()
+
+    def cancel_after_first_objects(uploaded_bytes, total_bytes):
+        if uploaded_bytes > 0:
+            cancellation_token.cancel("pod rescheduled")
+
+    with pytest.raises(JobCancelledError):
+        CloudStorageUploader(
+            CloudStorageProvider.AWS,
+            s3_bucket,
+            max_workers=1,
+            progress_callback=cancel_after_first_objects,
+            cancellation_token=cancellation_token,
+            checkpoint=checkpoint,
+        ).upload_directory(local_zarr)
+    first_keys = list_keys(s3_bucket, "datacube.zarr/")
+    assert 0 < len(first_keys) < len(keys)
+
+    # the next run of the job replays the checkpoint manifest
+    resumed_checkpoint = JobCheckpoint(str(tmp_path / "checkpoint"), "job-1", "request")
+    report = CloudStorageUploader(
+        CloudStorageProvider.AWS, s3_bucket, checkpoint=resumed_checkpoint
+    ).upload_directory(local_zarr)
+
+    assert report.objects == len(keys) - len(first_keys)
+    assert list_keys(s3_bucket, "datacube.zarr/") == keys
+
+
+def test_large_objects_are_uploaded_in_parts(tmp_path, s3_bucket):
+    folder = tmp_path / "datacube.zarr"
+    folder.mkdir()
+    (folder / "large").write_bytes(b"a" * (12 * 1024 * 1024))
+    (folder / "small").write_bytes(b"b" * 1024)
+    uploader = CloudStorageUploader(
+        CloudStorageProvider.AWS, s3_bucket, max_workers=2, multipart_threshold_mb=5
+    )
+
+    report = uploader.upload_directory(str(folder))
+
+    s3_client = boto3.client("s3")
+    large = s3_client.head_object(Bucket=s3_bucket, Key="datacube.zarr/large")
+    small = s3_client.head_object(Bucket=s3_bucket, Key="datacube.zarr/small")
+    # the ETag of a multipart object ends with its number of parts
+    assert large["ETag"].strip('"').endswith("-3")
+    assert large["ContentLength"] == 12 * 1024 * 1024
+    assert "-" not in small["ETag"]
+    assert report.objects == 2
+    assert report.bytes == 12 * 1024 * 1024 + 1024
+
+
+def test_objects_are_uploaded_in_parallel(s3_bucket, local_zarr):
+    in_flight = []
+    max_in_flight = []
+    lock = threading.Lock()
+
+    class SlowUploader(CloudStorageUploader):
+        def _upload_object(self, local_file_path: str, key: str):
+            with lock:
+                in_flight.append(key)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.05)
+            super()._upload_object(local_file_path, key)
+            with lock:
+                in_flight.remove(key)
+
+    SlowUploader(CloudStorageProvider.AWS, s3_bucket, max_workers=4).upload_directory(local_zarr)
+
+    assert max(max_in_flight) == 4
+    assert list_keys(s3_bucket, "datacube.zarr/") == {
+        key for _, key in list_directory_objects(local_zarr)
+    }
@@ -0,0 +1,89 @@
+"""Tests of the assembly of the indicator datasets"""
+
+import numpy as np
+import pandas as pd
+import xarray
+
+from analytics_datacube_processor.band_math import REFLECTANCE_INDICATOR
+from analytics_datacube_processor.datacube_merge import (
+    drop_single_bands,
+    get_coord_values,
+    merge_indicator_datasets,
+)
+from analytics_datacube_processor.utils import write_dataset_by_time_slices
+
+
+def test_merge_indicators_of_the_same_scenes_without_copy(get_indicator_dataset):
+    ndvi = get_indicator_dataset("NDVI")
+    evi = get_indicator_dataset("EVI")
+
+    datacube = merge_indicator_datasets([ndvi, evi])
+
+    assert list(datacube.data_vars) == ["ndvi", "evi"]
+    assert datacube["ndvi"].dims == ("time", "y", "x")
+    assert "band" not in datacube.dims
+    assert np.shares_memory(datacube["ndvi"].values, ndvi["ndvi"].values)
+    np.testing.assert_array_equal(datacube["evi"].values, evi["evi"].values[:, 0])
+
+
+def test_merge_misaligned_indicators_on_the_union(get_indicator_dataset):
+    ndvi = get_indicator_dataset("NDVI").isel(time=slice(0, 4), x=slice(0, 6))
+    evi = get_indicator_dataset("EVI").isel(time=slice(2, None), y=slice(1, None))
+
+    datacube = merge_indicator_datasets([ndvi, evi])
+
+    assert dict(datacube.sizes) == {"time": 7, "y": 8, "x": 8}
+    assert np.isnan(datacube["ndvi"].isel(time=6).values).all()
+    assert np.isnan(datacube["evi"].isel(time=0).values).all()
+    # the first dataset giving a value of a coordinate wins
+    assert list(datacube["image.id"].values) == [
+        "NDVI_0",
+        "NDVI_1",
+        "NDVI_2",
+        "NDVI_3",
+        "EVI_4",
+        "EVI_5",
+        "EVI_6",
+    ]
+
+
+def test_merged_coordinates_are_numpy_arrays(get_indicator_dataset):
+    ndvi = get_indicator_dataset("NDVI").isel(time=slice(0, 4))
+    evi = get_indicator_dataset("EVI").isel(time=slice(2, None))
+
+    datacube = merge_indicator_datasets([ndvi, evi])
+
+    for name, coord in datacube.coords.items():
+        assert isinstance(coord.variable.values, np.ndarray), name
+    assert datacube["image.spatialResolution"].dtype == np.float64
+    assert datacube["image.id"].dtype == object
+    assert all(isinstance(image_id, str) for image_id in datacube["image.id"].values)
+
+
+def test_merged_indicators_written_to_zarr_by_time_slices(tmp_path, get_indicator_dataset):
+    ndvi = get_indicator_dataset("NDVI").isel(time=slice(0, 4))
+    evi = get_indicator_dataset("EVI").isel(time=slice(2, None))
+    datacube = merge_indicator_datasets([ndvi, evi])
+    store = str(tmp_path / "datacube.zarr")
+
+    write_dataset_by_time_slices(datacube, store, memory_budget_mb=0.001)
+
+    written = xarray.open_zarr(store).load()
+    xarray.testing.assert_equal(written["ndvi"], datacube["ndvi"])
+    xarray.testing.assert_equal(written["evi"], datacube["evi"])
+    assert list(written["crs"].values) == list(datacube["crs"].values)
+
+
+def test_drop_single_bands_keeps_multi_band_variables(get_indicator_dataset):
+    reflectance = get_indicator_dataset(REFLECTANCE_INDICATOR)
+
+    assert drop_single_bands(reflectance)["reflectance"].sizes["band"] == 5
+    assert "band" not in drop_single_bands(get_indicator_dataset("NDVI")).coords
+
+
+def test_get_coord_values_of_pandas_strings():
+    values = get_coord_values(pd.Index(["NDVI", "EVI"], dtype="str"))
+
+    assert isinstance(values, np.ndarray)
+    assert values.dtype == object
+    assert list(values) == ["NDVI", "EVI"]
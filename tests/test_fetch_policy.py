@@ -0,0 +1,61 @@
+"""Tests of the fetch policy of the indicators"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from analytics_datacube_processor.fetch_policy import FetchPolicy, apply_fetch_timeout
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """answers after a delay given by the path, e.g. /0.5"""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        time.sleep(float(self.path.strip("/")))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture(name="server_url")
+def fixture_server_url():
+    """url of a local HTTP server answering slowly"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_slow_fetch_times_out_without_leaking_a_thread(server_url):
+    session = requests.Session()
+    apply_fetch_timeout(session)
+    policy = FetchPolicy(timeout_seconds=0.2, max_retries=1, backoff_base_seconds=0)
+
+    start_time = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        policy.call(lambda: session.get(f"{server_url}/1"))
+
+    assert time.monotonic() - start_time < 1
+    # the fetch ran in the calling thread, no thread is left waiting for the response
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("fetch")]
+
+
+def test_fast_fetch_and_calls_outside_of_a_fetch_are_not_timed_out(server_url):
+    session = requests.Session()
+    apply_fetch_timeout(session)
+    policy = FetchPolicy(timeout_seconds=0.5)
+
+    assert policy.call(lambda: session.get(f"{server_url}/0")).text == "ok"
+    assert session.get(f"{server_url}/0.7").text == "ok"
+
+
+def test_partial_datacubes_are_opt_in():
+    assert not FetchPolicy().partial_ok
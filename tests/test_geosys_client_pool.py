@@ -0,0 +1,46 @@
+"""Tests of the pool of the authenticated Geosys clients"""
+
+import time
+
+import requests
+from oauthlib.oauth2 import TokenExpiredError
+
+from analytics_datacube_processor.geosys_client_pool import GeosysClientPool, is_auth_error
+
+
+def test_clients_are_rebuilt_after_their_max_age(monkeypatch):
+    pool = GeosysClientPool(max_age_seconds=60)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    client = pool.get_client(bearer_token="token")
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 30)
+    assert pool.get_client(bearer_token="token") is client
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert pool.get_client(bearer_token="token") is not client
+    assert len(pool) == 1
+
+
+def test_evicted_client_is_rebuilt():
+    pool = GeosysClientPool()
+    client = pool.get_client(bearer_token="token")
+    other_client = pool.get_client(bearer_token="other token")
+
+    pool.evict(client)
+
+    assert len(pool) == 1
+    assert pool.get_client(bearer_token="other token") is other_client
+    assert pool.get_client(bearer_token="token") is not client
+
+
+def test_auth_errors():
+    response = requests.Response()
+    response.status_code = 401
+
+    assert is_auth_error(TokenExpiredError())
+    assert is_auth_error(AttributeError("'HttpClient' object has no attribute '__client_oauth'"))
+    assert is_auth_error(requests.HTTPError(response=response))
+    assert is_auth_error(ValueError("no time series"), statuses=[401])
+    assert not is_auth_error(ValueError("no time series"), statuses=[200])
+    assert not is_auth_error(AttributeError("'NoneType' object has no attribute 'values'"))
@@ -0,0 +1,41 @@
+"""Tests of the input schemas"""
+
+import pytest
+from pydantic import ValidationError
+
+from schemas.input_schema import BatchInputModel
+
+
+def get_field(field_id):
+    """parameters of a field of a batch request"""
+    return {
+        "field_id": field_id,
+        "polygon": "POLYGON((0 0, 0 1, 1 1, 1 0, 0 0))",
+        "startDate": "2023-06-01",
+        "endDate": "2023-07-01",
+    }
+
+
+def test_batch_with_unique_field_ids():
+    batch = BatchInputModel(fields=[get_field("a"), get_field("b")], indicators=["NDVI"])
+
+    assert [field.field_id for field in batch.fields] == ["a", "b"]
+
+
+def test_batch_with_duplicated_field_ids_is_rejected():
+    with pytest.raises(ValidationError, match="Duplicated field_id: a"):
+        BatchInputModel(
+            fields=[get_field("a"), get_field("b"), get_field("a")], indicators=["NDVI"]
+        )
+
+
+@pytest.mark.parametrize("field_id", ["../other", "a/b", "", ".hidden", "a b", "a" * 65])
+def test_batch_with_invalid_field_id_is_rejected(field_id):
+    with pytest.raises(ValidationError, match="field_id"):
+        BatchInputModel(fields=[get_field(field_id)], indicators=["NDVI"])
+
+
+def test_batch_field_id_charset():
+    batch = BatchInputModel(fields=[get_field("Field_1.v-2"), get_field("a" * 64)], indicators=[])
+
+    assert batch.fields[0].field_id == "Field_1.v-2"
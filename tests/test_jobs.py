@@ -0,0 +1,90 @@
+"""Tests of the asynchronous datacube jobs"""
+
+import threading
+import time
+
+import pytest
+
+from api.jobs import JobConflictError, JobManager
+from schemas.job_schema import JobStatus
+
+
+def wait_for_status(job_manager, job_id, status, timeout_seconds=5):
+    """poll a job until it has a status"""
+    for _ in range(int(timeout_seconds / 0.01)):
+        if job_manager.get(job_id).status == status:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {job_manager.get(job_id).status}, not {status}")
+
+
+def blocking_task(release: threading.Event):
+    """task of a job running until it is released or cancelled"""
+
+    def task(job_id, progress_callback, cancellation_token):
+        while not release.wait(0.01):
+            cancellation_token.raise_if_cancelled()
+        return {"storage_links": f"s3://bucket/{job_id}.zarr"}
+
+    return task
+
+
+def test_jobs_are_only_visible_to_their_owner():
+    job_manager = JobManager()
+    release = threading.Event()
+    job_manager.submit(blocking_task(release), "job-1", owner="alice")
+
+    assert job_manager.get("job-1", "alice") is not None
+    assert job_manager.get("job-1", "bob") is None
+    assert job_manager.get_events("job-1", owner="bob") is None
+    assert job_manager.cancel("job-1", owner="bob") is None
+
+    release.set()
+    wait_for_status(job_manager, "job-1", JobStatus.SUCCEEDED)
+    with pytest.raises(JobConflictError):
+        job_manager.submit(blocking_task(release), "job-1", owner="bob")
+    assert job_manager.submit(blocking_task(release), "job-1", owner="alice").job_id == "job-1"
+
+
+def counting_task(calls: list, name: str):
+    """task of a job recording its calls"""
+
+    def task(job_id, progress_callback, cancellation_token):
+        calls.append(name)
+        return {"storage_links": f"s3://bucket/{job_id}.zarr"}
+
+    return task
+
+
+def test_job_cancelled_while_queued_then_resubmitted_runs_once():
+    job_manager = JobManager(max_workers=1)
+    release = threading.Event()
+    calls = []
+    job_manager.submit(blocking_task(release), "blocking")
+    job_manager.submit(counting_task(calls, "cancelled"), "job-1")
+
+    assert job_manager.cancel("job-1").status == JobStatus.CANCELLED
+    job_manager.submit(counting_task(calls, "resubmitted"), "job-1")
+    release.set()
+
+    wait_for_status(job_manager, "job-1", JobStatus.SUCCEEDED)
+    job_manager.submit(counting_task(calls, "last"), "job-2")
+    wait_for_status(job_manager, "job-2", JobStatus.SUCCEEDED)
+    assert calls == ["resubmitted", "last"]
+
+
+def test_pruned_queued_cancelled_job_does_not_break_the_worker():
+    job_manager = JobManager(max_workers=1, max_finished_jobs=0)
+    release = threading.Event()
+    calls = []
+    job_manager.submit(blocking_task(release), "blocking")
+    job_manager.submit(counting_task(calls, "cancelled"), "job-1")
+    job_manager.cancel("job-1")
+
+    # the submission prunes the finished (cancelled) job-1 while its run is still queued
+    job_manager.submit(counting_task(calls, "next"), "job-2")
+    assert job_manager.get("job-1") is None
+    release.set()
+
+    wait_for_status(job_manager, "job-2", JobStatus.SUCCEEDED)
+    assert calls == ["next"]
@@ -0,0 +1,119 @@
+"""Tests of the datacube builds within a memory budget"""
+
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pytest
+import xarray
+
+from analytics_datacube_processor import processor
+from analytics_datacube_processor.indicator_spill import (
+    IndicatorSpill,
+    get_fetch_windows,
+    get_window_days,
+)
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.utils import get_zarr_store_from_link
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+from benchmarks.fake_geosys import FakeGeosys
+
+START_DATE = datetime(2023, 6, 1)
+END_DATE = datetime(2023, 7, 1)
+
+
+class WindowedGeosys(FakeGeosys):
+    """fake Geosys client whose scenes do not depend on the requested dates: the requests are
+    served from the time series of June"""
+
+    def get_satellite_image_time_series(
+        self, polygon, start_date, end_date, collections=None, indicators=None
+    ):
+        dataset = super().get_satellite_image_time_series(
+            polygon, START_DATE, END_DATE, collections, indicators
+        )
+        return dataset.sel(time=slice(start_date, end_date))
+
+
+def test_fetch_windows_cover_the_request():
+    assert get_fetch_windows(START_DATE, datetime(2023, 6, 30), 10) == [
+        (datetime(2023, 6, 1), datetime(2023, 6, 10)),
+        (datetime(2023, 6, 11), datetime(2023, 6, 20)),
+        (datetime(2023, 6, 21), datetime(2023, 6, 30)),
+    ]
+    assert get_fetch_windows(START_DATE, datetime(2023, 6, 3), 10) == [
+        (START_DATE, datetime(2023, 6, 3))
+    ]
+
+
+def test_window_days_fit_the_budget(polygon):
+    ndvi_days = get_window_days(polygon, "NDVI", 10)
+
+    assert get_window_days(polygon, "NDVI", 20) >= 2 * ndvi_days - 1
+    assert get_window_days(polygon, "Reflectance", 10) < ndvi_days
+    assert get_window_days(polygon, "NDVI", 0.001) == 1
+    with pytest.raises(ValueError):
+        get_window_days(polygon, "NDVI", 0)
+
+
+def test_spilled_time_series_is_read_back_lazily(tmp_path, polygon):
+    fake_geosys = WindowedGeosys(size=8)
+    windows = [
+        fake_geosys.get_satellite_image_time_series(
+            polygon, window_start_date, window_end_date, indicators=["NDVI"]
+        )
+        for window_start_date, window_end_date in get_fetch_windows(START_DATE, END_DATE, 7)
+    ]
+    spill = IndicatorSpill(str(tmp_path / "spill"))
+
+    dataset = spill.store("ndvi", iter(windows))
+
+    expected = xarray.concat([window for window in windows if window.sizes["time"]], dim="time")
+    assert dataset["ndvi"].chunks is not None
+    assert set(dataset["ndvi"].chunks[0]) == {1}
+    np.testing.assert_array_equal(dataset["ndvi"].values, expected["ndvi"].values)
+    np.testing.assert_array_equal(dataset["image.id"].values, expected["image.id"].values)
+    assert not spill.store("empty", iter([])).data_vars
+
+    spill.delete()
+    assert not os.path.exists(tmp_path / "spill")
+
+
+def test_budgeted_build_streams_the_fetched_time_series(monkeypatch, tmp_path, s3_bucket, polygon):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    written_datacubes = []
+    write = processor.dataset_to_cloud_storage_zarr
+
+    def record_written_datacube(datacube, *args):
+        written_datacubes.append(datacube)
+        return write(datacube, *args)
+
+    monkeypatch.setattr(processor, "dataset_to_cloud_storage_zarr", record_written_datacube)
+    input_data = {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": ["NDVI", "EVI"],
+    }
+
+    def build(client, memory_budget_mb):
+        output = AnalyticsDatacube(
+            input_data,
+            client=client,
+            aws_s3_bucket=s3_bucket,
+            zarr_storage_mode=ZarrStorageMode.DIRECT,
+            memory_budget_mb=memory_budget_mb,
+        ).trigger()
+        store, storage_options = get_zarr_store_from_link(output["storage_links"])
+        return xarray.open_zarr(store, storage_options=storage_options).load()
+
+    client = WindowedGeosys(size=8)
+    streamed = build(client, 0.001)
+    in_memory = build(WindowedGeosys(size=8), None)
+
+    # one fetch per day and indicator, the datacube is only computed while written
+    assert client.calls == 2 * 31
+    assert written_datacubes[0]["ndvi"].chunks is not None
+    assert written_datacubes[1]["ndvi"].chunks is None
+    xarray.testing.assert_equal(streamed, in_memory)
+    # the spilled time series are deleted with the build
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("analytics-datacube")]
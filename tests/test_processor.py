@@ -0,0 +1,69 @@
+"""Tests of the datacube build of the processor"""
+
+import threading
+
+import pytest
+import xarray
+
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from benchmarks.fake_geosys import FakeGeosys
+
+INDICATORS = ["NDVI", "EVI", "GNDVI", "CVI"]
+
+
+class ConcurrencyRecordingGeosys(FakeGeosys):
+    """fake Geosys client recording the maximum number of calls in flight"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.__lock = threading.Lock()
+
+    def get_satellite_image_time_series(self, *args, **kwargs):
+        with self.__lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return super().get_satellite_image_time_series(*args, **kwargs)
+        finally:
+            with self.__lock:
+                self.in_flight -= 1
+
+
+def get_input_data(polygon, indicators=INDICATORS):
+    return {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": indicators,
+    }
+
+
+def test_indicators_are_fetched_concurrently(polygon):
+    client = ConcurrencyRecordingGeosys(size=8, latency_seconds=0.2)
+    input_data = get_input_data(polygon)
+
+    datacube = AnalyticsDatacube(input_data, client=client, max_concurrent_fetches=3).predict(
+        input_data
+    )
+
+    assert client.calls == len(INDICATORS)
+    assert client.max_in_flight == 3
+    assert list(datacube.data_vars) == [indicator.lower() for indicator in INDICATORS]
+
+
+def test_concurrent_fetches_build_the_sequential_datacube(polygon):
+    input_data = get_input_data(polygon)
+
+    sequential = AnalyticsDatacube(input_data, client=FakeGeosys(size=8)).predict(input_data)
+    concurrent = AnalyticsDatacube(
+        input_data, client=FakeGeosys(size=8), max_concurrent_fetches=4
+    ).predict(input_data)
+
+    xarray.testing.assert_identical(concurrent, sequential)
+
+
+def test_max_concurrent_fetches_must_be_positive(polygon):
+    with pytest.raises(ValueError, match="max_concurrent_fetches"):
+        AnalyticsDatacube(
+            get_input_data(polygon), client=FakeGeosys(size=8), max_concurrent_fetches=0
+        )
@@ -0,0 +1,107 @@
+"""Tests of the progress events of the datacube builds"""
+
+import pytest
+
+from analytics_datacube_processor.fetch_policy import FetchPolicy
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.progress import (
+    ProgressEvent,
+    ProgressTracker,
+    print_progress_line,
+)
+from analytics_datacube_processor.progress_event_type import ProgressEventType
+from benchmarks.fake_geosys import FakeGeosys
+
+
+class FailingEviGeosys(FakeGeosys):
+    """fake Geosys client failing the EVI fetches"""
+
+    def get_satellite_image_time_series(
+        self, polygon, start_date, end_date, collections=None, indicators=None
+    ):
+        if indicators == ["EVI"]:
+            raise RuntimeError("EVI unavailable")
+        return super().get_satellite_image_time_series(
+            polygon, start_date, end_date, collections, indicators
+        )
+
+
+def test_stage_events_are_throttled_except_the_last_one():
+    events = []
+    tracker = ProgressTracker(events.append, min_interval_seconds=60)
+
+    for done in range(1, 5):
+        tracker.emit(ProgressEventType.CHUNKS_WRITTEN, "regions written", done, 4)
+
+    assert [(event.done, event.total) for event in events] == [(1, 4), (4, 4)]
+    assert events[0].progress == pytest.approx(0.65 + 0.15 / 4)
+    assert events[-1].progress == pytest.approx(0.8)
+
+
+def test_progress_never_decreases():
+    events = []
+    tracker = ProgressTracker(events.append, min_interval_seconds=0)
+
+    tracker.emit(ProgressEventType.INDICATOR_FETCHED, "fetched", 2, 2, indicator="NDVI")
+    tracker.emit(ProgressEventType.MERGE_DONE, "merged")
+    # a late fetch of a derived indicator
+    tracker.emit(ProgressEventType.INDICATOR_FETCHED, "fetched", 3, 4, indicator="EVI")
+
+    assert [event.progress for event in events] == [0.6, 0.65, 0.65]
+    assert events[-1].details == {"indicator": "EVI"}
+    assert tracker.progress == 0.65
+
+
+def test_failing_or_missing_listener_never_fails_the_build():
+    def failing_listener(event):
+        raise ValueError("listener down")
+
+    ProgressTracker(failing_listener).emit(ProgressEventType.STARTED, "build started")
+    tracker = ProgressTracker()
+    tracker.emit(ProgressEventType.COMPLETED, "build completed")
+
+    assert tracker.progress == 0.0
+
+
+def test_progress_line(capsys):
+    print_progress_line(ProgressEvent(ProgressEventType.MERGE_DONE, 0.65, "indicators merged"))
+    print_progress_line(ProgressEvent(ProgressEventType.COMPLETED, 1.0, "build completed"))
+
+    lines = capsys.readouterr().err.split("\r")
+    assert lines[1].startswith("[ 65%] indicators merged")
+    assert lines[2].startswith("[100%] build completed")
+    assert lines[2].endswith("\n")
+
+
+def test_build_emits_the_events_of_its_stages(s3_bucket, polygon):
+    events = []
+    input_data = {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": ["NDVI", "EVI", "NDWI"],
+    }
+
+    AnalyticsDatacube(
+        input_data,
+        client=FailingEviGeosys(size=8),
+        aws_s3_bucket=s3_bucket,
+        fetch_policy=FetchPolicy(max_retries=0, partial_ok=True),
+        progress_callback=events.append,
+    ).trigger()
+
+    event_types = [event.event_type for event in events]
+    assert event_types[0] == ProgressEventType.STARTED
+    assert event_types[-1] == ProgressEventType.COMPLETED
+    fetches = [event for event in events if event.done is not None and event.total == 3]
+    assert [event.done for event in fetches] == [1, 2, 3]
+    assert [
+        event.details["indicator"]
+        for event in events
+        if event.event_type == ProgressEventType.INDICATOR_FAILED
+    ] == ["EVI"]
+    assert event_types.index(ProgressEventType.MERGE_DONE) > events.index(fetches[-1])
+    assert ProgressEventType.CHUNKS_WRITTEN in event_types
+    assert ProgressEventType.BYTES_UPLOADED in event_types
+    progress = [event.progress for event in events]
+    assert progress == sorted(progress)
+    assert progress[-1] == 1.0
+    assert events[-1].details["storage_links"].startswith(f"s3://{s3_bucket}/")
@@ -0,0 +1,177 @@
+"""Tests of the result cache of the generated datacubes"""
+
+import shutil
+from datetime import date, timedelta
+
+import pytest
+
+from analytics_datacube_processor.cloud_storage_provider import CloudStorageProvider
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.result_cache import (
+    CloudStorageResultCacheBackend,
+    LocalResultCacheBackend,
+    ResultCache,
+    ResultCacheBackend,
+    get_request_cache_key,
+    is_cacheable_request,
+)
+from analytics_datacube_processor.zarr_storage_mode import ZarrStorageMode
+from benchmarks.fake_geosys import FakeGeosys
+
+INPUT_DATA = {
+    "parameters": {
+        "polygon": "POLYGON((0 0, 0 1, 1 1, 1 0, 0 0))",
+        "startDate": "2023-06-01",
+        "endDate": "2023-07-01",
+    },
+    "indicators": ["NDVI", "EVI"],
+}
+
+
+class CountingBackend(LocalResultCacheBackend):
+    """local backend counting the writes of the index"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.nb_saves = 0
+
+    def save_index(self, index: dict):
+        self.nb_saves += 1
+        super().save_index(index)
+
+
+@pytest.fixture
+def datacube_link(tmp_path):
+    """an existing output of a previous request"""
+    path = tmp_path / "datacube.zarr"
+    path.mkdir()
+    return str(path)
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ResultCacheBackend()  # pylint: disable=abstract-class-instantiated
+
+
+def test_cache_key_depends_on_the_entity_id():
+    keys = {
+        get_request_cache_key(INPUT_DATA, CloudStorageProvider.AWS, "bucket", entity_id)
+        for entity_id in (None, "field-1", "field-2")
+    }
+
+    assert len(keys) == 3
+    assert get_request_cache_key(
+        {**INPUT_DATA, "indicators": ["EVI", "NDVI"]}, CloudStorageProvider.AWS, "bucket"
+    ) == get_request_cache_key(INPUT_DATA, CloudStorageProvider.AWS, "bucket")
+
+
+def test_get_does_not_write_the_index(tmp_path, datacube_link):
+    backend = CountingBackend(str(tmp_path / "index.json"))
+    cache = ResultCache(backend)
+    cache.put("key", datacube_link)
+
+    assert cache.get("key") == datacube_link
+    assert cache.get("unknown") is None
+    assert backend.nb_saves == 1
+
+
+def test_hits_are_merged_in_the_lru_order_on_put(tmp_path, tmp_path_factory):
+    links = [str(tmp_path_factory.mktemp(f"datacube_{i}")) for i in range(3)]
+    cache = ResultCache(LocalResultCacheBackend(str(tmp_path / "index.json")), max_entries=2)
+    cache.put("first", links[0])
+    cache.put("second", links[1])
+
+    assert cache.get("first") == links[0]
+    cache.put("third", links[2])
+
+    assert cache.get("first") == links[0]
+    assert cache.get("second") is None
+    assert cache.get("third") == links[2]
+
+
+def test_deleted_output_is_a_miss(tmp_path, datacube_link):
+    cache = ResultCache(LocalResultCacheBackend(str(tmp_path / "index.json")))
+    cache.put("key", datacube_link)
+
+    shutil.rmtree(datacube_link)
+
+    assert cache.get("key") is None
+
+
+def test_invalidate_the_entries_of_an_appended_datacube(tmp_path, datacube_link):
+    cache = ResultCache(LocalResultCacheBackend(str(tmp_path / "index.json")))
+    cache.put("june", datacube_link)
+    cache.put("june-field-1", datacube_link)
+    other_link = str(tmp_path)
+    cache.put("other", other_link)
+
+    cache.invalidate(datacube_link)
+
+    assert cache.get("june") is None
+    assert cache.get("june-field-1") is None
+    assert cache.get("other") == other_link
+
+
+def test_requests_ending_today_or_later_are_not_cacheable():
+    def get_input_data(end_date):
+        return {**INPUT_DATA, "parameters": {**INPUT_DATA["parameters"], "endDate": end_date}}
+
+    today = date.today()
+    assert is_cacheable_request(INPUT_DATA)
+    assert is_cacheable_request(get_input_data((today - timedelta(days=2)).isoformat()))
+    assert not is_cacheable_request(get_input_data((today + timedelta(days=1)).isoformat()))
+    assert not is_cacheable_request(get_input_data("2999-01-01"))
+
+
+def test_datacube_of_a_request_ending_today_is_not_cached(tmp_path, s3_bucket, polygon):
+    backend = CountingBackend(str(tmp_path / "index.json"))
+    today = date.today()
+    input_data = {
+        "parameters": {
+            "polygon": polygon,
+            "startDate": (today - timedelta(days=30)).isoformat(),
+            "endDate": today.isoformat(),
+        },
+        "indicators": ["NDVI"],
+    }
+
+    output = AnalyticsDatacube(
+        input_data,
+        client=FakeGeosys(size=8),
+        aws_s3_bucket=s3_bucket,
+        zarr_storage_mode=ZarrStorageMode.DIRECT,
+        result_cache=ResultCache(backend),
+    ).trigger()
+
+    assert output["storage_links"].startswith(f"s3://{s3_bucket}/")
+    assert backend.nb_saves == 0
+
+
+def test_concurrent_updates_of_the_cloud_index_are_kept(s3_bucket):
+    backend = CloudStorageResultCacheBackend(CloudStorageProvider.AWS, s3_bucket)
+    other_process_backend = CloudStorageResultCacheBackend(CloudStorageProvider.AWS, s3_bucket)
+    entry = {"storage_links": "s3://bucket/datacube.zarr", "created_at": 0, "last_access": 0}
+    nb_updates = 0
+
+    def add_entry(index):
+        nonlocal nb_updates
+        nb_updates += 1
+        if nb_updates == 1:
+            # another process writes its entry between the read and the write of this one
+            other_process_backend.update_index(lambda other_index: {**other_index, "b": entry})
+        return {**index, "a": entry}
+
+    backend.update_index(add_entry)
+
+    assert nb_updates == 2
+    assert set(backend.load_index()) == {"a", "b"}
+
+
+def test_cloud_cache_entries_are_put_and_invalidated(s3_bucket):
+    cache = ResultCache(CloudStorageResultCacheBackend(CloudStorageProvider.AWS, s3_bucket))
+
+    cache.put("june", "s3://bucket/june.zarr")
+    cache.put("july", "s3://bucket/july.zarr")
+    cache.invalidate("s3://bucket/june.zarr")
+
+    assert set(cache.backend.load_index()) == {"july"}
@@ -0,0 +1,154 @@
+"""Tests of the spatial tiling of large areas of interest"""
+
+import numpy as np
+import pytest
+import xarray
+from shapely import wkt
+from shapely.ops import unary_union
+
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.checkpoint import JobCheckpoint
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.spatial_tiling import (
+    estimate_pixels,
+    get_tile_size_m,
+    split_geometry,
+    write_tiles_to_zarr,
+)
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+
+# U shaped field, its upper row of tiles is clipped into two parts
+U_POLYGON = (
+    "POLYGON((0 0, 0.03 0, 0.03 0.03, 0.02 0.03, 0.02 0.01, 0.01 0.01, 0.01 0.03, 0 0.03, 0 0))"
+)
+
+
+@pytest.fixture(name="datacube")
+def fixture_datacube(get_indicator_dataset):
+    """NDVI and EVI datacube of June"""
+    return merge_indicator_datasets([get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")])
+
+
+@pytest.fixture(name="tile_stores")
+def fixture_tile_stores(tmp_path, datacube):
+    """zarr of two tiles of the datacube overlapping on 2 columns, the overlap is missing from
+    the second tile, which also misses the first date"""
+    west = datacube.isel(x=slice(0, 5))
+    east = datacube.isel(x=slice(3, 8), time=slice(1, None))
+    east = east.where(east["x"] > datacube["x"][4])
+    tile_stores = []
+    for index, tile in enumerate([west, east]):
+        tile_store = str(tmp_path / f"tile-{index}.zarr")
+        tile.to_zarr(tile_store)
+        tile_stores.append(tile_store)
+    return tile_stores
+
+
+def test_split_geometry_covers_the_geometry(polygon):
+    field = wkt.loads(polygon)
+
+    tiles = split_geometry(polygon, 1000.0)
+
+    # the field is about 2.8 km wide and 1.3 km high
+    assert len(tiles) == 3 * 2
+    assert (
+        unary_union([wkt.loads(tile) for tile in tiles]).symmetric_difference(field).area < 1e-12
+    )
+    (single_tile,) = split_geometry(polygon, 10_000.0)
+    assert wkt.loads(single_tile).equals(field)
+    with pytest.raises(ValueError):
+        split_geometry(polygon, 0)
+
+
+def test_split_geometry_keeps_each_part_of_a_clipped_tile():
+    tiles = [wkt.loads(tile) for tile in split_geometry(U_POLYGON, 3 * 0.01 * 111_320.0)]
+
+    assert len(tiles) == 1
+    tiles = [wkt.loads(tile) for tile in split_geometry(U_POLYGON, 2 * 0.01 * 111_320.0)]
+    # the upper left tile holds both arms of the U
+    assert len(tiles) == 5
+    assert all(tile.geom_type == "Polygon" for tile in tiles)
+    assert abs(sum(tile.area for tile in tiles) - wkt.loads(U_POLYGON).area) < 1e-12
+
+
+def test_tile_size_fits_the_pixels_threshold(polygon):
+    assert get_tile_size_m(5120.0, 512 * 512) == 5120.0
+    assert get_tile_size_m(5120.0, 100 * 100) == 1000.0
+    # about 2.8 km x 1.3 km at 10 m
+    assert 30_000 < estimate_pixels(polygon) < 45_000
+    assert estimate_pixels(polygon, 20.0) == pytest.approx(estimate_pixels(polygon) / 4, rel=1e-3)
+
+
+def test_overlapping_tiles_keep_the_written_values(tmp_path, datacube, tile_stores):
+    store = str(tmp_path / "datacube.zarr")
+    progress = []
+
+    write_tiles_to_zarr(
+        tile_stores,
+        store,
+        attrs={"title": "tiled"},
+        progress_callback=lambda written, total: progress.append((written, total)),
+    )
+
+    written = xarray.open_zarr(store).load()
+    assert progress == [(1, 2), (2, 2)]
+    assert written.attrs["title"] == "tiled"
+    np.testing.assert_array_equal(written["x"].values, datacube["x"].values)
+    np.testing.assert_array_equal(written["image.id"].values, datacube["image.id"].values)
+    xarray.testing.assert_equal(
+        written["ndvi"].isel(x=slice(0, 5)), datacube["ndvi"].isel(x=slice(0, 5))
+    )
+    xarray.testing.assert_equal(
+        written["evi"].isel(time=slice(1, None)), datacube["evi"].isel(time=slice(1, None))
+    )
+    # the first date of the east tile was never fetched
+    assert np.isnan(written["ndvi"].isel(time=0, x=slice(5, None)).values).all()
+
+
+def test_tiles_of_the_archive_profile_share_a_scale_factor(tmp_path, datacube, tile_stores):
+    store = str(tmp_path / "datacube.zarr")
+
+    write_tiles_to_zarr(tile_stores, store, encoding_profile=ZarrEncodingProfile.ARCHIVE)
+
+    written = xarray.open_zarr(store).load()
+    scale_factor = written["ndvi"].encoding["scale_factor"]
+    np.testing.assert_allclose(
+        written["ndvi"].isel(x=slice(0, 5)).values,
+        datacube["ndvi"].isel(x=slice(0, 5)).values,
+        atol=scale_factor,
+    )
+
+
+def test_cancelled_tiling_resumes_the_remaining_tiles(tmp_path, datacube, tile_stores):
+    store = str(tmp_path / "datacube.zarr")
+    cancellation_token = CancellationToken()
+
+    def cancel_after_first_tile(written, total):
+        cancellation_token.cancel("pod rescheduled")
+
+    with pytest.raises(JobCancelledError):
+        write_tiles_to_zarr(
+            tile_stores,
+            store,
+            progress_callback=cancel_after_first_tile,
+            cancellation_token=cancellation_token,
+            checkpoint=JobCheckpoint(str(tmp_path / "checkpoint"), "job-1", "request"),
+        )
+    # the west tile is written, the east one is not
+    partial = xarray.open_zarr(store).load()
+    assert np.isnan(partial["ndvi"].isel(x=slice(5, None)).values).all()
+
+    write_tiles_to_zarr(
+        tile_stores,
+        store,
+        checkpoint=JobCheckpoint(str(tmp_path / "checkpoint"), "job-1", "request"),
+    )
+
+    written = xarray.open_zarr(store).load()
+    write_tiles_to_zarr(tile_stores, str(tmp_path / "uninterrupted.zarr"))
+    xarray.testing.assert_identical(
+        written, xarray.open_zarr(str(tmp_path / "uninterrupted.zarr")).load()
+    )
+    xarray.testing.assert_equal(
+        written["ndvi"].isel(x=slice(0, 5)), datacube["ndvi"].isel(x=slice(0, 5))
+    )
@@ -0,0 +1,79 @@
+"""Tests of the prometheus instrumentation"""
+
+import socket
+import urllib.request
+
+import pytest
+from prometheus_client import REGISTRY
+
+from analytics_datacube_processor import telemetry
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.telemetry import start_metrics_server, time_stage
+
+
+def get_stage_count(stage: str) -> float:
+    """number of observations of a stage in the stage histogram"""
+    value = REGISTRY.get_sample_value(
+        "analytics_datacube_stage_duration_seconds_count", {"stage": stage}
+    )
+    return value or 0.0
+
+
+def get_free_port() -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        return free_socket.getsockname()[1]
+
+
+def test_stage_is_observed_even_when_it_fails():
+    with time_stage("test_stage"):
+        pass
+    with pytest.raises(ValueError):
+        with time_stage("test_stage"):
+            raise ValueError("failed stage")
+
+    assert get_stage_count("test_stage") == 2
+
+
+def test_build_observes_its_stages(polygon, fake_geosys):
+    input_data = {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": ["NDVI", "EVI"],
+    }
+    stages = (telemetry.FETCH_STAGE, telemetry.MERGE_STAGE)
+    counts = {stage: get_stage_count(stage) for stage in stages}
+    fetched = REGISTRY.get_sample_value(
+        "analytics_datacube_indicators_fetched_total", {"indicator": "EVI"}
+    )
+
+    AnalyticsDatacube(input_data, client=fake_geosys).predict(input_data)
+
+    assert all(get_stage_count(stage) > counts[stage] for stage in stages)
+    assert (
+        REGISTRY.get_sample_value(
+            "analytics_datacube_indicators_fetched_total", {"indicator": "EVI"}
+        )
+        == (fetched or 0) + 1
+    )
+
+
+def test_metrics_server_is_started_once(monkeypatch):
+    monkeypatch.setattr(telemetry, "_server_started", False)
+    port = get_free_port()
+
+    assert start_metrics_server(port)
+    assert start_metrics_server(port)
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        metrics = response.read().decode()
+    assert "analytics_datacube_stage_duration_seconds_bucket" in metrics
+    assert "analytics_datacube_resident_memory_bytes" in metrics
+
+
+def test_metrics_server_on_a_busy_port(monkeypatch):
+    monkeypatch.setattr(telemetry, "_server_started", False)
+    with socket.socket() as busy_socket:
+        busy_socket.bind(("0.0.0.0", 0))
+        busy_socket.listen()
+
+        assert not start_metrics_server(busy_socket.getsockname()[1])
@@ -0,0 +1,64 @@
+"""Tests of the scene filtering and temporal compositing"""
+
+import numpy as np
+import pandas as pd
+import xarray
+
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.temporal_compositing import (
+    apply_compositing,
+    filter_scenes,
+    get_valid_fraction,
+)
+
+
+def get_merged_datacube(get_indicator_dataset):
+    """multi-indicator datacube placed on the union of the dates of its indicators"""
+    return merge_indicator_datasets(
+        [
+            get_indicator_dataset("NDVI").isel(time=slice(0, 5)),
+            get_indicator_dataset("EVI").isel(time=slice(2, None)),
+        ]
+    )
+
+
+def test_filter_scenes_of_a_merged_datacube(get_indicator_dataset):
+    datacube = get_merged_datacube(get_indicator_dataset)
+    fractions = get_valid_fraction(datacube).values
+
+    filtered = filter_scenes(datacube, 0.8)
+
+    assert filtered.sizes["time"] == int((fractions >= 0.8).sum())
+    np.testing.assert_array_equal(
+        filtered["image.id"].values, datacube["image.id"].values[fractions >= 0.8]
+    )
+
+
+def test_filter_scenes_with_pandas_extension_coordinates():
+    values = np.ones((4, 3, 3))
+    values[1] = np.nan
+    # pandas 3 reindexing gives arrow backed strings
+    image_ids = pd.Series(["a", "b", "c", "d"]).reindex(range(4)).values
+    dataset = xarray.Dataset(
+        {"ndvi": (("time", "y", "x"), values)},
+        coords={"time": pd.date_range("2023-06-01", periods=4), "image.id": ("time", image_ids)},
+    )
+
+    filtered = filter_scenes(dataset, 0.5)
+
+    assert list(filtered["image.id"].values) == ["a", "c", "d"]
+
+
+def test_monthly_composite_of_a_merged_datacube(get_indicator_dataset):
+    datacube = get_merged_datacube(get_indicator_dataset)
+
+    composites = apply_compositing(
+        datacube, {"min_valid_fraction": 0.1, "period": "1M"}, pd.Timestamp("2023-06-01")
+    )
+
+    assert list(composites.indexes["time"]) == [
+        pd.Timestamp("2023-06-01"),
+        pd.Timestamp("2023-07-01"),
+    ]
+    assert set(composites.data_vars) == {"ndvi", "evi"}
+    assert "image.id" not in composites.coords
@@ -0,0 +1,80 @@
+"""Tests of the on-disk cache of the fetched time series"""
+
+import shutil
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from analytics_datacube_processor.tile_cache import TileCache, get_tile_key
+
+START_DATE = datetime(2023, 6, 1)
+END_DATE = datetime(2023, 7, 1)
+TILE_KEY = get_tile_key("POLYGON((0 0, 0 1, 1 1, 1 0, 0 0))")
+
+
+class EvictingTileCache(TileCache):
+    """tile cache whose entries are evicted right after being stored, as by a concurrent
+    store of another indicator"""
+
+    def store(self, indicator, tile_key, dataset, start_date, end_date):
+        super().store(indicator, tile_key, dataset, start_date, end_date)
+        shutil.rmtree(self._entry_dir(indicator, tile_key))
+
+
+def get_fetch(get_indicator_dataset, fetched_intervals):
+    """fetch of the NDVI time series recording the fetched intervals"""
+
+    def fetch(start_date, end_date):
+        fetched_intervals.append((start_date, end_date))
+        return get_indicator_dataset("NDVI", start_date, end_date)
+
+    return fetch
+
+
+def test_cached_dates_are_not_fetched_again(tmp_path, get_indicator_dataset):
+    cache = TileCache(str(tmp_path), recent_days=0)
+    fetched_intervals = []
+    fetch = get_fetch(get_indicator_dataset, fetched_intervals)
+
+    first = cache.get_time_series("NDVI", TILE_KEY, START_DATE, END_DATE, fetch)
+    second = cache.get_time_series(
+        "NDVI", TILE_KEY, START_DATE, END_DATE + timedelta(days=10), fetch
+    )
+
+    assert fetched_intervals == [
+        (START_DATE, END_DATE),
+        (END_DATE + timedelta(days=1), END_DATE + timedelta(days=10)),
+    ]
+    np.testing.assert_array_equal(
+        second["ndvi"].sel(time=first.indexes["time"]).values, first["ndvi"].values
+    )
+    # the hits and misses are both counted in days
+    assert cache.stats() == {"hits": 31, "misses": 41}
+
+
+def test_recent_dates_are_refetched(tmp_path, get_indicator_dataset):
+    cache = TileCache(str(tmp_path), recent_days=7)
+    fetched_intervals = []
+    fetch = get_fetch(get_indicator_dataset, fetched_intervals)
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    start_date = today - timedelta(days=20)
+
+    cache.get_time_series("NDVI", TILE_KEY, start_date, today, fetch)
+    cache.get_time_series("NDVI", TILE_KEY, start_date, today, fetch)
+
+    assert fetched_intervals == [
+        (start_date, today),
+        (today - timedelta(days=6), today),
+    ]
+
+
+def test_evicted_entry_is_a_miss(tmp_path, get_indicator_dataset):
+    cache = EvictingTileCache(str(tmp_path), recent_days=0)
+    fetched_intervals = []
+    fetch = get_fetch(get_indicator_dataset, fetched_intervals)
+
+    dataset = cache.get_time_series("NDVI", TILE_KEY, START_DATE, END_DATE, fetch)
+
+    assert dataset.sizes["time"] == get_indicator_dataset("NDVI").sizes["time"]
+    assert fetched_intervals == [(START_DATE, END_DATE), (START_DATE, END_DATE)]
+    assert cache.stats() == {"hits": 0, "misses": 31}
@@ -0,0 +1,125 @@
+"""Tests of the zarr writes streamed by time slices within a memory budget"""
+
+import numpy as np
+import pytest
+import xarray
+
+from analytics_datacube_processor.cancellation import CancellationToken, JobCancelledError
+from analytics_datacube_processor.checkpoint import JobCheckpoint
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.utils import (
+    get_time_slice_size,
+    write_dataset_by_time_slices,
+    write_dataset_to_zarr,
+)
+
+
+@pytest.fixture(name="datacube")
+def fixture_datacube(get_indicator_dataset):
+    """NDVI and EVI datacube of June"""
+    return merge_indicator_datasets([get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")])
+
+
+@pytest.fixture(name="two_steps_mb")
+def fixture_two_steps_mb(datacube):
+    """memory budget of 2 time steps of the datacube, with their coordinates"""
+    time_step_bytes = sum(
+        variable.nbytes / datacube.sizes["time"]
+        for variable in datacube.variables.values()
+        if "time" in variable.dims
+    )
+    return 2 * time_step_bytes / 1024 / 1024
+
+
+@pytest.fixture(name="region_writes")
+def fixture_region_writes(monkeypatch):
+    """(number of time steps, lazy) of each region write to zarr"""
+    region_writes = []
+    to_zarr = xarray.Dataset.to_zarr
+
+    def record_region_write(dataset, *args, **kwargs):
+        if kwargs.get("region") is not None:
+            region_writes.append(
+                (
+                    dataset.sizes["time"],
+                    all(variable.chunks is not None for variable in dataset.data_vars.values()),
+                )
+            )
+        return to_zarr(dataset, *args, **kwargs)
+
+    monkeypatch.setattr(xarray.Dataset, "to_zarr", record_region_write)
+    return region_writes
+
+
+def test_time_slice_size_fits_the_budget(datacube, two_steps_mb):
+    assert get_time_slice_size(datacube, two_steps_mb) == 2
+    assert get_time_slice_size(datacube, two_steps_mb / 10) == 1
+    assert get_time_slice_size(datacube, 1024) == datacube.sizes["time"]
+    with pytest.raises(ValueError):
+        get_time_slice_size(datacube, 0)
+
+
+def test_time_slices_write_the_whole_datacube(tmp_path, datacube, region_writes, two_steps_mb):
+    progress = []
+
+    write_dataset_by_time_slices(
+        datacube,
+        str(tmp_path / "sliced.zarr"),
+        two_steps_mb,
+        progress_callback=lambda written, total: progress.append((written, total)),
+    )
+    write_dataset_to_zarr(datacube, str(tmp_path / "whole.zarr"))
+
+    sliced = xarray.open_zarr(str(tmp_path / "sliced.zarr")).load()
+    xarray.testing.assert_identical(sliced, xarray.open_zarr(str(tmp_path / "whole.zarr")).load())
+    nb_slices = int(np.ceil(datacube.sizes["time"] / 2))
+    assert [nb_times for nb_times, _ in region_writes] == [2] * (nb_slices - 1) + [
+        datacube.sizes["time"] - 2 * (nb_slices - 1)
+    ]
+    assert progress == [(index + 1, nb_slices) for index in range(nb_slices)]
+
+
+def test_lazy_datacube_is_computed_slice_by_slice(tmp_path, datacube, region_writes, two_steps_mb):
+    lazy_datacube = datacube.chunk({"time": 1})
+
+    write_dataset_by_time_slices(lazy_datacube, str(tmp_path / "lazy.zarr"), two_steps_mb)
+
+    # each region is computed while written, never the whole datacube at once
+    assert all(lazy and nb_times <= 2 for nb_times, lazy in region_writes)
+    assert lazy_datacube["ndvi"].chunks is not None
+    written = xarray.open_zarr(str(tmp_path / "lazy.zarr")).load()
+    xarray.testing.assert_equal(written["ndvi"], datacube["ndvi"])
+
+
+def test_cancelled_write_resumes_the_remaining_slices(
+    tmp_path, datacube, region_writes, two_steps_mb
+):
+    store = str(tmp_path / "datacube.zarr")
+    cancellation_token = CancellationToken()
+
+    def cancel_after_first_slice(written, total):
+        cancellation_token.cancel("pod rescheduled")
+
+    with pytest.raises(JobCancelledError):
+        write_dataset_by_time_slices(
+            datacube,
+            store,
+            two_steps_mb,
+            progress_callback=cancel_after_first_slice,
+            cancellation_token=cancellation_token,
+            checkpoint=JobCheckpoint(str(tmp_path / "checkpoint"), "job-1", "request"),
+        )
+    assert len(region_writes) == 1
+
+    write_dataset_by_time_slices(
+        datacube,
+        store,
+        two_steps_mb,
+        checkpoint=JobCheckpoint(str(tmp_path / "checkpoint"), "job-1", "request"),
+    )
+
+    nb_slices = int(np.ceil(datacube.sizes["time"] / 2))
+    assert len(region_writes) == nb_slices
+    written = xarray.open_zarr(store).load()
+    xarray.testing.assert_equal(written["ndvi"], datacube["ndvi"])
+    xarray.testing.assert_equal(written["evi"], datacube["evi"])
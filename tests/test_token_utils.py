@@ -0,0 +1,65 @@
+"""Tests of the bearer token checks"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from utils.token_utils import check_token_validity, get_token_subject
+
+
+def get_certificate_key(private_key) -> str:
+    """self-signed certificate of a key, in PEM format"""
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "identity-server")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(scope="module")
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture(scope="module")
+def certificate_key(private_key):
+    return get_certificate_key(private_key)
+
+
+def get_token(private_key, **claims) -> str:
+    claims = {"aud": "analytics", "exp": int(time.time()) + 60, **claims}
+    return jwt.encode(claims, private_key, algorithm="RS256")
+
+
+def test_subject_of_a_verified_token(private_key, certificate_key):
+    assert get_token_subject(get_token(private_key, sub="user-1"), certificate_key) == "user-1"
+    assert (
+        get_token_subject(get_token(private_key, client_id="client-1"), certificate_key)
+        == "client-1"
+    )
+    assert get_token_subject(get_token(private_key), certificate_key) is None
+
+
+def test_no_subject_of_a_forged_token(private_key, certificate_key):
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    forged_token = get_token(other_key, sub="user-1")
+    expired_token = get_token(private_key, sub="user-1", exp=int(time.time()) - 60)
+    unsigned_token = jwt.encode({"sub": "user-1", "exp": int(time.time()) + 60}, None, "none")
+
+    for token in (forged_token, expired_token, unsigned_token, "not a token"):
+        assert not check_token_validity(token, certificate_key)
+        assert get_token_subject(token, certificate_key) is None
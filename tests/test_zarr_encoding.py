@@ -0,0 +1,121 @@
+"""Tests of the zarr encoding profiles"""
+
+import numpy as np
+import pytest
+import xarray
+import zarr
+
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.utils import write_dataset_to_zarr
+from analytics_datacube_processor.zarr_encoding import (
+    DEFAULT_INT16_SCALE_FACTOR,
+    INT16_FILL_VALUE,
+    get_time_chunk,
+    get_zarr_encoding,
+)
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+
+
+@pytest.fixture(name="datacube")
+def fixture_datacube(get_indicator_dataset):
+    """NDVI and EVI datacube of June"""
+    return merge_indicator_datasets([get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")])
+
+
+def get_compressor(encoding: dict):
+    (compressor,) = encoding["compressors"]
+    return compressor.cname.value, compressor.clevel, compressor.shuffle.value
+
+
+def test_default_profile_keeps_the_zarr_encoding(datacube):
+    assert get_zarr_encoding(datacube) == {}
+    assert get_time_chunk(datacube) is None
+
+
+def test_profiles_set_the_chunks_and_compressors(datacube):
+    times = datacube.sizes["time"]
+
+    time_series = get_zarr_encoding(datacube, ZarrEncodingProfile.TIME_SERIES)
+    spatial = get_zarr_encoding(datacube, ZarrEncodingProfile.SPATIAL)
+    archive = get_zarr_encoding(datacube, ZarrEncodingProfile.ARCHIVE)
+
+    # the spatial chunks are capped by the 8x8 rasters
+    assert time_series["ndvi"]["chunks"] == (times, 8, 8)
+    assert spatial["ndvi"]["chunks"] == (1, 8, 8)
+    assert archive["ndvi"]["chunks"] == (min(8, times), 8, 8)
+    assert get_compressor(time_series["ndvi"]) == ("lz4", 5, "shuffle")
+    assert get_compressor(archive["evi"]) == ("zstd", 9, "bitshuffle")
+    assert time_series["ndvi"]["dtype"] == "float32"
+    assert archive["ndvi"]["dtype"] == "int16"
+    assert archive["ndvi"]["_FillValue"] == INT16_FILL_VALUE
+    # an explicit time chunk, e.g. of the time slices, overrides the profile one
+    assert get_zarr_encoding(datacube, ZarrEncodingProfile.TIME_SERIES, time_chunk=2)["ndvi"][
+        "chunks"
+    ] == (2, 8, 8)
+
+
+def test_int16_scale_factor_covers_the_variable_range(datacube):
+    archive = get_zarr_encoding(datacube, ZarrEncodingProfile.ARCHIVE)
+
+    for name, encoding in archive.items():
+        max_abs_value = float(abs(datacube[name]).max())
+        assert max_abs_value / encoding["scale_factor"] <= np.iinfo(np.int16).max
+        assert max_abs_value / encoding["scale_factor"] > np.iinfo(np.int16).max / 10
+    all_missing = datacube.assign(ndvi=datacube["ndvi"] * np.nan)
+    assert (
+        get_zarr_encoding(all_missing, ZarrEncodingProfile.ARCHIVE)["ndvi"]["scale_factor"]
+        == DEFAULT_INT16_SCALE_FACTOR
+    )
+    assert (
+        get_zarr_encoding(datacube, ZarrEncodingProfile.ARCHIVE, max_abs_values={"ndvi": 3000.0})[
+            "ndvi"
+        ]["scale_factor"]
+        == 0.1
+    )
+
+
+@pytest.mark.parametrize("profile", list(ZarrEncodingProfile))
+def test_profile_round_trip(tmp_path, datacube, profile):
+    store = str(tmp_path / "datacube.zarr")
+
+    write_dataset_to_zarr(datacube, store, encoding_profile=profile)
+
+    written = xarray.open_zarr(store).load()
+    if profile == ZarrEncodingProfile.ARCHIVE:
+        # int16 values keep 4 to 5 significant digits
+        scale_factor = get_zarr_encoding(datacube, profile)["ndvi"]["scale_factor"]
+        np.testing.assert_allclose(
+            written["ndvi"].values, datacube["ndvi"].values, atol=scale_factor
+        )
+        assert zarr.open_group(store)["ndvi"].dtype == np.int16
+    else:
+        np.testing.assert_allclose(written["ndvi"].values, datacube["ndvi"].values, rtol=1e-6)
+    np.testing.assert_array_equal(
+        np.isnan(written["evi"].values), np.isnan(datacube["evi"].values)
+    )
+
+
+def test_time_sliced_writes_align_with_the_profile_chunks(tmp_path, datacube):
+    time_step_mb = (
+        sum(
+            variable.nbytes / datacube.sizes["time"]
+            for variable in datacube.variables.values()
+            if "time" in variable.dims
+        )
+        / 1024
+        / 1024
+    )
+    store = str(tmp_path / "datacube.zarr")
+
+    # the whole time series chunks of the profile are cut to the 2 time steps slices
+    write_dataset_to_zarr(
+        datacube,
+        store,
+        memory_budget_mb=2 * time_step_mb,
+        encoding_profile=ZarrEncodingProfile.TIME_SERIES,
+    )
+
+    assert zarr.open_group(store)["ndvi"].chunks == (2, 8, 8)
+    np.testing.assert_allclose(
+        xarray.open_zarr(store)["ndvi"].values, datacube["ndvi"].values, rtol=1e-6
+    )
@@ -0,0 +1,116 @@
+"""Tests of the consolidated metadata and of the sharded zarr layout"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+import xarray
+import zarr
+
+from analytics_datacube_processor.datacube_merge import merge_indicator_datasets
+from analytics_datacube_processor.utils import (
+    append_dataset_to_zarr,
+    get_zarr_store_usage,
+    write_dataset_to_zarr,
+)
+from analytics_datacube_processor.zarr_encoding_profile import ZarrEncodingProfile
+from analytics_datacube_processor.zarr_layout import ZarrLayout
+
+
+@pytest.fixture(name="datacube")
+def fixture_datacube(get_indicator_dataset):
+    """NDVI and EVI datacube of June"""
+    return merge_indicator_datasets([get_indicator_dataset("NDVI"), get_indicator_dataset("EVI")])
+
+
+def get_consolidated_metadata(store: str) -> dict:
+    """arrays described by the consolidated metadata of the root group"""
+    with open(os.path.join(store, "zarr.json"), encoding="utf-8") as metadata_file:
+        return json.load(metadata_file)["consolidated_metadata"]["metadata"]
+
+
+@pytest.mark.parametrize("memory_budget_mb", [None, 1024])
+def test_metadata_is_consolidated(tmp_path, datacube, memory_budget_mb):
+    store = str(tmp_path / "datacube.zarr")
+
+    write_dataset_to_zarr(datacube, store, memory_budget_mb=memory_budget_mb)
+
+    metadata = get_consolidated_metadata(store)
+    assert {"ndvi", "evi", "time", "image.id"} <= set(metadata)
+    assert metadata["ndvi"]["shape"] == list(datacube["ndvi"].shape)
+    xarray.testing.assert_equal(xarray.open_zarr(store, consolidated=True).load(), datacube)
+
+
+def test_append_updates_the_consolidated_metadata(tmp_path, datacube, get_indicator_dataset):
+    store = str(tmp_path / "datacube.zarr")
+    write_dataset_to_zarr(datacube, store)
+    until_july = merge_indicator_datasets(
+        [
+            get_indicator_dataset(indicator, end_date=datetime(2023, 7, 31))
+            for indicator in ("NDVI", "EVI")
+        ]
+    )
+
+    appended = append_dataset_to_zarr(until_july, store)
+
+    assert appended > 0
+    assert get_consolidated_metadata(store)["ndvi"]["shape"][0] == until_july.sizes["time"]
+    assert xarray.open_zarr(store, consolidated=True).sizes["time"] == until_july.sizes["time"]
+
+
+def test_sharded_layout_packs_the_chunks(tmp_path, datacube):
+    chunked_store = str(tmp_path / "chunked.zarr")
+    sharded_store = str(tmp_path / "sharded.zarr")
+
+    write_dataset_to_zarr(datacube, chunked_store, encoding_profile=ZarrEncodingProfile.SPATIAL)
+    write_dataset_to_zarr(
+        datacube,
+        sharded_store,
+        encoding_profile=ZarrEncodingProfile.SPATIAL,
+        zarr_layout=ZarrLayout.SHARDED,
+    )
+
+    ndvi = zarr.open_group(sharded_store)["ndvi"]
+    assert ndvi.chunks == (1, 8, 8)
+    assert ndvi.shards == datacube["ndvi"].shape
+    # a single object per variable instead of one per time step
+    assert get_zarr_store_usage(sharded_store)[0] < get_zarr_store_usage(chunked_store)[0]
+    assert len(os.listdir(os.path.join(sharded_store, "ndvi", "c"))) == 1
+    xarray.testing.assert_equal(
+        xarray.open_zarr(sharded_store).load(), xarray.open_zarr(chunked_store).load()
+    )
+
+
+def test_sharded_layout_of_the_default_profile_sets_the_chunks(tmp_path, datacube):
+    store = str(tmp_path / "datacube.zarr")
+
+    write_dataset_to_zarr(datacube, store, zarr_layout=ZarrLayout.SHARDED)
+
+    ndvi = zarr.open_group(store)["ndvi"]
+    assert ndvi.chunks == (1, 8, 8)
+    assert ndvi.shards == datacube["ndvi"].shape
+    np.testing.assert_array_equal(xarray.open_zarr(store)["ndvi"].values, datacube["ndvi"].values)
+
+
+def test_time_sliced_sharded_layout_has_a_shard_per_slice(tmp_path, datacube):
+    time_step_mb = (
+        sum(
+            variable.nbytes / datacube.sizes["time"]
+            for variable in datacube.variables.values()
+            if "time" in variable.dims
+        )
+        / 1024
+        / 1024
+    )
+    store = str(tmp_path / "datacube.zarr")
+
+    write_dataset_to_zarr(
+        datacube, store, memory_budget_mb=2 * time_step_mb, zarr_layout=ZarrLayout.SHARDED
+    )
+
+    ndvi = zarr.open_group(store)["ndvi"]
+    assert ndvi.chunks == (1, 8, 8)
+    assert ndvi.shards == (2, 8, 8)
+    np.testing.assert_array_equal(xarray.open_zarr(store)["ndvi"].values, datacube["ndvi"].values)
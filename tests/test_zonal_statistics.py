@@ -0,0 +1,117 @@
+"""Tests of the zonal statistics of the datacube over the polygon"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+from analytics_datacube_processor.processor import AnalyticsDatacube
+from analytics_datacube_processor.utils import get_zarr_store_from_link
+from analytics_datacube_processor.zonal_statistics import (
+    ZONAL_STATISTICS_COLUMNS,
+    compute_zonal_statistics,
+    get_geometry_mask,
+    zonal_statistics_to_records,
+)
+
+# western half of the 4x4 grid below
+WEST_POLYGON = "POLYGON((0 0, 2 0, 2 4, 0 4, 0 0))"
+
+
+@pytest.fixture(name="datacube")
+def fixture_datacube():
+    """4x4 grid in WGS84 of 2 dates: a NDVI and a 2 bands reflectance whose SWIR band is
+    missing, the first date of the NDVI being missing in the west half"""
+    times = pd.to_datetime(["2023-06-01", "2023-06-11"])
+    ndvi = np.arange(2 * 4 * 4, dtype=np.float32).reshape(2, 4, 4)
+    ndvi[0, :, :2] = np.nan
+    reflectance = np.full((2, 2, 4, 4), np.nan, dtype=np.float32)
+    reflectance[:, 0] = 0.1
+    return xarray.Dataset(
+        {
+            "ndvi": (("time", "y", "x"), ndvi),
+            "reflectance": (("time", "band", "y", "x"), reflectance),
+        },
+        coords={
+            "time": times,
+            "band": ["RED", "SWIR1"],
+            "y": [3.5, 2.5, 1.5, 0.5],
+            "x": [0.5, 1.5, 2.5, 3.5],
+            "crs": ("time", ["EPSG:4326", "EPSG:4326"]),
+        },
+    )
+
+
+def test_mask_keeps_the_pixel_centers_in_the_geometry(datacube):
+    mask = get_geometry_mask(datacube, WEST_POLYGON)
+
+    np.testing.assert_array_equal(mask, np.tile([True, True, False, False], (4, 1)))
+    # a polygon smaller than a pixel uses the clipped rasters
+    assert get_geometry_mask(datacube, "POLYGON((0 0, 0.1 0, 0.1 0.1, 0 0))").all()
+
+
+def test_statistics_of_the_pixels_in_the_geometry(datacube):
+    table = compute_zonal_statistics(datacube, WEST_POLYGON)
+
+    assert list(table.columns) == ZONAL_STATISTICS_COLUMNS
+    # the SWIR band without any valid pixel is skipped
+    assert table[["indicator", "band"]].drop_duplicates().values.tolist() == [
+        ["ndvi", "NDVI"],
+        ["reflectance", "RED"],
+    ]
+    ndvi = table[table["indicator"] == "ndvi"].set_index("time")
+    west_values = datacube["ndvi"].values[1][:, :2]
+    assert ndvi["count"].tolist() == [0, 8]
+    assert ndvi.iloc[0][["mean", "min", "max"]].isna().all()
+    assert ndvi.iloc[1]["mean"] == pytest.approx(west_values.mean())
+    assert ndvi.iloc[1]["median"] == pytest.approx(np.median(west_values))
+    assert ndvi.iloc[1]["std"] == pytest.approx(west_values.std())
+    assert (ndvi.iloc[1]["min"], ndvi.iloc[1]["max"]) == (16, 29)
+    red = table[table["band"] == "RED"]
+    assert red["count"].tolist() == [8, 8]
+    assert red["mean"].tolist() == pytest.approx([0.1, 0.1])
+
+
+def test_statistics_of_an_empty_datacube():
+    table = compute_zonal_statistics(xarray.Dataset(), WEST_POLYGON)
+
+    assert table.empty
+    assert list(table.columns) == ZONAL_STATISTICS_COLUMNS
+
+
+def test_records_are_json_compatible(datacube):
+    records = zonal_statistics_to_records(compute_zonal_statistics(datacube, WEST_POLYGON))
+
+    assert records[0]["time"] == "2023-06-01T00:00:00"
+    assert records[0]["mean"] is None
+    assert records[1]["count"] == 8
+
+
+def test_inline_and_table_outputs(s3_bucket, polygon, fake_geosys):
+    input_data = {
+        "parameters": {"polygon": polygon, "startDate": "2023-06-01", "endDate": "2023-07-01"},
+        "indicators": ["NDVI", "EVI"],
+    }
+
+    inline = AnalyticsDatacube(
+        {**input_data, "output_format": "INLINE"}, client=fake_geosys, aws_s3_bucket=s3_bucket
+    ).trigger()
+    parquet = AnalyticsDatacube(
+        {**input_data, "output_format": "PARQUET"}, client=fake_geosys, aws_s3_bucket=s3_bucket
+    ).trigger()
+    too_many_rows = AnalyticsDatacube(
+        {**input_data, "output_format": "INLINE"},
+        client=fake_geosys,
+        aws_s3_bucket=s3_bucket,
+        max_inline_rows=1,
+    ).trigger()
+
+    assert inline["storage_links"] is None
+    assert {record["indicator"] for record in inline["zonal_statistics"]} == {"ndvi", "evi"}
+    assert parquet["storage_links"].endswith(".parquet")
+    path, storage_options = get_zarr_store_from_link(parquet["storage_links"])
+    table = pd.read_parquet(path, storage_options=storage_options)
+    assert len(table) == len(inline["zonal_statistics"])
+    # more rows than allowed inline: written as parquet
+    assert too_many_rows["zonal_statistics"] is None
+    assert too_many_rows["storage_links"].endswith(".parquet")